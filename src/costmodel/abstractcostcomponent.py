@@ -22,6 +22,7 @@
 # OTHER DEALINGS IN THE SOFTWARE.
 # -----------------------------------------------------------------------
 
+import time
 import logging
 
 LOG = logging.getLogger(__name__)
@@ -35,10 +36,21 @@ class AbstractCostComponent():
         self.state = state
         self.debug = LOG.isEnabledFor(logging.DEBUG)
         self.lastDesign = None
+        
+        # ColName -> The portion of the last computed cost that
+        # can be attributed to the operations on that collection
+        self.col_costs = { }
+
+        # The number of times that we computed a cost and how long it took in total
+        self.eval_count = 0
+        self.eval_time = 0.0
     ## DEF
         
     def getCost(self, design, num_nodes=None):
+        start = time.time()
         cost = self.getCostImpl(design, num_nodes)
+        self.eval_time += time.time() - start
+        self.eval_count += 1
         self.lastDesign = design
         return (cost)
     ## DEF
@@ -46,6 +58,11 @@ class AbstractCostComponent():
     def getCostImpl(self, design, num_nodes=None):
         raise NotImplementedError("Unimplemented %s.getCostImpl()" % self.__init__.im_class)
 
+    def getCollectionCosts(self):
+        """Return the per-collection breakdown of the last computed cost"""
+        return self.col_costs
+    ## DEF
+
     def invalidateCache(self, newDesign, col_name):
         """Optional callback for when the cost model needs to invalidate a collection's cache"""
         pass
@@ -33,11 +33,13 @@ import workload
 from nodeestimator import NodeEstimator
 from util import constants
 from util import Histogram
+from util import profiler
 import catalog
 import disk
 import skew
 import network
 from state import State
+from querystats import QueryStatsCollector
 from abstractcostcomponent import AbstractCostComponent
 from workload.workloadcombiner import WorkloadCombiner
 
@@ -69,6 +71,7 @@ class CostModel(object):
     def __init__(self, collections, workload, config):
         self.last_design = None
         self.last_cost = None
+        self.last_col_costs = { }
         self.new_design = None
         self.state = State(collections, workload, config)
 
@@ -92,6 +95,14 @@ class CostModel(object):
         self.debug = False
         
         self.design_set = set()
+
+        # Design costs that are shared with the other search workers
+        # See multithreaded.costcache.DesignCostCache
+        self.design_cost_cache = None
+
+        # Cached look-ups from a previous run that we can reuse
+        # ColName -> (DesignSignature, BestIndexCache, OpRegexCache)
+        self.warm_cache = { }
     ## DEF
 
     def calcMaxCardinality(self, collections):
@@ -109,6 +120,33 @@ class CostModel(object):
         return maxCardinality
 
     def overallCost(self, design):
+        """
+            Return the cost of the given design. If we share a cost cache with other
+            workers, the cost may come from there, in which case the per-collection
+            breakdown of getCollectionCosts() is not updated. Use computeCost() if
+            you need it.
+        """
+        if self.design_cost_cache is None:
+            return self.computeCost(design)
+
+        design_hash = design.getHash()
+        cost = self.design_cost_cache.get(design_hash)
+        if cost is None:
+            cost = self.computeCost(design)
+            self.design_cost_cache.put(design_hash, cost)
+        return cost
+    ## DEF
+
+    def computeCost(self, design):
+        """Evaluate the cost of the given design"""
+        profiler.getProfiler().start("cost")
+        try:
+            return self.__computeCost__(design)
+        finally:
+            profiler.getProfiler().stop("cost")
+    ## DEF
+
+    def __computeCost__(self, design):
         # TODO: We should reset any cache entries for only those collections
         #       that were changed in this new design from the last design
         self.new_design = design
@@ -145,6 +183,7 @@ class CostModel(object):
             
         self.last_cost = cost / self.weights_sum
         self.last_design = design
+        self.last_col_costs = self.combineCollectionCosts()
 
         # Calculate cache hit/miss ratio
         LOG.info("Overall Cost %f / Computed in %.2f seconds, design\n %s", \
@@ -158,10 +197,168 @@ class CostModel(object):
         return self.last_cost
     ## DEF
 
+    def combineCollectionCosts(self):
+        """
+            Combine the per-collection cost breakdowns of the components
+            using the same weights as overallCost(). The values for all of the
+            collections add up to the last computed overall cost.
+        """
+        col_costs = { }
+        for weight, component in ((self.state.weight_disk, self.diskComponent),
+                                  (self.state.weight_network, self.networkComponent),
+                                  (self.state.weight_skew, self.skewComponent)):
+            if weight <= 0: continue
+            for col_name, col_cost in component.getCollectionCosts().iteritems():
+                col_costs[col_name] = col_costs.get(col_name, 0.0) + \
+                                      (weight * col_cost / self.weights_sum)
+        ## FOR
+        return col_costs
+    ## DEF
+
+    def getComponentTimings(self):
+        """Return a dict from the name of each cost component to its (evaluation count, total seconds)"""
+        return {
+            "disk":    (self.diskComponent.eval_count, self.diskComponent.eval_time),
+            "network": (self.networkComponent.eval_count, self.networkComponent.eval_time),
+            "skew":    (self.skewComponent.eval_count, self.skewComponent.eval_time),
+        }
+    ## DEF
+
+    def getCollectionCosts(self):
+        """Return the per-collection breakdown of the last design's cost"""
+        return self.last_col_costs
+    ## DEF
+
+    def getQueryCostReport(self, design, top_n=None):
+        """
+            Evaluate the given design and return how much of its cost is caused by
+            each query class (query_hash), ranked from the most expensive one.
+            See QueryStatsCollector.getReport() for the entries of the report.
+        """
+        collector = QueryStatsCollector()
+        self.state.query_stats = collector
+        try:
+            cost = self.computeCost(design)
+        finally:
+            self.state.query_stats = None
+        weights = tuple([ w / self.weights_sum for w in (self.state.weight_disk, \
+                                                         self.state.weight_network, \
+                                                         self.state.weight_skew) ])
+        return collector.getReport(weights, self.skewComponent.getCollectionCosts(), cost, top_n)
+    ## DEF
+
     def invalidateCache(self, col_name):
         self.state.invalidateCache(col_name)
         for c in self.allComponents:
             c.invalidateCache(self.new_design, col_name)
+        if col_name in self.warm_cache:
+            self.__warmCache__(col_name)
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## QUERY CLASS CACHE
+    ## -----------------------------------------------------------------------
+
+    def getDesignSignature(self, design, col_name):
+        """
+            Return a value that identifies everything in the given design that the
+            cached look-ups for the queries on the given collection depend on.
+            The best index of a query depends on the collection's indexes and on
+            which collections are embedded in it, so we include all of the
+            denormalization relationships of the design.
+        """
+        denorm = [ ]
+        for name in sorted(design.getCollections()):
+            if design.isRelaxed(name): continue
+            parent = design.getDenormalizationParent(name)
+            if parent: denorm.append((name, parent))
+        ## FOR
+        return (tuple(design.getIndexes(col_name)), tuple(denorm))
+    ## DEF
+
+    def getQueryCounts(self):
+        """Return the number of operations of every query class (query_hash) per collection"""
+        counts = dict([(col_name, Histogram()) for col_name in self.col_names])
+        for sess in self.workload:
+            for op in sess["operations"]:
+                if op["collection"] in counts:
+                    counts[op["collection"]].put(op["query_hash"])
+        ## FOR
+        return counts
+    ## DEF
+
+    def getQueryClassCache(self):
+        """
+            Return the cached per-query-class look-ups that were computed for the
+            last evaluated design so that a later run can reuse them with loadQueryClassCache()
+        """
+        design = self.last_design
+        assert design, "No design has been evaluated yet"
+        query_counts = self.getQueryCounts()
+        ret = { }
+        for col_name in self.col_names:
+            if not design.hasCollection(col_name) or design.isRelaxed(col_name): continue
+            cache = self.state.cache_handles.get(col_name, None)
+            if cache is None: continue
+            ret[col_name] = {
+                "signature":  self.getDesignSignature(design, col_name),
+                "op_counts":  dict(query_counts[col_name].iteritems()),
+                "best_index": dict(cache.best_index),
+                "op_regex":   dict(cache.op_regex),
+            }
+        ## FOR
+        return ret
+    ## DEF
+
+    def loadQueryClassCache(self, data, threshold):
+        """
+            Reuse the per-query-class look-ups of a previous run that were returned by
+            getQueryClassCache(). We only keep the entries of the query classes whose
+            share of their collection's operations changed by at most the given
+            relative threshold. The entries are only used when a collection's design
+            matches the one that they were computed for.
+        """
+        self.warm_cache.clear()
+        query_counts = self.getQueryCounts()
+        reused = 0
+        for col_name, entry in data.iteritems():
+            if not col_name in query_counts: continue
+            cur_counts = query_counts[col_name]
+            cur_total = cur_counts.getSampleCount()
+            old_total = sum(entry["op_counts"].itervalues())
+            if not cur_total or not old_total: continue
+
+            valid = set()
+            for query_hash, old_count in entry["op_counts"].iteritems():
+                cur_count = cur_counts.get(query_hash, 0)
+                if not cur_count: continue
+                old_share = old_count / float(old_total)
+                cur_share = cur_count / float(cur_total)
+                if abs(cur_share - old_share) <= threshold * old_share:
+                    valid.add(query_hash)
+            ## FOR
+            if not valid: continue
+
+            best_index = dict([(k, v) for k, v in entry["best_index"].iteritems() if k in valid])
+            op_regex = dict([(k, v) for k, v in entry["op_regex"].iteritems() if k in valid])
+            self.warm_cache[col_name] = (entry["signature"], best_index, op_regex)
+            reused += len(valid)
+        ## FOR
+        LOG.info("Reusing cached cost data for %d query classes in %d collections", reused, len(self.warm_cache))
+        return reused
+    ## DEF
+
+    def __warmCache__(self, col_name):
+        """Pre-populate the cache of the given collection if its new design matches the cached one"""
+        if not self.state.cache_enable: return
+        design = self.new_design
+        if not design.hasCollection(col_name) or design.isRelaxed(col_name): return
+        signature, best_index, op_regex = self.warm_cache[col_name]
+        if signature != self.getDesignSignature(design, col_name): return
+
+        cache = self.state.getCacheHandle(self.collections[col_name])
+        cache.best_index.update(best_index)
+        cache.op_regex.update(op_regex)
     ## DEF
 
     def finish(self):
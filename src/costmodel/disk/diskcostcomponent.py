@@ -24,6 +24,7 @@
 import os
 import sys
 import math
+import time
 import logging
 from pprint import pformat
 import operator
@@ -279,9 +280,12 @@ class DiskCostComponent(AbstractCostComponent):
         sess_ctr = 0
         total_index_penalty = 0
         total_worst_index_penalty = 0
+        col_page_hits = Histogram()
+        query_stats = self.state.query_stats
         
         for sess in self.state.workload:
             for op in sess['operations']:
+                if query_stats: opStart = time.time()
                 # is the collection in the design - if not ignore
                 if not design.hasCollection(op['collection']):
                     if self.debug: LOG.debug("NOT in design: SKIP - All operations on %s", col_name)
@@ -415,6 +419,12 @@ class DiskCostComponent(AbstractCostComponent):
                 totalWorst += maxHits
                 total_index_penalty += indexKeyInsertionPenalty
                 total_worst_index_penalty += worst_index_penalty
+                col_page_hits.put(op['collection'], pageHits)
+                if not self.no_index_insertion_penalty:
+                    col_page_hits.put(op['collection'], indexKeyInsertionPenalty)
+                if query_stats:
+                    query_stats.addDisk(op, pageHits, maxHits, indexKeyInsertionPenalty, worst_index_penalty, \
+                                        indexKeys, covering, time.time() - opStart)
                 
                 if self.debug:
                     LOG.debug("Op #%d on '%s' -> [pageHits:%d / worst:%d]",\
@@ -442,6 +452,14 @@ class DiskCostComponent(AbstractCostComponent):
         assert totalCost <= totalWorst,\
             "Estimated total pageHits [%d] is greater than worst case pageHits [%d]" % (totalCost, totalWorst)
         final_cost = float(totalCost) / float(totalWorst) if totalWorst else 0
+        if query_stats:
+            query_stats.disk_worst = totalWorst
+            query_stats.include_index_penalty = not self.no_index_insertion_penalty
+        self.col_costs = { }
+        if totalWorst:
+            for col_name, hits in col_page_hits.iteritems():
+                self.col_costs[col_name] = hits / float(totalWorst)
+        ## IF
         evicted = sum([ lru.evicted for lru in self.buffers ])
         LOG.info("Computed Disk Cost: %s [pageHits=%d / worstCase=%d / evicted=%d]",\
                  final_cost, totalCost, totalWorst, evicted)
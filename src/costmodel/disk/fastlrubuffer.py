@@ -13,6 +13,7 @@ import logging
 import random
 from pprint import pformat
 from util import constants
+from util.utilmethods import stableHash
 
 # constants
 PREV_BUFFER_ENTRY = 0
@@ -184,7 +185,7 @@ class FastLRUBuffer:
 
             ctr = 0
             rng = random.Random()
-            rng.seed(col_name)
+            rng.seed(stableHash(col_name))
             while (col_remaining - doc_size) > 0 and self.evicted == 0:
                 documentId = rng.random()
                 self.getDocumentFromCollection(col_name, documentId)
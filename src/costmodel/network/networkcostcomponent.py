@@ -75,6 +75,7 @@ class NetworkCostComponent(AbstractCostComponent):
         total_op_count = 0
         total_msg_count = 0
         total_err = 0
+        col_msg_counts = { }
         for col_name in self.state.col_names:
             # Collection is not in design.. don't include the op
             if not design.hasCollection(col_name):
@@ -87,6 +88,7 @@ class NetworkCostComponent(AbstractCostComponent):
             if col_name in self.cache:
                 total_op_count += self.cache[col_name][0]
                 total_msg_count += self.cache[col_name][1]
+                col_msg_counts[col_name] = self.cache[col_name][1]
             else:
                 # TODO: The operations should come from the state handle, which
                 #       will have already combined things for us based on the design
@@ -101,6 +103,7 @@ class NetworkCostComponent(AbstractCostComponent):
                         assert len(msgs) <= self.state.max_num_nodes, \
                             "%s -- NumMsgs[%d] <= NumNodes[%d]" % (msgs, len(msgs), self.state.max_num_nodes)
                         msg_count += len(msgs)
+                        if self.state.query_stats: self.state.query_stats.addNetwork(op, len(msgs))
                         # if self.debug: LOG.debug("%s -> Messages %s", op, msgs)
                     except:
                         LOG.warn("Failed to estimate touched nodes for op\n%s" % pformat(op))
@@ -111,9 +114,15 @@ class NetworkCostComponent(AbstractCostComponent):
 
                 total_op_count += op_count
                 total_msg_count += msg_count
+                col_msg_counts[col_name] = msg_count
 
+        self.col_costs = { }
         if total_op_count > 0:
-            cost = total_msg_count / float(self.state.orig_op_count * self.state.max_num_nodes)
+            worst = float(self.state.orig_op_count * self.state.max_num_nodes)
+            cost = total_msg_count / worst
+            if self.state.query_stats: self.state.query_stats.network_worst = worst
+            for col_name, msg_count in col_msg_counts.iteritems():
+                self.col_costs[col_name] = msg_count / worst
 
         if self.debug: LOG.info("Total ops %s, error %s", total_op_count, total_err)
         LOG.info("Computed Network Cost: %f [msgCount=%d / opCount=%d]",\
@@ -29,6 +29,7 @@ import catalog
 from util.histogram import Histogram
 import workload
 from util import constants
+from util.utilmethods import stableHash
 
 LOG = logging.getLogger(__name__)
 
@@ -180,7 +181,7 @@ class NodeEstimator(object):
     def computeTouchedRange(self, col_name, field_name, value, num_nodes=None):
         ranges = self.collections[col_name]['fields'][field_name]['ranges']
         if len(ranges) == 0:
-            return hash(str(value)) % self.max_num_nodes
+            return stableHash(value) % self.max_num_nodes
         index = 0
         while index < len(ranges):
             if index == len(ranges) - 1:
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+from __future__ import division
+
+import logging
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## QueryClassStats
+## ==============================================
+class QueryClassStats(object):
+    """The parts of the cost of a single design that are caused by one query class (query_hash)"""
+
+    def __init__(self, query_hash, col_name):
+        self.query_hash = query_hash
+        self.col_name = col_name
+        self.op_count = 0
+        # Disk cost
+        self.page_hits = 0
+        self.worst_pages = 0
+        self.index_penalty = 0
+        self.worst_index_penalty = 0
+        self.index = None
+        self.covering = False
+        # Network cost: the number of messages is the number of nodes that each op touches
+        self.messages = 0
+        self.max_fanout = 0
+        # Seconds spent in the disk cost estimation of this query class
+        self.eval_time = 0.0
+    ## DEF
+## CLASS
+
+## ==============================================
+## QueryStatsCollector
+## ==============================================
+class QueryStatsCollector(object):
+    """
+        Attributes the page hits, messages and skew of a design to the query classes
+        that cause them. The cost components record their per-operation numbers in
+        here while the collector is set as State.query_stats.
+    """
+
+    def __init__(self):
+        # QueryHash -> QueryClassStats
+        self.classes = { }
+        # The denominators that the components divide their totals by
+        self.disk_worst = 0
+        self.network_worst = 0.0
+        self.include_index_penalty = True
+    ## DEF
+
+    def clear(self):
+        self.classes.clear()
+        self.disk_worst = 0
+        self.network_worst = 0.0
+    ## DEF
+
+    def getStats(self, op):
+        stats = self.classes.get(op["query_hash"], None)
+        if stats is None:
+            stats = QueryClassStats(op["query_hash"], op["collection"])
+            self.classes[op["query_hash"]] = stats
+        return stats
+    ## DEF
+
+    def addDisk(self, op, pageHits, maxHits, indexPenalty, worstIndexPenalty, indexKeys, covering, elapsed):
+        stats = self.getStats(op)
+        stats.op_count += 1
+        stats.page_hits += pageHits
+        stats.worst_pages += maxHits
+        stats.index_penalty += indexPenalty
+        stats.worst_index_penalty += worstIndexPenalty
+        stats.index = tuple(indexKeys) if indexKeys else None
+        stats.covering = bool(indexKeys and covering)
+        stats.eval_time += elapsed
+    ## DEF
+
+    def addNetwork(self, op, num_msgs):
+        stats = self.getStats(op)
+        stats.messages += num_msgs
+        stats.max_fanout = max(stats.max_fanout, num_msgs)
+    ## DEF
+
+    def getReport(self, weights, col_skew_costs, total_cost, top_n=None):
+        """
+            Return a list with a dict for each query class ranked by its share of
+            the design's cost. The weights are the (disk, network, skew) coefficients
+            divided by their sum, the same as CostModel.computeCost() uses.
+            We do not know which operations cause the skew of a collection, so we
+            split each collection's skew cost by the number of messages of its query classes.
+        """
+        weight_disk, weight_network, weight_skew = weights
+        col_messages = { }
+        for stats in self.classes.itervalues():
+            col_messages[stats.col_name] = col_messages.get(stats.col_name, 0) + stats.messages
+        ## FOR
+
+        report = [ ]
+        for stats in self.classes.itervalues():
+            pages = stats.page_hits
+            if self.include_index_penalty: pages += stats.index_penalty
+            disk = weight_disk * pages / self.disk_worst if self.disk_worst else 0.0
+            network = weight_network * stats.messages / self.network_worst if self.network_worst else 0.0
+            skew = 0.0
+            if col_messages.get(stats.col_name, 0):
+                skew = weight_skew * col_skew_costs.get(stats.col_name, 0.0) * \
+                       stats.messages / col_messages[stats.col_name]
+            cost = disk + network + skew
+            report.append({
+                "query_hash":   stats.query_hash,
+                "collection":   stats.col_name,
+                "op_count":     stats.op_count,
+                "index":        list(stats.index) if stats.index else None,
+                "covering":     stats.covering,
+                "page_hits":    stats.page_hits,
+                "worst_pages":  stats.worst_pages,
+                "index_penalty": stats.index_penalty,
+                "messages":     stats.messages,
+                "avg_fanout":   stats.messages / stats.op_count if stats.op_count else 0.0,
+                "max_fanout":   stats.max_fanout,
+                "eval_time":    stats.eval_time,
+                "disk_cost":    disk,
+                "network_cost": network,
+                "skew_cost":    skew,
+                "cost":         cost,
+                "share":        cost / total_cost if total_cost else 0.0,
+            })
+        ## FOR
+        report.sort(key=lambda x: (-x["cost"], -x["op_count"], x["query_hash"]))
+        if top_n: report = report[:top_n]
+        return report
+    ## DEF
+## CLASS
+
+def formatReport(report):
+    """Return the query classes of a report from QueryStatsCollector.getReport() as a ranked table"""
+    header = "%4s %-20s %-16s %8s %7s %6s %10s %10s %8s %7s %-24s" % \
+             ("#", "QueryHash", "Collection", "Ops", "Share", "Disk", "PageHits", "Worst", "Msgs", "FanOut", "Index")
+    lines = [ header, "-" * len(header) ]
+    for i, entry in enumerate(report):
+        index = "-"
+        if entry["index"]:
+            index = ",".join(map(str, entry["index"]))
+            if entry["covering"]: index += " (covering)"
+        lines.append("%4d %-20s %-16s %8d %6.1f%% %6.3f %10d %10d %8d %7.2f %-24s" % \
+                     (i+1, entry["query_hash"], entry["collection"][:16], entry["op_count"], \
+                      entry["share"]*100, entry["disk_cost"], entry["page_hits"], entry["worst_pages"], \
+                      entry["messages"], entry["avg_fanout"], index))
+    ## FOR
+    return "\n".join(lines)
+## DEF
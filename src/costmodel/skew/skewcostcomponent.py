@@ -50,6 +50,10 @@ class SkewCostComponent(AbstractCostComponent):
         self.nodeCounts = {}
         self.collectionCounts = {}
         self.workload_segments = [ ]
+        
+        # ColName -> Weighted skew of that collection in the
+        # last segment passed to calculateSkew()
+        self.segmentColSkew = {}
 
         # Pre-split the workload into separate intervals
         self.splitWorkload()
@@ -58,6 +62,8 @@ class SkewCostComponent(AbstractCostComponent):
     def getCostImpl(self, design, num_nodes=None):
         """Calculate the network cost for each segment for skew analysis"""
 
+        self.col_costs = { }
+
         # If there is only one node, then the cost is always zero
         if self.state.max_num_nodes == 1:
             LOG.info("Computed Skew Cost: %f", 0.0)
@@ -65,9 +71,11 @@ class SkewCostComponent(AbstractCostComponent):
 
         op_counts = [ 0 ] *  self.state.skew_segments
         segment_skew = [ 0 ] *  self.state.skew_segments
+        col_skew = [ None ] * self.state.skew_segments
         for i in range(0, len(self.workload_segments)):
             # TODO: We should cache this so that we don't have to call it twice
             segment_skew[i], op_counts[i] = self.calculateSkew(design, self.workload_segments[i], num_nodes)
+            col_skew[i] = dict(self.segmentColSkew)
 
         weighted_skew = sum([segment_skew[i] * op_counts[i] for i in xrange(len(self.workload_segments))])
         op_counts_sum = sum(op_counts)
@@ -75,6 +83,11 @@ class SkewCostComponent(AbstractCostComponent):
             cost = 1.0
         else:
             cost = weighted_skew / float(sum(op_counts))
+            for i in xrange(len(self.workload_segments)):
+                for col_name, skew in col_skew[i].iteritems():
+                    self.col_costs[col_name] = self.col_costs.get(col_name, 0.0) + \
+                                               (skew * op_counts[i] / float(op_counts_sum))
+            ## FOR
         LOG.info("Computed Skew Cost: %f", cost)
         return cost
     ## DEF
@@ -91,6 +104,7 @@ class SkewCostComponent(AbstractCostComponent):
 
         self.nodeCounts.clear()
         self.collectionCounts.clear()
+        self.segmentColSkew.clear()
                       
         # Iterate over each session and get the list of nodes
         # that we estimate that each of its operations will need to touch
@@ -147,10 +161,15 @@ class SkewCostComponent(AbstractCostComponent):
                 if ratio < best:
                     ratio = best + ((1 - ratio/best) * (1 - best))
                 skew += math.log(ratio / best)
-            skew_total += ((skew / (math.log(1 / best) * self.state.max_num_nodes)) * col_factor)
+            col_skew = ((skew / (math.log(1 / best) * self.state.max_num_nodes)) * col_factor)
+            self.segmentColSkew[col_name] = col_skew
+            skew_total += col_skew
         if col_factor_total == 0:
+            self.segmentColSkew.clear()
             return 0, num_ops
         else:
+            for col_name in self.segmentColSkew.keys():
+                self.segmentColSkew[col_name] /= float(col_factor_total)
             return skew_total / col_factor_total, num_ops
 
     ## DEF
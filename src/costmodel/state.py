@@ -124,6 +124,10 @@ class State():
         
         self.window_size = config['window_size']
 
+        # Per-query-class cost attribution (see CostModel.getQueryCostReport())
+        # This is only set while we are computing a report
+        self.query_stats = None
+
         # Build indexes from collections to sessions/operations
         # Note that this won't change dynamically based on denormalization schemes
         # It's up to the cost components to figure things out based on that
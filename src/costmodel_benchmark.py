@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+from __future__ import division
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../libs"))
+
+import argparse
+
+# mongodb-d4
+from costmodel import CostModel
+from search import Design
+from workload import WorkloadCombiner
+from workload.synthetic import SyntheticWorkloadGenerator
+from util import constants
+
+LOG = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the results changes
+RESULTS_VERSION = 1
+
+# Default maximum slowdown (relative to the baseline) before we call it a regression
+DEFAULT_THRESHOLD = 0.2
+
+BENCHMARKS = [ "costmodel", "disk", "network", "skew", "nodeestimator", "combiner" ]
+
+'''
+Cost Model Microbenchmarks
+
+Measures how many evaluations per second the cost model and its components
+can do on a synthetic workload, so that we can catch performance regressions
+without a MongoDB server or a workload trace. The results are written as JSON
+and can be compared against the results of an earlier run:
+
+    ./costmodel_benchmark.py --output=baseline.json
+    ./costmodel_benchmark.py --baseline=baseline.json
+'''
+
+## ==============================================
+## generateDesigns
+## ==============================================
+def generateDesigns(collections, num_designs, denormalize, rng):
+    """
+        Return random designs that pick shard keys and indexes from the fields that
+        the workload uses. If denormalize is true, then every other collection is
+        embedded in the collection whose id it references.
+    """
+    col_names = sorted(collections.iterkeys())
+    designs = [ ]
+    for i in xrange(num_designs):
+        design = Design()
+        for col_name in col_names:
+            design.addCollection(col_name)
+            fields = collections[col_name]['interesting'] or [ "f00" ]
+            design.addShardKey(col_name, tuple(rng.sample(fields, 1)))
+            for j in xrange(rng.randint(0, 2)):
+                design.addIndex(col_name, tuple(rng.sample(fields, rng.randint(1, min(2, len(fields))))))
+        ## FOR
+        if denormalize:
+            for j in xrange(1, len(col_names), 2):
+                design.setDenormalizationParent(col_names[j], col_names[j-1])
+                design.removeShardKeys(col_names[j])
+            ## FOR
+        ## IF
+        designs.append(design)
+    ## FOR
+    return designs
+## DEF
+
+## ==============================================
+## CostModelBenchmark
+## ==============================================
+class CostModelBenchmark:
+
+    def __init__(self, collections, workload, costModelConfig, designs, denormDesigns):
+        self.collections = collections
+        self.workload = workload
+        self.costModelConfig = costModelConfig
+        self.designs = designs
+        self.denormDesigns = denormDesigns
+        self.cm = CostModel(collections, workload, costModelConfig)
+        self.last_design = None
+    ## DEF
+
+    def __prepare__(self, design):
+        """Invalidate the cached look-ups of the collections that changed like CostModel.computeCost() does"""
+        cm = self.cm
+        cm.new_design = design
+        map(cm.invalidateCache, design.getDelta(self.last_design))
+        self.last_design = design
+        return cm.state.calcNumNodes(design, cm.maxCardinality)
+    ## DEF
+
+    def runCostModel(self):
+        for design in self.designs + self.denormDesigns:
+            self.cm.computeCost(design)
+        return len(self.designs) + len(self.denormDesigns)
+    ## DEF
+
+    def __runComponent__(self, component):
+        for design in self.designs:
+            num_nodes = self.__prepare__(design)
+            component.reset()
+            component.getCost(design, num_nodes)
+        ## FOR
+        component.finish()
+        return len(self.designs)
+    ## DEF
+
+    def runDisk(self):
+        return self.__runComponent__(self.cm.diskComponent)
+    ## DEF
+
+    def runNetwork(self):
+        return self.__runComponent__(self.cm.networkComponent)
+    ## DEF
+
+    def runSkew(self):
+        return self.__runComponent__(self.cm.skewComponent)
+    ## DEF
+
+    def runNodeEstimator(self):
+        """Estimate the touched nodes of every operation. Each operation is one evaluation."""
+        estimator = self.cm.state.estimator
+        count = 0
+        for design in self.designs:
+            num_nodes = self.cm.state.calcNumNodes(design, self.cm.maxCardinality)
+            for sess in self.workload:
+                for op in sess['operations']:
+                    estimator.estimateNodes(design, op, num_nodes)
+                    count += 1
+            ## FOR
+        ## FOR
+        estimator.reset()
+        return count
+    ## DEF
+
+    def runCombiner(self):
+        combiner = WorkloadCombiner(sorted(self.collections.iterkeys()), self.workload, self.collections)
+        for design in self.denormDesigns:
+            combiner.process(design)
+        return len(self.denormDesigns)
+    ## DEF
+
+    def run(self, name, rounds):
+        """
+            Run the given benchmark for the given number of rounds and return its
+            results. We report the fastest round because it is the least affected by
+            everything else that is running on the machine.
+        """
+        method = {
+            "costmodel":     self.runCostModel,
+            "disk":          self.runDisk,
+            "network":       self.runNetwork,
+            "skew":          self.runSkew,
+            "nodeestimator": self.runNodeEstimator,
+            "combiner":      self.runCombiner,
+        }[name]
+        # Warm up the caches the same way that a search would
+        method()
+        times = [ ]
+        for i in xrange(rounds):
+            start = time.time()
+            evaluations = method()
+            times.append(time.time() - start)
+        ## FOR
+        best = min(times)
+        return {
+            "evaluations": evaluations,
+            "seconds":     best,
+            "avg_seconds": sum(times) / len(times),
+            "per_second":  evaluations / best if best else 0.0,
+        }
+    ## DEF
+## CLASS
+
+## ==============================================
+## compareResults
+## ==============================================
+def compareResults(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+        Compare the evaluations per second of every benchmark with the baseline.
+        Returns a list of (name, baseline rate, current rate, relative change, regressed)
+    """
+    ret = [ ]
+    for name in sorted(results["results"].iterkeys()):
+        if not name in baseline.get("results", { }): continue
+        base_rate = baseline["results"][name]["per_second"]
+        cur_rate = results["results"][name]["per_second"]
+        change = (cur_rate - base_rate) / base_rate if base_rate else 0.0
+        ret.append((name, base_rate, cur_rate, change, change < -threshold))
+    ## FOR
+    return ret
+## DEF
+
+def formatComparison(comparison):
+    header = "%-15s %14s %14s %9s" % ("Benchmark", "Baseline (/s)", "Current (/s)", "Change")
+    lines = [ header, "-" * len(header) ]
+    for name, base_rate, cur_rate, change, regressed in comparison:
+        lines.append("%-15s %14.2f %14.2f %+8.1f%%%s" % \
+                     (name, base_rate, cur_rate, change*100, "  REGRESSION" if regressed else ""))
+    return "\n".join(lines)
+## DEF
+
+def runBenchmarks(generator, benchmarks=BENCHMARKS, num_designs=10, rounds=3, nodes=8, seed=0):
+    """Generate the workload, run the given benchmarks and return the results"""
+    start = time.time()
+    collections, workload = generator.generate()
+    generate_time = time.time() - start
+
+    costModelConfig = {
+        'weight_network': 1.0,
+        'weight_disk':    1.0,
+        'weight_skew':    1.0,
+        'nodes':          nodes,
+        'max_memory':     1024,
+        'skew_intervals': constants.DEFAULT_TIME_INTERVALS,
+        'address_size':   constants.DEFAULT_ADDRESS_SIZE,
+        'window_size':    constants.WINDOW_SIZE,
+    }
+    rng = random.Random(seed)
+    designs = generateDesigns(collections, num_designs, False, rng)
+    denormDesigns = generateDesigns(collections, num_designs, True, rng)
+
+    results = { }
+    for name in benchmarks:
+        # Every benchmark gets a new cost model so that they do not share any caches
+        bench = CostModelBenchmark(collections, workload, costModelConfig, designs, denormDesigns)
+        results[name] = bench.run(name, rounds)
+        LOG.info("%-15s %10.2f evaluations/sec [evaluations=%d / seconds=%.3f]", \
+                 name, results[name]["per_second"], results[name]["evaluations"], results[name]["seconds"])
+    ## FOR
+
+    parameters = generator.getParameters()
+    parameters.update({"num_designs": num_designs, "rounds": rounds, "nodes": nodes, "seed": seed})
+    return {
+        "version":       RESULTS_VERSION,
+        "parameters":    parameters,
+        "generate_time": generate_time,
+        "results":       results,
+    }
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    logging.basicConfig(level = logging.INFO,
+                        format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
+                        datefmt="%m-%d-%Y %H:%M:%S",
+                        stream = sys.stdout)
+    
+    aparser = argparse.ArgumentParser(description="Cost Model Microbenchmarks")
+    aparser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                         help='The benchmarks to run (default: all). Valid options: %s' % ", ".join(BENCHMARKS))
+    aparser.add_argument('--collections', type=int, default=4, help='Number of collections')
+    aparser.add_argument('--fields', type=int, default=8, help='Number of fields per collection')
+    aparser.add_argument('--templates', type=int, default=20, help='Number of query templates')
+    aparser.add_argument('--sessions', type=int, default=200, help='Number of sessions')
+    aparser.add_argument('--ops', type=int, default=10, help='Number of operations per session')
+    aparser.add_argument('--skew', type=float, default=1.0,
+                         help='Zipfian skew of the query templates and of the values (0.0 is uniform)')
+    aparser.add_argument('--documents', type=int, default=100000, help='Number of documents per collection')
+    aparser.add_argument('--nodes', type=int, default=8, help='Number of nodes in the cluster')
+    aparser.add_argument('--designs', type=int, default=10, help='Number of designs to evaluate per round')
+    aparser.add_argument('--rounds', type=int, default=3, help='Number of timed rounds per benchmark')
+    aparser.add_argument('--seed', type=int, default=0, help='Seed of the workload and design generators')
+    aparser.add_argument('--output', type=str, metavar='FILE', help='Write the results to this JSON file')
+    aparser.add_argument('--baseline', type=str, metavar='FILE',
+                         help='Compare the results with the ones in this JSON file and exit with ' +
+                              'a non-zero status if any benchmark got slower than the threshold')
+    aparser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help='Maximum relative slowdown compared to the baseline (default: %.2f)' % DEFAULT_THRESHOLD)
+    aparser.add_argument('--debug', action='store_true', help='Enable debug log messages')
+    args = vars(aparser.parse_args())
+    for name in args['benchmarks']:
+        if not name in BENCHMARKS:
+            aparser.error("Invalid benchmark '%s'" % name)
+    ## FOR
+    if not args['benchmarks']: args['benchmarks'] = BENCHMARKS
+    
+    # The cost model logs every evaluation, which would skew the timings
+    logging.getLogger().setLevel(logging.DEBUG if args['debug'] else logging.WARN)
+    LOG.setLevel(logging.INFO)
+    
+    generator = SyntheticWorkloadGenerator(
+        num_collections=args['collections'],
+        num_fields=args['fields'],
+        num_templates=args['templates'],
+        num_sessions=args['sessions'],
+        ops_per_session=args['ops'],
+        skew=args['skew'],
+        doc_count=args['documents'],
+        num_nodes=args['nodes'],
+        seed=args['seed'],
+    )
+    results = runBenchmarks(generator, args['benchmarks'], args['designs'], args['rounds'], args['nodes'], args['seed'])
+    
+    if args['output']:
+        f = open(args['output'], 'w')
+        try:
+            json.dump(results, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+        LOG.info("Wrote results to '%s'", args['output'])
+    ## IF
+    
+    if args['baseline']:
+        f = open(args['baseline'], 'r')
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+        if baseline.get("parameters") != results["parameters"]:
+            LOG.warn("The baseline was run with different parameters:\n%s", baseline.get("parameters"))
+        comparison = compareResults(results, baseline, args['threshold'])
+        LOG.info("Comparison with '%s':\n%s", args['baseline'], formatComparison(comparison))
+        if [ x for x in comparison if x[-1] ]:
+            sys.exit(1)
+    ## IF
+## MAIN
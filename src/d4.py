@@ -49,8 +49,10 @@ import mongokit
 import catalog
 import workload
 from search.designer import Designer
+from workload.filestore import exportMetadata
 from util import configutil
 from util import constants
+from util import profiler
 from util import termcolor
 from multithreaded.multi_search import MultiClientDesigner
 from multithreaded.messageprocessor import MessageProcessor
@@ -89,6 +91,12 @@ if __name__ == '__main__':
                              'already been loaded into the catalog database.')
     agroup.add_argument('--no-search', action='store_true',
                         help='Do not perform a search for a database design.')
+    agroup.add_argument('--resume', action='store_true',
+                        help='Resume the design search from the checkpoint file that is set in the ' +
+                             'multithread section of the configuration file.')
+    agroup.add_argument('--export-metadata', type=str, metavar='DIR',
+                        help='Copy the catalog and the workload in the metadata database to a ' +
+                             'file-backed store in the given directory and then exit.')
     agroup.add_argument('--sess-limit', type=int, metavar='S', default=None,
                         help='Limit the number of sessions to process from the sample workload.')
     agroup.add_argument('--op-limit', type=int, metavar='N', default=None,
@@ -100,6 +108,14 @@ if __name__ == '__main__':
                         help="Path to the MongoSniff file with the sample workload. Use '-' if you would like to read from stdin")
     agroup.add_argument('--mongo-skip', type=int, metavar='N', default=None,
                         help='Skip the first N lines in the MongoSniff input file.')
+    agroup.add_argument('--mongo-pcap', action='store_true',
+                        help='The input file is a libpcap capture of the MongoDB wire protocol instead of MongoSniff output. ' +
+                             'With this option --mongo-skip skips the first N messages.')
+    agroup.add_argument('--mongo-log', action='store_true',
+                        help='The input file is a mongod JSON log or an export of the system.profile collection ' +
+                             'with one document per line instead of MongoSniff output.')
+    agroup.add_argument('--mongo-port', type=int, metavar='P', default=27017,
+                        help='The TCP port of the MongoDB server in the libpcap capture.')
     # TODO: These are development option that should be removed
     agroup.add_argument('--no-mongo-parse', action='store_true',
                         help='Skip parsing and loading MongoSniff workload trace file into the internal catalog.'),
@@ -148,10 +164,38 @@ if __name__ == '__main__':
                         
     aparser.add_argument('--init-design', action='store_true',
                         help='Get the initial design for current workload')
+    
+    aparser.add_argument('--warm-start', type=str, metavar='FILE',
+                        help='Path to the design file of a previous run to start the search from.')
+    
+    aparser.add_argument('--cost-cache', type=str, metavar='FILE',
+                        help='Path to a file with the per-query-class cost data of a previous run. ' +
+                             'It is reused for the query classes whose statistics have not changed ' +
+                             'and it is overwritten with the data of the final design.')
+    
+    aparser.add_argument('--cost-report', type=str, metavar='FILE',
+                        help='Path to a JSON file to write the query classes that cause most of the ' +
+                             'cost of the final design to.')
+    
+    agroup = aparser.add_argument_group('Profiling Options')
+    agroup.add_argument('--profile', action='store_true',
+                        help='Record the wall time, CPU time and peak memory of every phase ' +
+                             '(load, post-process, load-workload, candidates, initial-design, ' +
+                             'search, cost) and the timings of the cost components.')
+    agroup.add_argument('--profile-phase', type=str, metavar='PHASE',
+                        help='Run cProfile while the given phase is running and write its stats to a ' +
+                             '.pstats file. Implies --profile.')
+    agroup.add_argument('--profile-dir', type=str, metavar='DIR', default='.',
+                        help='Directory that the .pstats files are written to.')
+    
+    aparser.add_argument('--seed', type=int,
+                        help='Seed for the random choices of the designer. ' +
+                             'Overrides the designer.seed configuration option.')
                         
     args = vars(aparser.parse_args())
 
     if args['debug']: LOG.setLevel(logging.DEBUG)
+    profiler.setupProfiler(args, "d4")
     if args['print_config']:
         print configutil.formatDefaultConfig()
         sys.exit(0)
@@ -166,51 +210,66 @@ if __name__ == '__main__':
     config = RawConfigParser()
     configutil.setDefaultValues(config)
     config.read(os.path.realpath(args['config'].name))
+    if args['seed'] is not None:
+        config.set(configutil.SECT_DESIGNER, 'seed', args['seed'])
     
-    ## ----------------------------------------------
-    ## Connect to MongoDB
-    ## ----------------------------------------------
-    hostname = config.get(configutil.SECT_MONGODB, 'host')
-    port = config.getint(configutil.SECT_MONGODB, 'port')
-    assert hostname
-    assert port
-    try:
-        conn = mongokit.Connection(host=hostname, port=port)
-    except:
-        LOG.error("Failed to connect to MongoDB at %s:%s" % (hostname, port))
-        raise
-    ## Register our objects with MongoKit
-    conn.register([ catalog.Collection, workload.Session ])
+    # With a file-backed metadata store we only need MongoDB to process the workload trace
+    metadata_db = None
+    dataset_db = None
+    if configutil.getMetadataDir(config) and (args['no_load'] or args['no_post_process']) and \
+       not (args['reset'] or args['export_metadata']):
+        LOG.info("Reading the metadata from '%s' instead of MongoDB", configutil.getMetadataDir(config))
+    else:
+        ## ----------------------------------------------
+        ## Connect to MongoDB
+        ## ----------------------------------------------
+        hostname = config.get(configutil.SECT_MONGODB, 'host')
+        port = config.getint(configutil.SECT_MONGODB, 'port')
+        assert hostname
+        assert port
+        try:
+            conn = mongokit.Connection(host=hostname, port=port)
+        except:
+            LOG.error("Failed to connect to MongoDB at %s:%s" % (hostname, port))
+            raise
+        ## Register our objects with MongoKit
+        conn.register([ catalog.Collection, workload.Session ])
 
-    ## Make sure that the databases that we need are there
-    db_names = conn.database_names()
-    for key in [ 'dataset_db', ]: # FIXME 'workload_db' ]:
-        if not config.has_option(configutil.SECT_MONGODB, key):
-            raise Exception("Missing the configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
-        elif not config.get(configutil.SECT_MONGODB, key):
-            raise Exception("Empty configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
-    ## FOR
+        ## Make sure that the databases that we need are there
+        db_names = conn.database_names()
+        for key in [ 'dataset_db', ]: # FIXME 'workload_db' ]:
+            if not config.has_option(configutil.SECT_MONGODB, key):
+                raise Exception("Missing the configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
+            elif not config.get(configutil.SECT_MONGODB, key):
+                raise Exception("Empty configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
+        ## FOR
 
-    ## ----------------------------------------------
-    ## MONGODB DATABASE RESET
-    ## ----------------------------------------------
-    metadata_db = conn[config.get(configutil.SECT_MONGODB, 'metadata_db')]
-    dataset_db = conn[config.get(configutil.SECT_MONGODB, 'dataset_db')]
+        ## ----------------------------------------------
+        ## MONGODB DATABASE RESET
+        ## ----------------------------------------------
+        metadata_db = conn[config.get(configutil.SECT_MONGODB, 'metadata_db')]
+        dataset_db = conn[config.get(configutil.SECT_MONGODB, 'dataset_db')]
 
-    if args['reset']:
-        LOG.warn("Dropping collections from %s and %s databases" % (metadata_db.name, dataset_db.name))
-        for col_name in [metadata_db.Session.collection.name, metadata_db.Collection.collection.name]:
-            if LOG.isEnabledFor(logging.DEBUG):
-                LOG.warn("Dropping %s.%s", metadata_db.name, col_name)
-            metadata_db.drop_collection(col_name)
-        ## FOR
+        if args['reset']:
+            LOG.warn("Dropping collections from %s and %s databases" % (metadata_db.name, dataset_db.name))
+            for col_name in [metadata_db.Session.collection.name, metadata_db.Collection.collection.name]:
+                if LOG.isEnabledFor(logging.DEBUG):
+                    LOG.warn("Dropping %s.%s", metadata_db.name, col_name)
+                metadata_db.drop_collection(col_name)
+            ## FOR
 
-        for col_name in dataset_db.collection_names():
-            if col_name.startswith("system"): continue
-            if LOG.isEnabledFor(logging.DEBUG):
-                LOG.warn("Dropping %s.%s" % (dataset_db.name, col_name))
-            dataset_db.drop_collection(col_name)
-        ## FOR
+            for col_name in dataset_db.collection_names():
+                if col_name.startswith("system"): continue
+                if LOG.isEnabledFor(logging.DEBUG):
+                    LOG.warn("Dropping %s.%s" % (dataset_db.name, col_name))
+                dataset_db.drop_collection(col_name)
+            ## FOR
+        ## IF
+    ## IF
+    
+    if args['export_metadata']:
+        exportMetadata(metadata_db, args['export_metadata'])
+        sys.exit(0)
     ## IF
     
     # This designer is only used for input processing
@@ -244,7 +303,10 @@ if __name__ == '__main__':
                     if not args['no_load']:
                         LOG.warn("A mongonsiff trace file was not provided. Reading from standard input...")
                     inputFile = "-"
-                with open(inputFile, 'r') if inputFile != '-' else sys.stdin as fd:
+                if args['mongo_pcap'] and args['mongo_log']:
+                    raise Exception("The options --mongo-pcap and --mongo-log can not be used together")
+                mode = 'rb' if args['mongo_pcap'] else 'r'
+                with open(inputFile, mode) if inputFile != '-' else sys.stdin as fd:
                     designer.processMongoInput(\
                         fd, \
                         no_load=args['no_load'], \
@@ -270,8 +332,12 @@ if __name__ == '__main__':
         #import pycallgraph
         #pycallgraph.start_trace()
         # Bombs away!!! Quote from the previous contributors 
-        mcd = MultiClientDesigner(config, args)
-        mcd.runSearch()
+        mcd = MultiClientDesigner(config, args, designer)
+        profiler.getProfiler().start("search")
+        try:
+            mcd.runSearch()
+        finally:
+            profiler.getProfiler().stop("search")
         #try:
             #finalSolution = designer.search()
         #finally:
@@ -281,6 +347,9 @@ if __name__ == '__main__':
     finally:
         stop = time.time()
         LOG.info("Total Time: %.1f sec", (stop - start))
+        if profiler.getProfiler().enabled:
+            profiler.getProfiler().finish()
+            LOG.info("Profile:\n%s", profiler.formatSummary(profiler.getProfiler().getPhases()))
 
 ## MAIN
 
@@ -26,18 +26,39 @@ import random
 import logging
 import numpy
 import math
+import multiprocessing
 from pprint import pformat
 
 import catalog
 from util import constants
+from util import profiler
 from util.histogram import Histogram
+from util.sketches import ValueSketch, StreamingStats
 from workload import OpHasher
 import workload
 from scipy.stats import mstats
-import random
+from pymongo import Connection
+from pymongo.errors import OperationFailure
 
 LOG = logging.getLogger(__name__)
 
+# Collections with at least this many documents are split up into
+# ranges of _id values that are extracted by different worker processes
+SCHEMA_SPLIT_DOCS = 100000
+
+# Number of sampled documents that we fetch at once from a range of _id values
+SAMPLE_FETCH_BATCH = 1000
+
+# We count the values of an embedding key in collections with at most this
+# many documents ourselves. The server counts them in larger collections
+VALUE_SCAN_DOCS = 100000
+# Number of values that we ask the server to count at once
+VALUE_COUNT_BATCH = 1000
+
+# The temporary statistics of each field that processDataFields() gathers
+# and computeFieldStats() turns into the catalog attributes
+FIELD_STATS_KEYS = [ 'distinct_values', 'num_values', 'size_histogram', 'list_len' ]
+
 ## ==============================================
 ## Abstract Convertor
 ## ==============================================
@@ -60,6 +81,23 @@ class AbstractConverter():
         self.rng = random.Random()
         self.debug = LOG.isEnabledFor(logging.DEBUG)
         self.num_nodes = num_nodes
+        # Percentage of the documents of each collection that we examine
+        # when we extract the schema catalog
+        self.sample_rate = 100
+        # Estimate the field statistics with sketches instead of
+        # keeping all of the distinct values of every field
+        self.field_sketches = False
+        # Number of processes that extract the schema catalog
+        self.schema_workers = 1
+        # Collections with at least this many documents are split up
+        # between the schema extraction processes
+        self.schema_split_docs = SCHEMA_SPLIT_DOCS
+        # Collections with at most this many documents have the values
+        # of their embedding keys counted on our side
+        self.value_scan_docs = VALUE_SCAN_DOCS
+        # (CollectionName, Key) -> { Value -> Number of documents }
+        # This is only kept while we calculate the embedding ratios of one collection
+        self.value_counts = { }
     ## DEF
 
     def reset(self):
@@ -83,9 +121,19 @@ class AbstractConverter():
     ## DEF
 
     def process(self, no_load=False, no_post_process=False, page_size=constants.DEFAULT_PAGE_SIZE):
-        if not no_load: self.loadImpl()
+        if not no_load:
+            profiler.getProfiler().start("load")
+            try:
+                self.loadImpl()
+            finally:
+                profiler.getProfiler().stop("load")
         #self.printAllSessionsTime()
-        if not no_post_process: self.postProcess(page_size)
+        if not no_post_process:
+            profiler.getProfiler().start("post-process")
+            try:
+                self.postProcess(page_size)
+            finally:
+                profiler.getProfiler().stop("post-process")
         # self.printAllCollectionInfo()
     ## DEF
 
@@ -156,7 +204,7 @@ class AbstractConverter():
         self.computeWorkloadStats()
 
         # STEP 3: Process dataset
-        self.extractSchemaCatalog()
+        self.extractSchemaCatalog(self.sample_rate)
         
         # Let the converter implementation have a shot at it
         self.postProcessImpl()
@@ -232,24 +280,78 @@ class AbstractConverter():
     
     def getCountOfValues(self, col_name, key, values):
         """
-            build a histogram of the number of d../inputs/abstractconverter.pyocuments found by the given value
+            build a histogram of the number of documents found by the given value
         """
-        value_count_dict = {x : 0 for x in values}
-        
-        self.dataset_db[col_name].create_index(key)
-        
-        for value in values:
-            value_count_dict[value] = self.dataset_db[col_name].find({key : value}).count()
+        if self.isValueScanCollection(col_name):
+            value_counts = self.getValueCounts(col_name, key)
+            return dict([ (x, value_counts.get(x, 0)) for x in values ])
+
+        # Only count the values that we need. A document whose key is a list
+        # counts once for each distinct value in it
+        counts = dict([ (x, 0) for x in values ])
+        values = list(values)
+        for i in xrange(0, len(values), VALUE_COUNT_BATCH):
+            batch = values[i:i+VALUE_COUNT_BATCH]
+            pipeline = [
+                {"$match": {key: {"$in": batch}}},
+                {"$project": {"value": "$" + key}},
+                {"$unwind": "$value"},
+                {"$match": {"value": {"$in": batch}}},
+                {"$group": {"_id": {"doc": "$_id", "value": "$value"}}},
+                {"$group": {"_id": "$_id.value", "count": {"$sum": 1}}},
+            ]
+            for doc in self.dataset_db[col_name].aggregate(pipeline, cursor={ }, allowDiskUse=True):
+                counts[doc["_id"]] = doc["count"]
         ## FOR
+        return counts
+    ## DEF
+
+    def isValueScanCollection(self, col_name):
+        """Return true if we count the values of the keys in the given collection ourselves"""
+        return self.dataset_db[col_name].count() <= self.value_scan_docs
+    ## DEF
+
+    def getDistinctValues(self, col_name, key):
+        """Return the set of the values of the given key in the collection"""
+        if self.isValueScanCollection(col_name):
+            return set(self.getValueCounts(col_name, key))
+        pipeline = [
+            {"$project": {"value": "$" + key}},
+            {"$unwind": "$value"},
+            {"$group": {"_id": "$value"}},
+        ]
+        cursor = self.dataset_db[col_name].aggregate(pipeline, cursor={ }, allowDiskUse=True)
+        return set([ doc["_id"] for doc in cursor if not isinstance(doc["_id"], (dict, list)) ])
+    ## DEF
+    
+    def getValueCounts(self, col_name, key):
+        """
+            Return a dict from every value of the given key in the collection to the number
+            of documents that have that value. A document whose key is a list counts once
+            for each distinct value in it, just like find({key: value}).count().
+            We build it with a single pass over the collection and then cache it, because
+            the same key is used by every candidate parent of a collection. This keeps every
+            value in memory, so it is only used for collections with at most value_scan_docs
+            documents.
+        """
+        cache_key = (col_name, key)
+        if cache_key in self.value_counts:
+            return self.value_counts[cache_key]
         
-        self.dataset_db[col_name].drop_indexes()
-        
-        return value_count_dict
+        value_counts = { }
+        for doc in self.dataset_db[col_name].find({ }, {key: 1}):
+            for value in set(getFieldValues(doc, key)):
+                value_counts[value] = value_counts.get(value, 0) + 1
+        ## FOR
+        if self.debug:
+            LOG.debug("Counted %d distinct values for '%s.%s'", len(value_counts), col_name, key)
+        self.value_counts[cache_key] = value_counts
+        return value_counts
     ## DEF
     
     def getCommonKeyValues(self, foreign_key, key, parent_col, child_col):
-        parent_distinct_values = set(self.dataset_db[parent_col].distinct(foreign_key))
-        child_distinct_values = set(self.dataset_db[child_col].distinct(key))
+        parent_distinct_values = self.getDistinctValues(parent_col, foreign_key)
+        child_distinct_values = self.getDistinctValues(child_col, key)
         
         intersect_values = parent_distinct_values.intersection(child_distinct_values)
         
@@ -262,6 +364,7 @@ class AbstractConverter():
     ## DEF
     
     def calculateEmbeddingRatio(self):
+        self.value_counts = { }
         for colName in self.dataset_db.collection_names():
             # Skip ignored collections
             if colName.split(".")[0] in constants.IGNORED_COLLECTIONS:
@@ -276,6 +379,8 @@ class AbstractConverter():
             assert col_info, "col_name %s" % colName
 
             self.calculateFieldEmbeddingRato(col_info, col_info['fields'])
+            # Only the candidate parents of this collection use the cached counts
+            self.value_counts = { }
         ## FOR
     ## DEF
     
@@ -510,53 +615,287 @@ class AbstractConverter():
             the statistics information for each collection
         """
         LOG.info("Extracting database schema catalog from workload trace")
-        for colName in self.dataset_db.collection_names():
-            # Skip ignored collections
-            if colName.split(".")[0] in constants.IGNORED_COLLECTIONS:
-                continue
+        # Skip ignored collections
+        colNames = [ colName for colName in self.dataset_db.collection_names() \
+                             if not colName.split(".")[0] in constants.IGNORED_COLLECTIONS ]
+        if self.schema_workers > 1:
+            self.extractSchemaCatalogParallel(colNames, sample_rate)
+            return
+
+        for colName in colNames:
             LOG.info("Extracting schema catalog information from collection '%s'", colName)
+            col_info = self.getCollectionInfo(colName)
+            num_sampled = self.scanCollection(col_info, colName, sample_rate)
+            self.saveCollectionInfo(col_info, num_sampled, sample_rate)
+        ## FOR
+    ## DEF
 
-            # Get the collection information object
-            # We will use this to store the number times each key is referenced in a query
-            col_info = self.metadata_db.Collection.one({'name': colName})
-            if not col_info:
-                col_info = self.metadata_db.Collection()
-                col_info['name'] = colName
-
-            col_info['doc_count'] = 0
-            col_info['data_size'] = 0l
-
-            # Examine each document in the dataset for this collection
-            for doc in self.dataset_db[colName].find():
-                col_info['doc_count'] += 1
-                if random.randint(0, 100) <= sample_rate:
-                    try:
-                        self.processDataFields(col_info, col_info['fields'], doc)
-                    except:
-                        msg = "Unexpected error when processing '%s' data fields" % colName
-                        msg += "\n" + pformat(doc)
-                        LOG.error(msg)
-                        raise
+    def extractSchemaCatalogParallel(self, colNames, sample_rate):
+        """
+            Extract the schema catalog with multiple worker processes. Each worker
+            scans a collection (or a range of _id values of a large collection) and
+            sends us back the statistics of its fields. The statistics of the parts
+            of a collection are merged here and we save the collection once all of
+            its parts are done.
+        """
+        connection = self.dataset_db.connection
+        col_infos = { }
+        num_parts = { }
+        num_sampled = { }
+        tasks = [ ]
+        for colName in colNames:
+            col_info = self.getCollectionInfo(colName)
+            queries = self.getIdRanges(colName, self.schema_workers)
+            col_infos[colName] = col_info
+            num_parts[colName] = len(queries)
+            num_sampled[colName] = 0
+            for query in queries:
+                tasks.append((connection.host, connection.port, self.dataset_db.name, colName, \
+                              col_info['fields'], list(col_info['interesting']), query, \
+                              sample_rate, self.field_sketches))
             ## FOR
+        ## FOR
+        LOG.info("Extracting schema catalog information from %d collections in %d parts with %d worker processes", \
+                 len(colNames), len(tasks), self.schema_workers)
+
+        pool = multiprocessing.Pool(self.schema_workers)
+        try:
+            for result in pool.imap_unordered(extractCollectionPart, tasks):
+                colName = result['name']
+                col_info = col_infos[colName]
+                self.mergeCollectionPart(col_info, result)
+                num_sampled[colName] += result['num_sampled']
+                num_parts[colName] -= 1
+                if not num_parts[colName]:
+                    self.saveCollectionInfo(col_info, num_sampled[colName], sample_rate)
+                    del col_infos[colName]
+            ## FOR
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    ## DEF
 
-            # Calculate average tuple size (if we have at least one)
-            if not col_info['doc_count']:
-                col_info['avg_doc_size'] = int(col_info['data_size'])
-            else :
-                col_info['avg_doc_size'] = int(col_info['data_size'] / col_info['doc_count'])
+    def getCollectionInfo(self, colName):
+        """Return the catalog entry for the given collection with its dataset statistics reset"""
+        # Get the collection information object
+        # We will use this to store the number times each key is referenced in a query
+        col_info = self.metadata_db.Collection.one({'name': colName})
+        if not col_info:
+            col_info = self.metadata_db.Collection()
+            col_info['name'] = colName
+
+        col_info['doc_count'] = 0
+        col_info['data_size'] = 0l
+        return col_info
+    ## DEF
 
-            # Calculate cardinality and selectivity
-            self.computeFieldStats(col_info, col_info['fields'])
+    def getIdRanges(self, colName, num_ranges):
+        """
+            Return a list of queries that split up the given collection into
+            num_ranges ranges of _id values with about the same amount of data.
+            Small collections, collections whose _id values do not all have the
+            same type and collections that the server cannot find the boundaries
+            for are not split up, so we return a single empty query.
+        """
+        collection = self.dataset_db[colName]
+        doc_count = collection.count()
+        if num_ranges <= 1 or doc_count < self.schema_split_docs:
+            return [ None ]
+        boundaries = self.getIdBoundaries(colName, num_ranges)
+        if not boundaries:
+            LOG.warn("Not splitting up collection '%s' because the server did not give us the boundaries of its _id ranges", colName)
+            return [ None ]
+
+        # A range query only matches values of the same type
+        def getIdAt(direction):
+            for doc in collection.find({ }, {"_id": 1}).sort("_id", direction).limit(1):
+                return doc["_id"]
+            return None
+        ## DEF
+        types = set([ type(x) for x in boundaries + [ getIdAt(1), getIdAt(-1) ] ])
+        if len(types) > 1:
+            LOG.warn("Not splitting up collection '%s' because its _id values have different types", colName)
+            return [ None ]
+        boundaries = sorted(set(boundaries))
+
+        queries = [ {"_id": {"$lt": boundaries[0]}} ]
+        for i in xrange(1, len(boundaries)):
+            queries.append({"_id": {"$gte": boundaries[i-1], "$lt": boundaries[i]}})
+        queries.append({"_id": {"$gte": boundaries[-1]}})
+        return queries
+    ## DEF
 
-            if self.debug:
-                LOG.debug("Saved new catalog entry for collection '%s'" % colName)
+    def getIdBoundaries(self, colName, num_ranges):
+        """
+            Ask the server for the _id values that split up the given collection into
+            num_ranges ranges with about the same amount of data. splitVector walks the
+            _id index on the server, $bucketAuto is the fallback where we are not allowed
+            to run it. Returns an empty list if neither of them works.
+        """
+        collection = self.dataset_db[colName]
+        try:
+            size = self.dataset_db.command("collstats", colName)["size"]
+            result = self.dataset_db.command("splitVector", collection.full_name, keyPattern={"_id": 1}, \
+                                             maxChunkSizeBytes=max(1, int(size / num_ranges)))
+            keys = [ x["_id"] for x in result["splitKeys"] ]
+            # splitVector may split the collection up into more chunks than we asked for,
+            # so we pick the keys that split it up into num_ranges ranges of chunks
+            if len(keys) >= num_ranges:
+                keys = [ keys[int(round(i * (len(keys) + 1) / float(num_ranges))) - 1] \
+                         for i in xrange(1, num_ranges) ]
+            if keys: return keys
+        except OperationFailure, ex:
+            LOG.debug("Unable to run splitVector on collection '%s': %s", colName, ex)
+        try:
+            pipeline = [ {"$bucketAuto": {"groupBy": "$_id", "buckets": num_ranges}} ]
+            buckets = list(collection.aggregate(pipeline, cursor={ }, allowDiskUse=True))
+            return [ bucket["_id"]["min"] for bucket in buckets[1:] ]
+        except OperationFailure, ex:
+            LOG.warn("Unable to find the _id ranges of collection '%s': %s", colName, ex)
+        return [ ]
+    ## DEF
+
+    def scanCollection(self, col_info, colName, sample_rate, query=None):
+        """
+            Examine the documents of the given collection that match the query
+            and add their fields to the collection's catalog entry.
+            Returns the number of documents that we examined.
+        """
+        num_sampled = 0
+        for doc in self.getSampleCursor(colName, sample_rate, query):
+            num_sampled += 1
             try:
-                col_info.save()
-            except Exception:
-                if self.debug:
-                    LOG.info("abnormal col_info\n%s", pformat(col_info))
+                self.processDataFields(col_info, col_info['fields'], doc)
+            except:
+                msg = "Unexpected error when processing '%s' data fields" % colName
+                msg += "\n" + pformat(doc)
+                LOG.error(msg)
                 raise
         ## FOR
+        return num_sampled
+    ## DEF
+
+    def saveCollectionInfo(self, col_info, num_sampled, sample_rate):
+        """Compute the statistics of a collection whose documents we have examined and save it"""
+        colName = col_info['name']
+        if sample_rate < 100:
+            # Scale the size of the documents that we examined up to the whole collection
+            col_info['doc_count'] = self.dataset_db[colName].count()
+            if num_sampled:
+                col_info['data_size'] = long(col_info['data_size'] * col_info['doc_count'] / num_sampled)
+            LOG.info("Sampled %d out of %d documents from collection '%s'", \
+                     num_sampled, col_info['doc_count'], colName)
+        else:
+            col_info['doc_count'] = num_sampled
+
+        # Calculate average tuple size (if we have at least one)
+        if not col_info['doc_count']:
+            col_info['avg_doc_size'] = int(col_info['data_size'])
+        else :
+            col_info['avg_doc_size'] = int(col_info['data_size'] / col_info['doc_count'])
+
+        # Calculate cardinality and selectivity
+        self.computeFieldStats(col_info, col_info['fields'])
+
+        if self.debug:
+            LOG.debug("Saved new catalog entry for collection '%s'" % colName)
+        try:
+            col_info.save()
+        except Exception:
+            if self.debug:
+                LOG.info("abnormal col_info\n%s", pformat(col_info))
+            raise
+    ## DEF
+
+    def mergeCollectionPart(self, col_info, result):
+        """Add the statistics that extractCollectionPart() gathered to the collection's catalog entry"""
+        col_info['data_size'] += result['data_size']
+        for k in result['interesting']:
+            if not k in col_info['interesting']:
+                col_info['interesting'].append(k)
+        self.mergeDataFields(col_info['fields'], result['fields'])
+        self.total_field_ctr += result['total_field_ctr']
+        self.err_field_ctr += result['err_field_ctr']
+    ## DEF
+
+    def mergeDataFields(self, fields, other):
+        """
+            Recursively merge the fields that processDataFields() extracted from
+            one set of documents into the fields extracted from another set
+        """
+        for k, other_field in other.iteritems():
+            if not k in fields:
+                fields[k] = other_field
+                continue
+            field = fields[k]
+            for key, value in other_field.iteritems():
+                if not key in field:
+                    field[key] = value
+                elif key == 'fields':
+                    self.mergeDataFields(field['fields'], value)
+                elif key == 'num_values':
+                    field[key] += value
+                elif key == 'distinct_values':
+                    if isinstance(value, ValueSketch):
+                        field[key].merge(value)
+                    else:
+                        field[key] |= value
+                elif key in FIELD_STATS_KEYS:
+                    if isinstance(value, StreamingStats):
+                        field[key].merge(value)
+                    else:
+                        for x, count in value.iteritems():
+                            field[key].put(x, count)
+                else:
+                    # Any other attribute is the same for every part
+                    # except for the type, for which the last value wins
+                    field[key] = value
+            ## FOR
+        ## FOR
+    ## DEF
+
+    def getSampleCursor(self, colName, sample_rate, query=None):
+        """
+            Return a cursor over sample_rate percent of the documents in the given collection
+            that match the query. The server picks the sample of a whole collection with $sample,
+            so we never fetch the documents that we skip.
+        """
+        collection = self.dataset_db[colName]
+        if sample_rate >= 100:
+            return collection.find(query)
+        if query:
+            # A $match in front of $sample makes the server sort the whole range
+            # in memory, so we pick the sample of a range of _id values ourselves
+            return self.getRangeSample(colName, sample_rate, query)
+        num_samples = int(math.ceil(collection.count() * max(0, sample_rate) / 100.0))
+        try:
+            return collection.aggregate([ {"$sample": {"size": num_samples}} ], cursor={ })
+        except OperationFailure, ex:
+            LOG.warn("Unable to sample collection '%s' on the server: %s", colName, ex)
+        # Fall back to skipping documents as we iterate over all of them
+        return (doc for doc in collection.find() if self.rng.randint(1, 100) <= sample_rate)
+    ## DEF
+
+    def getRangeSample(self, colName, sample_rate, query):
+        """
+            Iterate over sample_rate percent of the documents that match the given range query.
+            We pick the sample from the _id values, which the server reads from the _id index,
+            and only fetch the documents in the sample.
+        """
+        collection = self.dataset_db[colName]
+        ids = [ ]
+        for doc in collection.find(query, {"_id": 1}):
+            if self.rng.randint(1, 100) > sample_rate: continue
+            ids.append(doc["_id"])
+            if len(ids) >= SAMPLE_FETCH_BATCH:
+                for sampled in collection.find({"_id": {"$in": ids}}): yield sampled
+                ids = [ ]
+        ## FOR
+        if ids:
+            for sampled in collection.find({"_id": {"$in": ids}}): yield sampled
     ## DEF
 
     def processDataFields(self, col_info, fields, doc):
@@ -591,17 +930,19 @@ class AbstractConverter():
             # We will store the distinct values for each field in a set
             # that is embedded in the field. We will delete it when
             # we call computeFieldStats()
+            # If field_sketches is enabled, we use a sketch of the values instead
+            # so that the memory for each field does not grow with the dataset
             if not 'distinct_values' in fields[k]:
-                fields[k]['distinct_values'] = set()
+                fields[k]['distinct_values'] = ValueSketch() if self.field_sketches else set()
             if not "num_values" in fields[k]:
                 fields[k]['num_values'] = 0
             # Likewise, we will also store a histogram for the different sizes
             # of each field. We will use this later on to compute the weighted average
             if not 'size_histogram' in fields[k]:
-                fields[k]['size_histogram'] = Histogram()
+                fields[k]['size_histogram'] = StreamingStats() if self.field_sketches else Histogram()
             # Maintain a histogram of list lengths
             if not 'list_len' in fields[k]:
-                fields[k]['list_len'] = Histogram();
+                fields[k]['list_len'] = StreamingStats() if self.field_sketches else Histogram()
                 
             if fields[k]['query_use_count'] > 0 and not k in col_info['interesting']:
                 col_info['interesting'].append(k)
@@ -715,23 +1056,33 @@ class AbstractConverter():
         for k,field in fields.iteritems():
             # Compute list information
             if 'list_len' in field:
-                if len(field['list_len']) > 0:
+                if isinstance(field['list_len'], StreamingStats):
+                    stats = field['list_len']
+                    if stats.getSampleCount() > 0:
+                        field['list_len_min'] = int(stats.min)
+                        field['list_len_max'] = int(stats.max)
+                        field['list_len_avg'] = stats.mean
+                        field['list_len_stdev'] = stats.getStdev()
+                elif len(field['list_len']) > 0:
                     all_values = field['list_len'].getAllValues()
                     field['list_len_min'] = int(min(all_values))
                     field['list_len_max'] = int(max(all_values))
                     field['list_len_avg'] = numpy.average(all_values)
-                    field['list_len_stdev'] = numpy.average(all_values)
+                    field['list_len_stdev'] = numpy.std(all_values)
                 del field['list_len']
             
             # Compute a weighted average for each field
             if 'size_histogram' in field:
                 h = field['size_histogram']
-                total = 0.0
-                for size, count in h.iteritems():
-                    if count: total += (size * count)
                 num_samples = h.getSampleCount()
+                if isinstance(h, StreamingStats):
+                    total = h.total
+                else:
+                    total = 0.0
+                    for size, count in h.iteritems():
+                        if count: total += (size * count)
                 if num_samples:
-                    field['avg_size'] = int(math.ceil(total / num_samples))
+                    field['avg_size'] = int(math.ceil(total / float(num_samples)))
                 else:
                     field['avg_size'] = 0
                 del field['size_histogram']
@@ -757,6 +1108,10 @@ class AbstractConverter():
 
     def computeFieldRange(self, field):
         num_ranges = self.num_nodes
+        if isinstance(field['distinct_values'], ValueSketch):
+            ranges = field['distinct_values'].getRanges(num_ranges)
+            if ranges: field['ranges'] = ranges
+            return
         sorted_distinct_values = sorted([value for value in field['distinct_values'] if value is not None])
         if len(sorted_distinct_values) > 0:
             field['ranges'] = []
@@ -817,3 +1172,58 @@ class AbstractConverter():
     ## DEF
 
 ## CLASS
+
+## ==============================================
+## getFieldValues
+## ==============================================
+def getFieldValues(doc, key):
+    """
+        Return the values of the given (possibly dotted) key in the document.
+        The elements of lists are returned as separate values. Embedded documents
+        are skipped because we cannot use them as a dict key.
+    """
+    values = [ doc ]
+    for part in key.split("."):
+        next_values = [ ]
+        for value in values:
+            if isinstance(value, dict) and part in value:
+                value = value[part]
+                next_values.extend(value if isinstance(value, list) else [ value ])
+        ## FOR
+        values = next_values
+    ## FOR
+    return [ value for value in values if not isinstance(value, (dict, list)) ]
+## DEF
+
+## ==============================================
+## extractCollectionPart
+## ==============================================
+def extractCollectionPart(args):
+    """
+        Worker function that extracts the fields of the documents in one collection
+        (or one range of _id values of a collection) for extractSchemaCatalogParallel()
+    """
+    host, port, db_name, colName, fields, interesting, query, sample_rate, field_sketches = args
+    conn = Connection(host, port)
+    try:
+        converter = AbstractConverter(None, conn[db_name])
+        converter.field_sketches = field_sketches
+        col_info = {
+            'name':        colName,
+            'fields':      fields,
+            'interesting': interesting,
+            'data_size':   0l,
+        }
+        num_sampled = converter.scanCollection(col_info, colName, sample_rate, query)
+    finally:
+        conn.close()
+    return {
+        'name':             colName,
+        'fields':           col_info['fields'],
+        'interesting':      col_info['interesting'],
+        'data_size':        col_info['data_size'],
+        'num_sampled':      num_sampled,
+        'total_field_ctr':  converter.total_field_ctr,
+        'err_field_ctr':    converter.err_field_ctr,
+    }
+## DEF
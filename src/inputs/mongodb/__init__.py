@@ -7,4 +7,5 @@ sys.path.append(os.path.join(basedir, "../../../libs"))
 sys.path.append(os.path.join(basedir, ".."))
 
 from abstractconverter import AbstractConverter
-from mongosniffconverter import MongoSniffConverter
\ No newline at end of file
+from mongosniffconverter import MongoSniffConverter
+from mongologconverter import MongoLogConverter
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import logging
+from collections import OrderedDict
+
+from bson.objectid import ObjectId
+
+LOG = logging.getLogger(__name__)
+
+# The writes that the Reconstructor replays against the dataset:
+#   (WRITE_SAVE, doc)
+#   (WRITE_REMOVE, query)
+#   (WRITE_UPDATE, query, update, upsert, multi)
+WRITE_SAVE = "save"
+WRITE_REMOVE = "remove"
+WRITE_UPDATE = "update"
+
+def isModifier(update):
+    """Return true if the given update document uses update operators instead of replacing the document"""
+    return bool(update) and update.keys()[0].startswith("$")
+## DEF
+
+def valuesEqual(a, b):
+    # MongoDB does not consider true to be equal to 1
+    if isinstance(a, bool) != isinstance(b, bool): return False
+    return a == b
+## DEF
+
+def matches(doc, query):
+    """Return true if the given document matches all of the equality predicates of the query"""
+    for key, value in query.iteritems():
+        if not key in doc:
+            if value is None: continue
+            return False
+        field = doc[key]
+        if valuesEqual(field, value): continue
+        # An array matches if one of its elements is equal to the value
+        if isinstance(field, list) and not isinstance(value, list) and \
+           any(valuesEqual(x, value) for x in field):
+            continue
+        return False
+    ## FOR
+    return True
+## DEF
+
+def getKey(_id):
+    """Return the dict key for the given _id value"""
+    if isinstance(_id, (dict, list)):
+        return repr(_id)
+    return _id
+## DEF
+
+## ==============================================
+## MemoryDataset
+## ==============================================
+class MemoryDataset:
+    """
+        Applies the writes of the Reconstructor to documents in memory instead of sending
+        them to mongod. The workload stores the contents of the operations with escaped
+        keys (see util.escapeFieldNames), so every query is an equality match on top-level
+        fields and every update replaces the document, which is all that we support here.
+    """
+
+    def __init__(self):
+        # CollectionName -> OrderedDict(_id -> Document)
+        self.collections = { }
+    ## DEF
+
+    def collection_names(self):
+        return self.collections.keys()
+    ## DEF
+
+    def getDocuments(self, col_name):
+        """Return the list of documents in the given collection in the order that they were added"""
+        return self.collections.get(col_name, { }).values()
+    ## DEF
+
+    def apply(self, col_name, writes):
+        """Apply the given list of writes to the collection in order"""
+        for write in writes:
+            if write[0] == WRITE_SAVE:
+                self.save(col_name, write[1])
+            elif write[0] == WRITE_REMOVE:
+                self.remove(col_name, write[1])
+            elif write[0] == WRITE_UPDATE:
+                self.update(col_name, *write[1:])
+            else:
+                raise Exception("Unexpected write type '%s'" % write[0])
+        ## FOR
+    ## DEF
+
+    def find(self, col_name, query):
+        """Return the list of the documents in the collection that match the query"""
+        docs = self.collections.get(col_name, None)
+        if not docs: return [ ]
+        if "_id" in query and not isinstance(query["_id"], (dict, list)):
+            doc = docs.get(getKey(query["_id"]), None)
+            return [ doc ] if doc is not None and matches(doc, query) else [ ]
+        return [ doc for doc in docs.itervalues() if matches(doc, query) ]
+    ## DEF
+
+    def save(self, col_name, doc):
+        """Insert the document or replace the document with the same _id"""
+        if not "_id" in doc:
+            doc["_id"] = ObjectId()
+        self.collections.setdefault(col_name, OrderedDict())[getKey(doc["_id"])] = doc
+    ## DEF
+
+    def remove(self, col_name, query):
+        """Remove all of the documents that match the query"""
+        docs = self.collections.get(col_name, None)
+        if not docs: return
+        for doc in self.find(col_name, query):
+            del docs[getKey(doc["_id"])]
+    ## DEF
+
+    def update(self, col_name, query, update, upsert, multi):
+        """
+            Replace the first document that matches the query. This is what the bulk
+            operations of the Reconstructor do as well, because mongod does not allow
+            a replacement document to change more than one document.
+        """
+        if isModifier(update):
+            raise Exception("Update operators are not supported in memory: %s" % update.keys())
+        found = self.find(col_name, query)
+        if found:
+            doc = dict(update)
+            doc["_id"] = found[0]["_id"]
+        elif upsert:
+            doc = dict(update)
+            if not "_id" in doc and "_id" in query and not isinstance(query["_id"], dict):
+                doc["_id"] = query["_id"]
+        else:
+            return
+        self.save(col_name, doc)
+    ## DEF
+## CLASS
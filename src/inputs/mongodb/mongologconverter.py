@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import os
+import sys
+import logging
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, ".."))
+
+# mongodb-d4
+from mongosniffconverter import MongoSniffConverter
+import profileparser
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## MongoDB Log Converter
+## ==============================================
+class MongoLogConverter(MongoSniffConverter):
+    """
+        Loads the workload from mongod's structured JSON log or from an export of
+        the system.profile collection instead of a mongosniff trace. Everything
+        after the parsing is the same as for a mongosniff trace.
+    """
+
+    def __init__(self, metadata_db, dataset_db, fd=None, num_nodes=1):
+        MongoSniffConverter.__init__(self, metadata_db, dataset_db, fd, num_nodes)
+        self.server = profileparser.DEFAULT_SERVER
+    ## DEF
+
+    def createParser(self, fd):
+        return profileparser.ProfileParser(self.metadata_db, fd, self.server, skipSaltSearch=self.no_mongo_aggregate_fix)
+    ## DEF
+
+    def canParseInParallel(self, fd):
+        LOG.warn("Unable to parse a mongod log or a system.profile export in parallel")
+        return False
+    ## DEF
+## CLASS
@@ -39,6 +39,8 @@ sys.path.append(os.path.join(basedir, ".."))
 from abstractconverter import AbstractConverter
 
 import parser
+import pcapparser
+import reconstructor
 from reconstructor import Reconstructor
 from sessionizer import Sessionizer
 from normalizer import Normalizer
@@ -68,8 +70,17 @@ class MongoSniffConverter(AbstractConverter):
         self.no_mongo_normalize = False
         self.random_sessionizer = False
         self.mongo_skip = None
+        self.mongo_pcap = False
+        self.mongo_port = pcapparser.DEFAULT_PORT
         self.sess_limit = None
         self.op_limit = None
+        self.parse_workers = 1
+        self.checkpoint_lines = parser.DEFAULT_CHECKPOINT_LINES
+        self.checkpoint_seconds = 0
+        self.idle_timeout = None
+        self.reconstruct_batch_size = reconstructor.DEFAULT_BATCH_SIZE
+        self.reconstruct_workers = 1
+        self.reconstruct_in_memory = False
     ## DEF
         
     def loadImpl(self):
@@ -135,9 +146,16 @@ class MongoSniffConverter(AbstractConverter):
     ## ----------------------------------------------
     ## WORKLOAD PARSING + LOADING
     ## ----------------------------------------------
+    def createParser(self, fd):
+        """Return the Parser object for the format of the workload trace"""
+        if self.mongo_pcap:
+            return pcapparser.PcapParser(self.metadata_db, fd, self.mongo_port, skipSaltSearch=self.no_mongo_aggregate_fix)
+        return parser.Parser(self.metadata_db, fd, skipSaltSearch=self.no_mongo_aggregate_fix)
+    ## DEF
+    
     def parseWorkload(self, fd):
         # Create the Parser object that will go to town on our input file 
-        p = parser.Parser(self.metadata_db, fd, skipSaltSearch=self.no_mongo_aggregate_fix)
+        p = self.createParser(fd)
         
         # Stop on Error
         if self.stop_on_error:
@@ -155,18 +173,48 @@ class MongoSniffConverter(AbstractConverter):
             LOG.info("Will stop reading workload trace after %d Operations are processed", self.op_limit)
             p.op_limit =  self.op_limit
         
+        # Checkpoint Interval
+        p.checkpoint_lines = self.checkpoint_lines
+        p.checkpoint_seconds = self.checkpoint_seconds
+        # Streaming Sessions
+        if not self.idle_timeout is None:
+            LOG.info("Will flush sessions that are idle for %.1f seconds", self.idle_timeout)
+            p.idle_timeout = self.idle_timeout
+        
         # Clear our existing data
         if self.clean: p.clean()
         
         # Bombs away!
-        LOG.info("Processing mongosniff trace input")
-        p.process()
+        LOG.info("Processing workload trace input with %s", p.__class__.__name__)
+        if self.parse_workers > 1 and self.canParseInParallel(fd):
+            p.processParallel(fd.name, self.parse_workers)
+        else:
+            p.process()
         LOG.info("Finishing processing")
         LOG.info("Added %d sessions with %d operations to '%s'" % (\
             p.getSessionCount(), p.getOpCount(), self.metadata_db.collection.full_name))
         LOG.info("Skipped Responses: %d" % p.getOpSkipCount())
+        LOG.info("Parsed %d content lines as JSON and %d with the YAML parser" % (\
+            p.getJSONContentCount(), p.getYAMLContentCount()))
     ## IF
     
+    def canParseInParallel(self, fd):
+        """Return true if the given input can be split up between multiple parser processes"""
+        if self.mongo_pcap:
+            LOG.warn("Unable to parse a libpcap capture in parallel")
+            return False
+        elif fd is sys.stdin or not os.path.isfile(getattr(fd, "name", "")):
+            LOG.warn("Unable to parse the workload trace in parallel because it is not a file")
+            return False
+        elif self.mongo_skip or self.sess_limit or self.op_limit:
+            LOG.warn("Unable to parse the workload trace in parallel with a skip or limit")
+            return False
+        elif not self.idle_timeout is None:
+            LOG.warn("Unable to parse the workload trace in parallel with a session idle timeout")
+            return False
+        return True
+    ## DEF
+    
     ## ----------------------------------------------
     ## DATABASE RECONSTRUCTION
     ## ----------------------------------------------
@@ -174,6 +222,9 @@ class MongoSniffConverter(AbstractConverter):
         # Create a Reconstructor that will use the WORKLOAD_COL to regenerate
         # the original database and extract a schema catalog.
         r = Reconstructor(self.metadata_db, self.dataset_db)
+        r.batch_size = self.reconstruct_batch_size
+        r.num_workers = self.reconstruct_workers
+        r.in_memory = self.reconstruct_in_memory
         
         # Clear our existing data
         if self.clean: r.clean()
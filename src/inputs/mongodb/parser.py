@@ -22,14 +22,19 @@
 # OTHER DEALINGS IN THE SOFTWARE.
 # -----------------------------------------------------------------------
 from bson.errors import InvalidDocument
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
 import copy
+from collections import OrderedDict
 
 import os
 import sys
 import re
+import time
 import yaml
 import json
 import logging
+import multiprocessing
 from pprint import pformat
 
 # Third-Party Dependencies
@@ -44,6 +49,7 @@ from sanitizer import anonymize
 from workload import Session
 from workload import OpHasher
 from util import constants
+import relaxedjson
 
 LOG = logging.getLogger(__name__)
 
@@ -91,12 +97,30 @@ NTORETURN_MASK = ".*ntoreturn: (?P<ntoreturn>-?\d+).*" # int
 NTOSKIP_MASK = ".*ntoskip: (?P<ntoskip>\d+).*" #int
 HASFIELDS_MASK = ".*hasfields: (?P<hasfields>\{.*?\}).*" #dict
 
+# By default, we save a checkpoint of the sessions after this many lines
+DEFAULT_CHECKPOINT_LINES = 10000
+
+# The number of sessions that we write to the metadata database in a single bulk write
+CHECKPOINT_BATCH_SIZE = 500
+
+# When streaming, we check for idle sessions this many times per idle timeout
+IDLE_CHECKS_PER_TIMEOUT = 10
+
+# The maximum number of queries of flushed sessions that we keep waiting for a reply
+MAX_PENDING_REPLIES = 100000
+
+# When parsing in parallel, we split the trace into this many chunks per worker
+# so that the workers stay busy even if some chunks take longer than others
+CHUNKS_PER_WORKER = 4
+
+# The counters of a ChunkParser that are added to the main Parser
+CHUNK_COUNTERS = [ "line_ctr", "resp_ctr", "skip_ctr", "error_ctr", "json_ctr", "yaml_ctr" ]
+
 # Original Code: Emanuel Buzek
 class Parser:
     """Mongosniff Trace Parser"""
     
     def __init__(self, metadata_db, fd, skipSaltSearch=False):
-        assert metadata_db
         assert fd
         
         self.metadata_db = metadata_db
@@ -111,12 +135,22 @@ class Parser:
         self.op_limit = None
         self.recreated_db = None
         self.error_ctr = 0
+        # Number of content lines parsed as relaxed JSON vs. with the YAML parser
+        self.json_ctr = 0
+        self.yaml_ctr = 0
         self.stop_on_error = False
         self.no_salt_search = skipSaltSearch
 
         # If set to true, then we will periodically save the Sessions out to the
         # metatdata_db in case we crash and want to inspect what happened
         self.save_checkpoints = True
+        # Save a checkpoint after this many lines or seconds (zero means never)
+        self.checkpoint_lines = DEFAULT_CHECKPOINT_LINES
+        self.checkpoint_seconds = 0
+        self.last_checkpoint_line = 0
+        self.last_checkpoint_time = time.time()
+        # SessionId -> Session for the sessions that changed since the last checkpoint
+        self.dirty_sessions = { }
         
         # If this flag is true, then mongosniff got an invalid message packet
         # So we'll skip until we find the next matching header
@@ -139,6 +173,16 @@ class Parser:
         # used to pair up queries & replies by their mongosniff ID
         self.query_response_map = {} 
 
+        # Streaming mode: if this is set, then we flush a session out to the metadata_db
+        # and drop it from memory once its client has been idle for this many seconds
+        # of trace time. We keep the queries of the flushed sessions that have not
+        # gotten their reply yet in pending_replies so that we can still add late replies
+        self.idle_timeout = None
+        self.last_activity = { } # IpClient -> Timestamp of its last message
+        self.last_idle_check = 0.0
+        self.pending_replies = OrderedDict() # QueryId -> (Session _id, OpIndex, FlushTime)
+        self.flush_ctr = 0
+
         # Post-processing global vars. PLAINTEXT Collection Names for AGGREGATES
         # this dictionary is used to figure out the real collection names for aggregate queries
         # the col names are hashed
@@ -167,7 +211,7 @@ class Parser:
 
     def getSessionCount(self):
         """Return the number of sessions extracted from the workload trace"""
-        return len(self.session_map)
+        return len(self.session_map) + self.flush_ctr
     ## DEF
     
     def getOpCount(self):
@@ -179,6 +223,16 @@ class Parser:
         """Return the number of operations that were skipped during processing"""
         return self.skip_ctr
     ## DEF
+
+    def getJSONContentCount(self):
+        """Return the number of content lines that were parsed with the fast JSON path"""
+        return self.json_ctr
+    ## DEF
+
+    def getYAMLContentCount(self):
+        """Return the number of content lines that had to fall back to the YAML parser"""
+        return self.yaml_ctr
+    ## DEF
     
     def clean(self):
         """Remove all existing sessions in the workload collection"""
@@ -200,23 +254,15 @@ class Parser:
                 continue
             
             try:
-                # Parse the current line to decide whether this 
-                # is the beginning of a new operaton/reply
-                result = self.headerRegex.match(line)
-                if result:
-                    self.skip_to_next = False
-                    self.process_header_line(result.groupdict())
-                elif not self.skip_to_next:
-                    self.process_content_line(line)
+                self.processLine(line)
             except:
                 self.error_ctr += 1
                 LOG.error("Unexpected error when processing line %d" % self.line_ctr)
                 raise
             finally:
                 # Checkpoint!
-                if self.save_checkpoints and self.line_ctr % 10000 == 0:
-                    LOG.info("Saving checkpoint at line %d [sessions=%d / ops=%d / errors=%d]", self.line_ctr, self.sess_ctr, self.op_ctr, self.error_ctr)
-                    self.saveSessions(self.session_map.itervalues())
+                if self.save_checkpoints and self.isCheckpointDue():
+                    self.checkpoint()
 
             if not self.sess_limit is None and self.sess_ctr >= self.sess_limit:
                 LOG.warn("Session Limit Reached. Halting processing [sess_limit=%d]", self.sess_limit)
@@ -232,22 +278,175 @@ class Parser:
         # If only Emanuel was still alive to see this!
         self.postProcess()
         
-        self.saveSessions(self.session_map.itervalues())
+        self.saveDirtySessions()
+        
+        LOG.info("Completed processing %d lines from workload trace [errors=%d / jsonContent=%d / yamlContent=%d]", \
+                 self.line_ctr, self.error_ctr, self.json_ctr, self.yaml_ctr)
+    ## DEF
+    
+    def processLine(self, line):
+        """Process a single line from the workload trace"""
+        # Parse the current line to decide whether this 
+        # is the beginning of a new operaton/reply
+        result = self.headerRegex.match(line)
+        if result:
+            self.skip_to_next = False
+            self.process_header_line(result.groupdict())
+        elif not self.skip_to_next:
+            self.process_content_line(line)
+    ## DEF
+    
+    def storeMessage(self, header, content):
+        """
+            Store an operation that was decoded from the wire protocol instead of
+            parsed from mongosniff's output. The header has the same fields as a
+            mongosniff header line plus the 'type' and flags of the operation
+        """
+        self.line_ctr += 1
+        self.process_header_line(header)
+        if self.currentOp:
+            self.currentContent = content
+            self.storeCurrentOpInSession()
+            self.currentOp = None
+    ## DEF
+    
+    def processParallel(self, path, num_workers):
+        """
+            Extract all of the sessions from the workload trace file at the given path
+            using multiple worker processes. The file is split into chunks that begin
+            at a header line. Each worker parses a chunk into per-client operation lists
+            and we then stitch them together here in the order of the chunks, which
+            gives us the same sessions as process().
+        """
+        chunks = findChunks(path, num_workers * CHUNKS_PER_WORKER, self.headerRegex)
+        LOG.info("Parsing workload trace '%s' in %d chunks with %d worker processes", path, len(chunks), num_workers)
+        tasks = [ (path, start, end, self.stop_on_error) for start, end in chunks ]
+        
+        pool = multiprocessing.Pool(num_workers)
+        try:
+            # imap() returns the chunks in order, so we can merge them as soon
+            # as they arrive instead of holding all of them in memory
+            for result in pool.imap(parseChunk, tasks):
+                self.mergeChunk(result)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        
+        # Post Processing!
+        self.postProcess()
+        
+        self.saveDirtySessions()
+        
+        LOG.info("Completed processing %d lines from workload trace [errors=%d / jsonContent=%d / yamlContent=%d]", \
+                 self.line_ctr, self.error_ctr, self.json_ctr, self.yaml_ctr)
+    ## DEF
+    
+    def isCheckpointDue(self):
+        """Return true if we have processed enough lines or time since the last checkpoint"""
+        if self.checkpoint_lines and self.line_ctr - self.last_checkpoint_line >= self.checkpoint_lines:
+            return True
+        if self.checkpoint_seconds and time.time() - self.last_checkpoint_time >= self.checkpoint_seconds:
+            return True
+        return False
+    ## DEF
+    
+    def checkpoint(self):
+        """Save the sessions that changed since the last checkpoint"""
+        LOG.info("Saving checkpoint at line %d [sessions=%d / changed=%d / ops=%d / errors=%d]", \
+                 self.line_ctr, self.sess_ctr, len(self.dirty_sessions), self.op_ctr, self.error_ctr)
+        self.saveDirtySessions()
+        self.last_checkpoint_line = self.line_ctr
+        self.last_checkpoint_time = time.time()
+    ## DEF
+    
+    def mergeChunk(self, result):
+        """Add the operations parsed by a ChunkParser to our sessions"""
+        # Replies to queries from earlier chunks
+        for reply_id, content, size, timestamp, resp_id in result["replies"]:
+            if reply_id in self.query_response_map:
+                query_op = self.query_response_map.pop(reply_id)
+                query_op['resp_content'] = content
+                query_op['resp_size'] = size
+                query_op['resp_time'] = timestamp
+                query_op['resp_id'] = resp_id
+            else:
+                self.skip_ctr += 1
+        ## FOR
+        
+        for ip_client, ip_server, start_time, operations in result["sessions"]:
+            session = self.getOrCreateSession(ip_client, ip_server)
+            if session["start_time"] is None:
+                session["start_time"] = start_time
+            session['operations'].extend(operations)
+            self.op_ctr += len(operations)
+            self.dirty_sessions[session['session_id']] = session
+        ## FOR
+        
+        # Queries that might get their reply in a later chunk
+        self.query_response_map.update(result["queries"])
         
-        LOG.info("Completed processing %d lines from workload trace [errors=%d]", self.line_ctr, self.error_ctr)
+        self.known_collections |= result["known_collections"]
+        self.bustedOps.extend(result["bustedOps"])
+        for key in CHUNK_COUNTERS:
+            setattr(self, key, getattr(self, key) + result[key])
+    ## DEF
+    
+    def saveDirtySessions(self):
+        """Save all of the sessions that changed since the last time that we saved them"""
+        sessions = self.dirty_sessions.values()
+        self.dirty_sessions = { }
+        for i in xrange(0, len(sessions), CHECKPOINT_BATCH_SIZE):
+            self.bulkSaveSessions(sessions[i:i+CHECKPOINT_BATCH_SIZE])
+    ## DEF
+    
+    def bulkSaveSessions(self, sessions):
+        """
+            Upsert the given sessions with a single bulk write. If that fails, we fall
+            back to saving them one at a time with saveSessions() so that sessions
+            that are too big get split up. Returns the sessions that were saved with
+            all of their operations
+        """
+        batch = [ ]
+        for session in sessions:
+            if not len(session['operations']): continue
+            # Pick the id now so that the next checkpoint replaces this document
+            if not '_id' in session:
+                session['_id'] = ObjectId()
+            batch.append(session)
+        ## FOR
+        if not batch: return [ ]
+        
+        bulk = self.metadata_db.Session.collection.initialize_unordered_bulk_op()
+        for session in batch:
+            bulk.find({'_id': session['_id']}).upsert().replace_one(session)
+        try:
+            bulk.execute()
+        except (BulkWriteError, InvalidDocument) as err:
+            LOG.warn("Failed to save %d sessions with a bulk write. Saving them one at a time [%s]", len(batch), err)
+            return self.saveSessions(batch)
+        return batch
     ## DEF
     
     def saveSessions(self, sessions, noSplit=False):
-        """Save all sessions!"""
+        """
+            Save all sessions! Returns the sessions that were saved with all of their
+            operations, i.e. the ones that we did not have to split up or cut short
+        """
+        saved = [ ]
         for session in sessions:
             if not len(session['operations']):
                 if self.debug:
                     LOG.warn("Ignoring Session %(session_id)d because it doesn't have any operations" % session)
                 continue
 
+            whole = True
             while len(session["operations"]) > 0:
                 try:
                     session.save()
+                    if whole: saved.append(session)
                     break
                 except (mongokit.MaxDocumentSizeError, InvalidDocument) as err:
                     if noSplit: raise
@@ -258,6 +457,7 @@ class Parser:
                     
                     # HACK: Remove operations until it works
                     session["operations"].pop(-1)
+                    whole = False
                     
                     if len(session["operations"]) == 0:
                         msg = "Failed to save session: %s [errors=%d]" % (err.message, self.error_ctr)
@@ -269,6 +469,7 @@ class Parser:
                 ## EXCEPT
             ## WHILE
         ## FOR
+        return saved
     ## DEF
 
     def storeCurrentOpInSession(self):
@@ -307,11 +508,6 @@ class Parser:
             return
         ## IF
         
-        # Get the session to store this operation in
-        session = self.getOrCreateSession(ip_client, ip_server)
-        if session["start_time"] is None and "timestamp" in self.currentOp:
-            session["start_time"] = self.currentOp['timestamp']
-
         # Escape any invalid key names
         for i in xrange(0, len(self.currentContent)):
             # HACK: Rename the 'query' key to '$query'
@@ -321,6 +517,27 @@ class Parser:
             self.currentContent[i] = util.escapeFieldNames(self.currentContent[i])
         ## FOR
         
+        # A late reply to a session that we already flushed should not start a new one
+        if self.currentOp['type'] == constants.OP_TYPE_REPLY and not ip_client in self.session_map and \
+           self.currentOp['reply_id'] in self.pending_replies:
+            self.resp_ctr += 1
+            self.storeLateReply(self.currentOp['reply_id'])
+            return
+        ## IF
+        
+        # Get the session to store this operation in
+        session = self.getOrCreateSession(ip_client, ip_server)
+        if session["start_time"] is None and "timestamp" in self.currentOp:
+            session["start_time"] = self.currentOp['timestamp']
+        self.dirty_sessions[session['session_id']] = session
+        
+        if not self.idle_timeout is None:
+            timestamp = self.currentOp['timestamp']
+            self.last_activity[ip_client] = timestamp
+            if timestamp - self.last_idle_check >= self.idle_timeout / IDLE_CHECKS_PER_TIMEOUT:
+                self.flushIdleSessions(timestamp)
+        ## IF
+        
         # QUERY: $query, $delete, $insert, $update:
         # Create the operation, add it to the session
         if self.currentOp['type'] in [constants.OP_TYPE_QUERY, constants.OP_TYPE_INSERT, constants.OP_TYPE_DELETE, constants.OP_TYPE_UPDATE]:
@@ -360,8 +577,11 @@ class Parser:
                     ## --> This has to be done at the end after the first pass, because the collection name is hashed up
             
             # Keep track of operations by their ids so that we can add
-            # the response to it later on
-            self.query_response_map[self.currentOp['query_id']] = op
+            # the response to it later on. The legacy OP_INSERT, OP_UPDATE and
+            # OP_DELETE messages never get one, so we would only wait for them
+            # forever. The writes that are sent as commands are marked by the decoder
+            if op['type'] == constants.OP_TYPE_QUERY or self.currentOp.get('expects_reply', False):
+                self.query_response_map[self.currentOp['query_id']] = op
             
             # Append it to the current session
             # TODO: Large traces will cause the sessions to get too big.
@@ -394,9 +614,7 @@ class Parser:
                 query_op['resp_id'] = long(self.currentOp['query_id'])
                 del self.query_response_map[reply_id]
             else:
-                self.skip_ctr += 1
-                if self.debug:
-                    LOG.warn("Skipping response on line %d - No matching query_id '%s' [skipCtr=%d/%d]" % (self.line_ctr, reply_id, self.skip_ctr, self.resp_ctr))
+                self.storeUnmatchedReply(reply_id)
                 
         # These can be safely ignored
         elif self.currentOp['type'] in [constants.OP_TYPE_GETMORE, constants.OP_TYPE_KILLCURSORS]:
@@ -410,6 +628,95 @@ class Parser:
         return
     ## DEF
 
+    def storeUnmatchedReply(self, reply_id):
+        """Handle a reply to a query that we have not seen"""
+        if reply_id in self.pending_replies:
+            self.storeLateReply(reply_id)
+            return
+        self.skip_ctr += 1
+        if self.debug:
+            LOG.warn("Skipping response on line %d - No matching query_id '%s' [skipCtr=%d/%d]" % (self.line_ctr, reply_id, self.skip_ctr, self.resp_ctr))
+    ## DEF
+
+    def storeLateReply(self, reply_id):
+        """Add the current reply to a query in a session that we already flushed"""
+        _id, op_idx, flush_time = self.pending_replies.pop(reply_id)
+        prefix = "operations.%d." % op_idx
+        self.metadata_db.Session.collection.update({'_id': _id}, {'$set': {
+            prefix + 'resp_content': self.currentContent,
+            prefix + 'resp_size':    self.currentOp['size'],
+            prefix + 'resp_time':    self.currentOp['timestamp'],
+            prefix + 'resp_id':      long(self.currentOp['query_id']),
+        }})
+    ## DEF
+    
+    def flushIdleSessions(self, now):
+        """Flush the sessions whose client has not sent anything in the last idle_timeout seconds"""
+        self.last_idle_check = now
+        idle = [ ip_client for ip_client, timestamp in self.last_activity.iteritems() \
+                           if now - timestamp >= self.idle_timeout ]
+        if idle: self.flushSessions(idle, now)
+        
+        # Forget about queries that have been waiting for their reply for too long
+        while self.pending_replies:
+            query_id, (_id, op_idx, flush_time) = next(self.pending_replies.iteritems())
+            if now - flush_time < self.idle_timeout and len(self.pending_replies) <= MAX_PENDING_REPLIES:
+                break
+            del self.pending_replies[query_id]
+        ## WHILE
+    ## DEF
+    
+    def closeSession(self, ip_client, now):
+        """The client's connection was closed, so there will not be any more operations in its session"""
+        if not self.idle_timeout is None and ip_client in self.session_map:
+            self.flushSessions([ ip_client ], now)
+    ## DEF
+    
+    def flushSessions(self, ip_clients, now):
+        """Save the sessions of the given clients and drop them from memory"""
+        sessions = [ ]
+        for ip_client in ip_clients:
+            session = self.session_map.pop(ip_client)
+            self.last_activity.pop(ip_client, None)
+            self.dirty_sessions.pop(session['session_id'], None)
+            sessions.append(session)
+        ## FOR
+        saved = [ ]
+        for i in xrange(0, len(sessions), CHECKPOINT_BATCH_SIZE):
+            saved.extend(self.bulkSaveSessions(sessions[i:i+CHECKPOINT_BATCH_SIZE]))
+        saved = set(map(id, saved))
+        
+        for session in sessions:
+            # Keep just enough information about the queries that did not
+            # get their reply yet to update the saved session later. We can only
+            # do that if the session was saved whole, because splitting it up
+            # moves some of its operations into another document
+            for op_idx in xrange(len(session['operations'])):
+                op = session['operations'][op_idx]
+                if self.query_response_map.get(op['query_id']) is op:
+                    del self.query_response_map[op['query_id']]
+                    if id(session) in saved:
+                        self.pending_replies[op['query_id']] = (session['_id'], op_idx, now)
+            ## FOR
+        ## FOR
+        self.flush_ctr += len(sessions)
+        if self.debug:
+            LOG.debug("Flushed %d idle sessions [active=%d / pendingReplies=%d]", \
+                      len(sessions), len(self.session_map), len(self.pending_replies))
+    ## DEF
+    
+    def iterSessions(self):
+        """Iterate over all of the sessions that we have extracted so far"""
+        if self.idle_timeout is None:
+            return self.session_map.itervalues()
+        # Most of the sessions are only in the metadata_db when streaming.
+        # Splitting a session that is too big puts a new one in the session_map
+        while self.session_map:
+            self.flushSessions(self.session_map.keys(), None)
+        return self.metadata_db.Session.fetch({'session_id': {'$gte': constants.INITIAL_SESSION_ID, \
+                                                              '$lt': self.next_session_id}})
+    ## DEF
+
     def splitSession(self, orig_sess):
         # HACK: If the number of operations in the session gets too big, then
         # we have to spill the session into another object.
@@ -417,7 +724,7 @@ class Parser:
 
         new_sess = self.metadata_db.Session()
         for k in orig_sess.iterkeys():
-            if not k in ['operations', 'session_id']:
+            if not k in ['operations', 'session_id', '_id']:
                 new_sess[k] = copy.deepcopy(orig_sess[k])
                 ## FOR
         new_sess['session_id'] = self.__nextSessionId__()
@@ -438,6 +745,7 @@ class Parser:
         # Now update the session map so that the next time that we need
         # to add an operation for this client we get our new Session
         self.session_map[orig_sess['ip_client']] = new_sess
+        self.dirty_sessions[new_sess['session_id']] = new_sess
 
 #        if self.debug:
         LOG.info("Split Session #%d with %d operations into new Session #%d", \
@@ -566,27 +874,35 @@ class Parser:
             LOG.warn(msg)
             return
         
+        # Almost every line is valid JSON once mongosniff's bare keys and values
+        # are quoted, so we only hand the lines that the fast path rejects
+        # over to the YAML parser
         try:
-            obj = yaml.load(yaml_line)
-        except (yaml.scanner.ScannerError, yaml.parser.ParserError, yaml.reader.ReaderError) as err:
-            self.error_ctr += 1
-            msg = "Failed to parse YAML on Line %d - %s" % (self.line_ctr, err)
-            if self.debug: LOG.debug("Offending Line: %s" % yaml_line)
-            if self.stop_on_error: raise Exception(msg)
-            LOG.warn(msg)
-            return
-        
-        try:
-            valid_json = json.dumps(obj)
-            obj = yaml.load(valid_json)
-        finally:
-            if not obj:
+            obj = relaxedjson.loads(yaml_line)
+            self.json_ctr += 1
+        except ValueError:
+            self.yaml_ctr += 1
+            try:
+                obj = yaml.load(yaml_line)
+            except (yaml.scanner.ScannerError, yaml.parser.ParserError, yaml.reader.ReaderError) as err:
                 self.error_ctr += 1
-                msg = "Failed to Convert YAML to JSON on Line %d [errors=%d]" % (self.line_ctr, self.error_ctr)
+                msg = "Failed to parse YAML on Line %d - %s" % (self.line_ctr, err)
                 if self.debug: LOG.debug("Offending Line: %s" % yaml_line)
                 if self.stop_on_error: raise Exception(msg)
                 LOG.warn(msg)
                 return
+            # Round-trip through JSON so that we end up with the
+            # same types that the fast path would have given us
+            if obj: obj = json.loads(json.dumps(obj))
+        ## TRY
+        
+        if not obj:
+            self.error_ctr += 1
+            msg = "Failed to Convert YAML to JSON on Line %d [errors=%d]" % (self.line_ctr, self.error_ctr)
+            if self.debug: LOG.debug("Offending Line: %s" % yaml_line)
+            if self.stop_on_error: raise Exception(msg)
+            LOG.warn(msg)
+            return
         return obj
     ## DEF
 
@@ -729,7 +1045,7 @@ class Parser:
         
         candidate_hashes = set()
         LOG.debug("Retrieving hashed collection names...")
-        for session in self.session_map.itervalues():
+        for session in self.iterSessions():
             for op in session['operations']:
                 if op['query_aggregate']:
                     # find the JSON of the query...
@@ -786,7 +1102,7 @@ class Parser:
         LOG.info("PlainText Hashes:\n%s" % pformat(hashed_collections))
         
         cnt = 0
-        for session in self.session_map.itervalues():
+        for session in self.iterSessions():
             dirty = False
             for op in session['operations']:
                 query = op['query_content'][0]
@@ -834,4 +1150,112 @@ class Parser:
     '''
     
     
-## CLASS
\ No newline at end of file
+## CLASS
+
+## ==============================================
+## ChunkParser
+## ==============================================
+class ChunkParser(Parser):
+    """
+        Parses a byte range of a mongosniff trace file in a worker process.
+        Instead of creating Sessions in the metadata database, it collects the
+        operations of each client in plain lists. Replies to queries that are
+        not in this chunk and queries that did not get their reply in this chunk
+        are handed back to the main Parser so that it can match them up.
+    """
+    
+    def __init__(self, fd):
+        Parser.__init__(self, None, fd)
+        self.save_checkpoints = False
+        # IpClient -> [ IpServer, StartTime, Operations ]
+        self.client_ops = { }
+        self.client_order = [ ]
+        # (reply_id, content, size, timestamp, resp_id)
+        self.unmatched_replies = [ ]
+    ## DEF
+    
+    def processRange(self, start, end):
+        """Process the lines in the given byte range of the trace"""
+        self.fd.seek(start)
+        pos = start
+        while pos < end:
+            line = self.fd.readline()
+            if not line: break
+            pos += len(line)
+            self.line_ctr += 1
+            self.processLine(line)
+        ## WHILE
+        if self.currentOp:
+            self.storeCurrentOpInSession()
+    ## DEF
+    
+    def getOrCreateSession(self, ip_client, ip_server):
+        if not ip_client in self.client_ops:
+            self.client_ops[ip_client] = { "session_id": ip_client, "ip_server": ip_server, "start_time": None, "operations": [ ] }
+            self.client_order.append(ip_client)
+        return self.client_ops[ip_client]
+    ## DEF
+    
+    def storeUnmatchedReply(self, reply_id):
+        self.unmatched_replies.append((reply_id, self.currentContent, self.currentOp['size'], \
+                                       self.currentOp['timestamp'], long(self.currentOp['query_id'])))
+    ## DEF
+    
+    def getResult(self):
+        """Return everything that the main Parser needs to merge this chunk"""
+        result = {
+            "sessions":          [ ],
+            "replies":           self.unmatched_replies,
+            "queries":           self.query_response_map,
+            "known_collections": self.known_collections,
+            "bustedOps":         self.bustedOps,
+        }
+        for ip_client in self.client_order:
+            sess = self.client_ops[ip_client]
+            result["sessions"].append((ip_client, sess["ip_server"], sess["start_time"], sess["operations"]))
+        for key in CHUNK_COUNTERS:
+            result[key] = getattr(self, key)
+        return result
+    ## DEF
+## CLASS
+
+def findChunks(path, num_chunks, headerRegex):
+    """
+        Split the trace file at the given path into at most num_chunks byte ranges.
+        Every range except for the first one begins with a header line.
+    """
+    size = os.path.getsize(path)
+    offsets = [ 0 ]
+    fd = open(path, "r")
+    try:
+        for i in xrange(1, num_chunks):
+            pos = max(size * i / num_chunks, offsets[-1])
+            fd.seek(pos)
+            # Skip the rest of the line that we landed in
+            pos += len(fd.readline())
+            while True:
+                line = fd.readline()
+                if not line or headerRegex.match(line): break
+                pos += len(line)
+            ## WHILE
+            if offsets[-1] < pos < size:
+                offsets.append(pos)
+        ## FOR
+    finally:
+        fd.close()
+    offsets.append(size)
+    return zip(offsets[:-1], offsets[1:])
+## DEF
+
+def parseChunk(args):
+    """Worker function that parses one chunk of a trace file"""
+    path, start, end, stop_on_error = args
+    fd = open(path, "r")
+    try:
+        p = ChunkParser(fd)
+        p.stop_on_error = stop_on_error
+        p.processRange(start, end)
+    finally:
+        fd.close()
+    return p.getResult()
+## DEF
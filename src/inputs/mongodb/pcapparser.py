@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import os
+import sys
+import zlib
+import base64
+import struct
+import logging
+import calendar
+from datetime import datetime
+
+import bson
+from bson.binary import Binary
+from bson.objectid import ObjectId
+from bson.timestamp import Timestamp
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, ".."))
+
+# mongodb-d4
+from util import constants
+import parser
+from pcapreader import PcapReader, TCPReassembler
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## MongoDB Wire Protocol
+## ==============================================
+DEFAULT_PORT = 27017
+
+OP_REPLY = 1
+OP_UPDATE = 2001
+OP_INSERT = 2002
+OP_QUERY = 2004
+OP_GET_MORE = 2005
+OP_DELETE = 2006
+OP_KILL_CURSORS = 2007
+OP_COMPRESSED = 2012
+OP_MSG = 2013
+OPCODES = set([ OP_REPLY, OP_UPDATE, OP_INSERT, OP_QUERY, OP_GET_MORE, \
+                OP_DELETE, OP_KILL_CURSORS, OP_COMPRESSED, OP_MSG ])
+
+COMPRESSOR_NOOP = 0
+COMPRESSOR_ZLIB = 2
+
+MSG_CHECKSUM_PRESENT = 0x01
+MSG_MORE_TO_COME = 0x02
+
+UPDATE_UPSERT = 0x01
+UPDATE_MULTI = 0x02
+
+HEADER_SIZE = 16
+MAX_MESSAGE_SIZE = 48 * 1024 * 1024
+
+MSG_HEADER = struct.Struct("<iiii")
+INT32 = struct.Struct("<i")
+INT32_PAIR = struct.Struct("<ii")
+COMPRESSED_HEADER = struct.Struct("<iiB")
+
+# OP_MSG command fields that only matter to the server and not to the workload
+COMMAND_META_FIELDS = set([ "$db", "lsid", "txnNumber", "autocommit", "startTransaction", "$clusterTime", \
+                            "$readPreference", "readConcern", "writeConcern", "$audit", "$client", "apiVersion" ])
+
+# The values that we can store as they are
+SIMPLE_TYPES = set([ unicode, str, int, long, float, bool, type(None) ])
+
+# What the decoder yields
+EVENT_MESSAGE = "message"
+EVENT_CLOSE = "close"
+
+def convertValue(value):
+    """Convert the BSON types that JSON does not have into the strings that mongosniff prints for them"""
+    if isinstance(value, dict):
+        for k, v in value.iteritems():
+            if not type(v) in SIMPLE_TYPES:
+                value[k] = convertValue(v)
+        return value
+    elif isinstance(value, list):
+        for i in xrange(len(value)):
+            if not type(value[i]) in SIMPLE_TYPES:
+                value[i] = convertValue(value[i])
+        return value
+    elif isinstance(value, ObjectId):
+        return "ObjectId('%s')" % value
+    elif isinstance(value, datetime):
+        return "new Date(%d)" % (calendar.timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000)
+    elif isinstance(value, Binary):
+        return "BinData(%d, %s)" % (value.subtype, base64.b64encode(value))
+    elif isinstance(value, Timestamp):
+        return "Timestamp %d|%d" % (value.time, value.inc)
+    elif isinstance(value, (int, long, float)):
+        return value
+    elif hasattr(value, "pattern"):
+        return "/%s/" % value.pattern
+    return str(value)
+## DEF
+
+def readCString(data, offset):
+    """Return the string at the given offset and the offset after its terminating null"""
+    end = data.index("\0", offset)
+    return data[offset:end], end + 1
+## DEF
+
+def readDocuments(data, offset, end=None):
+    """Decode the BSON documents from the given offset until the end of the data"""
+    return [ convertValue(doc) for doc in bson.decode_all(data[offset:end]) ]
+## DEF
+
+def isMessageHeader(data, offset=0):
+    """Return true if the data at the given offset looks like the beginning of a message"""
+    if len(data) - offset < HEADER_SIZE: return False
+    length, request_id, response_to, opcode = MSG_HEADER.unpack_from(data, offset)
+    return HEADER_SIZE <= length <= MAX_MESSAGE_SIZE and opcode in OPCODES
+## DEF
+
+def getReplyContent(body):
+    """Return the documents in the reply to a command"""
+    cursor = body.get("cursor", None)
+    if isinstance(cursor, dict):
+        return cursor.get("firstBatch", cursor.get("nextBatch", [ ]))
+    return [ body ]
+## DEF
+
+def translateCommand(header, command, body, sequences=None):
+    """
+        Return the list of (header, content) for the legacy operations that perform the
+        same work as the given command. OP_MSG carries every operation as a command, so we
+        turn the CRUD commands into the legacy operations and everything else into a query
+        on the $cmd collection, which is what older drivers sent. The sequences are the
+        document sequences of the OP_MSG keyed by their identifier.
+    """
+    if sequences is None: sequences = { }
+    database = body.get("$db", "admin")
+    target = body.get(command, None)
+    collection = "%s.%s" % (database, target) if isinstance(target, basestring) else None
+    ops = [ ]
+    if command == "find" and collection:
+        header['collection'] = collection
+        header['type'] = constants.OP_TYPE_QUERY
+        # The workload code expects the filter to be under $query like
+        # the legacy drivers send it when the query has any options
+        query = { "$query": body.get("filter", { }) }
+        if "sort" in body:
+            query["$orderby"] = body["sort"]
+        header['ntoskip'] = body.get("skip", 0)
+        header['ntoreturn'] = -1 if body.get("singleBatch", False) else body.get("limit", 0)
+        header['hasfields'] = body.get("projection", None)
+        ops.append((header, [ query ]))
+    elif command == "insert" and collection:
+        header['collection'] = collection
+        header['type'] = constants.OP_TYPE_INSERT
+        ops.append((header, body.get("documents", [ ]) + sequences.get("documents", [ ])))
+    elif command == "update" and collection:
+        for stmt in body.get("updates", [ ]) + sequences.get("updates", [ ]):
+            op_header = dict(header)
+            op_header['collection'] = collection
+            op_header['type'] = constants.OP_TYPE_UPDATE
+            op_header['update_upsert'] = bool(stmt.get("upsert", False))
+            op_header['update_multi'] = bool(stmt.get("multi", False))
+            update = stmt.get("u", { })
+            if not isinstance(update, dict):
+                # Aggregation pipeline
+                update = { "$pipeline": update }
+            ops.append((op_header, [ stmt.get("q", { }), update ]))
+        ## FOR
+    elif command == "delete" and collection:
+        for stmt in body.get("deletes", [ ]) + sequences.get("deletes", [ ]):
+            op_header = dict(header)
+            op_header['collection'] = collection
+            op_header['type'] = constants.OP_TYPE_DELETE
+            ops.append((op_header, [ stmt.get("q", { }) ]))
+        ## FOR
+    elif command == "getMore":
+        header['collection'] = "%s.%s" % (database, body.get("collection", ""))
+        header['type'] = constants.OP_TYPE_GETMORE
+        ops.append((header, [ ]))
+    elif command == "killCursors":
+        header['collection'] = collection or ""
+        header['type'] = constants.OP_TYPE_KILLCURSORS
+        ops.append((header, [ ]))
+    else:
+        header['collection'] = "%s.$cmd" % database
+        header['type'] = constants.OP_TYPE_QUERY
+        header['ntoskip'] = 0
+        header['ntoreturn'] = -1
+        header['hasfields'] = None
+        ops.append((header, [ dict([ (k, v) for k, v in body.iteritems() if not k in COMMAND_META_FIELDS ]) ]))
+    ## IF
+    return ops
+## DEF
+
+class MessageBuffer:
+    """Splits one direction of a TCP connection into wire protocol messages"""
+
+    def __init__(self):
+        self.chunks = [ ]
+        self.size = 0
+        # The number of bytes that we need before we can look at the data again
+        self.needed = HEADER_SIZE
+        self.start_time = None
+        # False if we do not know where the next message begins
+        self.synced = False
+        self.resync_ctr = 0
+    ## DEF
+
+    def reset(self):
+        self.chunks = [ ]
+        self.size = 0
+        self.needed = HEADER_SIZE
+        self.synced = False
+    ## DEF
+
+    def add(self, timestamp, data):
+        """Return the list of (timestamp, message) for the messages that are now complete"""
+        if data is None:
+            # We lost some of the stream
+            self.reset()
+            return [ ]
+        if self.size == 0:
+            self.start_time = timestamp
+            if not self.synced:
+                # Wait for a segment that begins with a message
+                if not isMessageHeader(data): return [ ]
+                self.synced = True
+        ## IF
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size < self.needed: return [ ]
+
+        data = "".join(self.chunks)
+        offset = 0
+        ret = [ ]
+        while len(data) - offset >= HEADER_SIZE:
+            if not isMessageHeader(data, offset):
+                LOG.warn("Invalid message header in stream. Skipping to the next message")
+                self.resync_ctr += 1
+                self.reset()
+                return ret
+            length = INT32.unpack_from(data, offset)[0]
+            if len(data) - offset < length: break
+            ret.append((self.start_time, data[offset:offset+length]))
+            offset += length
+            self.start_time = timestamp
+        ## WHILE
+
+        data = data[offset:]
+        self.chunks = [ data ] if data else [ ]
+        self.size = len(data)
+        self.needed = INT32.unpack_from(data, 0)[0] if self.size >= HEADER_SIZE else HEADER_SIZE
+        return ret
+    ## DEF
+## CLASS
+
+class WireProtocolDecoder:
+    """
+        Decodes the MongoDB messages in a libpcap capture into the same operation
+        headers and contents that the mongosniff Parser extracts from its text output
+    """
+
+    def __init__(self, fd, port=DEFAULT_PORT):
+        self.reader = PcapReader(fd)
+        self.tcp = TCPReassembler(self.reader, port)
+        # (ip_client, ip_server, from_client) -> MessageBuffer
+        self.buffers = { }
+        # (ip_client, ip_server) -> { RequestId -> Collection } for the requests that will get a reply
+        self.requests = { }
+        self.msg_ctr = 0
+        self.resync_ctr = 0
+        self.unsupported_ctr = 0
+    ## DEF
+
+    def events(self):
+        """
+            Yield (EVENT_MESSAGE, header, content) for every operation and
+            (EVENT_CLOSE, ip_client, timestamp) when a connection is closed
+        """
+        for timestamp, ip_client, ip_server, from_client, data in self.tcp.events():
+            if from_client is None:
+                for key in [ (ip_client, ip_server, True), (ip_client, ip_server, False) ]:
+                    if key in self.buffers:
+                        self.resync_ctr += self.buffers.pop(key).resync_ctr
+                self.requests.pop((ip_client, ip_server), None)
+                yield (EVENT_CLOSE, ip_client, timestamp)
+                continue
+            ## IF
+
+            key = (ip_client, ip_server, from_client)
+            buf = self.buffers.get(key, None)
+            if buf is None:
+                buf = MessageBuffer()
+                self.buffers[key] = buf
+            for msg_time, msg in buf.add(timestamp, data):
+                self.msg_ctr += 1
+                try:
+                    ops = self.decodeMessage(msg_time, ip_client, ip_server, from_client, msg)
+                except (struct.error, ValueError, bson.errors.InvalidBSON, zlib.error) as err:
+                    LOG.warn("Failed to decode message %d from %s: %s", self.msg_ctr, ip_client, err)
+                    self.unsupported_ctr += 1
+                    continue
+                for header, content in ops:
+                    yield (EVENT_MESSAGE, header, content)
+            ## FOR
+        ## FOR
+        for buf in self.buffers.itervalues():
+            self.resync_ctr += buf.resync_ctr
+    ## DEF
+
+    def decodeMessage(self, timestamp, ip_client, ip_server, from_client, msg):
+        """Return the list of (header, content) for the operations in the given message"""
+        length, request_id, response_to, opcode = MSG_HEADER.unpack_from(msg, 0)
+        if opcode == OP_COMPRESSED:
+            opcode, uncompressed_size, compressor = COMPRESSED_HEADER.unpack_from(msg, HEADER_SIZE)
+            if compressor == COMPRESSOR_ZLIB:
+                body = zlib.decompress(msg[HEADER_SIZE+9:])
+            elif compressor == COMPRESSOR_NOOP:
+                body = msg[HEADER_SIZE+9:]
+            else:
+                # snappy and zstd need libraries that we do not depend on
+                self.unsupported_ctr += 1
+                return [ ]
+            msg = msg[:HEADER_SIZE] + body
+        ## IF
+
+        header = {
+            'timestamp': timestamp,
+            'size':      length,
+            'magic_id':  "id:%x" % request_id,
+            'query_id':  request_id,
+            'reply_id':  None,
+        }
+        if from_client:
+            header['ip1'], header['arrow'], header['ip2'] = ip_client, "-->>", ip_server
+        else:
+            header['ip1'], header['arrow'], header['ip2'] = ip_server, "<<--", ip_client
+        requests = self.requests.setdefault((ip_client, ip_server), { })
+
+        if opcode == OP_REPLY:
+            header['type'] = constants.OP_TYPE_REPLY
+            header['reply_id'] = response_to
+            header['collection'] = requests.pop(response_to, "")
+            return [ (header, readDocuments(msg, HEADER_SIZE + 20)) ]
+        elif opcode == OP_MSG:
+            return self.decodeOpMsg(header, from_client, requests, msg)
+        elif not from_client:
+            self.unsupported_ctr += 1
+            return [ ]
+
+        if opcode == OP_QUERY:
+            header['collection'], offset = readCString(msg, HEADER_SIZE + 4)
+            header['ntoskip'], header['ntoreturn'] = INT32_PAIR.unpack_from(msg, offset)
+            docs = readDocuments(msg, offset + 8)
+            header['type'] = constants.OP_TYPE_QUERY
+            header['hasfields'] = docs[1] if len(docs) > 1 else None
+            content = docs[:1]
+            requests[request_id] = header['collection']
+        elif opcode == OP_INSERT:
+            header['collection'], offset = readCString(msg, HEADER_SIZE + 4)
+            header['type'] = constants.OP_TYPE_INSERT
+            content = readDocuments(msg, offset)
+        elif opcode == OP_UPDATE:
+            header['collection'], offset = readCString(msg, HEADER_SIZE + 4)
+            flags = INT32.unpack_from(msg, offset)[0]
+            header['type'] = constants.OP_TYPE_UPDATE
+            header['update_upsert'] = bool(flags & UPDATE_UPSERT)
+            header['update_multi'] = bool(flags & UPDATE_MULTI)
+            content = readDocuments(msg, offset + 4)
+        elif opcode == OP_DELETE:
+            header['collection'], offset = readCString(msg, HEADER_SIZE + 4)
+            header['type'] = constants.OP_TYPE_DELETE
+            content = readDocuments(msg, offset + 4)
+        elif opcode == OP_GET_MORE:
+            header['collection'], offset = readCString(msg, HEADER_SIZE + 4)
+            header['type'] = constants.OP_TYPE_GETMORE
+            content = [ ]
+            requests[request_id] = header['collection']
+        elif opcode == OP_KILL_CURSORS:
+            header['collection'] = ""
+            header['type'] = constants.OP_TYPE_KILLCURSORS
+            content = [ ]
+        else:
+            self.unsupported_ctr += 1
+            return [ ]
+        return [ (header, content) ]
+    ## DEF
+
+    def decodeOpMsg(self, header, from_client, requests, msg):
+        """Return the list of (header, content) for the operations in the given OP_MSG"""
+        flags = INT32.unpack_from(msg, HEADER_SIZE)[0]
+        end = len(msg) - (4 if flags & MSG_CHECKSUM_PRESENT else 0)
+        offset = HEADER_SIZE + 4
+        body = None
+        sequences = { }
+        while offset < end:
+            kind = ord(msg[offset])
+            size = INT32.unpack_from(msg, offset + 1)[0]
+            if kind == 0:
+                body = readDocuments(msg, offset + 1, offset + 1 + size)[0]
+                # Commands are identified by their first key, which the decoded dict does not keep
+                command, x = readCString(msg, offset + 6)
+            elif kind == 1:
+                identifier, start = readCString(msg, offset + 5)
+                sequences[identifier] = readDocuments(msg, start, offset + 1 + size)
+            else:
+                self.unsupported_ctr += 1
+                return [ ]
+            offset += 1 + size
+        ## WHILE
+        if body is None:
+            self.unsupported_ctr += 1
+            return [ ]
+
+        if not from_client:
+            header['type'] = constants.OP_TYPE_REPLY
+            header['reply_id'] = INT32.unpack_from(msg, 8)[0]
+            header['collection'] = requests.pop(header['reply_id'], "")
+            return [ (header, getReplyContent(body)) ]
+        ## IF
+
+        # Unlike the legacy write messages, every command gets a reply
+        # unless the client told the server not to send one
+        header['expects_reply'] = not flags & MSG_MORE_TO_COME
+        ops = translateCommand(header, command, body, sequences)
+        if header['expects_reply'] and ops:
+            requests[header['query_id']] = ops[-1][0]['collection']
+        return ops
+    ## DEF
+## CLASS
+
+## ==============================================
+## PcapParser
+## ==============================================
+class PcapParser(parser.Parser):
+    """
+        Extracts the sessions from a libpcap capture of the MongoDB wire protocol.
+        This does not need mongosniff and skips its text output altogether.
+    """
+
+    def __init__(self, metadata_db, fd, port=DEFAULT_PORT, skipSaltSearch=False):
+        parser.Parser.__init__(self, metadata_db, fd, skipSaltSearch)
+        self.port = port
+    ## DEF
+
+    def process(self):
+        """Read each message from the capture and extract all of the sessions"""
+        decoder = WireProtocolDecoder(self.fd, self.port)
+        for event in decoder.events():
+            if event[0] == EVENT_CLOSE:
+                self.closeSession(event[1], event[2])
+                continue
+            if self.op_skip and decoder.msg_ctr < self.op_skip:
+                continue
+            # The Parser does not keep track of cursors
+            if event[1]['type'] in [ constants.OP_TYPE_GETMORE, constants.OP_TYPE_KILLCURSORS ]:
+                continue
+
+            try:
+                self.storeMessage(event[1], event[2])
+            except:
+                self.error_ctr += 1
+                LOG.error("Unexpected error when processing message %d" % decoder.msg_ctr)
+                raise
+            finally:
+                # Checkpoint!
+                if self.save_checkpoints and self.isCheckpointDue():
+                    self.checkpoint()
+
+            if not self.sess_limit is None and self.sess_ctr >= self.sess_limit:
+                LOG.warn("Session Limit Reached. Halting processing [sess_limit=%d]", self.sess_limit)
+                break
+            elif not self.op_limit is None and self.op_ctr >= self.op_limit:
+                LOG.warn("Operation Limit Reached. Halting processing [op_limit=%d]", self.op_limit)
+                break
+        ## FOR
+
+        # Post Processing!
+        self.postProcess()
+
+        self.saveDirtySessions()
+
+        LOG.info("Completed processing %d messages from %d packets [errors=%d / resyncs=%d / gaps=%d / unsupported=%d]", \
+                 decoder.msg_ctr, decoder.reader.packet_ctr, self.error_ctr, \
+                 decoder.resync_ctr, decoder.tcp.gap_ctr, decoder.unsupported_ctr)
+    ## DEF
+## CLASS
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import socket
+import struct
+import logging
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## libpcap File Format
+## ==============================================
+PCAP_MAGIC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+PCAPNG_MAGIC = 0x0a0d0d0a
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = [ 0x8100, 0x88a8 ]
+
+IPPROTO_TCP = 6
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+# The maximum number of out-of-order segments that we hold on to for each
+# direction of a connection before we give up on the missing data
+MAX_PENDING_SEGMENTS = 1024
+
+ETHERNET_TYPE = struct.Struct("!H")
+NULL_FAMILY = struct.Struct("=I")
+IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+IPV6_HEADER = struct.Struct("!IHBB16s16s")
+TCP_HEADER = struct.Struct("!HHIIBB")
+
+class PcapReader:
+    """Reads the packets from a libpcap capture file"""
+
+    def __init__(self, fd):
+        self.fd = fd
+        header = fd.read(24)
+        if len(header) < 24:
+            raise Exception("The capture file is too short")
+        magic = struct.unpack("<I", header[:4])[0]
+        if magic == PCAPNG_MAGIC:
+            raise Exception("pcapng capture files are not supported. Convert it with 'editcap -F pcap'")
+        for endian in "<>":
+            magic = struct.unpack(endian + "I", header[:4])[0]
+            if magic in [ PCAP_MAGIC, PCAP_MAGIC_NSEC ]: break
+        else:
+            raise Exception("Not a libpcap capture file [magic=0x%08x]" % magic)
+        self.ts_scale = 1e-9 if magic == PCAP_MAGIC_NSEC else 1e-6
+        self.record = struct.Struct(endian + "IIII")
+        self.linktype = struct.unpack(endian + "I", header[20:24])[0] & 0x0fffffff
+        self.packet_ctr = 0
+    ## DEF
+
+    def packets(self):
+        """Yield the (timestamp, data) of every packet in the capture"""
+        read = self.fd.read
+        record = self.record
+        while True:
+            header = read(16)
+            if len(header) < 16: break
+            ts_sec, ts_frac, caplen, length = record.unpack(header)
+            data = read(caplen)
+            if len(data) < caplen:
+                LOG.warn("The capture file ends with a truncated packet")
+                break
+            self.packet_ctr += 1
+            yield ts_sec + ts_frac * self.ts_scale, data
+        ## WHILE
+    ## DEF
+## CLASS
+
+def decodeTCP(linktype, data):
+    """
+        Return the (src_ip, src_port, dst_ip, dst_port, seq, flags, payload) of
+        the TCP segment in the given link-layer frame or None if it is not TCP
+    """
+    # Link Layer
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 14
+        ethertype = ETHERNET_TYPE.unpack_from(data, 12)[0]
+        while ethertype in ETHERTYPE_VLAN:
+            ethertype = ETHERNET_TYPE.unpack_from(data, offset + 2)[0]
+            offset += 4
+        ## WHILE
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset = 16
+        ethertype = ETHERNET_TYPE.unpack_from(data, 14)[0]
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        offset = 20
+        ethertype = ETHERNET_TYPE.unpack_from(data, 0)[0]
+    elif linktype == LINKTYPE_NULL:
+        offset = 4
+        family = NULL_FAMILY.unpack_from(data, 0)[0]
+        ethertype = ETHERTYPE_IPV4 if family == socket.AF_INET else ETHERTYPE_IPV6
+    elif linktype in [ LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6 ]:
+        offset = 0
+        ethertype = ETHERTYPE_IPV4 if (ord(data[0]) >> 4) == 4 else ETHERTYPE_IPV6
+    else:
+        raise Exception("Unsupported link-layer type %d" % linktype)
+
+    # Network Layer
+    if ethertype == ETHERTYPE_IPV4:
+        ver_ihl, tos, total_len, ident, frag, ttl, proto, csum, src, dst = IPV4_HEADER.unpack_from(data, offset)
+        # We do not reassemble IP fragments
+        if proto != IPPROTO_TCP or frag & 0x1fff or frag & 0x2000: return None
+        end = offset + total_len
+        offset += (ver_ihl & 0x0f) * 4
+        src_ip = socket.inet_ntoa(src)
+        dst_ip = socket.inet_ntoa(dst)
+    elif ethertype == ETHERTYPE_IPV6:
+        flow, payload_len, proto, hops, src, dst = IPV6_HEADER.unpack_from(data, offset)
+        # We do not follow extension headers
+        if proto != IPPROTO_TCP: return None
+        offset += 40
+        end = offset + payload_len
+        src_ip = "[%s]" % socket.inet_ntop(socket.AF_INET6, src)
+        dst_ip = "[%s]" % socket.inet_ntop(socket.AF_INET6, dst)
+    else:
+        return None
+
+    # Transport Layer
+    src_port, dst_port, seq, ack, data_offset, flags = TCP_HEADER.unpack_from(data, offset)
+    payload = data[offset + (data_offset >> 4) * 4:end]
+    return (src_ip, src_port, dst_ip, dst_port, seq, flags, payload)
+## DEF
+
+class TCPStream:
+    """Puts the segments of one direction of a TCP connection back in order"""
+
+    def __init__(self):
+        self.next_seq = None
+        # Seq -> Payload of the segments that arrived before the ones in front of them
+        self.pending = { }
+        self.gap_ctr = 0
+    ## DEF
+
+    def add(self, seq, flags, payload):
+        """Return the list of payloads that are now in order"""
+        if flags & TCP_SYN:
+            self.next_seq = (seq + 1) & 0xffffffff
+            return [ ]
+        if not payload:
+            return [ ]
+        if self.next_seq is None:
+            # We did not see the beginning of this connection
+            self.next_seq = seq
+
+        ret = [ ]
+        self.pending[seq] = payload
+        while self.pending:
+            found = False
+            for seq in self.pending.keys():
+                diff = (self.next_seq - seq) & 0xffffffff
+                if diff >= 0x80000000:
+                    continue # Still in the future
+                payload = self.pending.pop(seq)
+                # Drop whatever part of a retransmission that we already have
+                if diff < len(payload):
+                    ret.append(payload[diff:])
+                    self.next_seq = (self.next_seq + len(payload) - diff) & 0xffffffff
+                found = True
+            ## FOR
+            if not found: break
+        ## WHILE
+
+        if len(self.pending) > MAX_PENDING_SEGMENTS:
+            # Whatever we were waiting for is not in the capture, so skip ahead
+            # to the oldest segment that we have. The decoder has to resync
+            self.gap_ctr += 1
+            self.next_seq = min(self.pending.keys(), key=lambda x: (x - self.next_seq) & 0xffffffff)
+            ret.append(None)
+            ret.extend(self.add(self.next_seq, 0, self.pending.pop(self.next_seq)))
+        ## IF
+        return ret
+    ## DEF
+## CLASS
+
+class TCPReassembler:
+    """
+        Follows the TCP connections to a server port in a capture and yields their data in order.
+        Every event is a tuple (timestamp, ip_client, ip_server, from_client, data) where
+        data is a string with the next bytes of the stream, None if there is a gap in the
+        stream and from_client is None when the connection was closed.
+    """
+
+    def __init__(self, reader, port):
+        self.reader = reader
+        self.port = port
+        # (ip_client, ip_server) -> [ ClientStream, ServerStream ]
+        self.connections = { }
+        self.gap_ctr = 0
+    ## DEF
+
+    def events(self):
+        linktype = self.reader.linktype
+        port = self.port
+        for timestamp, data in self.reader.packets():
+            try:
+                segment = decodeTCP(linktype, data)
+            except struct.error:
+                # Truncated by the snapshot length
+                continue
+            if segment is None: continue
+            src_ip, src_port, dst_ip, dst_port, seq, flags, payload = segment
+            if dst_port == port:
+                from_client = True
+                ip_client = "%s:%d" % (src_ip, src_port)
+                ip_server = "%s:%d" % (dst_ip, dst_port)
+            elif src_port == port:
+                from_client = False
+                ip_client = "%s:%d" % (dst_ip, dst_port)
+                ip_server = "%s:%d" % (src_ip, src_port)
+            else:
+                continue
+
+            key = (ip_client, ip_server)
+            streams = self.connections.get(key, None)
+            if streams is None:
+                if flags & (TCP_FIN | TCP_RST) and not payload: continue
+                streams = [ TCPStream(), TCPStream() ]
+                self.connections[key] = streams
+            stream = streams[0 if from_client else 1]
+            for chunk in stream.add(seq, flags, payload):
+                yield (timestamp, ip_client, ip_server, from_client, chunk)
+
+            if flags & (TCP_FIN | TCP_RST):
+                self.gap_ctr += streams[0].gap_ctr + streams[1].gap_ctr
+                del self.connections[key]
+                yield (timestamp, ip_client, ip_server, None, None)
+        ## FOR
+        for streams in self.connections.itervalues():
+            self.gap_ctr += streams[0].gap_ctr + streams[1].gap_ctr
+    ## DEF
+## CLASS
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import os
+import re
+import sys
+import json
+import calendar
+import logging
+from collections import OrderedDict
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, ".."))
+
+# mongodb-d4
+from util import constants
+import parser
+import pcapparser
+
+LOG = logging.getLogger(__name__)
+
+# mongod does not log the address of the server itself
+DEFAULT_SERVER = "localhost:27017"
+
+# The id of the "Slow query" messages in the structured log, which are the
+# operations that took longer than slowms or that were sampled by the profiler
+LOG_ID_SLOW_QUERY = 51803
+# The id of the "Connection ended" messages
+LOG_ID_CONNECTION_ENDED = 22944
+
+# The operation types of the profiler and the legacy operations in the log
+PROFILE_OP_QUERY = "query"
+PROFILE_OP_INSERT = "insert"
+PROFILE_OP_UPDATE = "update"
+PROFILE_OP_REMOVE = "remove"
+PROFILE_OP_COMMAND = "command"
+# The Parser does not keep track of cursors
+PROFILE_OP_IGNORED = set([ "getmore", "killcursors" ])
+
+DATE_REGEX = re.compile("^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(\.\d+)?(Z|[+-]\d\d:?\d\d)?$")
+
+def decodeValue(value):
+    """
+        Convert a value of the extended JSON that mongod writes into the value that
+        the mongosniff Parser would have extracted for it. The object_pairs_hook
+        gives us OrderedDicts so that we know the name of each command, but the
+        rest of the code only handles plain dicts.
+    """
+    if isinstance(value, dict):
+        if len(value) <= 2 and value and value.keys()[0].startswith("$"):
+            key = value.keys()[0]
+            if key == "$oid":
+                return "ObjectId('%s')" % value[key]
+            elif key == "$date":
+                return "new Date(%d)" % parseDate(value[key])
+            elif key in [ "$numberInt", "$numberLong" ]:
+                return int(value[key])
+            elif key in [ "$numberDouble", "$numberDecimal" ]:
+                return float(value[key])
+            elif key == "$binary":
+                if isinstance(value[key], dict):
+                    return "BinData(%d, %s)" % (int(value[key]["subType"], 16), value[key]["base64"])
+                return "BinData(%d, %s)" % (int(value.get("$type", "0"), 16), value[key])
+            elif key == "$timestamp":
+                return "Timestamp %d|%d" % (value[key]["t"], value[key]["i"])
+            elif key == "$regularExpression":
+                return "/%s/" % value[key]["pattern"]
+            elif key == "$regex":
+                return "/%s/" % value[key]
+            elif key in [ "$minKey", "$maxKey", "$undefined" ]:
+                return key[1:]
+        ## IF
+        return dict([ (k, decodeValue(v)) for k, v in value.iteritems() ])
+    elif isinstance(value, list):
+        return map(decodeValue, value)
+    return value
+## DEF
+
+def parseDate(value):
+    """Return the number of milliseconds since the epoch for a $date value"""
+    if isinstance(value, dict):
+        return int(value["$numberLong"])
+    elif isinstance(value, (int, long, float)):
+        return int(value)
+    m = DATE_REGEX.match(value)
+    if not m:
+        raise ValueError("Invalid date '%s'" % value)
+    seconds = calendar.timegm(map(int, m.groups()[:6]))
+    millis = int(round(float(m.group(7)) * 1000)) if m.group(7) else 0
+    tz = m.group(8)
+    if tz and tz != "Z":
+        offset = int(tz[1:3]) * 3600 + int(tz[-2:]) * 60
+        seconds += -offset if tz[0] == "+" else offset
+    return seconds * 1000 + millis
+## DEF
+
+def getTimestamp(value):
+    """Return the seconds since the epoch for a date that went through decodeValue()"""
+    if isinstance(value, basestring) and value.startswith("new Date("):
+        return int(value[9:-1]) / 1000.0
+    return parseDate(value) / 1000.0
+## DEF
+
+## ==============================================
+## ProfileParser
+## ==============================================
+class ProfileParser(parser.Parser):
+    """
+        Extracts the sessions from mongod's structured JSON log (4.4+) or from an
+        export of the system.profile collection with one document per line.
+        The operations of the log are grouped into sessions by their connection
+        ('conn12'). The profiler does not record the connection, so we group its
+        operations by the client's address and logical session id instead.
+        Neither of them has the documents that the server returned.
+    """
+
+    def __init__(self, metadata_db, fd, server=DEFAULT_SERVER, skipSaltSearch=False):
+        parser.Parser.__init__(self, metadata_db, fd, skipSaltSearch)
+        self.server = server
+        # Neither the log nor the profiler have the request ids of the messages
+        self.next_id = 1
+        self.entry_ctr = 0
+        self.truncated_ctr = 0
+    ## DEF
+
+    def process(self):
+        """Read each line of the input and extract all of the sessions"""
+        line_ctr = 0
+        for line in self.fd:
+            line_ctr += 1
+            if self.op_skip and line_ctr < self.op_skip:
+                continue
+            line = line.strip()
+            if not line: continue
+
+            try:
+                self.processEntry(line)
+            except (ValueError, KeyError, TypeError) as err:
+                self.error_ctr += 1
+                msg = "Invalid entry on line %d: %s" % (line_ctr, err)
+                if self.stop_on_error: raise Exception(msg)
+                LOG.warn(msg)
+            except:
+                self.error_ctr += 1
+                LOG.error("Unexpected error when processing line %d" % line_ctr)
+                raise
+            finally:
+                # Checkpoint!
+                if self.save_checkpoints and self.isCheckpointDue():
+                    self.checkpoint()
+
+            if not self.sess_limit is None and self.sess_ctr >= self.sess_limit:
+                LOG.warn("Session Limit Reached. Halting processing [sess_limit=%d]", self.sess_limit)
+                break
+            elif not self.op_limit is None and self.op_ctr >= self.op_limit:
+                LOG.warn("Operation Limit Reached. Halting processing [op_limit=%d]", self.op_limit)
+                break
+        ## FOR
+
+        # Post Processing!
+        self.postProcess()
+
+        self.saveDirtySessions()
+
+        LOG.info("Completed processing %d lines with %d operations [errors=%d / skipped=%d / truncated=%d]", \
+                 line_ctr, self.entry_ctr, self.error_ctr, self.skip_ctr, self.truncated_ctr)
+    ## DEF
+
+    def processEntry(self, line):
+        """Store the operation in the given line of the log or the profiler export"""
+        entry = json.loads(line, object_pairs_hook=OrderedDict)
+        if "attr" in entry:
+            # Structured Log
+            attr = entry["attr"]
+            if entry.get("id", None) == LOG_ID_CONNECTION_ENDED:
+                self.closeSession(entry["ctx"], getTimestamp(decodeValue(entry["t"])))
+                return
+            elif entry.get("id", None) != LOG_ID_SLOW_QUERY or not "command" in attr:
+                return
+            ip_client = entry["ctx"]
+            op_type = attr.get("type", PROFILE_OP_COMMAND)
+            resp_time = getTimestamp(decodeValue(entry["t"]))
+            duration = attr.get("durationMillis", 0)
+            resp_size = attr.get("reslen", 0)
+        else:
+            # system.profile
+            attr = entry
+            ip_client = entry.get("client", "")
+            if "lsid" in entry:
+                ip_client += "/" + str(decodeValue(entry["lsid"]).get("id", ""))
+            op_type = entry["op"]
+            resp_time = getTimestamp(decodeValue(entry["ts"]))
+            duration = entry.get("millis", 0)
+            resp_size = entry.get("responseLength", 0)
+        ## IF
+
+        if op_type in PROFILE_OP_IGNORED:
+            self.skip_ctr += 1
+            return
+        command = attr.get("command", attr.get("query", None))
+        if not isinstance(command, dict) or "$truncated" in command:
+            # mongod cuts off large commands in the log
+            self.truncated_ctr += 1
+            return
+        self.entry_ctr += 1
+        name, body = self.getCommand(op_type, attr, command)
+        body.setdefault("$db", attr["ns"].split(".")[0])
+
+        header = {
+            'timestamp': resp_time - duration / 1000.0,
+            'ip1':       ip_client,
+            'arrow':     "-->>",
+            'ip2':       self.server,
+            'size':      len(line),
+            'reply_id':  None,
+        }
+        ops = pcapparser.translateCommand(header, name, body)
+        for op_header, content in ops:
+            # Every statement of a bulk write gets its own id so that the reply
+            # only goes to the last one, just like in the wire protocol
+            op_header['expects_reply'] = op_header is ops[-1][0]
+            op_header['query_id'] = self.next_id
+            op_header['magic_id'] = "id:%x" % self.next_id
+            self.next_id += 1
+            self.storeMessage(op_header, content)
+        ## FOR
+        if not ops: return
+
+        reply = {
+            'timestamp':  resp_time,
+            'ip1':        self.server,
+            'arrow':      "<<--",
+            'ip2':        ip_client,
+            'collection': ops[-1][0]['collection'],
+            'size':       resp_size,
+            'query_id':   self.next_id,
+            'magic_id':   "id:%x" % self.next_id,
+            'reply_id':   ops[-1][0]['query_id'],
+            'type':       constants.OP_TYPE_REPLY,
+        }
+        self.next_id += 1
+        self.storeMessage(reply, [ ])
+    ## DEF
+
+    def getCommand(self, op_type, attr, command):
+        """
+            Return the name and the body of the command that performed the operation.
+            The profiler and the log show the legacy operations of old drivers without
+            a command, so we turn them into the command that a new driver would send
+        """
+        name = command.keys()[0] if command else None
+        col_name = attr["ns"].split(".", 1)[-1]
+        if op_type == PROFILE_OP_UPDATE and name != "update":
+            stmt = {
+                "q":      decodeValue(command.get("q", command)),
+                "u":      decodeValue(command.get("u", attr.get("updateobj", { }))),
+                "upsert": command.get("upsert", False),
+                "multi":  command.get("multi", False),
+            }
+            return "update", { "update": col_name, "updates": [ stmt ] }
+        elif op_type == PROFILE_OP_REMOVE and name != "delete":
+            return "delete", { "delete": col_name, "deletes": [ { "q": decodeValue(command.get("q", command)) } ] }
+        elif op_type == PROFILE_OP_INSERT and name != "insert":
+            return "insert", { "insert": col_name, "documents": [ decodeValue(command) ] }
+        elif op_type == PROFILE_OP_QUERY and name != "find":
+            body = { "find": col_name, "filter": decodeValue(command.get("$query", command)) }
+            if "$orderby" in command:
+                body["sort"] = decodeValue(command["$orderby"])
+            if attr.get("ntoreturn", 0):
+                body["limit"] = attr["ntoreturn"]
+            if attr.get("ntoskip", 0):
+                body["skip"] = attr["ntoskip"]
+            return "find", body
+        return name, decodeValue(command)
+    ## DEF
+## CLASS
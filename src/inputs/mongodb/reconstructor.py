@@ -24,9 +24,14 @@
 
 import os
 import sys
+import time
+import Queue
 import logging
+import threading
 from pprint import pformat
 
+from pymongo.errors import BulkWriteError
+
 # Third-Party Dependencies
 basedir = os.path.realpath(os.path.dirname(__file__))
 sys.path.append(os.path.join(basedir, "../../libs"))
@@ -39,9 +44,16 @@ from catalog import Collection
 from workload import Session
 from util import Histogram
 from util import constants
+from memorydataset import MemoryDataset, WRITE_SAVE, WRITE_REMOVE, WRITE_UPDATE, isModifier
 
 LOG = logging.getLogger(__name__)
 
+# The number of writes to a collection that we send in one bulk operation
+DEFAULT_BATCH_SIZE = 1000
+# The number of batches that can wait for each worker thread before
+# we stop reading more operations from the workload
+MAX_QUEUED_BATCHES = 4
+
 # Original Code: Emanuel Buzek
 class Reconstructor:
     """MongoDB Database Reconstructor"""
@@ -52,47 +64,84 @@ class Reconstructor:
         self.metadata_db = metadata_db
         self.dataset_db = dataset_db
 
+        # The writes to each collection are sent in ordered bulk operations
+        # of this many writes. The worker threads execute the bulk operations of
+        # different collections concurrently, while the bulk operations of the
+        # same collection always go to the same worker so that they stay in order.
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.num_workers = 1
+        # If this is true, then we replay the workload in memory and only
+        # write the final documents of each collection to the dataset database
+        self.in_memory = False
+
+        # CollectionName -> List of writes that we have not sent yet
+        self.batches = { }
+        # CollectionName -> Index of the worker that executes its bulk operations
+        self.col_workers = { }
+        self.queues = [ ]
+        self.workers = [ ]
+        self.worker_errors = [ ]
+        self.memory = None
+
         self.op_ctr = 0
         self.sess_ctr = 0
         self.skip_ctr = 0
         self.fix_ctr = 0
+        self.write_ctr = 0
+        self.bulk_ctr = 0
     ## DEF
 
     def process(self):
         """Iterates through all operations of all sessions and recreates the dataset..."""
         cnt = self.metadata_db.Session.fetch().count()
         LOG.info("Found %d sessions in the workload collection. Processing... ", cnt)
+        start = time.time()
 
-        # HACK: Skip any operations with invalid collection names
-        #       We will go back later and fix these up
-        toIgnore = [constants.INVALID_COLLECTION_MARKER] + constants.IGNORED_COLLECTIONS
-        LOG.info("Reconstructing dataset from %d Sessions" % self.metadata_db.Session.fetch().count())
-        for session in self.metadata_db.Session.fetch():
-            self.sess_ctr += 1
-            for op in session["operations"]:
-                self.op_ctr += 1
-                if op["collection"] in toIgnore:
-                    self.skip_ctr += 1
-                    continue
-                
-                if op["type"] == constants.OP_TYPE_QUERY:
-                    ret = self.processQuery(op)
-                elif op["type"] == constants.OP_TYPE_DELETE:
-                    ret = self.processDelete(op)
-                elif op["type"] == constants.OP_TYPE_UPDATE:
-                    ret = self.processUpdate(op)
-                elif op["type"] in [constants.OP_TYPE_INSERT, constants.OP_TYPE_ISERT]:
-                    ret = self.processInsert(op)
-                else:
-                    LOG.warn("Unknown operation type: %s", op["type"])
+        if self.in_memory:
+            LOG.info("Replaying the workload in memory")
+            self.memory = MemoryDataset()
+        elif self.num_workers > 1:
+            self.startWorkers()
 
-                if not ret: self.skip_ctr += 1
-            ## FOR (operations)
-        ## FOR (sessions)
-        LOG.info("Processed %d sessions with %d operations [skipped=%d]",
-                 self.sess_ctr, self.op_ctr, self.skip_ctr)
+        try:
+            # HACK: Skip any operations with invalid collection names
+            #       We will go back later and fix these up
+            toIgnore = [constants.INVALID_COLLECTION_MARKER] + constants.IGNORED_COLLECTIONS
+            LOG.info("Reconstructing dataset from %d Sessions" % cnt)
+            for session in self.metadata_db.Session.fetch():
+                self.sess_ctr += 1
+                for op in session["operations"]:
+                    self.op_ctr += 1
+                    if op["collection"] in toIgnore:
+                        self.skip_ctr += 1
+                        continue
+
+                    ret = False
+                    if op["type"] == constants.OP_TYPE_QUERY:
+                        ret = self.processQuery(op)
+                    elif op["type"] == constants.OP_TYPE_DELETE:
+                        ret = self.processDelete(op)
+                    elif op["type"] == constants.OP_TYPE_UPDATE:
+                        ret = self.processUpdate(op)
+                    elif op["type"] in [constants.OP_TYPE_INSERT, constants.OP_TYPE_ISERT]:
+                        ret = self.processInsert(op)
+                    else:
+                        LOG.warn("Unknown operation type: %s", op["type"])
+
+                    if not ret: self.skip_ctr += 1
+                ## FOR (operations)
+            ## FOR (sessions)
+            for col_name in self.batches.keys():
+                self.flushBatch(col_name)
+
+            if self.in_memory:
+                self.saveMemoryDataset()
+        finally:
+            self.stopWorkers()
+        LOG.info("Processed %d sessions with %d operations [skipped=%d / writes=%d / bulkOps=%d] in %.1f seconds",
+                 self.sess_ctr, self.op_ctr, self.skip_ctr, self.write_ctr, self.bulk_ctr, time.time() - start)
     ## DEF
-    
+
     def getSessionCount(self):
         """Return the number of sessions examined"""
         return self.sess_ctr
@@ -123,12 +172,140 @@ class Reconstructor:
         return counts
     ## DEF
 
+    ## -----------------------------------------------------------------------
+    ## BATCHES
+    ## -----------------------------------------------------------------------
+
+    def addWrite(self, col_name, write):
+        """Queue a write to the given collection and send the batch once it is full"""
+        batch = self.batches.setdefault(col_name, [ ])
+        batch.append(write)
+        self.write_ctr += 1
+        if len(batch) >= self.batch_size:
+            self.flushBatch(col_name)
+    ## DEF
+
+    def flushBatch(self, col_name):
+        batch = self.batches.pop(col_name, None)
+        if not batch: return
+        if self.in_memory:
+            self.memory.apply(col_name, batch)
+        elif self.queues:
+            if not col_name in self.col_workers:
+                self.col_workers[col_name] = len(self.col_workers) % len(self.queues)
+            self.queues[self.col_workers[col_name]].put((col_name, batch))
+            self.checkWorkers()
+        else:
+            self.executeBatch(col_name, batch)
+    ## DEF
+
+    def executeBatch(self, col_name, batch):
+        """Send the writes to the collection to the server in a single ordered bulk operation"""
+        bulk = self.dataset_db[col_name].initialize_ordered_bulk_op()
+        for write in batch:
+            if write[0] == WRITE_SAVE:
+                doc = write[1]
+                if "_id" in doc:
+                    bulk.find({ "_id": doc["_id"] }).upsert().replace_one(doc)
+                else:
+                    bulk.insert(doc)
+            elif write[0] == WRITE_REMOVE:
+                bulk.find(write[1]).remove()
+            elif write[0] == WRITE_UPDATE:
+                query, update, upsert, multi = write[1:]
+                view = bulk.find(query)
+                if upsert: view = view.upsert()
+                if not isModifier(update):
+                    view.replace_one(update)
+                elif multi:
+                    view.update(update)
+                else:
+                    view.update_one(update)
+            ## IF
+        ## FOR
+        try:
+            bulk.execute()
+        except BulkWriteError as err:
+            LOG.error("Failed to write %d operations to collection '%s':\n%s", \
+                      len(batch), col_name, pformat(err.details["writeErrors"][:10]))
+            raise
+        self.bulk_ctr += 1
+    ## DEF
+
+    def saveMemoryDataset(self):
+        """Write the documents that we reconstructed in memory to the dataset database"""
+        memory = self.memory
+        self.in_memory = False
+        if self.num_workers > 1:
+            self.startWorkers()
+        num_docs = 0
+        for col_name in memory.collection_names():
+            for doc in memory.getDocuments(col_name):
+                self.addWrite(col_name, (WRITE_SAVE, doc))
+                num_docs += 1
+            self.flushBatch(col_name)
+        ## FOR
+        self.in_memory = True
+        LOG.info("Wrote %d documents in %d collections to the dataset database", \
+                 num_docs, len(memory.collection_names()))
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## WORKER THREADS
+    ## -----------------------------------------------------------------------
+
+    def startWorkers(self):
+        LOG.info("Starting %d threads to write to the dataset database", self.num_workers)
+        for i in xrange(self.num_workers):
+            queue = Queue.Queue(MAX_QUEUED_BATCHES)
+            worker = threading.Thread(target=self.runWorker, args=(queue,), name="Reconstructor-%d" % i)
+            worker.daemon = True
+            worker.start()
+            self.queues.append(queue)
+            self.workers.append(worker)
+        ## FOR
+    ## DEF
+
+    def runWorker(self, queue):
+        while True:
+            item = queue.get()
+            if item is None: break
+            # Keep on taking batches after an error so that the main thread never blocks
+            if self.worker_errors: continue
+            try:
+                self.executeBatch(*item)
+            except Exception as err:
+                self.worker_errors.append(err)
+        ## WHILE
+    ## DEF
+
+    def checkWorkers(self):
+        if self.worker_errors:
+            raise self.worker_errors[0]
+    ## DEF
+
+    def stopWorkers(self):
+        """Wait for the worker threads to finish all of their batches"""
+        for queue in self.queues:
+            queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.queues = [ ]
+        self.workers = [ ]
+        self.col_workers = { }
+        self.checkWorkers()
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## OPERATIONS
+    ## -----------------------------------------------------------------------
+
     def processInsert(self, op):
         payload = op["query_content"]
         col = op["collection"]
         if self.debug: LOG.debug("Inserting %d documents into collection %s", len(payload), col)
         for doc in payload:
-            self.dataset_db[col].save(doc)
+            self.addWrite(col, (WRITE_SAVE, doc))
         return True
     ## DEF
 
@@ -137,7 +314,7 @@ class Reconstructor:
         col = op["collection"]
         if self.debug: LOG.debug("Deleting documents from collection %s..", col)
         for doc in payload:
-            self.dataset_db[col].remove(doc)
+            self.addWrite(col, (WRITE_REMOVE, doc))
         return True
     ## DEF
 
@@ -150,7 +327,7 @@ class Reconstructor:
             LOG.warn("Update operation payload is expected to have exactly 2 entries. payload: %s" % payload)
             return False
             
-        self.dataset_db[col].update(payload[0], payload[1], op["update_upsert"], op["update_multi"])
+        self.addWrite(col, (WRITE_UPDATE, payload[0], payload[1], op["update_upsert"], op["update_multi"]))
         return True
     ## DEF
 
@@ -175,13 +352,11 @@ class Reconstructor:
             # Note that this is an upsert operation: insert if not present
             for doc in op["resp_content"]:
                 #print "doc:", doc
-                self.dataset_db[col].update(doc, doc, True, False)
+                self.addWrite(col, (WRITE_UPDATE, doc, doc, True, False))
             
             return True
         ## IF
         
         return False
     ## DEF
-
-    
-## CLASS
\ No newline at end of file
+## CLASS
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import re
+import json
+
+## ==============================================
+## Relaxed JSON
+## ==============================================
+## mongosniff prints the documents in a message using a relaxed object
+## notation where keys and most string values are not quoted:
+##
+##   { _id: ObjectId('4f32e322...'), address: { street: 5397.../6 }, ok: 1.0 }
+##
+## This is a valid YAML flow mapping, but the YAML parser is very slow. Most
+## lines only need their bare words quoted to become strict JSON, which the
+## json module can parse an order of magnitude faster. Anything that we are
+## not sure would be interpreted the same way by YAML is rejected so that the
+## caller can fall back to the YAML parser for that line.
+
+TOKEN_REGEX = re.compile(r"""
+      (?P<string>"(?:[^"\\]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*")
+    | (?P<quoted>'(?:[^']|'')*')
+    | (?P<oid>ObjectId\('[0-9a-fA-F]*'\))
+    | (?P<bare>-?[\w$][\w$./+\-]*)(?=[\s,}\]]|:\s|$)
+    | (?P<punct>[{}\[\],:])
+    | (?P<space>\s+)
+    | (?P<error>.)
+""", re.VERBOSE)
+
+# The subset of numbers that YAML and JSON agree on
+NUMBER_REGEX = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+(?:[eE][-+][0-9]+)?)?$")
+
+# Plain scalars that YAML turns into booleans or nulls
+YAML_CONSTANTS = { }
+for words, value in [ ("yes Yes YES true True TRUE on On ON", "true"),
+                      ("no No NO false False FALSE off Off OFF", "false"),
+                      ("null Null NULL", "null") ]:
+    for word in words.split():
+        YAML_CONSTANTS[word] = value
+## FOR
+
+def toJSON(line):
+    """
+        Rewrite a line of mongosniff content into strict JSON.
+        Raises a ValueError if the line uses any notation that we do not
+        know how to translate exactly the same way that YAML would.
+    """
+    output = [ ]
+    for m in TOKEN_REGEX.finditer(line):
+        kind = m.lastgroup
+        token = m.group(kind)
+        if kind == "bare":
+            if token in YAML_CONSTANTS:
+                token = YAML_CONSTANTS[token]
+            elif "/" in token or not (token[0] == "-" or token[0].isdigit()):
+                # No YAML type can contain a slash, and anything else that
+                # does not start like a number is just a string
+                token = '"%s"' % token
+            elif not NUMBER_REGEX.match(token):
+                # Octal, hex, sexagesimal, dates, ...
+                raise ValueError("Unsupported scalar '%s'" % token)
+        elif kind == "oid":
+            token = '"%s"' % token
+        elif kind == "quoted":
+            token = json.dumps(token[1:-1].replace("''", "'"))
+        elif kind == "space":
+            continue
+        elif kind == "error":
+            raise ValueError("Unexpected character '%s' at position %d" % (token, m.start()))
+        output.append(token)
+    ## FOR
+    return "".join(output)
+## DEF
+
+def loads(line):
+    """
+        Parse a line of mongosniff content into a dict.
+        Raises a ValueError if the line cannot be parsed as relaxed JSON.
+    """
+    return json.loads(toJSON(line))
+## DEF
@@ -0,0 +1,777 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+from __future__ import division
+
+import os
+import sys
+import json
+import time
+import math
+import heapq
+import random
+import socket
+import struct
+import logging
+from collections import OrderedDict
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../libs"))
+sys.path.append(os.path.join(basedir, "../.."))
+
+import argparse
+import bson
+
+# mongodb-d4
+import util
+from util import constants
+from workload.synthetic import ZipfGenerator
+
+LOG = logging.getLogger(__name__)
+
+OUTPUT_MONGOSNIFF = "mongosniff"
+OUTPUT_SESSIONS = "sessions"
+OUTPUT_PCAP = "pcap"
+OUTPUT_FORMATS = [ OUTPUT_MONGOSNIFF, OUTPUT_SESSIONS, OUTPUT_PCAP ]
+
+DEFAULT_DATABASE = "synthetic"
+DEFAULT_SERVER = "10.0.0.1:27017"
+DEFAULT_START_TIME = 1335000000.0
+
+# The default share of the query templates of each operation type
+DEFAULT_OP_MIX = OrderedDict([
+    (constants.OP_TYPE_QUERY,  0.70),
+    (constants.OP_TYPE_UPDATE, 0.15),
+    (constants.OP_TYPE_INSERT, 0.10),
+    (constants.OP_TYPE_DELETE, 0.05),
+])
+# Short names for the operation types on the command line
+OP_TYPE_NAMES = {
+    "query":  constants.OP_TYPE_QUERY,
+    "update": constants.OP_TYPE_UPDATE,
+    "insert": constants.OP_TYPE_INSERT,
+    "delete": constants.OP_TYPE_DELETE,
+}
+
+# We only compute the Zipfian distribution over this many buckets
+# of keys so that the memory does not grow with the number of documents
+ZIPF_BUCKETS = 10000
+# Prime number used to spread the hot keys across the whole key space
+KEY_SPREAD = 7919
+
+# The probability that a query template looks up the documents by their id
+ID_PREDICATE_RATIO = 0.5
+# The probability that a query template looks up the documents by their foreign key
+FK_PREDICATE_RATIO = 0.25
+# The probability that a query template on the id is a range query
+RANGE_PREDICATE_RATIO = 0.1
+# The probability that a query template has a projection
+PROJECTION_RATIO = 0.2
+# The probability that a query on a parent collection is followed by
+# a query for the child documents that reference it
+JOIN_RATIO = 0.5
+# The number of documents that range queries scan
+RANGE_SIZE = 10
+# The maximum number of documents that a query on a non-key field returns
+RESULT_LIMIT = 10
+# Every third field is a string instead of an integer
+STRING_FIELD_INTERVAL = 3
+
+# Average time between two operations in a session (seconds)
+THINK_TIME = 0.05
+# Time between an operation and its response (seconds)
+RESPONSE_TIME = 0.0005
+# Size of the message header in a mongosniff trace (bytes)
+MESSAGE_HEADER_SIZE = 16
+# The largest TCP payload in a packet of a libpcap trace (bytes)
+PCAP_MSS = 1448
+
+'''
+Synthetic Trace Generator
+
+Generates workload traces of any size for scaling tests without needing
+production traces. The trace is either written as mongosniff text that can be
+fed to 'd4.py --mongo', as a libpcap capture of the wire protocol that can
+be fed to 'd4.py --mongo --mongo-pcap', or as sessions in the same format that the mongosniff
+parser stores in the metadata database (one JSON document per line that can
+be loaded with 'mongoimport --collection %s').
+
+The generator only keeps the sessions that are currently active in memory,
+so it can write traces with millions of operations.
+''' % constants.COLLECTION_WORKLOAD
+
+## ==============================================
+## SyntheticSchema
+## ==============================================
+class SyntheticSchema:
+    """
+        The collections of the synthetic database. Every collection has an '_id'
+        field and collections can reference the id of an earlier collection
+        through a foreign key field '<parent>_id'. Each parent document has
+        'fanout' child documents. The remaining fields are spread over sub-documents
+        that are nested 'nesting' levels deep.
+
+        The value of a field is computed from the document id, so we never have
+        to store the documents and we can find all of the documents that match
+        a value without scanning them.
+    """
+
+    def __init__(self, num_collections, num_fields, nesting, fk_ratio, fanout, doc_count, rng):
+        assert num_collections > 0
+        assert num_fields > 0
+        assert fanout > 0
+        self.doc_count = doc_count
+        self.fanout = fanout
+        self.col_names = [ "col%02d" % i for i in xrange(num_collections) ]
+        # ColName -> Parent ColName
+        self.parents = { }
+        # ColName -> List of child ColNames
+        self.children = dict([ (col_name, [ ]) for col_name in self.col_names ])
+        # ColName -> List of (FieldPath, Cardinality) of the fields that are not keys
+        self.fields = { }
+        # ColName -> List of (ParentNames, FieldName) of the fields that are not keys
+        self.layouts = { }
+
+        for i in xrange(num_collections):
+            col_name = self.col_names[i]
+            parent = None
+            if i > 0 and rng.random() < fk_ratio:
+                parent = self.col_names[rng.randint(0, i-1)]
+                self.children[parent].append(col_name)
+            self.parents[col_name] = parent
+
+            self.fields[col_name] = [ ]
+            for j in xrange(num_fields):
+                # Split the fields evenly over the nesting levels
+                level = (j * (nesting+1)) // num_fields
+                path = ".".join([ "n%d" % k for k in xrange(1, level+1) ] + [ "f%02d" % j ])
+                # Most fields have a small number of distinct values
+                cardinality = int(10 ** rng.uniform(1, math.log10(max(10, doc_count))))
+                self.fields[col_name].append((path, cardinality))
+            ## FOR
+            self.layouts[col_name] = [ (tuple(path.split(".")[:-1]), path.split(".")[-1]) \
+                                       for path, cardinality in self.fields[col_name] ]
+        ## FOR
+    ## DEF
+
+    def getForeignKey(self, col_name):
+        """Return the name of the foreign key field of the given collection (None if it does not have one)"""
+        parent = self.parents[col_name]
+        return parent + "_id" if parent else None
+    ## DEF
+
+    def getValue(self, col_name, path, doc_id):
+        if path == "_id":
+            return doc_id
+        elif path == self.getForeignKey(col_name):
+            return doc_id // self.fanout
+        for i in xrange(len(self.fields[col_name])):
+            if self.fields[col_name][i][0] == path:
+                return self.__fieldValue__(i, doc_id % self.fields[col_name][i][1])
+        raise Exception("Unexpected field '%s' in collection '%s'" % (path, col_name))
+    ## DEF
+
+    def findDocuments(self, col_name, path, value, limit):
+        """Return the ids of the documents whose field has the given value"""
+        if path == "_id":
+            return [ value ] if value < self.doc_count else [ ]
+        elif path == self.getForeignKey(col_name):
+            return range(value * self.fanout, min(self.doc_count, (value+1) * self.fanout))[:limit]
+        for i in xrange(len(self.fields[col_name])):
+            f_path, cardinality = self.fields[col_name][i]
+            if f_path == path:
+                if i % STRING_FIELD_INTERVAL == STRING_FIELD_INTERVAL-1:
+                    value = int(value[1:])
+                return range(value, self.doc_count, cardinality)[:limit]
+        ## FOR
+        raise Exception("Unexpected field '%s' in collection '%s'" % (path, col_name))
+    ## DEF
+
+    def getDocument(self, col_name, doc_id, projection=None):
+        """Return the document with the given id. The projection is a list of field paths."""
+        doc = OrderedDict()
+        doc["_id"] = doc_id
+        fk = self.getForeignKey(col_name)
+        if fk and (projection is None or fk in projection):
+            doc[fk] = doc_id // self.fanout
+        fields = self.fields[col_name]
+        layout = self.layouts[col_name]
+        for i in xrange(len(fields)):
+            path, cardinality = fields[i]
+            if projection is not None and not path in projection: continue
+            parents, name = layout[i]
+            subdoc = doc
+            for part in parents:
+                if not part in subdoc: subdoc[part] = OrderedDict()
+                subdoc = subdoc[part]
+            subdoc[name] = self.__fieldValue__(i, doc_id % cardinality)
+        ## FOR
+        return doc
+    ## DEF
+
+    def __fieldValue__(self, field_idx, value):
+        if field_idx % STRING_FIELD_INTERVAL == STRING_FIELD_INTERVAL-1:
+            return "s%d" % value
+        return value
+    ## DEF
+## CLASS
+
+## ==============================================
+## SyntheticOperation
+## ==============================================
+class SyntheticOperation:
+    """A single operation of a synthetic session and the documents that it returns"""
+
+    def __init__(self, col_name, op_type, timestamp):
+        self.collection = col_name
+        self.type = op_type
+        self.query_time = timestamp
+        self.resp_time = timestamp + RESPONSE_TIME
+        self.query_id = None
+        self.resp_id = None
+        # The query predicate of queries, updates and deletes
+        self.query = None
+        # The modifier of updates
+        self.update = None
+        # The inserted documents for inserts, the returned documents for queries
+        self.documents = [ ]
+        # List of field paths
+        self.projection = None
+        self.limit = 0
+    ## DEF
+## CLASS
+
+class SyntheticSession:
+    def __init__(self, session_id, ip_client, start_time, num_ops):
+        self.session_id = session_id
+        self.ip_client = ip_client
+        self.start_time = start_time
+        self.next_time = start_time
+        self.remaining = num_ops
+        # (Template, Value) of the operations that have to be executed next
+        # (e.g., a query on a child collection)
+        self.pending = [ ]
+    ## DEF
+## CLASS
+
+## ==============================================
+## TraceGenerator
+## ==============================================
+class TraceGenerator:
+    """
+        Generates the operations of a synthetic workload in timestamp order.
+        The sessions arrive evenly over the given time span and the query templates
+        and the keys that they access are picked with a Zipfian distribution.
+    """
+
+    def __init__(self, num_collections=4, num_fields=8, nesting=1, fk_ratio=1.0, fanout=4, \
+                 num_templates=20, op_mix=None, skew=1.0, doc_count=100000, num_sessions=1000, \
+                 ops_per_session=10, duration=3600.0, start_time=DEFAULT_START_TIME, \
+                 database=DEFAULT_DATABASE, seed=0):
+        self.num_templates = num_templates
+        self.op_mix = op_mix if op_mix else DEFAULT_OP_MIX
+        self.skew = skew
+        self.doc_count = doc_count
+        self.num_sessions = num_sessions
+        self.ops_per_session = ops_per_session
+        self.duration = duration
+        self.start_time = start_time
+        self.database = database
+        self.rng = random.Random(seed)
+
+        self.schema = SyntheticSchema(num_collections, num_fields, nesting, fk_ratio, fanout, doc_count, self.rng)
+        self.templates = [ ]
+        self.__generateTemplates__()
+        self.template_zipf = ZipfGenerator(len(self.templates), skew, self.rng)
+        self.key_zipf = ZipfGenerator(min(ZIPF_BUCKETS, doc_count), skew, self.rng)
+        # ColName -> Next id of an inserted document
+        self.next_ids = dict([ (col_name, doc_count) for col_name in self.schema.col_names ])
+        self.next_msg_id = 1
+        self.op_ctr = 0
+    ## DEF
+
+    def __generateTemplates__(self):
+        col_zipf = ZipfGenerator(len(self.schema.col_names), self.skew, self.rng)
+        op_types = self.op_mix.keys()
+        total = sum(self.op_mix.itervalues())
+        for i in xrange(self.num_templates):
+            col_name = self.schema.col_names[col_zipf.next()]
+            point = self.rng.random() * total
+            for op_type in op_types:
+                point -= self.op_mix[op_type]
+                if point < 0: break
+            ## FOR
+            template = { "collection": col_name, "type": op_type, "path": "_id", "range": False, \
+                         "projection": None, "join": None }
+
+            fk = self.schema.getForeignKey(col_name)
+            if op_type == constants.OP_TYPE_QUERY:
+                point = self.rng.random()
+                if point < ID_PREDICATE_RATIO:
+                    template["range"] = self.rng.random() < RANGE_PREDICATE_RATIO
+                elif fk and point < ID_PREDICATE_RATIO + FK_PREDICATE_RATIO:
+                    template["path"] = fk
+                else:
+                    template["path"] = self.rng.choice(self.schema.fields[col_name])[0]
+                if self.rng.random() < PROJECTION_RATIO:
+                    fields = [ x[0] for x in self.schema.fields[col_name] ]
+                    template["projection"] = sorted(self.rng.sample(fields, self.rng.randint(1, len(fields))))
+                # Follow up lookups of a single parent document with a query on its children
+                if template["path"] == "_id" and not template["range"] and \
+                   self.schema.children[col_name] and self.rng.random() < JOIN_RATIO:
+                    template["join"] = self.rng.choice(self.schema.children[col_name])
+            elif op_type == constants.OP_TYPE_UPDATE:
+                template["update"] = self.rng.choice(self.schema.fields[col_name])[0]
+            self.templates.append(template)
+        ## FOR
+    ## DEF
+
+    def __nextKey__(self, col_name):
+        # Pick a Zipfian bucket and then a random key inside of it
+        width = max(1, self.doc_count // ZIPF_BUCKETS)
+        key = self.key_zipf.next() * width + self.rng.randint(0, width-1)
+        return (key * KEY_SPREAD) % self.doc_count
+    ## DEF
+
+    def __nextMsgId__(self):
+        msg_id = self.next_msg_id
+        self.next_msg_id += 1
+        return msg_id
+    ## DEF
+
+    def __createOperation__(self, template, timestamp, value=None):
+        schema = self.schema
+        col_name = template["collection"]
+        op = SyntheticOperation(col_name, template["type"], timestamp)
+        op.query_id = self.__nextMsgId__()
+        path = template["path"]
+
+        if op.type == constants.OP_TYPE_INSERT:
+            doc_id = self.next_ids[col_name]
+            self.next_ids[col_name] += 1
+            op.documents = [ schema.getDocument(col_name, doc_id) ]
+            return op
+        ## IF
+
+        if value is None:
+            doc_id = self.__nextKey__(col_name)
+            value = schema.getValue(col_name, path, doc_id)
+        if template["range"]:
+            op.query = { path: OrderedDict([ ("$gte", value), ("$lt", value + RANGE_SIZE) ]) }
+        else:
+            op.query = { path: value }
+
+        if op.type == constants.OP_TYPE_QUERY:
+            op.resp_id = self.__nextMsgId__()
+            op.projection = template["projection"]
+            if template["range"]:
+                doc_ids = range(value, min(self.doc_count, value + RANGE_SIZE))
+                op.limit = RANGE_SIZE
+            else:
+                doc_ids = schema.findDocuments(col_name, path, value, RESULT_LIMIT)
+                op.limit = -1 if path == "_id" else RESULT_LIMIT
+            op.documents = [ schema.getDocument(col_name, x, op.projection) for x in doc_ids ]
+        elif op.type == constants.OP_TYPE_UPDATE:
+            # Set the field to the value that it already has so that the
+            # documents in the responses always stay the same
+            op.update = { "$set": { template["update"]: schema.getValue(col_name, template["update"], value) } }
+        return op
+    ## DEF
+
+    def __nextOperation__(self, sess):
+        if sess.pending:
+            template, value = sess.pending.pop(0)
+            return self.__createOperation__(template, sess.next_time, value)
+        template = self.templates[self.template_zipf.next()]
+        op = self.__createOperation__(template, sess.next_time)
+        # The follow-up query counts towards the operations of the session
+        if template["join"] and op.documents and sess.remaining > 1:
+            child = template["join"]
+            join_template = { "collection": child, "type": constants.OP_TYPE_QUERY, \
+                              "path": self.schema.getForeignKey(child), "range": False, \
+                              "projection": None, "join": None }
+            sess.pending.append((join_template, op.documents[0]["_id"]))
+        ## IF
+        return op
+    ## DEF
+
+    def getClientAddress(self, session_id):
+        # The clients use 10.1.0.0 and up so that they never clash with the server
+        return "10.%d.%d.%d:%d" % (1 + ((session_id >> 16) & 127), (session_id >> 8) & 255, session_id & 255, \
+                                   30000 + (session_id >> 23))
+    ## DEF
+
+    def generate(self):
+        """
+            Yields (SyntheticSession, SyntheticOperation) tuples in timestamp order.
+            The session's 'remaining' counter is zero for its last operation.
+        """
+        interval = self.duration / self.num_sessions if self.num_sessions else 0.0
+        next_session = 0
+        active = [ ]
+        while active or next_session < self.num_sessions:
+            # Start all of the sessions that begin before the next operation
+            while next_session < self.num_sessions and \
+                  (not active or self.start_time + next_session * interval <= active[0][0]):
+                start = self.start_time + (next_session + self.rng.random()) * interval
+                sess = SyntheticSession(constants.INITIAL_SESSION_ID + next_session, \
+                                        self.getClientAddress(next_session), start, self.ops_per_session)
+                heapq.heappush(active, (start, sess.session_id, sess))
+                next_session += 1
+            ## WHILE
+            if not active: break
+
+            timestamp, session_id, sess = heapq.heappop(active)
+            op = self.__nextOperation__(sess)
+            sess.remaining -= 1
+            self.op_ctr += 1
+            if sess.remaining > 0:
+                sess.next_time = op.resp_time + self.rng.expovariate(1.0 / THINK_TIME)
+                heapq.heappush(active, (sess.next_time, session_id, sess))
+            yield sess, op
+        ## WHILE
+    ## DEF
+## CLASS
+
+## ==============================================
+## Output Formats
+## ==============================================
+def formatValue(value):
+    """Format a value the same way that mongosniff prints it"""
+    if isinstance(value, dict):
+        if not value: return "{}"
+        return "{ " + ", ".join([ "%s: %s" % (k, formatValue(v)) for k, v in value.iteritems() ]) + " }"
+    elif isinstance(value, list):
+        return "[ " + ", ".join(map(formatValue, value)) + " ]"
+    return str(value)
+## DEF
+
+class MongoSniffWriter:
+    """Writes the operations as mongosniff text that the mongosniff Parser can read"""
+
+    def __init__(self, fd, database=DEFAULT_DATABASE, server=DEFAULT_SERVER):
+        self.fd = fd
+        self.database = database
+        self.server = server
+        self.fd.write("sniffing... %s\n" % server.split(":")[-1])
+    ## DEF
+
+    def write(self, sess, op):
+        col_name = "%s.%s" % (self.database, op.collection)
+        if op.type == constants.OP_TYPE_QUERY:
+            content = "query: %s  ntoreturn: %d ntoskip: 0" % (formatValue(op.query), op.limit)
+            if op.projection:
+                content += " hasfields: %s" % formatValue(OrderedDict([ (f, 1) for f in op.projection ]))
+            lines = [ content ]
+        elif op.type == constants.OP_TYPE_INSERT:
+            lines = [ "insert: %s" % formatValue(op.documents[0]) ] + map(formatValue, op.documents[1:])
+        elif op.type == constants.OP_TYPE_UPDATE:
+            lines = [ "update flags:0 q:%s o:%s" % (formatValue(op.query), formatValue(op.update)) ]
+        elif op.type == constants.OP_TYPE_DELETE:
+            lines = [ "delete flags: 0 q: %s" % formatValue(op.query) ]
+        else:
+            raise Exception("Unexpected operation type '%s'" % op.type)
+        self.__writeMessage__(op.query_time, sess.ip_client, "-->>", self.server, col_name, \
+                              op.query_id, None, lines)
+
+        if op.type == constants.OP_TYPE_QUERY:
+            lines = [ "reply n:%d cursorId: 0" % len(op.documents) ] + map(formatValue, op.documents)
+            self.__writeMessage__(op.resp_time, self.server, "<<--", sess.ip_client, col_name, \
+                                  op.resp_id, op.query_id, lines)
+        ## IF
+    ## DEF
+
+    def __writeMessage__(self, timestamp, ip1, arrow, ip2, col_name, msg_id, reply_id, lines):
+        size = MESSAGE_HEADER_SIZE + sum(map(len, lines))
+        header = "%.6f - %s %s %s %s %d bytes id:%x\t%d" % (timestamp, ip1, arrow, ip2, col_name, size, msg_id, msg_id)
+        if reply_id is not None:
+            header += " - %d" % reply_id
+        self.fd.write(header + "\n")
+        for line in lines:
+            self.fd.write("\t" + line + "\n")
+    ## DEF
+
+    def close(self):
+        pass
+    ## DEF
+## CLASS
+
+class SessionWriter:
+    """
+        Writes every session as a JSON document in the format that the mongosniff
+        Parser stores in the metadata database. We only keep the sessions that
+        have not finished yet in memory.
+    """
+
+    def __init__(self, fd, database=DEFAULT_DATABASE, server=DEFAULT_SERVER):
+        self.fd = fd
+        self.database = database
+        self.server = server
+        # SessionId -> Session dict
+        self.sessions = { }
+    ## DEF
+
+    def write(self, sess, op):
+        if not sess.session_id in self.sessions:
+            self.sessions[sess.session_id] = {
+                "session_id": sess.session_id,
+                "ip_client":  sess.ip_client,
+                "ip_server":  self.server,
+                "start_time": op.query_time,
+                "end_time":   None,
+                "operations": [ ],
+            }
+        session = self.sessions[sess.session_id]
+        session["operations"].append(self.convertOperation(op))
+        session["end_time"] = op.resp_time if op.resp_id else op.query_time
+        if sess.remaining == 0:
+            self.fd.write(json.dumps(session) + "\n")
+            del self.sessions[sess.session_id]
+    ## DEF
+
+    def convertOperation(self, op):
+        ret = {
+            "collection":      "%s.%s" % (self.database, op.collection),
+            "type":            op.type,
+            "query_time":      op.query_time,
+            "query_id":        op.query_id,
+            "query_aggregate": False,
+        }
+        if op.type == constants.OP_TYPE_INSERT:
+            content = op.documents
+        elif op.type == constants.OP_TYPE_UPDATE:
+            content = [ op.query, op.update ]
+            ret["update_upsert"] = False
+            ret["update_multi"] = False
+        else:
+            content = [ op.query ]
+        ret["query_content"] = [ util.escapeFieldNames(x) for x in content ]
+        ret["query_size"] = MESSAGE_HEADER_SIZE + sum([ len(formatValue(x)) for x in content ])
+
+        if op.type == constants.OP_TYPE_QUERY:
+            ret["query_limit"] = op.limit
+            ret["query_offset"] = 0
+            if op.projection:
+                ret["query_fields"] = dict([ (f.replace(".", "*"), 1) for f in op.projection ])
+            ret["resp_content"] = [ util.escapeFieldNames(x) for x in op.documents ]
+            ret["resp_size"] = MESSAGE_HEADER_SIZE + sum([ len(formatValue(x)) for x in op.documents ])
+            ret["resp_time"] = op.resp_time
+            ret["resp_id"] = op.resp_id
+        ## IF
+        return ret
+    ## DEF
+
+    def close(self):
+        """Write out any sessions that have not finished"""
+        for session_id in sorted(self.sessions.iterkeys()):
+            self.fd.write(json.dumps(self.sessions[session_id]) + "\n")
+        self.sessions.clear()
+    ## DEF
+## CLASS
+
+class PcapWriter:
+    """
+        Writes the operations as the packets of a libpcap capture with the legacy
+        wire protocol messages that the PcapParser can read. Every session gets
+        its own TCP connection that is closed after its last operation.
+    """
+
+    def __init__(self, fd, database=DEFAULT_DATABASE, server=DEFAULT_SERVER, mss=PCAP_MSS):
+        self.fd = fd
+        self.database = database
+        self.server = server
+        self.mss = mss
+        # ClientAddress -> [ ClientSeq, ServerSeq ]
+        self.seqs = { }
+        # Magic, Version, Timezone, Accuracy, SnapLen, Ethernet
+        self.fd.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+    ## DEF
+
+    def write(self, sess, op):
+        col_name = "%s.%s" % (self.database, op.collection)
+        if not sess.ip_client in self.seqs:
+            self.seqs[sess.ip_client] = [ 0, 0 ]
+            self.__writePacket__(op.query_time, sess.ip_client, True, 0x02, "")
+            self.__writePacket__(op.query_time, sess.ip_client, False, 0x12, "")
+        ## IF
+
+        if op.type == constants.OP_TYPE_QUERY:
+            body = struct.pack("<i", 0) + col_name + "\0" + \
+                   struct.pack("<ii", 0, op.limit) + self.__encode__(op.query)
+            if op.projection:
+                body += self.__encode__(OrderedDict([ (f, 1) for f in op.projection ]))
+            opcode = 2004
+        elif op.type == constants.OP_TYPE_INSERT:
+            body = struct.pack("<i", 0) + col_name + "\0" + "".join(map(self.__encode__, op.documents))
+            opcode = 2002
+        elif op.type == constants.OP_TYPE_UPDATE:
+            body = struct.pack("<i", 0) + col_name + "\0" + struct.pack("<i", 0) + \
+                   self.__encode__(op.query) + self.__encode__(op.update)
+            opcode = 2001
+        elif op.type == constants.OP_TYPE_DELETE:
+            body = struct.pack("<i", 0) + col_name + "\0" + struct.pack("<i", 0) + self.__encode__(op.query)
+            opcode = 2006
+        else:
+            raise Exception("Unexpected operation type '%s'" % op.type)
+        self.__writeMessage__(op.query_time, sess.ip_client, True, op.query_id, 0, opcode, body)
+
+        if op.type == constants.OP_TYPE_QUERY:
+            body = struct.pack("<iqii", 0, 0, 0, len(op.documents)) + "".join(map(self.__encode__, op.documents))
+            self.__writeMessage__(op.resp_time, sess.ip_client, False, op.resp_id, op.query_id, 1, body)
+        if sess.remaining == 0:
+            timestamp = op.resp_time if op.resp_id else op.query_time
+            self.__writePacket__(timestamp, sess.ip_client, True, 0x11, "")
+            del self.seqs[sess.ip_client]
+        ## IF
+    ## DEF
+
+    def __encode__(self, doc):
+        # The field paths of the projections and the nested queries have dots in them
+        return bson.BSON.encode(doc, check_keys=False)
+    ## DEF
+
+    def __writeMessage__(self, timestamp, ip_client, from_client, msg_id, reply_id, opcode, body):
+        msg = struct.pack("<iiii", MESSAGE_HEADER_SIZE + len(body), msg_id, reply_id, opcode) + body
+        for i in xrange(0, len(msg), self.mss):
+            self.__writePacket__(timestamp, ip_client, from_client, 0x18, msg[i:i+self.mss])
+    ## DEF
+
+    def __writePacket__(self, timestamp, ip_client, from_client, flags, payload):
+        seqs = self.seqs[ip_client]
+        src, dst = (ip_client, self.server) if from_client else (self.server, ip_client)
+        src_ip, src_port = src.split(":")
+        dst_ip, dst_port = dst.split(":")
+        idx = 0 if from_client else 1
+        seq = seqs[idx]
+        # SYN and FIN take up a sequence number
+        seqs[idx] = (seq + len(payload) + (1 if flags & 0x03 else 0)) & 0xffffffff
+
+        tcp = struct.pack("!HHIIBBHHH", int(src_port), int(dst_port), seq, seqs[1-idx], 5 << 4, flags, 65535, 0, 0)
+        ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp) + len(payload), 0, 0x4000, 64, 6, 0, \
+                         socket.inet_aton(src_ip), socket.inet_aton(dst_ip))
+        frame = "\0" * 12 + struct.pack("!H", 0x0800) + ip + tcp + payload
+        ts_sec = int(timestamp)
+        ts_usec = int(round((timestamp - ts_sec) * 1000000))
+        if ts_usec >= 1000000:
+            ts_sec, ts_usec = ts_sec + 1, ts_usec - 1000000
+        self.fd.write(struct.pack("<IIII", ts_sec, ts_usec, len(frame), len(frame)) + frame)
+    ## DEF
+
+    def close(self):
+        pass
+    ## DEF
+## CLASS
+
+def parseOpMix(value):
+    """Parse an operation mix like 'query=70,update=15,insert=10,delete=5'"""
+    op_mix = OrderedDict()
+    for item in value.split(","):
+        name, share = item.split("=")
+        name = name.strip().lower()
+        if not name in OP_TYPE_NAMES:
+            raise Exception("Invalid operation type '%s'" % name)
+        op_mix[OP_TYPE_NAMES[name]] = float(share)
+    ## FOR
+    assert sum(op_mix.itervalues()) > 0
+    return op_mix
+## DEF
+
+def writeTrace(generator, writer):
+    """Write all of the operations of the generator and return the number of operations"""
+    start = time.time()
+    for sess, op in generator.generate():
+        writer.write(sess, op)
+        if generator.op_ctr % 100000 == 0:
+            LOG.info("Generated %d operations [%.0f ops/sec]", generator.op_ctr, generator.op_ctr / (time.time() - start))
+    ## FOR
+    writer.close()
+    LOG.info("Generated %d operations in %d sessions in %.1f seconds", \
+             generator.op_ctr, generator.num_sessions, time.time() - start)
+    return generator.op_ctr
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    logging.basicConfig(level = logging.INFO,
+                        format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
+                        datefmt="%m-%d-%Y %H:%M:%S",
+                        stream = sys.stderr)
+
+    aparser = argparse.ArgumentParser(description="Synthetic Trace Generator")
+    aparser.add_argument('--format', choices=OUTPUT_FORMATS, default=OUTPUT_MONGOSNIFF,
+                         help='Write a mongosniff trace, a libpcap capture or the sessions as JSON documents')
+    aparser.add_argument('--output', type=str, metavar='FILE', default='-',
+                         help='Output file (default: stdout)')
+    aparser.add_argument('--collections', type=int, default=4, help='Number of collections')
+    aparser.add_argument('--fields', type=int, default=8, help='Number of fields per collection')
+    aparser.add_argument('--nesting', type=int, default=1, help='Depth of the nested sub-documents')
+    aparser.add_argument('--fk-ratio', type=float, default=1.0,
+                         help='Probability that a collection references an earlier collection')
+    aparser.add_argument('--fanout', type=int, default=4, help='Number of child documents per parent document')
+    aparser.add_argument('--documents', type=int, default=100000, help='Number of documents per collection')
+    aparser.add_argument('--templates', type=int, default=20, help='Number of query templates')
+    aparser.add_argument('--op-mix', type=parseOpMix, metavar='MIX',
+                         help='Share of the operation types (default: query=70,update=15,insert=10,delete=5)')
+    aparser.add_argument('--skew', type=float, default=1.0,
+                         help='Zipfian skew of the templates, collections and keys (0.0 is uniform)')
+    aparser.add_argument('--sessions', type=int, default=1000, help='Number of sessions')
+    aparser.add_argument('--ops', type=int, default=10, help='Number of operations per session')
+    aparser.add_argument('--duration', type=float, default=3600.0,
+                         help='The time span (in seconds) over which the sessions start')
+    aparser.add_argument('--start-time', type=float, default=DEFAULT_START_TIME, help='Timestamp of the first session')
+    aparser.add_argument('--database', type=str, default=DEFAULT_DATABASE, help='Name of the database')
+    aparser.add_argument('--seed', type=int, default=0, help='Seed of the random number generator')
+    args = vars(aparser.parse_args())
+
+    generator = TraceGenerator(
+        num_collections=args['collections'],
+        num_fields=args['fields'],
+        nesting=args['nesting'],
+        fk_ratio=args['fk_ratio'],
+        fanout=args['fanout'],
+        num_templates=args['templates'],
+        op_mix=args['op_mix'],
+        skew=args['skew'],
+        doc_count=args['documents'],
+        num_sessions=args['sessions'],
+        ops_per_session=args['ops'],
+        duration=args['duration'],
+        start_time=args['start_time'],
+        database=args['database'],
+        seed=args['seed'],
+    )
+    fd = sys.stdout if args['output'] == '-' else open(args['output'], 'wb')
+    try:
+        if args['format'] == OUTPUT_MONGOSNIFF:
+            writer = MongoSniffWriter(fd, args['database'])
+        elif args['format'] == OUTPUT_PCAP:
+            writer = PcapWriter(fd, args['database'])
+        else:
+            writer = SessionWriter(fd, args['database'])
+        writeTrace(generator, writer)
+    finally:
+        if fd != sys.stdout: fd.close()
+## MAIN
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import os
+import time
+import logging
+try:
+   import cPickle as pickle
+except:
+   import pickle
+
+LOG = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the checkpoint changes
+CHECKPOINT_VERSION = 1
+
+class Checkpoint:
+    """
+        Snapshot of the progress of a multi-client design search that the
+        coordinator writes to disk so that the search can be resumed later
+    """
+    def __init__(self):
+        self.version = CHECKPOINT_VERSION
+        self.bestCost = None
+        self.bestDesign = None
+        # Total number of seconds that the search has run for so far
+        self.elapsed = 0.0
+        # WorkerId -> Search state dict returned by the worker's search method
+        self.workers = { }
+    ## DEF
+
+    def getWorkerState(self, worker_id):
+        return self.workers.get(worker_id, None)
+    ## DEF
+
+    def __str__(self):
+        return "Checkpoint[bestCost=%s / elapsed=%.1f / workers=%d]" % \
+               (self.bestCost, self.elapsed, len(self.workers))
+    ## DEF
+## CLASS
+
+def saveCheckpoint(path, checkpoint):
+    """
+        Write the given checkpoint to a file. We write to a temporary file first
+        and then rename it so that we never leave a half-written checkpoint behind
+    """
+    start = time.time()
+    tmp_path = path + ".tmp"
+    f = open(tmp_path, 'wb')
+    try:
+        pickle.dump(checkpoint, f, -1)
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+    os.rename(tmp_path, path)
+    LOG.debug("Saved %s to '%s' in %.2f seconds", checkpoint, path, time.time() - start)
+## DEF
+
+def loadCheckpoint(path):
+    """Read a checkpoint written by saveCheckpoint()"""
+    f = open(path, 'rb')
+    try:
+        checkpoint = pickle.load(f)
+    finally:
+        f.close()
+    if getattr(checkpoint, "version", None) != CHECKPOINT_VERSION:
+        raise Exception("Unsupported checkpoint version in '%s'" % path)
+    LOG.info("Loaded %s from '%s'", checkpoint, path)
+    return checkpoint
+## DEF
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import time
+import logging
+
+from message import *
+
+LOG = logging.getLogger(__name__)
+
+# Send the costs that we computed to the coordinator once we have this many
+PUBLISH_BATCH_SIZE = 50
+# ... or once this many seconds have passed since the last time
+PUBLISH_INTERVAL = 5.0
+# Clear the front cache once it grows beyond this many entries
+MAX_FRONT_ENTRIES = 100000
+
+class DesignCostCache:
+    """
+        Worker-side front of the design cost cache that is shared by all of the
+        workers. Costs that we compute are published to the coordinator in batches
+        and the coordinator forwards them to the other workers. We never wait for
+        the coordinator: if a design is not in our front cache yet, the caller
+        evaluates it.
+    """
+    def __init__(self, channel, worker_id):
+        self.channel = channel
+        self.worker_id = worker_id
+
+        # DesignHash -> Cost
+        self.entries = { }
+        # DesignHash -> Cost that the other workers computed
+        self.remote_entries = { }
+        # [(DesignHash, Cost)] that the coordinator doesn't know about yet
+        self.unpublished = [ ]
+        self.lastPublish = time.time()
+
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+    ## DEF
+
+    def get(self, design_hash):
+        """Return the cost of the design with the given hash or None if nobody has computed it yet"""
+        cost = self.entries.get(design_hash, None)
+        if not cost is None:
+            self.local_hits += 1
+            return cost
+        cost = self.remote_entries.get(design_hash, None)
+        if not cost is None:
+            self.remote_hits += 1
+            return cost
+        self.misses += 1
+        return None
+    ## DEF
+
+    def put(self, design_hash, cost):
+        """Store the cost of a design that we evaluated"""
+        self.__store__(self.entries, design_hash, cost)
+        self.unpublished.append((design_hash, cost))
+        if len(self.unpublished) >= PUBLISH_BATCH_SIZE or \
+           time.time() - self.lastPublish >= PUBLISH_INTERVAL:
+            self.publish()
+    ## DEF
+
+    def publish(self):
+        """Send all of the costs that the coordinator doesn't know about yet"""
+        if self.unpublished:
+            sendMessage(MSG_COST_CACHE_PUBLISH, self.unpublished, self.channel)
+        self.unpublished = [ ]
+        self.lastPublish = time.time()
+    ## DEF
+
+    def putRemote(self, entries):
+        """Callback for when the coordinator forwards the costs that another worker published"""
+        for design_hash, cost in entries:
+            self.__store__(self.remote_entries, design_hash, cost)
+    ## DEF
+
+    def __store__(self, entries, design_hash, cost):
+        if len(entries) >= MAX_FRONT_ENTRIES:
+            entries.clear()
+        entries[design_hash] = cost
+    ## DEF
+
+    def __str__(self):
+        return "DesignCostCache[entries=%d / remoteEntries=%d / localHits=%d / remoteHits=%d / misses=%d]" % \
+               (len(self.entries), len(self.remote_entries), self.local_hits, self.remote_hits, self.misses)
+    ## DEF
+## CLASS
@@ -50,9 +50,20 @@ MSG_STATUS_CODES = [
     "START_EXECUTING",
     "START_LOADING",
     "START_SEARCHING",
-    "EVALUATED_ONE_DESIGN",
+    "SEARCH_TELEMETRY",
     "FINISHED_UPDATE",
     "SEARCH_INFO",
+    "SEARCH_STATE",
+    "CMD_SAVE_COST_CACHE",
+    "COST_CACHE_SAVED",
+    "REQUEST_NEIGHBORHOOD",
+    "CMD_NEIGHBORHOOD",
+    "COST_CACHE_PUBLISH",
+    "COST_CACHE_UPDATE",
+    "CMD_COST_REPORT",
+    "COST_REPORT",
+    "CMD_PROFILE_REPORT",
+    "PROFILE_REPORT",
     "OTHER_MESSAGE"
 ]
 
@@ -78,6 +89,11 @@ def getChannelsByHost(channels):
     return (ret)
 ## DEF
 
+def isLocalChannel(channel):
+    """Return True if the worker at the other end of the given channel runs on this machine"""
+    return channel.gateway is None or bool(channel.gateway.spec.popen)
+## DEF
+
 def sendMessagesLimited(queue, limit):
     start = time.time()
     responses = [ ]
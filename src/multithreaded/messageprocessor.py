@@ -56,18 +56,43 @@ class MessageProcessor:
                 self.worker = Worker(msg.data[0],  msg.data[1], self.channel, msg.data[2])
             
             elif msg.header == MSG_CMD_LOAD_DB:
-                self.worker.load()
+                self.worker.load(msg.data)
             # MSG_CMD_EXECUTE
             # Tells the worker thread to begin the search process
             # This will only occur once all of the threads complete the
             # EXECUTE_INIT phase.
             elif msg.header == MSG_CMD_EXECUTE:
-                self.worker.execute(msg.data[0], msg.data[1])
+                self.worker.execute(msg.data[0], msg.data[1], msg.data[2])
             
             # MSG_CMD_UPDATE_BEST_COST
             # update the best cost of the current client
             elif msg.header == MSG_CMD_UPDATE_BEST_COST:
                 self.worker.update(msg.data)
+            
+            # MSG_CMD_NEIGHBORHOOD
+            # the collections that the search should relax next
+            elif msg.header == MSG_CMD_NEIGHBORHOOD:
+                self.worker.setNeighborhood(msg.data)
+            
+            # MSG_COST_CACHE_UPDATE
+            # the design costs that the other workers computed
+            elif msg.header == MSG_COST_CACHE_UPDATE:
+                self.worker.updateCostCache(msg.data)
+            
+            # MSG_CMD_SAVE_COST_CACHE
+            # write the cost data of the final design for the next run
+            elif msg.header == MSG_CMD_SAVE_COST_CACHE:
+                self.worker.saveCostCache(msg.data[0], msg.data[1])
+            
+            # MSG_CMD_COST_REPORT
+            # attribute the cost of the final design to its query classes
+            elif msg.header == MSG_CMD_COST_REPORT:
+                self.worker.sendCostReport(msg.data[0], msg.data[1])
+            
+            # MSG_CMD_PROFILE_REPORT
+            # send the timings of the phases that this worker ran
+            elif msg.header == MSG_CMD_PROFILE_REPORT:
+                self.worker.sendProfileReport()
                 
             # MSG_CMD_STOP
             # Tells the worker thread to halt the benchmark
@@ -12,6 +12,7 @@ sys.path.append(os.path.join(basedir, "../search"))
 
 from search.designer import Designer
 from multi_search_coordinator import Coordinator
+import processbackend
 from util import configutil
 
 LOG = logging.getLogger(__name__)
@@ -20,21 +21,52 @@ class MultiClientDesigner:
     """
         This is the multithreaded version of LNS search
     """
-    def __init__(self, config, args):
+    def __init__(self, config, args, designer=None):
         self.config = config
         self.args = args # ONLY USED FOR Designer.setOptionsFromArguments: Comment: this is a weired method
+        # Used by the coordinator to load the workload once for all of the workers
+        self.designer = designer
         self.coordinator = Coordinator()
         self.channels = None
     ## DEF
             
     def runSearch(self):
-        self.channels = self.createChannels()
+        backend = self.config.get(configutil.SECT_MULTI_SEARCH, 'backend')
+        queue = None
+        processes = None
+        if backend == "execnet":
+            self.channels = self.createChannels()
+        elif backend == "process":
+            self.channels, queue, processes = self.createProcesses()
+        else:
+            raise Exception("Unknown multi-search backend '%s'" % backend)
         
-        # Step 1: Initialize all of the Workers on the client nodes
-        self.coordinator.init(self.config, self.channels, self.args)
-            
-        # Step 2: Execute search 
-        self.coordinator.execute()
+        try:
+            # Step 1: Initialize all of the Workers on the client nodes
+            self.coordinator.init(self.config, self.channels, self.args, self.designer, queue)
+                
+            # Step 2: Execute search 
+            self.coordinator.execute()
+        finally:
+            if processes: processbackend.stopProcesses(self.channels, processes)
+    ## DEF
+    
+    def createProcesses(self):
+        '''
+            Fork the workers on this machine. If we can, we load the workload before
+            so that all of the workers share it with us instead of loading it again
+        '''
+        num_clients = self.config.getint(configutil.SECT_MULTI_SEARCH, 'num_clients')
+        LOG.info("Starting LNS search on %d local processes" % num_clients)
+        
+        workload = None
+        if self.designer and configutil.getBoolean(self.config, configutil.SECT_MULTI_SEARCH, 'share_workload'):
+            collections = self.designer.loadCollections()
+            workload = (collections, self.designer.loadWorkload(collections))
+            self.coordinator.inherited_workload = True
+        ## IF
+        channels, queue, processes = processbackend.createProcessChannels(num_clients, workload)
+        return channels, queue, processes
     ## DEF
     
     def createChannels(self):
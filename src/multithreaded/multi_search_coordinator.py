@@ -1,8 +1,19 @@
 
 from message import *
+from checkpoint import Checkpoint, saveCheckpoint, loadCheckpoint
+from snapshot import saveSnapshot, dumpSnapshot
+from neighborhoodqueue import NeighborhoodQueue
+from telemetry import SearchProgress
+import os
 import sys
 import time
 import Queue
+import tempfile
+import json
+
+from util import configutil
+from costmodel.querystats import formatReport
+from util import profiler
 
 import logging
 LOG = logging.getLogger(__name__)
@@ -13,19 +24,48 @@ class Coordinator:
         self.bestCost = sys.maxint
         self.config = None
         self.bestDesign = None
+        # Loads the workload snapshot that we share with the workers
+        self.designer = None
+        # True if the workers were forked after we loaded the workload
+        self.inherited_workload = False
+        
+        # Periodic snapshot of the search progress
+        self.checkpoint = None
+        self.checkpoint_file = None
+        self.checkpoint_interval = None
+        self.lastCheckpoint = None
+        # How long the search ran before we resumed it from a checkpoint
+        self.resumed_elapsed = 0.0
         
         self.debug = False
     ## DEF
     
-    def init(self, config, channels, args):
+    def init(self, config, channels, args, designer=None, queue=None):
+        """
+            The optional queue is where we receive the messages of all of the channels.
+            If it is None, then the channels are execnet channels.
+        """
         self.channels = channels
         self.config = config
         self.args = args
+        self.designer = designer
+        
+        self.checkpoint_file = config.get(configutil.SECT_MULTI_SEARCH, 'checkpoint_file')
+        self.checkpoint_interval = config.getint(configutil.SECT_MULTI_SEARCH, 'checkpoint_interval')
+        if args.get("resume", False):
+            if not self.checkpoint_file:
+                raise Exception("Missing the configuration option '%s.checkpoint_file' needed to resume" % configutil.SECT_MULTI_SEARCH)
+            self.checkpoint = loadCheckpoint(self.checkpoint_file)
+            self.resumed_elapsed = self.checkpoint.elapsed
+        else:
+            self.checkpoint = Checkpoint()
         
         start = time.time()
         
-        mch = execnet.MultiChannel(self.channels)
-        self.queue = mch.make_receive_queue()
+        if queue is None:
+            mch = execnet.MultiChannel(self.channels)
+            queue = mch.make_receive_queue()
+        self.queue = queue
     
         # Tell every client to start
         worker_id = 0
@@ -54,7 +94,14 @@ class Coordinator:
     
     def sendLoadDBCommand(self):
         LOG.info("Sending out load database commands")
-        self.send2All(MSG_CMD_LOAD_DB, None)
+        snapshot_file = None
+        if self.inherited_workload:
+            # The workers already have the workload that we loaded before forking them
+            self.send2All(MSG_CMD_LOAD_DB, (None, None))
+        elif self.designer and configutil.getBoolean(self.config, configutil.SECT_MULTI_SEARCH, 'share_workload'):
+            snapshot_file = self.sendWorkloadSnapshot()
+        else:
+            self.send2All(MSG_CMD_LOAD_DB, None)
         
         bestInitCost = sys.maxint
         bestInitDesign = None
@@ -85,46 +132,98 @@ class Coordinator:
                 LOG.info("Got [%d] responses, missing [%d]", num_of_response, len(self.channels) - num_of_response)
         ## WHILE
         
+        # All of the workers have read the snapshot by now
+        if snapshot_file: os.remove(snapshot_file)
+        
         assert bestInitCost != sys.maxint
         assert bestInitDesign
         
+        if self.checkpoint.bestDesign and self.checkpoint.bestCost <= bestInitCost:
+            LOG.info("Continuing from the best design in the checkpoint")
+            LOG.info("Checkpoint cost: %s", self.checkpoint.bestCost)
+            bestInitCost = self.checkpoint.bestCost
+            bestInitDesign = self.checkpoint.bestDesign.copy()
+        ## IF
+        
         self.bestCost = bestInitCost
         self.bestDesign = bestInitDesign
         
         return bestInitCost, bestInitDesign
     ## DEF
     
+    def sendWorkloadSnapshot(self):
+        """
+            Load the collections and the workload from the metadata database once
+            and send them to all of the workers. Workers on this machine each load their
+            own copy from the snapshot file, while remote workers get it in a single message.
+            Returns the path of the snapshot file or None if there are no local workers
+        """
+        start = time.time()
+        snapshot = self.designer.createWorkloadSnapshot()
+        LOG.info("Created %s in %.2f seconds", snapshot, time.time() - start)
+        
+        snapshot_file = None
+        snapshot_data = None
+        for channel in self.channels:
+            if isLocalChannel(channel):
+                if snapshot_file is None:
+                    fd, snapshot_file = tempfile.mkstemp(prefix="d4-workload-", suffix=".snapshot")
+                    os.close(fd)
+                    saveSnapshot(snapshot_file, snapshot)
+                sendMessage(MSG_CMD_LOAD_DB, (snapshot_file, None), channel)
+            else:
+                if snapshot_data is None:
+                    snapshot_data = dumpSnapshot(snapshot)
+                sendMessage(MSG_CMD_LOAD_DB, (None, snapshot_data), channel)
+        ## FOR
+        return snapshot_file
+    ## DEF
+    
     def sendExecuteCommand(self, bestInitCost, bestInitDesign):
-        self.send2All(MSG_CMD_EXECUTE, (bestInitCost, bestInitDesign))
+        # Every worker continues from its own state if we are resuming from a checkpoint
+        worker_id = 0
+        for channel in self.channels:
+            state = self.checkpoint.getWorkerState(worker_id)
+            sendMessage(MSG_CMD_EXECUTE, (bestInitCost, bestInitDesign, state), channel)
+            worker_id += 1
+        ## FOR
+        
+        # Hands out disjoint neighborhoods to the LNS workers
+        neighborhoods = NeighborhoodQueue()
+        
+        # Counters that the workers report periodically
+        progress = SearchProgress(self.config.get(configutil.SECT_MULTI_SEARCH, 'progress_file'))
+        progress.recordBestCost(self.bestCost)
+        progress_interval = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'progress_interval')
         
         running_clients = len(self.channels)
         started_searching_process = 0
-        evaluated_design = 0
         finished_update = 0
         num_bestDesign = 0
+        num_shared_costs = 0
         start = time.time()
+        self.lastCheckpoint = start
+        lastProgress = start
         
         while True:
+            if self.checkpoint_file and time.time() - self.lastCheckpoint >= self.checkpoint_interval:
+                self.saveCheckpoint(start)
+            if time.time() - lastProgress >= progress_interval:
+                LOG.info("PROGRESS %s", progress.getProgressLine(self.bestCost, running_clients))
+                lastProgress = time.time()
             try:
-                chan, res = self.queue.get(timeout=60)
+                chan, res = self.queue.get(timeout=min(60, progress_interval))
                 msg = getMessage(res)
                 
                 if msg.header == MSG_EXECUTE_COMPLETED:
+                    neighborhoods.release(msg.data)
                     running_clients -= 1
                     LOG.info("worker #%s has terminated, [%d] workers left.", msg.data, running_clients)
                     if running_clients == 0:
                         break
                 ## IF
-                elif msg.header == MSG_EVALUATED_ONE_DESIGN:
-                    evaluated_design += 1
-                    if self.debug:
-                        LOG.info("Best cost: %s", msg.data[0])
-                        LOG.info("Evaluated cost: %s", msg.data[1])
-                        
-                    # Output current status every 1000 evaluation
-                    if evaluated_design % 500 == 0:
-                        raise Queue.Empty
-                    
+                elif msg.header == MSG_SEARCH_TELEMETRY:
+                    progress.update(msg.data[0], msg.data[1])
                 ## ELIF
                 elif msg.header == MSG_FOUND_BEST_COST:
                     bestCost = msg.data[0]
@@ -139,10 +238,29 @@ class Coordinator:
                         
                         self.bestCost = bestCost
                         self.bestDesign = bestDesign.copy()
+                        progress.recordBestCost(bestCost)
+                        neighborhoods.resetExplored()
                         finished_update = 0
                         self.send2All(MSG_CMD_UPDATE_BEST_COST, (bestCost, bestDesign))
+                        # The next periodic checkpoint saves the new best design. Saving it
+                        # right away would stall us while the workers find new bests in bursts
                     ## IF
                 ## ELIF
+                elif msg.header == MSG_REQUEST_NEIGHBORHOOD:
+                    worker_id, request_id, size, preferences = msg.data
+                    neighborhood = neighborhoods.getNeighborhood(worker_id, size, preferences)
+                    sendMessage(MSG_CMD_NEIGHBORHOOD, (request_id, neighborhood), chan)
+                ## ELIF
+                elif msg.header == MSG_COST_CACHE_PUBLISH:
+                    # We don't keep the costs ourselves, the workers cache them
+                    num_shared_costs += len(msg.data)
+                    for channel in self.channels:
+                        if not channel is chan: sendMessage(MSG_COST_CACHE_UPDATE, msg.data, channel)
+                    ## FOR
+                ## ELIF
+                elif msg.header == MSG_SEARCH_STATE:
+                    self.checkpoint.workers[msg.data[0]] = msg.data[1]
+                ## ELIF
                 elif msg.header == MSG_SEARCH_INFO:
                     #LOG.info("%s","*"*40)
                     LOG.info("worker #%s starts a new BBsearch, time limit: [%s], patient time used: [%s], worker run time: [%s]", msg.data[5], msg.data[1], msg.data[4], msg.data[3])
@@ -167,13 +285,30 @@ class Coordinator:
                     
             except Queue.Empty:
                 LOG.info("WAITING, clients left: %s", running_clients)
-                LOG.info("Number of evaluated design: %d", evaluated_design)
+                LOG.info("Number of evaluated design: %d", progress.getTotal("evaluated"))
                 LOG.info("Found %s better designs so far", num_bestDesign)
                 LOG.info("Time elapsed: %s", time.time() - start)
                 LOG.info("Best cost: %s", self.bestCost)
+                LOG.info("Shared design costs: %d", num_shared_costs)
                 LOG.info("Best Design:\n%s", self.bestDesign)
                 
         ## WHILE
+        LOG.info("PROGRESS %s", progress.getProgressLine(self.bestCost, running_clients))
+        if self.checkpoint_file: self.saveCheckpoint(start)
+    ## DEF
+    
+    def saveCheckpoint(self, start):
+        """Write the best design and the last search state of every worker to the checkpoint file"""
+        self.checkpoint.bestCost = self.bestCost
+        self.checkpoint.bestDesign = self.bestDesign
+        self.checkpoint.elapsed = self.resumed_elapsed + (time.time() - start)
+        try:
+            saveCheckpoint(self.checkpoint_file, self.checkpoint)
+        except IOError, ex:
+            LOG.warn("Failed to write checkpoint to '%s': %s", self.checkpoint_file, ex)
+        self.lastCheckpoint = time.time()
+    ## DEF
+    
     def execute(self):
         """
             send messages to channels to tell them to start running
@@ -186,6 +321,20 @@ class Coordinator:
         # STEP 1. Tell the clients to start the search algorithm from the same initial design
         self.sendExecuteCommand(bestInitCost, bestInitDesign)
         
+        # STEP 2. Save the cost data of the best design so that the next run can reuse it
+        costCacheFile = self.args.get("cost_cache", None)
+        if costCacheFile:
+            self.sendSaveCostCacheCommand(costCacheFile)
+        
+        # STEP 3. Find out which query classes the cost of the best design comes from
+        costReportFile = self.args.get("cost_report", None)
+        if costReportFile:
+            self.sendCostReportCommand(costReportFile)
+        
+        # STEP 4. Collect the timings of the workers
+        if profiler.getProfiler().enabled:
+            self.sendProfileReportCommand()
+        
         end = time.time()
         LOG.info("All the workers finished executing")
         LOG.info("Best cost: %s", self.bestCost)
@@ -200,6 +349,81 @@ class Coordinator:
             f.close()
     ## DEF
     
+    def sendSaveCostCacheCommand(self, path):
+        """Tell the first worker to write the cost data of the best design to the given file"""
+        LOG.info("Sending out save cost cache command")
+        sendMessage(MSG_CMD_SAVE_COST_CACHE, (path, self.bestDesign), self.channels[0])
+        
+        while True:
+            try:
+                chan, res = self.queue.get(timeout=60)
+                msg = getMessage(res)
+                if msg.header == MSG_COST_CACHE_SAVED:
+                    LOG.info("worker #%s saved the cost cache to '%s'", msg.data, path)
+                    break
+                ## IF
+                # Ignore any late messages from the search
+            except Queue.Empty:
+                LOG.info("WAITING for the cost cache to be saved")
+        ## WHILE
+    ## DEF
+    
+    def sendCostReportCommand(self, path):
+        """
+            Ask the first worker for the per-query-class cost report of the best
+            design. We log it as a table and write it to the given JSON file.
+        """
+        LOG.info("Sending out cost report command")
+        top_n = self.config.getint(configutil.SECT_COSTMODEL, 'cost_report_size')
+        sendMessage(MSG_CMD_COST_REPORT, (self.bestDesign, top_n), self.channels[0])
+        
+        while True:
+            try:
+                chan, res = self.queue.get(timeout=60)
+                msg = getMessage(res)
+                if msg.header == MSG_COST_REPORT:
+                    report = msg.data
+                    break
+                ## IF
+                # Ignore any late messages from the search
+            except Queue.Empty:
+                LOG.info("WAITING for the cost report")
+        ## WHILE
+        
+        LOG.info("Top %d query classes of the best design:\n%s", len(report), formatReport(report))
+        f = open(path, 'w')
+        try:
+            json.dump({"cost": self.bestCost, "query_classes": report}, f, indent=2)
+        finally:
+            f.close()
+        LOG.info("Wrote the cost report to '%s'", path)
+    ## DEF
+    
+    def sendProfileReportCommand(self):
+        """Ask every worker for the timings of its phases and cost components and log them"""
+        LOG.info("Sending out profile report command")
+        self.send2All(MSG_CMD_PROFILE_REPORT, None)
+        
+        reports = { }
+        while len(reports) < len(self.channels):
+            try:
+                chan, res = self.queue.get(timeout=60)
+                msg = getMessage(res)
+                if msg.header == MSG_PROFILE_REPORT:
+                    worker_id, phases, components = msg.data
+                    reports[worker_id] = (phases, components)
+                ## IF
+                # Ignore any late messages from the search
+            except Queue.Empty:
+                LOG.info("WAITING for the profile reports of %d workers", len(self.channels) - len(reports))
+        ## WHILE
+        
+        for worker_id in sorted(reports.iterkeys()):
+            phases, components = reports[worker_id]
+            LOG.info("Profile of worker #%d:\n%s", worker_id, profiler.formatSummary(phases, components))
+        ## FOR
+    ## DEF
+    
     def send2All(self, cmd, message):
         for channel in self.channels:
             sendMessage(cmd, message, channel)
@@ -7,7 +7,10 @@ sys.path.append(os.path.join(basedir, "../search"))
 
 from search.designer import Designer
 from util import configutil
+from util import profiler
 from message import *
+from snapshot import loadSnapshot, loadsSnapshot
+import processbackend
 
 import catalog
 import workload
@@ -24,36 +27,93 @@ class Worker:
         self.designer = None
         self.bestLock = None
         self.worker_id = worker_id
+        profiler.setupProfiler(args, "d4-worker%d" % worker_id)
         
         sendMessage(MSG_INIT_COMPLETED, self.worker_id, self.channel)
     ## DEF
     
-    def load(self):
+    def load(self, data=None):
         """
             Load data from mongodb
+            If the coordinator sent us a workload snapshot, either as the path of
+            a local file or as serialized data, then we use it instead of reading
+            the collections and the workload from the metadata database.
+            If both are None, then the coordinator forked us after loading the workload.
         """
         self.designer = self.establishConnection(self.config, self.args, self.channel)
+        if data:
+            path, snapshotData = data
+            if path:
+                self.designer.snapshot = loadSnapshot(path)
+            elif snapshotData:
+                self.designer.snapshot = loadsSnapshot(snapshotData)
+            else:
+                assert processbackend.INHERITED_WORKLOAD, "Missing inherited workload"
+                self.designer.snapshot = processbackend.INHERITED_WORKLOAD
+        ## IF
         initialCost, initialDesign = self.designer.load()
         sendMessage(MSG_INITIAL_DESIGN, (initialCost, initialDesign, self.worker_id), self.channel)
     ## DEF
     
-    def execute(self, initialCost, initialDesign):
+    def execute(self, initialCost, initialDesign, state=None):
         """
             Run LNS/BB search and inform the coordinator once getting a new best design
+            If state is not None, then the search continues from a checkpoint
         """
         sendMessage(MSG_START_SEARCHING, self.worker_id, self.channel)
-        self.designer.search(initialCost, initialDesign, self.worker_id)
+        self.designer.search(initialCost, initialDesign, self.worker_id, state)
     ## DEF
     
     def update(self, data):
         bestCost = data[0]
         bestDesign = data[1]
         
-        self.designer.search_method.bbsearch_method.updateBest(bestCost, bestDesign)
+        self.designer.search_method.updateBest(bestCost, bestDesign)
         sendMessage(MSG_FINISHED_UPDATE, self.worker_id, self.channel)
     ## DEF
     
+    def setNeighborhood(self, data):
+        self.designer.search_method.putNeighborhood(data[0], data[1])
+    ## DEF
+    
+    def updateCostCache(self, data):
+        self.designer.design_cost_cache.putRemote(data)
+    ## DEF
+    
+    def saveCostCache(self, path, design):
+        """
+            Write the per-query-class cost data of the given design so that
+            the next run can start from it with --cost-cache
+        """
+        self.designer.saveCostCache(path, design)
+        sendMessage(MSG_COST_CACHE_SAVED, self.worker_id, self.channel)
+    ## DEF
+    
+    def sendCostReport(self, design, top_n):
+        """Send the coordinator the query classes that cause most of the cost of the given design"""
+        report = self.designer.cm.getQueryCostReport(design, top_n)
+        sendMessage(MSG_COST_REPORT, report, self.channel)
+    ## DEF
+    
+    def sendProfileReport(self):
+        """
+            Send the coordinator the timings of our phases and cost components
+            and write the cProfile stats of the profiled phase
+        """
+        p = profiler.getProfiler()
+        p.finish()
+        components = self.designer.cm.getComponentTimings() if self.designer and self.designer.cm else None
+        sendMessage(MSG_PROFILE_REPORT, (self.worker_id, p.getPhases(), components), self.channel)
+    ## DEF
+    
     def establishConnection(self, config, args, channel):
+        # We do not need MongoDB if we read the workload from a file-backed store
+        if configutil.getMetadataDir(config):
+            designer = Designer(config, None, None, channel)
+            designer.setOptionsFromArguments(args)
+            return designer
+        ## IF
+        
         ## ----------------------------------------------
         ## Connect to MongoDB
         ## ----------------------------------------------
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import logging
+
+LOG = logging.getLogger(__name__)
+
+class NeighborhoodQueue:
+    """
+        Hands out the neighborhoods (the sets of collections to relax) that the
+        LNS workers search next. A worker sends the collections in the order that
+        its own generator prefers them and we give it the most preferred ones that
+        no other worker is relaxing right now. We also avoid handing out the same
+        neighborhood twice until the best design changes.
+    """
+    def __init__(self):
+        # WorkerId -> Collections that the worker is relaxing
+        self.leases = { }
+        # Neighborhoods that were handed out since the best design last changed
+        self.explored = set()
+    ## DEF
+
+    def getNeighborhood(self, worker_id, size, preferences):
+        """Return the list of collections that the given worker should relax next"""
+        self.release(worker_id)
+        leased = set()
+        for col_names in self.leases.itervalues():
+            leased.update(col_names)
+        ## FOR
+        ordered = [ x for x in preferences if not x in leased ] + \
+                  [ x for x in preferences if x in leased ]
+        neighborhood = ordered[:size]
+
+        # Swap out the least preferred collection until we find
+        # a neighborhood that nobody has searched yet
+        i = size
+        while frozenset(neighborhood) in self.explored and i < len(ordered):
+            neighborhood[-1] = ordered[i]
+            i += 1
+        ## WHILE
+
+        self.explored.add(frozenset(neighborhood))
+        self.leases[worker_id] = neighborhood
+        LOG.debug("Worker #%s relaxes %s", worker_id, neighborhood)
+        return neighborhood
+    ## DEF
+
+    def release(self, worker_id):
+        """The given worker is no longer relaxing its last neighborhood"""
+        self.leases.pop(worker_id, None)
+    ## DEF
+
+    def resetExplored(self):
+        """Neighborhoods are relative to the best design, so they are worth searching again once it changes"""
+        self.explored.clear()
+    ## DEF
+## CLASS
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import time
+import logging
+import multiprocessing
+
+LOG = logging.getLogger(__name__)
+
+# Seconds that we give the workers to exit once we told them to stop
+# before we kill them (e.g., because they are stuck in a cost evaluation)
+STOP_TIMEOUT = 10.0
+
+# The collections and the workload that the coordinator loaded before it
+# forked the workers. The workers share these pages with the coordinator
+# until they write to them (copy-on-write)
+INHERITED_WORKLOAD = None
+
+class InheritedWorkload:
+    """Looks like a WorkloadSnapshot but hands out the already loaded objects"""
+    def __init__(self, collections, workload):
+        self.collections = collections
+        self.workload = workload
+    ## DEF
+
+    def getCollections(self):
+        return self.collections
+    ## DEF
+
+    def getWorkload(self):
+        return self.workload
+    ## DEF
+## CLASS
+
+class ProcessChannel:
+    """
+        Coordinator's end of the connection to a worker process.
+        This implements the parts of an execnet channel that we use.
+    """
+    gateway = None
+
+    def __init__(self, worker_id, inbox):
+        self.worker_id = worker_id
+        self.inbox = inbox
+    ## DEF
+
+    def send(self, item):
+        self.inbox.put(item)
+    ## DEF
+
+    def close(self):
+        # Tells the worker's MessageProcessor to stop
+        self.inbox.put(None)
+    ## DEF
+## CLASS
+
+class WorkerChannel:
+    """Worker's end of the connection to the coordinator"""
+    gateway = None
+
+    def __init__(self, worker_id, inbox, results):
+        self.worker_id = worker_id
+        self.inbox = inbox
+        self.results = results
+    ## DEF
+
+    def send(self, item):
+        self.results.put((self.worker_id, item))
+    ## DEF
+
+    def __iter__(self):
+        return iter(self.inbox.get, None)
+    ## DEF
+## CLASS
+
+class ProcessReceiveQueue:
+    """Same interface as the receive queue of an execnet MultiChannel"""
+    def __init__(self, channels, results):
+        self.channels = channels
+        self.results = results
+    ## DEF
+
+    def get(self, timeout=None):
+        """Return the next (channel, item) that any worker sent. Raises Queue.Empty on timeout"""
+        worker_id, item = self.results.get(timeout=timeout)
+        return self.channels[worker_id], item
+    ## DEF
+## CLASS
+
+def runWorker(worker_id, inbox, results):
+    """Main loop of a worker process"""
+    # Imported here because the worker modules import this one
+    from messageprocessor import MessageProcessor
+    mp = MessageProcessor(WorkerChannel(worker_id, inbox, results))
+    mp.processMessage()
+## DEF
+
+def createProcessChannels(num_clients, workload=None):
+    """
+        Fork the given number of worker processes on this machine.
+        If workload is not None, it is the (collections, workload) tuple that
+        the workers inherit. Returns the list of channels, the receive queue
+        and the list of processes.
+    """
+    global INHERITED_WORKLOAD
+    if workload:
+        INHERITED_WORKLOAD = InheritedWorkload(workload[0], workload[1])
+
+    results = multiprocessing.Queue()
+    channels = [ ]
+    processes = [ ]
+    for worker_id in xrange(num_clients):
+        inbox = multiprocessing.Queue()
+        p = multiprocessing.Process(target=runWorker, args=(worker_id, inbox, results), name="d4-worker-%d" % worker_id)
+        p.daemon = True
+        p.start()
+        channels.append(ProcessChannel(worker_id, inbox))
+        processes.append(p)
+    ## FOR
+    LOG.info("Started %d worker processes", num_clients)
+    return channels, ProcessReceiveQueue(channels, results), processes
+## DEF
+
+def stopProcesses(channels, processes, timeout=STOP_TIMEOUT):
+    """Tell the workers to stop and terminate the ones that have not exited after the timeout"""
+    for channel in channels:
+        channel.close()
+    deadline = time.time() + timeout
+    for p in processes:
+        p.join(max(0.0, deadline - time.time()))
+    for p in processes:
+        if p.is_alive():
+            LOG.warn("Worker process %s did not stop after %.1f seconds. Terminating it", p.name, timeout)
+            p.terminate()
+            p.join()
+    ## FOR
+## DEF
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import os
+import sys
+import time
+import logging
+try:
+   import cPickle as pickle
+except:
+   import pickle
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, ".."))
+
+# mongodb-d4
+import catalog
+import workload
+
+LOG = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the snapshot changes
+SNAPSHOT_VERSION = 1
+
+class WorkloadSnapshot:
+    """
+        The collection catalog and the workload sessions that the coordinator
+        loads once from MongoDB and then hands to all of the search workers so
+        that they do not have to query the metadata database themselves.
+        We only store plain dicts so that the snapshot can be pickled.
+    """
+    def __init__(self, collections, sessions):
+        self.version = SNAPSHOT_VERSION
+        self.collections = [ dict(col_info) for col_info in collections.itervalues() ]
+        self.sessions = [ dict(sess) for sess in sessions ]
+    ## DEF
+
+    def getCollections(self):
+        """Return a dict of collection catalog objects"""
+        collections = { }
+        for doc in self.collections:
+            col_info = catalog.Collection(doc)
+            collections[col_info['name']] = col_info
+        return collections
+    ## DEF
+
+    def getWorkload(self):
+        """Return the list of workload sessions"""
+        return [ workload.Session(doc) for doc in self.sessions ]
+    ## DEF
+
+    def __str__(self):
+        return "WorkloadSnapshot[collections=%d / sessions=%d]" % \
+               (len(self.collections), len(self.sessions))
+    ## DEF
+## CLASS
+
+def dumpSnapshot(snapshot):
+    """Serialize the given snapshot into a string that can be sent to a remote worker"""
+    return pickle.dumps(snapshot, -1)
+## DEF
+
+def loadsSnapshot(data):
+    """Restore a snapshot that was serialized with dumpSnapshot()"""
+    snapshot = pickle.loads(data)
+    __checkVersion__(snapshot)
+    return snapshot
+## DEF
+
+def saveSnapshot(path, snapshot):
+    """
+        Write the given snapshot to a file that every local worker loads its own copy from.
+        We write to a temporary file first and then rename it so that a worker
+        never reads a half-written snapshot
+    """
+    start = time.time()
+    tmp_path = path + ".tmp"
+    f = open(tmp_path, 'wb')
+    try:
+        pickle.dump(snapshot, f, -1)
+    finally:
+        f.close()
+    os.rename(tmp_path, path)
+    LOG.info("Saved %s to '%s' in %.2f seconds", snapshot, path, time.time() - start)
+## DEF
+
+def loadSnapshot(path):
+    """Read a snapshot that was written by saveSnapshot()"""
+    start = time.time()
+    f = open(path, 'rb')
+    try:
+        snapshot = pickle.load(f)
+    finally:
+        f.close()
+    __checkVersion__(snapshot)
+    LOG.info("Loaded %s from '%s' in %.2f seconds", snapshot, path, time.time() - start)
+    return snapshot
+## DEF
+
+def __checkVersion__(snapshot):
+    if getattr(snapshot, "version", None) != SNAPSHOT_VERSION:
+        raise Exception("Unsupported workload snapshot version")
+## DEF
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import time
+import logging
+
+from message import *
+
+LOG = logging.getLogger(__name__)
+
+# Upper bounds (in seconds) of the buckets of the evaluation time histogram
+# The last bucket holds everything that took longer than the last bound
+EVAL_TIME_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+
+def getEvalTimeBucket(seconds):
+    """Return the index of the evaluation time histogram bucket for the given duration"""
+    for i in xrange(len(EVAL_TIME_BUCKETS)):
+        if seconds <= EVAL_TIME_BUCKETS[i]:
+            return i
+    return len(EVAL_TIME_BUCKETS)
+## DEF
+
+def getEvalTimeBucketName(bucket):
+    if bucket < len(EVAL_TIME_BUCKETS):
+        return "<=%gs" % EVAL_TIME_BUCKETS[bucket]
+    return ">%gs" % EVAL_TIME_BUCKETS[-1]
+## DEF
+
+class SearchTelemetry:
+    """
+        Counters that a search worker collects about its progress. Instead of
+        sending a message for every evaluated design, we send all of the counters
+        to the coordinator at most once per interval. The counters are cumulative,
+        so the coordinator only has to keep the last ones of every worker.
+    """
+    def __init__(self, channel, worker_id, interval, design_cost_cache=None):
+        self.channel = channel
+        self.worker_id = worker_id
+        self.interval = interval
+        # The DesignCostCache whose hits we report
+        self.design_cost_cache = design_cost_cache
+        self.lastFlush = time.time()
+
+        self.evaluated = 0
+        self.pruned = 0
+        self.bestCost = None
+        # Bucket -> Number of evaluated designs
+        self.eval_times = [ 0 ] * (len(EVAL_TIME_BUCKETS) + 1)
+    ## DEF
+
+    def recordEvaluation(self, cost, eval_time):
+        self.evaluated += 1
+        self.eval_times[getEvalTimeBucket(eval_time)] += 1
+        if self.bestCost is None or cost < self.bestCost:
+            self.bestCost = cost
+        self.flush()
+    ## DEF
+
+    def recordPruned(self):
+        self.pruned += 1
+    ## DEF
+
+    def getCounters(self):
+        counters = {
+            "evaluated":  self.evaluated,
+            "pruned":     self.pruned,
+            "bestCost":   self.bestCost,
+            "eval_times": self.eval_times[:],
+        }
+        if self.design_cost_cache:
+            counters["cache_local_hits"] = self.design_cost_cache.local_hits
+            counters["cache_remote_hits"] = self.design_cost_cache.remote_hits
+            counters["cache_misses"] = self.design_cost_cache.misses
+        return counters
+    ## DEF
+
+    def flush(self, force=False):
+        """Send the counters to the coordinator if the interval has passed since the last time"""
+        if self.channel is None: return
+        now = time.time()
+        if not force and now - self.lastFlush < self.interval: return
+        sendMessage(MSG_SEARCH_TELEMETRY, (self.worker_id, self.getCounters()), self.channel)
+        self.lastFlush = now
+    ## DEF
+## CLASS
+
+class SearchProgress:
+    """
+        Coordinator-side view of the progress of all of the search workers.
+        It writes a time series of the best cost to a CSV file if one is given.
+    """
+    def __init__(self, progress_file=None):
+        self.start = time.time()
+        # WorkerId -> Last counters from SearchTelemetry
+        self.workers = { }
+        self.progress_file = progress_file
+        self.lastBestCost = None
+        if self.progress_file:
+            f = open(self.progress_file, 'w')
+            f.write("elapsed,best_cost,evaluated\n")
+            f.close()
+    ## DEF
+
+    def update(self, worker_id, counters):
+        self.workers[worker_id] = counters
+    ## DEF
+
+    def getTotal(self, key):
+        return sum([ c.get(key, 0) for c in self.workers.itervalues() ])
+    ## DEF
+
+    def getEvalTimes(self):
+        eval_times = [ 0 ] * (len(EVAL_TIME_BUCKETS) + 1)
+        for c in self.workers.itervalues():
+            for i in xrange(len(eval_times)):
+                eval_times[i] += c["eval_times"][i]
+        ## FOR
+        return eval_times
+    ## DEF
+
+    def recordBestCost(self, bestCost):
+        """Append the given best cost to the time series if it changed"""
+        if bestCost == self.lastBestCost: return
+        self.lastBestCost = bestCost
+        if not self.progress_file: return
+        f = open(self.progress_file, 'a')
+        f.write("%.3f,%r,%d\n" % (time.time() - self.start, bestCost, self.getTotal("evaluated")))
+        f.close()
+    ## DEF
+
+    def getProgressLine(self, bestCost, running):
+        """Return a single key=value line that summarizes the progress of the search"""
+        elapsed = time.time() - self.start
+        evaluated = self.getTotal("evaluated")
+        fields = [
+            ("elapsed", "%.1f" % elapsed),
+            ("running", running),
+            ("evaluated", evaluated),
+            ("rate", "%.1f" % (evaluated / elapsed if elapsed > 0 else 0.0)),
+            ("pruned", self.getTotal("pruned")),
+            ("cache_hits", self.getTotal("cache_local_hits") + self.getTotal("cache_remote_hits")),
+            ("cache_misses", self.getTotal("cache_misses")),
+            ("best_cost", bestCost),
+        ]
+        eval_times = self.getEvalTimes()
+        for i in xrange(len(eval_times)):
+            fields.append(("eval%s" % getEvalTimeBucketName(i), eval_times[i]))
+        return " ".join([ "%s=%s" % x for x in fields ])
+    ## DEF
+## CLASS
@@ -14,3 +14,4 @@ from utilmethods import *
 from initialdesigner import InitialDesigner
 from randomdesigner import RandomDesigner
 from lnsdesigner import LNSDesigner
+from annealingdesigner import AnnealingDesigner
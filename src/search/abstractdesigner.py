@@ -47,6 +47,10 @@ class AbstractDesigner(Thread):
     def generate(self):
         raise NotImplementedError("Unimplemented %s.generate()" % self.__init__.im_class)
     
+    def setState(self, state):
+        """Optional callback to continue a search from the state saved in a checkpoint"""
+        pass
+    
     def run(self):
         pass
 ## CLASS
\ No newline at end of file
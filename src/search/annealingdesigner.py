@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import sys
+import os
+import math
+import time
+import random
+import logging
+
+# mongodb-d4
+from util import *
+from util import profiler
+from search import bbsearch
+from abstractdesigner import AbstractDesigner
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../multithreaded"))
+
+from message import *
+from telemetry import SearchTelemetry
+LOG = logging.getLogger(__name__)
+
+# Constants
+MOVE_SHARD_KEY = "shardKey"
+MOVE_DENORM = "denorm"
+MOVE_ADD_INDEX = "addIndex"
+MOVE_DROP_INDEX = "dropIndex"
+
+# Once the temperature drops below this fraction of the initial
+# temperature, we restart from the best design with the initial temperature
+REHEAT_RATIO = 0.001
+
+# Send our search state to the coordinator after this many evaluated designs
+STATE_MESSAGE_INTERVAL = 100
+
+## ==============================================
+## AnnealingDesigner
+## ==============================================
+class AnnealingDesigner(AbstractDesigner):
+    """
+        Implementation of a simulated annealing design algorithm.
+        Every move changes the shard key, the denormalization parent or one of the
+        indexes of a single collection, so the cost model only has to re-evaluate
+        the collections whose design has changed.
+    """
+
+    def __init__(self, collections, designCandidates, workload, config, costModel, initialDesign, bestCost, channel=None, lock=None, worker_id=None):
+        AbstractDesigner.__init__(self, collections, workload, config)
+        self.costModel = costModel
+        self.designCandidates = designCandidates
+
+        self.init_bestDesign = initialDesign.copy()
+        self.init_bestCost = bestCost
+
+        self.timeout = self.config.getint(configutil.SECT_MULTI_SEARCH, 'time_for_lnssearch')
+        self.patient_time = self.config.getint(configutil.SECT_MULTI_SEARCH, 'patient_time')
+        self.init_temperature = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'annealing_init_temp')
+        self.cooling_rate = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'annealing_cooling_rate')
+        assert 0.0 < self.cooling_rate < 1.0
+
+        self.channel = channel
+        self.bestLock = lock
+        self.worker_id = worker_id
+        self.rng = random.Random(deriveSeed(configutil.getSeed(self.config), "annealing", worker_id))
+        self.telemetry = SearchTelemetry(channel, worker_id, \
+                                         self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'telemetry_interval'), \
+                                         getattr(costModel, "design_cost_cache", None))
+
+        self.bestCost = bestCost
+        self.bestDesign = initialDesign.copy()
+        # Set when the coordinator sends us a better design than our own
+        self.bestUpdated = False
+
+        # Time-to-best trace: (elapsed seconds, number of evaluated designs, cost)
+        self.trace = [ ]
+        self.evaluated = 0
+        self.accepted = 0
+        # Search state from a checkpoint that we will continue from
+        self.resume_state = None
+    ## DEF
+    
+    def setState(self, state):
+        self.resume_state = state
+    ## DEF
+
+    def run(self):
+        """
+            main public method. Simply call to get the optimal solution
+        """
+        profiler.getProfiler().start("search")
+        try:
+            self.__run__()
+        finally:
+            profiler.getProfiler().stop("search")
+        self.telemetry.flush(True)
+        sendMessage(MSG_EXECUTE_COMPLETED, self.worker_id, self.channel)
+    ## DEF
+
+    def __run__(self):
+        start = time.time()
+        lastImprovement = start
+        self.trace.append((0.0, 0, self.bestCost))
+
+        currentDesign = self.init_bestDesign.copy()
+        currentCost = self.init_bestCost
+        # The temperature is relative to the cost of the initial design
+        # so that the same configuration works across workloads
+        init_temperature = max(self.init_temperature * self.init_bestCost, sys.float_info.min)
+        temperature = init_temperature
+        timeout = self.timeout
+        if self.resume_state:
+            LOG.info("Resuming annealing search from checkpoint state")
+            timeout -= self.resume_state["elapsed"]
+            temperature = self.resume_state["temperature"]
+            self.rng.setstate(self.resume_state["rng"])
+        ## IF
+        used = self.timeout - timeout
+
+        while True:
+            now = time.time()
+            if now - start >= timeout:
+                break
+            if now - lastImprovement >= self.patient_time:
+                LOG.info("Haven't found a better design for %s seconds. QUIT", now - lastImprovement)
+                break
+
+            self.bestLock.acquire()
+            if self.bestUpdated:
+                # Another worker found a better design, so continue from there
+                currentDesign = self.bestDesign.copy()
+                currentCost = self.bestCost
+                self.bestUpdated = False
+                lastImprovement = now
+            self.bestLock.release()
+
+            design = self.neighbor(currentDesign)
+            if design is None:
+                LOG.info("There are no moves left for this design. QUIT")
+                break
+            evalStart = time.time()
+            cost = self.costModel.overallCost(design)
+            self.evaluated += 1
+            self.telemetry.recordEvaluation(cost, time.time() - evalStart)
+
+            if cost <= currentCost or \
+               self.rng.random() < math.exp((currentCost - cost) / temperature):
+                currentDesign = design
+                currentCost = cost
+                self.accepted += 1
+            ## IF
+
+            self.bestLock.acquire()
+            if currentCost < self.bestCost:
+                self.bestCost = currentCost
+                self.bestDesign = currentDesign.copy()
+                self.trace.append((time.time() - start, self.evaluated, self.bestCost))
+                lastImprovement = time.time()
+                sendMessage(MSG_FOUND_BEST_COST, (self.bestCost, self.bestDesign), self.channel)
+            self.bestLock.release()
+
+            if self.evaluated % STATE_MESSAGE_INTERVAL == 0:
+                # Let the coordinator know where we are so that it can checkpoint it
+                state = {
+                    "elapsed":     used + time.time() - start,
+                    "temperature": temperature,
+                    "rng":         self.rng.getstate(),
+                }
+                sendMessage(MSG_SEARCH_STATE, (self.worker_id, state), self.channel)
+            ## IF
+
+            temperature *= self.cooling_rate
+            if temperature < init_temperature * REHEAT_RATIO:
+                currentDesign = self.bestDesign.copy()
+                currentCost = self.bestCost
+                temperature = init_temperature
+            ## IF
+        ## WHILE
+
+        LOG.info("Annealing search evaluated %d designs and accepted %d moves in %.1f seconds", \
+                 self.evaluated, self.accepted, time.time() - start)
+        LOG.info("Time-to-best trace [seconds, evaluated designs, cost]:\n%s", \
+                 "\n".join(["%.2f, %d, %f" % x for x in self.trace]))
+    ## DEF
+
+    def updateBest(self, bestCost, bestDesign):
+        self.bestLock.acquire()
+        if bestCost < self.bestCost:
+            self.bestCost = bestCost
+            self.bestDesign = bestDesign.copy()
+            self.bestUpdated = True
+        ## IF
+        self.bestLock.release()
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## MOVES
+    ## -----------------------------------------------------------------------
+
+    def neighbor(self, design):
+        """
+            Return a copy of the given design with one random feasible move applied
+            to one random collection. Returns None if no move is possible.
+        """
+        col_names = sorted(self.designCandidates.collections)
+        self.rng.shuffle(col_names)
+        for col_name in col_names:
+            moves = self.getMoves(design, col_name)
+            if not moves: continue
+            move = self.rng.choice(moves)
+            newDesign = design.copy()
+            self.applyMove(newDesign, col_name, move)
+            return newDesign
+        ## FOR
+        return None
+    ## DEF
+
+    def getMoves(self, design, col_name):
+        """Return the list of move types that can be applied to the given collection"""
+        moves = [ ]
+        isDenormalized = design.isDenormalized(col_name)
+        if not isDenormalized and self.designCandidates.shardKeys[col_name]:
+            moves.append(MOVE_SHARD_KEY)
+        if self.designCandidates.denorm[col_name]:
+            moves.append(MOVE_DENORM)
+        indexes = design.getIndexes(col_name)
+        if self.designCandidates.indexKeys[col_name] and len(indexes) < constants.MAX_INDEX_SIZE:
+            moves.append(MOVE_ADD_INDEX)
+        if indexes:
+            moves.append(MOVE_DROP_INDEX)
+        return moves
+    ## DEF
+
+    def applyMove(self, design, col_name, move):
+        if design.isRelaxed(col_name):
+            design.recover(col_name)
+
+        if move == MOVE_SHARD_KEY:
+            keys = self.designCandidates.shardKeys[col_name][:bbsearch.SHARD_KEY_MAX_COMPOUND_COUNT]
+            size = self.rng.randint(1, len(keys))
+            shardKey = tuple(self.rng.sample(keys, size))
+            design.addShardKey(col_name, shardKey)
+
+        elif move == MOVE_DENORM:
+            # Either move the collection back to its own documents
+            # or embed it inside of a different parent
+            current = design.getDenormalizationParent(col_name)
+            choices = [ None ] + self.designCandidates.denorm[col_name]
+            choices = filter(lambda x: x != current and bbsearch.isFeasible(design, col_name, x), choices)
+            if not choices: return
+            denorm = self.rng.choice(choices)
+            design.setDenormalizationParent(col_name, denorm)
+            if denorm is not None:
+                # Embedded collections do not have their own shard keys
+                design.removeShardKeys(col_name)
+
+        elif move == MOVE_ADD_INDEX:
+            indexes = design.getIndexes(col_name)
+            choices = filter(lambda x: not tuple(x) in indexes, self.designCandidates.indexKeys[col_name])
+            if not choices: return
+            design.addIndex(col_name, self.rng.choice(choices))
+
+        elif move == MOVE_DROP_INDEX:
+            indexes = design.getIndexes(col_name)
+            design.removeIndex(col_name, self.rng.choice(indexes))
+        ## IF
+    ## DEF
+## CLASS
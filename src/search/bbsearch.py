@@ -52,7 +52,7 @@ class BBSearch ():
         initialized, solving, solved, timed_out, user_terminated, updated_design
     """
 
-    def __init__(self, designCandidate, costModel, relaxedDesingn, bestCost, timeout, channel=None, lock=None):
+    def __init__(self, designCandidate, costModel, relaxedDesingn, bestCost, timeout, channel=None, lock=None, telemetry=None, seed=None):
         """
             class constructor
             args:
@@ -61,6 +61,8 @@ class BBSearch ():
             * initialDesign (instance of Design)
             * bestCost (float; cost of initialDesign, upper bound)
             * timeout (in sec)
+            * telemetry (optional SearchTelemetry that counts evaluated and pruned designs)
+            * seed (optional seed for the order in which the collections are assigned)
         """
 
         # all nodes have a pointer to the bbsearch object
@@ -68,6 +70,8 @@ class BBSearch ():
         self.terminated = False
         # store keys list... used only to translate integer iterators back to real key values...
         self.designCandidate = designCandidate
+        # All nodes share one generator so that a seeded search is reproducible
+        self.rng = random.Random(seed)
         self.rootNode = BBNode(relaxedDesingn, self, True, 0) #rootNode: True
         self.costModel = costModel
         self.bestDesign = relaxedDesingn
@@ -79,6 +83,7 @@ class BBSearch ():
 
         self.channel = channel
         self.bestLock = lock
+        self.telemetry = telemetry
         
         self.debug = LOG.isEnabledFor(logging.DEBUG)
         return
@@ -177,6 +182,37 @@ class BBSearch ():
 ## CLASS
 
 
+def isFeasible(design, col_name, denorm):
+    ###             CONSTRAINTS     
+    ### --- Solution Feasibility Check ---
+    
+    # IMPORTANT
+    # This might be a stupid way of doing it, but let's go with it for now
+    # --> check feasibility of denormalizing col_name into denorm in this partial solution:
+    #   * embedded collections should not have a sharding key
+    #       -note: actually, the sharding key could be picked from the embedded collection,
+    #       but in that case we must ensure the sharding key is not assigned on the enclosing collection...
+    #   * NO CIRCULAR EMBEDDING
+    
+    feasible = True
+    # NO CIRCULAR EMBEDDING - this checks against "embedding in itself" as well
+    denorm_parent = denorm
+    # traverse the embedding chain to the end and detect cycles:
+    while denorm_parent:
+        # if the end of the "embedded_in" chain is col_name, it is a CYCLE
+        if denorm_parent == col_name:
+            feasible = False
+            break
+        denorm_parent = design.getDenormalizationParent(denorm_parent)
+        
+    # Empty denormalization collection?
+    if not denorm is None and len(denorm) == 0:
+        LOG.warn("Invalid denormalization candidate '%s' for collection %s", denorm, col_name)
+        feasible = False
+    
+    return feasible
+## DEF
+
 '''
 helper Classes
 '''
@@ -488,34 +524,7 @@ class BBNode():
         return child
 
     def __isFeasible__(self, denorm, shardKey):
-        ###             CONSTRAINTS     
-        ### --- Solution Feasibility Check ---
-        
-        # IMPORTANT
-        # This might be a stupid way of doing it, but let's go with it for now
-        # --> check feasibility of this partial solution:
-        #   * embedded collections should not have a sharding key
-        #       -note: actually, the sharding key could be picked from the embedded collection,
-        #       but in that case we must ensure the sharding key is not assigned on the enclosing collection...
-        #   * NO CIRCULAR EMBEDDING
-        
-        feasible = True
-        # NO CIRCULAR EMBEDDING - this checks against "embedding in itself" as well
-        denorm_parent = denorm
-        # traverse the embedding chain to the end and detect cycles:
-        while denorm_parent:
-            # if the end of the "embedded_in" chain is currentCol, it is a CYCLE
-            if denorm_parent == self.currentCol:
-                feasible = False
-                break
-            denorm_parent = self.design.getDenormalizationParent(denorm_parent)
-            
-        # Empty denormalization collection?
-        if not denorm is None and len(denorm) == 0:
-            LOG.warn("Invalid denormalization candidate '%s' for collection %s", denorm, self.currentCol)
-            feasible = False
-        
-        return feasible
+        return isFeasible(self.design, self.currentCol, denorm)
     
     def prepareChildren(self):
         # initialize iterators 
@@ -544,8 +553,10 @@ class BBNode():
             LOG.debug(".",)
             LOG.debug(self)
         # add child only when the solution is admissible
+        start = time.time()
         self.cost = self.bbsearch.costModel.overallCost(self.design)
-        sendMessage(MSG_EVALUATED_ONE_DESIGN, (self.bbsearch.bestCost, self.cost), self.bbsearch.channel)
+        if self.bbsearch.telemetry:
+            self.bbsearch.telemetry.recordEvaluation(self.cost, time.time() - start)
 #        LOG.debug("EVAL NODE: %s / bound_lower:%f / bound_upper:%f / BOUND:%f", \
 #                  self.design, self.lower_bound, self.upper_bound, self.bbsearch.lower_bound)
 
@@ -563,6 +574,8 @@ class BBNode():
         # So when this function returns False, the node is discarded
         isCostBetter = (self.cost <= self.bbsearch.bestCost)
         self.bbsearch.bestLock.release()
+        if not isCostBetter and self.bbsearch.telemetry:
+            self.bbsearch.telemetry.recordPruned()
         return isCostBetter
         
 
@@ -604,8 +617,8 @@ class BBNode():
         self.bbsearch = bb
         self.children = [] # list of BBNode
         self.debug = LOG.isEnabledFor(logging.DEBUG)
-        self.candidate_collections = [col_name for col_name in self.bbsearch.designCandidate.collections]
-        self.random_instance = random.Random()
+        self.candidate_collections = sorted(self.bbsearch.designCandidate.collections)
+        self.random_instance = self.bbsearch.rng
         return
         
 
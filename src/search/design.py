@@ -7,6 +7,7 @@ sys.path.append(os.path.join(basedir, ".."))
 
 import logging
 import json
+import hashlib
 from util import *
 
 LOG = logging.getLogger(__name__)
@@ -88,6 +89,22 @@ class Design(object):
     ## COMPARISON METHODS
     ## ----------------------------------------------
         
+    def getHash(self):
+        """
+            Return a hash of this design that is the same in every process,
+            so that it can be used to share the costs of designs between workers
+        """
+        items = [ ]
+        for col_name in sorted(self.data.iterkeys()):
+            v = self.data[col_name]
+            if v is None:
+                items.append((col_name, None))
+            else:
+                items.append((col_name, v['shardKeys'], v['denorm'], v['indexes']))
+        ## FOR
+        return hashlib.md5(json.dumps(items)).hexdigest()
+    ## DEF
+
     def getDelta(self, other):
         """
             Return the list of collection names that have a different design
@@ -208,6 +225,10 @@ class Design(object):
             self.data[col_name]['shardKeys'] = key
     ## DEF
 
+    def removeShardKeys(self, col_name):
+        self.data[col_name]['shardKeys'] = []
+    ## DEF
+
     def getShardKeys(self, col_name):
         if self.data[col_name]:
             return self.data[col_name]['shardKeys']
@@ -258,6 +279,12 @@ class Design(object):
                 self.data[col_name]['indexes'].append(indexKeys)
     ## DEF
     
+    def removeIndex(self, col_name, indexKeys):
+        indexKeys = tuple(indexKeys)
+        if indexKeys in self.data[col_name]['indexes']:
+            self.data[col_name]['indexes'].remove(indexKeys)
+    ## DEF
+    
     def hasIndex(self, col_name, list):
         if self.data[col_name]:
             return False
@@ -21,8 +21,13 @@
 # ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 # -----------------------------------------------------------------------
+import gc
 import itertools
 import logging
+try:
+   import cPickle as pickle
+except:
+   import pickle
 import operator
 import time
 import os
@@ -42,13 +47,18 @@ from operator import itemgetter
 from initialdesigner import InitialDesigner
 from design import Design
 from lnsdesigner import LNSDesigner
+from annealingdesigner import AnnealingDesigner
 from randomdesigner import RandomDesigner
 from costmodel import CostModel
 from util import constants
 from util import configutil
+from util import profiler
 from designcandidates import DesignCandidates
 
 from message import *
+from snapshot import WorkloadSnapshot
+from workload.filestore import FileStore, exportMetadata
+from costcache import DesignCostCache
 import thread
 
 LOG = logging.getLogger(__name__)
@@ -77,23 +87,39 @@ class Designer():
         # compute whatever stuff that it needs
         self.dataset_db = dataset_db
 
+        # If set, we read the catalog and the workload from this
+        # file-backed store instead of the metadata database
+        self.metadata_dir = configutil.getMetadataDir(config)
+
         self.initialSolution = None
         self.finalSolution = None
 
         # self.page_size = self.config.getint(configutil.SECT_CLUSTER, 'page_size')
         self.page_size = constants.DEFAULT_PAGE_SIZE
         self.sample_rate = self.config.getint(configutil.SECT_DESIGNER, 'sample_rate')
+        self.field_sketches = configutil.getBoolean(self.config, configutil.SECT_DESIGNER, 'field_sketches')
+        self.schema_workers = self.config.getint(configutil.SECT_DESIGNER, 'schema_workers')
 
         self.sess_limit = None
         self.op_limit = None
 
+        # Previous design that the search starts from
+        self.warm_start = None
+        # File with the per-query-class cost data of a previous run
+        self.cost_cache = None
+
         # Used for multithread
         self.channel = channel
         self.search_method = None
         self.designCandidates = None
         self.collections = None
         self.cm = None
+        # DesignCostCache that we share with the other search workers
+        self.design_cost_cache = None
         self.workload = None
+        # Workload snapshot from the coordinator that we use
+        # instead of reading from the metadata database
+        self.snapshot = None
         
         self.debug = LOG.isEnabledFor(logging.DEBUG)
     ## DEF
@@ -127,7 +153,8 @@ class Designer():
         import inputs.mongodb
 
         # MongoDB Trace
-        converter = inputs.mongodb.MongoSniffConverter(
+        converterClass = inputs.mongodb.MongoLogConverter if self.mongo_log else inputs.mongodb.MongoSniffConverter
+        converter = converterClass(
             self.metadata_db,
             self.dataset_db,
             fd,
@@ -142,14 +169,29 @@ class Designer():
         converter.no_mongo_dependencies = self.no_mongo_dependencies
         converter.random_sessionizer = self.random_sessionizer
         converter.mongo_skip = self.mongo_skip
+        converter.mongo_pcap = self.mongo_pcap
+        converter.mongo_port = self.mongo_port
         converter.sess_limit = self.sess_limit
         converter.op_limit = self.op_limit
+        converter.sample_rate = self.sample_rate
+        converter.field_sketches = self.field_sketches
+        converter.schema_workers = self.schema_workers
+        converter.parse_workers = self.config.getint(configutil.SECT_MONGODB, 'parse_workers')
+        converter.checkpoint_lines = self.config.getint(configutil.SECT_MONGODB, 'checkpoint_lines')
+        converter.checkpoint_seconds = self.config.getfloat(configutil.SECT_MONGODB, 'checkpoint_seconds')
+        converter.reconstruct_batch_size = self.config.getint(configutil.SECT_MONGODB, 'reconstruct_batch_size')
+        converter.reconstruct_workers = self.config.getint(configutil.SECT_MONGODB, 'reconstruct_workers')
+        converter.reconstruct_in_memory = configutil.getBoolean(self.config, configutil.SECT_MONGODB, 'reconstruct_in_memory')
+        if self.config.get(configutil.SECT_MONGODB, 'session_idle_timeout'):
+            converter.idle_timeout = self.config.getfloat(configutil.SECT_MONGODB, 'session_idle_timeout')
 
         converter.process(
             no_load=no_load,
             no_post_process=no_post_process,
             page_size=self.page_size,
         )
+        if self.metadata_dir:
+            exportMetadata(self.metadata_db, self.metadata_dir)
     ## DEF
 
     def processMySQLInput(self, no_load=False, no_post_process=False):
@@ -171,6 +213,9 @@ class Designer():
         converter.no_mysql_dataset = self.no_mysql_dataset
         converter.sess_limit = self.sess_limit
         converter.op_limit = self.op_limit
+        converter.sample_rate = self.sample_rate
+        converter.field_sketches = self.field_sketches
+        converter.schema_workers = self.schema_workers
         
         # Process the inputs and then save the results in mongodb
         converter.process(
@@ -178,6 +223,8 @@ class Designer():
             no_post_process=no_post_process,
             page_size=self.page_size,
         )
+        if self.metadata_dir:
+            exportMetadata(self.metadata_db, self.metadata_dir)
     ## DEF
 
     def generateDesignCandidates(self, collections, isShardingEnabled=True, isIndexesEnabled=True, isDenormalizationEnabled=True):
@@ -272,7 +319,11 @@ class Designer():
 
     def loadCollections(self):
         collections = dict()
-        for col_info in self.metadata_db.Collection.fetch():
+        if self.metadata_dir:
+            cursor = FileStore(self.metadata_dir).fetchCollections()
+        else:
+            cursor = self.metadata_db.Collection.fetch()
+        for col_info in cursor:
             # Skip any collection that doesn't have any documents in it
             # This is because we won't be able to make any estimates about how
             # big the collection actually is
@@ -293,22 +344,47 @@ class Designer():
         workload = [ ]
         workloadQuery = {"operations.collection": {"$in": collections.keys()}}
         op_ctr = 0
-        cursor = self.metadata_db.Session.fetch(workloadQuery)
         if not self.sess_limit is None:
             assert self.sess_limit >= 0
-            cursor.limit(self.sess_limit)
-        for sess in cursor:
-            if not self.op_limit is None and op_ctr >= self.op_limit:
-                break
-            workload.append(sess)
-            op_ctr += len(sess['operations'])
-        ## FOR
+        if self.metadata_dir:
+            store = FileStore(self.metadata_dir)
+            LOG.info("Loading workload from %s", store)
+            cursor = store.fetchSessions(collections.keys())
+        else:
+            cursor = self.metadata_db.Session.fetch(workloadQuery)
+            if not self.sess_limit is None:
+                cursor.limit(self.sess_limit)
+        # The garbage collector would otherwise keep on traversing all of
+        # the sessions that we already loaded while we load the next ones
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for sess in cursor:
+                if not self.op_limit is None and op_ctr >= self.op_limit:
+                    break
+                if not self.sess_limit is None and len(workload) >= self.sess_limit:
+                    break
+                workload.append(sess)
+                op_ctr += len(sess['operations'])
+            ## FOR
+        finally:
+            if enabled: gc.enable()
         if not len(workload):
             raise Exception("No workload sessions were found in database\n%s" % pformat(workloadQuery))
         LOG.info("Loaded %d sessions with %d operations from workload database", len(workload), op_ctr)
         return workload
     ## DEF
 
+    def createWorkloadSnapshot(self):
+        """Load the collections and the workload into a snapshot that the search workers can share"""
+        profiler.getProfiler().start("load-workload")
+        try:
+            collections = self.loadCollections()
+            return WorkloadSnapshot(collections, self.loadWorkload(collections))
+        finally:
+            profiler.getProfiler().stop("load-workload")
+    ## DEF
+
     ## -------------------------------------------------------------------------
     ## DESIGNER EXECUTION
     ## -------------------------------------------------------------------------
@@ -322,10 +398,24 @@ class Designer():
         isIndexesEnabled = self.config.getboolean(configutil.SECT_DESIGNER, 'enable_indexes')
         isDenormalizationEnabled = self.config.getboolean(configutil.SECT_DESIGNER, 'enable_denormalization')
 
-        self.collections = self.loadCollections()
-        self.workload = self.loadWorkload(self.collections)
+        profiler.getProfiler().start("load-workload")
+        try:
+            if self.snapshot is None:
+                self.collections = self.loadCollections()
+                self.workload = self.loadWorkload(self.collections)
+            else:
+                self.collections = self.snapshot.getCollections()
+                self.workload = self.snapshot.getWorkload()
+                LOG.info("Loaded %d collections and %d sessions from workload snapshot", \
+                         len(self.collections), len(self.workload))
+        finally:
+            profiler.getProfiler().stop("load-workload")
         # Generate all the design candidates
-        self.designCandidates = self.generateDesignCandidates(self.collections, isShardingEnabled, isIndexesEnabled, isDenormalizationEnabled)
+        profiler.getProfiler().start("candidates")
+        try:
+            self.designCandidates = self.generateDesignCandidates(self.collections, isShardingEnabled, isIndexesEnabled, isDenormalizationEnabled)
+        finally:
+            profiler.getProfiler().stop("candidates")
         #LOG.info("candidates: %s\n", self.designCandidates)
         # Instantiate cost model
         cmConfig = {
@@ -339,6 +429,8 @@ class Designer():
             'window_size':    self.config.getint(configutil.SECT_COSTMODEL, 'window_size')
         }
         self.cm = CostModel(self.collections, self.workload, cmConfig)
+        if self.cost_cache and os.path.exists(self.cost_cache):
+            self.loadCostCache(self.cost_cache)
 #        if self.debug:
 #            state.debug = True
 #            costmodel.LOG.setLevel(logging.DEBUG)
@@ -347,29 +439,116 @@ class Designer():
         # This will be the upper bound from starting design
         
         if not replay:
-            initialDesign = InitialDesigner(self.collections, self.workload, self.config).generate()
-            
-            if init:
-                print initialDesign.toJSON()
-            #import pycallgraph
-            #pycallgraph.start_trace()
-            
-            initialCost = self.cm.overallCost(initialDesign)
+            profiler.getProfiler().start("initial-design")
+            try:
+                initialDesign = InitialDesigner(self.collections, self.workload, self.config).generate()
+                
+                if init:
+                    print initialDesign.toJSON()
+                #import pycallgraph
+                #pycallgraph.start_trace()
+                
+                if self.warm_start:
+                    # Evaluate the previous design first so that it can use the cached cost data
+                    warmDesign = self.loadWarmStartDesign(self.warm_start, initialDesign)
+                    warmCost = self.cm.overallCost(warmDesign)
+                initialCost = self.cm.overallCost(initialDesign)
+            finally:
+                profiler.getProfiler().stop("initial-design")
             
             #pycallgraph.make_dot_graph('d4.png')
             
+            if self.warm_start:
+                LOG.info("Warm start design cost: %s / Initial design cost: %s", warmCost, initialCost)
+                if warmCost <= initialCost:
+                    return warmCost, warmDesign
             return initialCost, initialDesign
         else:
             self.cm.overallCost(replay_design)
             return None
     ## DEF
     
-    def search(self, initialCost, initialDesign, worker_id):
+    def loadWarmStartDesign(self, path, initialDesign):
+        """
+            Read the design of a previous run from the given file so that we can start
+            the search from it. Collections that are not in the previous design keep
+            their initial design and we drop anything that refers to collections that
+            no longer exist.
+        """
+        from design_deserializer import Deserializer
+        ds = Deserializer()
+        ds.loadDesignFile(path)
+        prevDesign = ds.Deserialize()
+
+        design = initialDesign.copy()
+        for col_name in design.getCollections():
+            if not prevDesign.hasCollection(col_name) or prevDesign.isRelaxed(col_name):
+                LOG.info("Collection '%s' is not in the warm start design. Using its initial design", col_name)
+                continue
+            design.recover(col_name)
+            shardKeys = prevDesign.getShardKeys(col_name)
+            if shardKeys: design.addShardKey(col_name, tuple(shardKeys))
+            for indexKeys in prevDesign.getIndexes(col_name):
+                design.addIndex(col_name, indexKeys)
+        ## FOR
+        for col_name in design.getCollections():
+            if not prevDesign.hasCollection(col_name) or prevDesign.isRelaxed(col_name): continue
+            parent = prevDesign.getDenormalizationParent(col_name)
+            if parent and design.hasCollection(parent):
+                design.setDenormalizationParent(col_name, parent)
+        ## FOR
+        LOG.info("Loaded warm start design from '%s'\n%s", path, design)
+        return design
+    ## DEF
+
+    def loadCostCache(self, path):
+        """Reuse the per-query-class cost data that saveCostCache() wrote in a previous run"""
+        threshold = self.config.getfloat(configutil.SECT_COSTMODEL, 'cost_cache_threshold')
+        f = open(path, 'rb')
+        try:
+            data = pickle.load(f)
+        finally:
+            f.close()
+        LOG.info("Loaded cost cache for %d collections from '%s'", len(data), path)
+        self.cm.loadQueryClassCache(data, threshold)
+    ## DEF
+
+    def saveCostCache(self, path, design):
+        """
+            Evaluate the given design and write the per-query-class cost data that
+            the cost model computed for it to the given file
+        """
+        self.cm.computeCost(design)
+        data = self.cm.getQueryClassCache()
+        tmp_path = path + ".tmp"
+        f = open(tmp_path, 'wb')
+        try:
+            pickle.dump(data, f, -1)
+        finally:
+            f.close()
+        os.rename(tmp_path, path)
+        LOG.info("Saved cost cache for %d collections to '%s'", len(data), path)
+    ## DEF
+
+    def search(self, initialCost, initialDesign, worker_id, state=None):
         """
             Main search process starts here
+            The optional state is the search state of this worker from a checkpoint
         """
         lock = thread.allocate_lock()
-        self.search_method = LNSDesigner(self.collections, self.designCandidates, self.workload, self.config, self.cm, initialDesign, initialCost, self.channel, lock, worker_id)
+        if self.channel and configutil.getBoolean(self.config, configutil.SECT_MULTI_SEARCH, 'shared_cost_cache'):
+            self.design_cost_cache = DesignCostCache(self.channel, worker_id)
+            self.cm.design_cost_cache = self.design_cost_cache
+        algorithm = self.config.get(configutil.SECT_MULTI_SEARCH, 'search_algorithm')
+        if algorithm == "lns":
+            designerClass = LNSDesigner
+        elif algorithm == "annealing":
+            designerClass = AnnealingDesigner
+        else:
+            raise Exception("Unknown search algorithm '%s'" % algorithm)
+        self.search_method = designerClass(self.collections, self.designCandidates, self.workload, self.config, self.cm, initialDesign, initialCost, self.channel, lock, worker_id)
+        if state:
+            self.search_method.setState(state)
         self.search_method.start()
     ## DEF
 
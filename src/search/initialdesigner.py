@@ -32,6 +32,7 @@ from pprint import pformat
 from design import Design
 import workload
 from util import Histogram, configutil, constants
+from util.utilmethods import deriveSeed
 from abstractdesigner import AbstractDesigner
 import utilmethods
 
@@ -49,6 +50,7 @@ class InitialDesigner(AbstractDesigner):
         AbstractDesigner.__init__(self, collections, workload, config)
         self.address_size = constants.DEFAULT_ADDRESS_SIZE
         self.debug = LOG.isEnabledFor(logging.DEBUG)
+        self.rng = random.Random(deriveSeed(configutil.getSeed(config), "initial"))
     ## DEF
     
     def generate(self):
@@ -95,12 +97,12 @@ class InitialDesigner(AbstractDesigner):
     ## DEF
     
     def __selectShardingKeys__(self, design, col_keys):
-        for col_name, h in col_keys.iteritems():
+        for col_name, h in sorted(col_keys.iteritems()):
             max_keys = h.getMaxCountKeys()
             if self.debug:
                 LOG.debug("Sharding Key Candidates %s => %s", col_name, max_keys)
             if len(max_keys) > 0:
-                design.addShardKey(col_name, random.choice(max_keys))
+                design.addShardKey(col_name, self.rng.choice(sorted(max_keys)))
             else:
                 design.addShardKey(col_name, [])
         ## FOR
@@ -27,9 +27,11 @@ import os
 import math
 import random
 import logging
+import Queue
 
 # mongodb-d4
 from util import *
+from util import profiler
 from search import bbsearch
 from abstractdesigner import AbstractDesigner
 
@@ -37,6 +39,7 @@ basedir = os.path.realpath(os.path.dirname(__file__))
 sys.path.append(os.path.join(basedir, "../multithreaded"))
 
 from message import *
+from telemetry import SearchTelemetry
 LOG = logging.getLogger(__name__)
 
 # Constants
@@ -44,6 +47,16 @@ RELAX_RATIO_STEP = 0.1
 RELAX_RATIO_UPPER_BOUND = 0.5
 INIFITY = float('inf')
 
+# Adaptive relaxation
+ADAPTIVE_MIN_COST_SHARE = 0.01 # Keeps collections with no cost from never getting relaxed
+ADAPTIVE_MIN_SCORE = 0.05 # Keeps collections that never improve from never getting relaxed
+ADAPTIVE_REWARD_IMPROVED = 1.0
+ADAPTIVE_REWARD_NOT_IMPROVED = 0.0
+ADAPTIVE_COUPLING_BOOST = 4.0 # Weight boost for collections that can be denormalized with a picked one
+
+# Seconds to wait for the coordinator to assign a neighborhood before picking one ourselves
+NEIGHBORHOOD_TIMEOUT = 60
+
 ## ==============================================
 ## LNSDesigner
 ## ==============================================
@@ -52,12 +65,10 @@ class LNSDesigner(AbstractDesigner):
         Implementation of the large-neighborhood search design algorithm
     """
     class RandomCollectionGenerator:
-        def __init__(self, collections):
-            self.rng = random.Random()
-            self.collections = [ ]
-            for col_name in collections.iterkeys():
-                self.collections.append(col_name)
-            ## FOR
+        def __init__(self, collections, seed=None):
+            self.rng = random.Random(seed)
+            # Sorted so that the same seed always picks the same collections
+            self.collections = sorted(collections.iterkeys())
             self.length = len(self.collections)
         ## DEF
         
@@ -65,6 +76,132 @@ class LNSDesigner(AbstractDesigner):
             r = self.rng.sample(self.collections, num)
             return r
         ## DEF
+        
+        def updateCosts(self, col_costs):
+            """Optional callback for when the cost breakdown of the best design changes"""
+            pass
+        ## DEF
+        
+        def update(self, col_names, oldCost, newCost):
+            """Optional callback for when a search over the given relaxed collections finishes"""
+            pass
+        ## DEF
+        
+        def getState(self):
+            return {"rng": self.rng.getstate()}
+        ## DEF
+        
+        def setState(self, state):
+            self.rng.setstate(state["rng"])
+        ## DEF
+    ## CLASS
+    
+    class AdaptiveCollectionGenerator(RandomCollectionGenerator):
+        """
+            Picks the collections to relax with a probability that is proportional to
+            their share of the cost of the current best design and to how often relaxing
+            them has recently led to a better design (adaptive large neighborhood search).
+            Collections that can be denormalized into each other are more likely to be
+            relaxed together.
+        """
+        def __init__(self, collections, designCandidates=None, reaction=0.5, seed=None):
+            LNSDesigner.RandomCollectionGenerator.__init__(self, collections, seed)
+            assert 0.0 <= reaction <= 1.0
+            self.reaction = reaction
+            
+            # ColName -> Share of the best design's cost
+            self.col_costs = dict([(col_name, 1.0 / self.length) for col_name in self.collections])
+            # ColName -> Smoothed reward of the searches that relaxed this collection
+            self.scores = dict([(col_name, 1.0) for col_name in self.collections])
+            # ColName -> [Number of searches, Number of searches that found a better design]
+            self.attempts = dict([(col_name, [0, 0]) for col_name in self.collections])
+            
+            # ColName -> Set of collections it can be denormalized with (in both directions)
+            self.neighbors = dict([(col_name, set()) for col_name in self.collections])
+            if designCandidates:
+                for col_name, parents in designCandidates.denorm.iteritems():
+                    if not col_name in self.neighbors: continue
+                    for parent_col in parents:
+                        if not parent_col in self.neighbors or parent_col == col_name: continue
+                        self.neighbors[col_name].add(parent_col)
+                        self.neighbors[parent_col].add(col_name)
+                    ## FOR
+                ## FOR
+            ## IF
+        ## DEF
+        
+        def getWeight(self, col_name):
+            return (self.col_costs.get(col_name, 0.0) + ADAPTIVE_MIN_COST_SHARE) * \
+                   max(self.scores[col_name], ADAPTIVE_MIN_SCORE)
+        ## DEF
+        
+        def getRandomCollections(self, num):
+            weights = dict([(col_name, self.getWeight(col_name)) for col_name in self.collections])
+            r = [ ]
+            while len(r) < num and len(weights) > 0:
+                col_name = self.__pick__(weights)
+                r.append(col_name)
+                del weights[col_name]
+                for neighbor in self.neighbors[col_name]:
+                    if neighbor in weights:
+                        weights[neighbor] *= ADAPTIVE_COUPLING_BOOST
+                ## FOR
+            ## WHILE
+            return r
+        ## DEF
+        
+        def __pick__(self, weights):
+            # Iterate in a fixed order so that the pick only depends on our rng
+            col_names = sorted(weights.iterkeys())
+            point = self.rng.random() * sum(weights.itervalues())
+            for col_name in col_names:
+                point -= weights[col_name]
+                if point < 0:
+                    return col_name
+            ## FOR
+            return col_names[-1]
+        ## DEF
+        
+        def updateCosts(self, col_costs):
+            total = sum(col_costs.itervalues())
+            for col_name in self.collections:
+                if total > 0:
+                    self.col_costs[col_name] = col_costs.get(col_name, 0.0) / total
+                else:
+                    self.col_costs[col_name] = 1.0 / self.length
+            ## FOR
+        ## DEF
+        
+        def update(self, col_names, oldCost, newCost):
+            improved = newCost < oldCost
+            reward = ADAPTIVE_REWARD_IMPROVED if improved else ADAPTIVE_REWARD_NOT_IMPROVED
+            for col_name in col_names:
+                self.scores[col_name] = (1.0 - self.reaction) * self.scores[col_name] + self.reaction * reward
+                self.attempts[col_name][0] += 1
+                if improved: self.attempts[col_name][1] += 1
+            ## FOR
+        ## DEF
+        
+        def getState(self):
+            state = LNSDesigner.RandomCollectionGenerator.getState(self)
+            state["scores"] = dict(self.scores)
+            state["attempts"] = dict([(k, v[:]) for k, v in self.attempts.iteritems()])
+            return state
+        ## DEF
+        
+        def setState(self, state):
+            LNSDesigner.RandomCollectionGenerator.setState(self, state)
+            for col_name in self.collections:
+                if col_name in state.get("scores", { }):
+                    self.scores[col_name] = state["scores"][col_name]
+                    self.attempts[col_name] = state["attempts"][col_name][:]
+            ## FOR
+        ## DEF
+        
+        def getImprovementRate(self, col_name):
+            num_searches, num_improved = self.attempts[col_name]
+            return num_improved / float(num_searches) if num_searches else 0.0
+        ## DEF
     ## CLASS
     
     def __init__(self, collections, designCandidates, workload, config, costModel, initialDesign, bestCost, channel=None, lock=None, worker_id=None):
@@ -89,6 +226,13 @@ class LNSDesigner(AbstractDesigner):
             
         self.ratio_step = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'relax_ratio_step')
         self.max_ratio = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'max_relax_ratio')
+        self.adaptive = configutil.getBoolean(self.config, configutil.SECT_MULTI_SEARCH, 'adaptive_relax')
+        self.adaptive_reaction = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'adaptive_reaction')
+        self.partition = configutil.getBoolean(self.config, configutil.SECT_MULTI_SEARCH, 'partition_neighborhoods')
+        self.seed = deriveSeed(configutil.getSeed(self.config), "lns", worker_id)
+        self.telemetry = SearchTelemetry(channel, worker_id, \
+                                         self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'telemetry_interval'), \
+                                         getattr(costModel, "design_cost_cache", None))
         
         self.designCandidates = designCandidates
 
@@ -97,15 +241,38 @@ class LNSDesigner(AbstractDesigner):
         self.bestLock = lock
         self.worker_id = worker_id
         self.debug = False
+        # Search state from a checkpoint that we will continue from
+        self.resume_state = None
+        # (RequestId, Collections) assigned by the coordinator
+        self.neighborhoods = Queue.Queue()
+        self.neighborhood_requests = 0
         ### Test
         self.count = 0
     ## DEF
+    
+    def setState(self, state):
+        self.resume_state = state
+    ## DEF
 
     def run(self):
         """
             main public method. Simply call to get the optimal solution
         """
-        col_generator = LNSDesigner.RandomCollectionGenerator(self.collections)
+        profiler.getProfiler().start("search")
+        try:
+            self.__run__()
+        finally:
+            profiler.getProfiler().stop("search")
+        self.telemetry.flush(True)
+        sendMessage(MSG_EXECUTE_COMPLETED, self.worker_id, self.channel)
+    # DEF
+
+    def __run__(self):
+        if self.adaptive:
+            col_generator = LNSDesigner.AdaptiveCollectionGenerator(self.collections, self.designCandidates, self.adaptive_reaction, self.seed)
+            self.__updateCollectionCosts__(col_generator, self.init_bestDesign)
+        else:
+            col_generator = LNSDesigner.RandomCollectionGenerator(self.collections, self.seed)
         
         worker_used_time = 0 # This is used to record how long this worker has been running
         elapsedTime = 0 # this is used to check if this worker has found a better design for a limited time: patient time
@@ -113,22 +280,50 @@ class LNSDesigner(AbstractDesigner):
         bbsearch_time_out = self.init_bbsearch_time
         bestCost = self.init_bestCost
         bestDesign = self.init_bestDesign.copy()
+        iteration = 0 # Number of bbsearches so far, used to seed each of them
+        
+        if self.resume_state:
+            LOG.info("Resuming LNS search from checkpoint state")
+            relaxRatio = self.resume_state["relaxRatio"]
+            bbsearch_time_out = self.resume_state["bbsearch_time_out"]
+            worker_used_time = self.resume_state["worker_used_time"]
+            elapsedTime = self.resume_state["elapsedTime"]
+            self.timeout = self.resume_state["timeout"]
+            col_generator.setState(self.resume_state["generator"])
+            iteration = self.resume_state.get("iteration", 0)
+        ## IF
         
         while True:
+            # Let the coordinator know where we are so that it can checkpoint it
+            state = {
+                "relaxRatio":        relaxRatio,
+                "bbsearch_time_out": bbsearch_time_out,
+                "worker_used_time":  worker_used_time,
+                "elapsedTime":       elapsedTime,
+                "timeout":           self.timeout,
+                "generator":         col_generator.getState(),
+                "iteration":         iteration,
+            }
+            sendMessage(MSG_SEARCH_STATE, (self.worker_id, state), self.channel)
+            
             relaxedCollectionsNames, relaxedDesign = self.__relax__(col_generator, bestDesign, relaxRatio)
             sendMessage(MSG_SEARCH_INFO, (relaxedCollectionsNames, bbsearch_time_out, relaxedDesign, worker_used_time, elapsedTime, self.worker_id), self.channel)
             
             dc = self.designCandidates.getCandidates(relaxedCollectionsNames)
-            self.bbsearch_method = bbsearch.BBSearch(dc, self.costModel, relaxedDesign, bestCost, bbsearch_time_out, self.channel, self.bestLock)
+            self.bbsearch_method = bbsearch.BBSearch(dc, self.costModel, relaxedDesign, bestCost, bbsearch_time_out, self.channel, self.bestLock, self.telemetry, \
+                                                     deriveSeed(self.seed, "bbsearch", iteration))
             self.bbsearch_method.solve()
+            iteration += 1
             
             worker_used_time += self.bbsearch_method.usedTime
             
             if self.bbsearch_method.status != "updated_design":
+                col_generator.update(relaxedCollectionsNames, bestCost, self.bbsearch_method.bestCost)
                 if self.bbsearch_method.bestCost < bestCost:
                     bestCost = self.bbsearch_method.bestCost
                     bestDesign = self.bbsearch_method.bestDesign.copy()
                     elapsedTime = 0
+                    if self.adaptive: self.__updateCollectionCosts__(col_generator, bestDesign)
                 else:
                     elapsedTime += self.bbsearch_method.usedTime
                 
@@ -154,11 +349,52 @@ class LNSDesigner(AbstractDesigner):
                 if self.bbsearch_method.bestCost < bestCost:
                     bestCost = self.bbsearch_method.bestCost
                     bestDesign = self.bbsearch_method.bestDesign.copy()
+                    if self.adaptive: self.__updateCollectionCosts__(col_generator, bestDesign)
                 ## IF
             ## ELSE
         ## WHILE
-        sendMessage(MSG_EXECUTE_COMPLETED, self.worker_id, self.channel)
-    # DEF
+    ## DEF
+
+    def updateBest(self, bestCost, bestDesign):
+        """Pass a better design found by another worker on to the running bbsearch"""
+        if self.bbsearch_method:
+            self.bbsearch_method.updateBest(bestCost, bestDesign)
+    ## DEF
+
+    def putNeighborhood(self, request_id, col_names):
+        """Callback for when the coordinator assigns the collections to relax next"""
+        self.neighborhoods.put((request_id, col_names))
+    ## DEF
+
+    def __getNeighborhood__(self, generator, num):
+        """
+            Return the collections to relax next. If we run as one of many clients, we send
+            all of the collections in the order our generator prefers them to the coordinator
+            and it picks the ones that no other client is relaxing.
+        """
+        if not self.partition or self.channel is None:
+            return generator.getRandomCollections(num)
+        
+        preferences = generator.getRandomCollections(generator.length)
+        self.neighborhood_requests += 1
+        sendMessage(MSG_REQUEST_NEIGHBORHOOD, (self.worker_id, self.neighborhood_requests, num, preferences), self.channel)
+        try:
+            while True:
+                request_id, col_names = self.neighborhoods.get(timeout=NEIGHBORHOOD_TIMEOUT)
+                # Skip the late answers to requests that we already gave up on
+                if request_id == self.neighborhood_requests:
+                    return col_names
+            ## WHILE
+        except Queue.Empty:
+            LOG.warn("The coordinator did not assign a neighborhood in %d seconds. Picking one locally", NEIGHBORHOOD_TIMEOUT)
+            return preferences[:num]
+    ## DEF
+
+    def __updateCollectionCosts__(self, generator, design):
+        """Tell the generator how much each collection contributes to the cost of the given design"""
+        self.costModel.computeCost(design)
+        generator.updateCosts(self.costModel.getCollectionCosts())
+    ## DEF
 
     def __relax__(self, generator, design, ratio):
         numberOfRelaxedCollections = int(round(len(self.collections) * ratio))
@@ -171,7 +407,7 @@ class LNSDesigner(AbstractDesigner):
             ## FOR
         ## IF
         else:
-            relaxedCollectionsNames = generator.getRandomCollections(numberOfRelaxedCollections)
+            relaxedCollectionsNames = self.__getNeighborhood__(generator, numberOfRelaxedCollections)
             for col_name in relaxedCollectionsNames:
                 relaxedDesign.reset(col_name)
             ## FOR
@@ -28,6 +28,8 @@ import random
 # mongodb-d4
 from design import Design
 from abstractdesigner import AbstractDesigner
+from util import configutil
+from util.utilmethods import deriveSeed
 
 LOG = logging.getLogger(__name__)
 
@@ -43,12 +45,13 @@ class RandomDesigner(AbstractDesigner):
     def generate(self):
         LOG.info("Generating random design")
         design = Design()
-        rng = random.Random()
-        for col_info in self.collections.itervalues():
+        rng = random.Random(deriveSeed(configutil.getSeed(self.config), "random"))
+        for col_name in sorted(self.collections.iterkeys()):
+            col_info = self.collections[col_name]
             design.addCollection(col_info['name'])
 
             col_fields = []
-            for field, data in col_info['fields'].iteritems():
+            for field in sorted(col_info['fields'].iterkeys()):
                 col_fields.append(field)
 
             # Figure out which attribute has the highest value for
@@ -56,7 +59,7 @@ class RandomDesigner(AbstractDesigner):
             attrs = [ ]
             chosen_field = None
             while chosen_field is None or str(chosen_field).startswith("#") or str(chosen_field).startswith("_"):
-                chosen_field = random.choice(col_fields)
+                chosen_field = rng.choice(col_fields)
             attrs.append(chosen_field)
             print "field: ", chosen_field
 
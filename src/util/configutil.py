@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import os
 from datetime import datetime
 
 import constants
@@ -30,6 +31,15 @@ DEFAULT_CONFIG = {
         ("metadata_db", "The name of the database that the designer will use to store catalog information.",
 constants.METADATA_DB_NAME),
         ("dataset_db", "The name of the database that contains the sample data set", constants.DATASET_DB_NAME),
+        ("metadata_store", "Where the designer reads the collection catalog and the workload sessions from: 'mongodb' (the metadata_db database) or 'file' (the store in metadata_dir that is written after the workload is processed, so that later runs with --no-load do not need MongoDB)", "mongodb"),
+        ("metadata_dir", "The directory of the file-backed metadata store", None),
+        ("parse_workers", "Number of processes used to parse the mongosniff trace. If this is greater than one, a trace file is split into chunks that are parsed in parallel. Reading from stdin or using --mongo-skip, --sess-limit or --op-limit always uses a single process", 1),
+        ("checkpoint_lines", "While parsing the mongosniff trace, save the sessions that changed to the metadata database after this many lines. Set to 0 to disable", 10000),
+        ("checkpoint_seconds", "While parsing the mongosniff trace, save the sessions that changed to the metadata database after this many seconds. Set to 0 to disable", 0),
+        ("session_idle_timeout", "While parsing the mongosniff trace, write a session to the metadata database and drop it from memory once its client has not sent anything for this many seconds of trace time. This bounds the memory by the number of concurrently active connections. Leave empty to keep every session in memory until the end of the trace", None),
+        ("reconstruct_batch_size", "Number of writes to the same collection that are sent to the dataset database in one bulk operation when the sample database is reconstructed from the workload", 1000),
+        ("reconstruct_workers", "Number of threads that send the bulk operations of different collections to the dataset database concurrently when the sample database is reconstructed", 1),
+        ("reconstruct_in_memory", "Replay the writes of the workload in memory and only write the final documents of each collection to the dataset database. Every query of the workload is an equality match and every update replaces the document, so this gives the same documents as replaying the writes on the server", False),
     ],
     
     # Target Cluster Configuration
@@ -45,6 +55,9 @@ constants.METADATA_DB_NAME),
         ("enable_denormalization", "Enable the designer to look for denormalization candidates.", True),
         ("enable_local_search_inc", "Enable increasing local search parameters after a restart", True),
         ("sample_rate", "Integer Percentage of dataset values to sample while gathering statistics.", 100),
+        ("field_sketches", "Estimate the cardinality, sizes and ranges of every field with fixed-size sketches instead of keeping all of its distinct values in memory while gathering statistics.", False),
+        ("schema_workers", "Number of processes that extract the schema catalog from the dataset. Each process examines a different collection, and collections with many documents are split up into ranges of _id values.", 1),
+        ("seed", "Seed for all of the random choices made by the designer. Every search client derives its own seed from it, so the same seed, workload and number of clients produce the same search. Leave empty for a different search every run.", None),
     ],
     
     # Cost Model Configuration
@@ -55,6 +68,8 @@ constants.METADATA_DB_NAME),
         ("time_intervals", "Number of intervals over which to examine the workload skew", constants.DEFAULT_TIME_INTERVALS),
         ("address_size", "Size of an address for an index node in bytes", constants.DEFAULT_ADDRESS_SIZE),
         ("window_size", "Size of the window used by the lru buffer", constants.WINDOW_SIZE),
+        ("cost_report_size", "number of query classes in the cost report of the final design (d4.py --cost-report)", 20),
+        ("cost_cache_threshold", "cached cost data of a query class from a previous run (d4.py --cost-cache) is only reused if the query class's share of its collection's operations changed by at most this fraction", 0.1),
     ],
     
     # MySQL Conversion Configuration
@@ -69,12 +84,26 @@ constants.METADATA_DB_NAME),
     # Multi-threaded search configuration
     SECT_MULTI_SEARCH: [
         ("num_clients", "number of clients the LNS/BB search will be run on", 1),
+        ("backend", "how the clients are started: 'execnet' (gateways that can also run on other hosts) or 'process' (forked processes on this machine that share the loaded workload)", "execnet"),
         ("time_for_lnssearch", "seconds that the lns search will run", 60*60), # LNS search runs up to one hour by default
         ("patient_time", "seconds within which if a better design is not found, we quit lns search", 30*60), # We wait for half an hour 
         ("init_bbsearch_time", "time bbsearch will run at the first time", 10*60),
         ("init_relax_ratio", "initial relax ratio", 0.25),
         ("max_relax_ratio", "maximum relax ratio", 0.5),
-        ("relax_ratio_step", "the increase step of relax ratio", 0.1)
+        ("search_algorithm", "the search algorithm each client runs: 'lns' (branch-and-bound over relaxed neighborhoods) or 'annealing' (simulated annealing)", "lns"),
+        ("relax_ratio_step", "the increase step of relax ratio", 0.1),
+        ("partition_neighborhoods", "let the coordinator assign the collections that each lns client relaxes so that the clients do not search the same neighborhood at the same time. Each relaxation then waits for a round-trip to the coordinator", False),
+        ("adaptive_relax", "bias the collections relaxed by the lns search towards the ones that contribute the most to the cost and that recently led to better designs", False),
+        ("adaptive_reaction", "how quickly the adaptive relax weights react to the outcome of each bbsearch (0.0 - 1.0)", 0.5),
+        ("annealing_init_temp", "initial temperature of the annealing search, relative to the cost of the initial design", 0.05),
+        ("annealing_cooling_rate", "the annealing temperature is multiplied by this value after every move", 0.995),
+        ("share_workload", "load the workload once in the coordinator and share it with the clients instead of having every client read it from MongoDB", True),
+        ("shared_cost_cache", "forward the costs of the designs that each client evaluates to the other clients through the coordinator so that they do not evaluate them again", True),
+        ("telemetry_interval", "seconds between two progress reports that every client sends to the coordinator", 5),
+        ("progress_interval", "seconds between two progress lines that the coordinator logs", 30),
+        ("progress_file", "path of a CSV file that the coordinator writes the best cost over time to", None),
+        ("checkpoint_file", "path of the file that the coordinator periodically saves the search progress to (use d4.py --resume to continue from it)", None),
+        ("checkpoint_interval", "seconds between two search checkpoints", 5*60),
     ],
     
     # Replay configuration
@@ -158,3 +187,51 @@ def setDefaultValues(config):
     return (config)
 ## DEF
     
+
+## ==============================================
+## getBoolean
+## ==============================================
+def getBoolean(config, section, option):
+    """
+        Return the boolean value of the given option. Unlike RawConfigParser.getboolean(),
+        this also works for the default values that setDefaultValues() stores as bools
+    """
+    value = config.get(section, option)
+    if isinstance(value, bool):
+        return value
+    return config.getboolean(section, option)
+## DEF
+
+## ==============================================
+## getMetadataDir
+## ==============================================
+def getMetadataDir(config):
+    """
+        Return the directory of the file-backed metadata store or None if the
+        designer uses the metadata database
+    """
+    store = config.get(SECT_MONGODB, 'metadata_store')
+    if store == "mongodb":
+        return None
+    elif store == "file":
+        path = config.get(SECT_MONGODB, 'metadata_dir')
+        if not path:
+            raise Exception("Missing the configuration option '%s.metadata_dir'" % SECT_MONGODB)
+        return os.path.expanduser(path)
+    raise Exception("Unknown metadata store '%s'" % store)
+## DEF
+
+## ==============================================
+## getSeed
+## ==============================================
+def getSeed(config):
+    """
+        Return the designer's random seed as an int or None if it is not set
+    """
+    if config is None or not config.has_option(SECT_DESIGNER, 'seed'):
+        return None
+    value = config.get(SECT_DESIGNER, 'seed')
+    if value is None or str(value).strip() == "":
+        return None
+    return int(value)
+## DEF
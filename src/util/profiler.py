@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import os
+import time
+import threading
+import logging
+import cProfile
+try:
+    import resource
+except ImportError:
+    resource = None
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## Profiler
+## ==============================================
+class Profiler(object):
+    """
+        Records the wall time, CPU time and peak RSS of the phases of a d4 run.
+        A phase can be started and stopped more than once (e.g. every cost
+        model evaluation) and its times are added up. If a phase is the one
+        that we profile, then cProfile runs while it is active and its stats
+        are written to <output_dir>/<name>-<phase>.pstats by finish().
+        Note that cProfile only follows the thread that started the phase and
+        that the CPU time is the time of the whole process.
+    """
+
+    def __init__(self, enabled=False, profile_phase=None, output_dir=".", name="d4"):
+        self.enabled = enabled or bool(profile_phase)
+        self.profile_phase = profile_phase
+        self.output_dir = output_dir
+        self.name = name
+        self.lock = threading.Lock()
+        # Phase -> [Count, WallTime, CpuTime, PeakRSS (KB)]
+        self.phases = { }
+        # Phase order for the summary
+        self.order = [ ]
+        # Phase -> (WallStart, CpuStart)
+        self.active = { }
+        self.profile = None
+    ## DEF
+
+    def start(self, phase):
+        if not self.enabled: return
+        self.lock.acquire()
+        try:
+            assert not phase in self.active, "Phase '%s' is already running" % phase
+            if not phase in self.phases:
+                self.phases[phase] = [ 0, 0.0, 0.0, 0 ]
+                self.order.append(phase)
+            self.active[phase] = (time.time(), getCpuTime())
+        finally:
+            self.lock.release()
+        if phase == self.profile_phase:
+            if self.profile is None: self.profile = cProfile.Profile()
+            self.profile.enable()
+    ## DEF
+
+    def stop(self, phase):
+        if not self.enabled: return
+        if phase == self.profile_phase and self.profile:
+            self.profile.disable()
+        self.lock.acquire()
+        try:
+            wall_start, cpu_start = self.active.pop(phase)
+            entry = self.phases[phase]
+            entry[0] += 1
+            entry[1] += time.time() - wall_start
+            entry[2] += getCpuTime() - cpu_start
+            entry[3] = max(entry[3], getPeakRSS())
+        finally:
+            self.lock.release()
+    ## DEF
+
+    def getPhases(self):
+        """Return a list of (phase, count, wall time, cpu time, peak rss) tuples in the order that they first ran"""
+        self.lock.acquire()
+        try:
+            return [ tuple([ phase ] + self.phases[phase]) for phase in self.order ]
+        finally:
+            self.lock.release()
+    ## DEF
+
+    def finish(self):
+        """Write the cProfile stats of the profiled phase. Returns the path of the file or None."""
+        if self.profile is None: return None
+        path = os.path.join(self.output_dir, "%s-%s.pstats" % (self.name, self.profile_phase))
+        self.profile.dump_stats(path)
+        LOG.info("Wrote profile of phase '%s' to '%s'", self.profile_phase, path)
+        return path
+    ## DEF
+## CLASS
+
+# The profiler of this process. It does not record anything until
+# setupProfiler() is called with the --profile arguments of d4.py
+PROFILER = Profiler()
+
+def getProfiler():
+    return PROFILER
+## DEF
+
+def setupProfiler(args, name):
+    """Replace the profiler of this process with one that is configured by the given d4.py arguments"""
+    global PROFILER
+    PROFILER = Profiler(args.get("profile", False), args.get("profile_phase", None), \
+                        args.get("profile_dir", None) or ".", name)
+    return PROFILER
+## DEF
+
+def getCpuTime():
+    """Return the user and system CPU time of this process in seconds"""
+    t = os.times()
+    return t[0] + t[1]
+## DEF
+
+def getPeakRSS():
+    """Return the peak resident set size of this process in KB (0 if we cannot tell)"""
+    if resource is None: return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+## DEF
+
+def formatSummary(phases, components=None):
+    """
+        Return the phases from Profiler.getPhases() and the optional cost component
+        timings from CostModel.getComponentTimings() as a table
+    """
+    header = "%-20s %8s %10s %10s %10s" % ("Phase", "Count", "Wall (s)", "CPU (s)", "PeakRSS MB")
+    lines = [ header, "-" * len(header) ]
+    for phase, count, wall, cpu, rss in phases:
+        lines.append("%-20s %8d %10.2f %10.2f %10.1f" % (phase, count, wall, cpu, rss / 1024.0))
+    if components:
+        lines.append("")
+        header = "%-20s %8s %10s %10s" % ("Cost Component", "Count", "Total (s)", "Avg (ms)")
+        lines.extend([ header, "-" * len(header) ])
+        for name in sorted(components.iterkeys()):
+            count, total = components[name]
+            lines.append("%-20s %8d %10.2f %10.2f" % (name, count, total, (total / count * 1000.0) if count else 0.0))
+    return "\n".join(lines)
+## DEF
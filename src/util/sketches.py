@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012
+# Andy Pavlo - http://www.cs.brown.edu/~pavlo/
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import math
+import random
+
+# Number of bits of the hash that pick the register of the HyperLogLog.
+# 2^12 registers have a standard error of about 1.6%
+DEFAULT_HLL_PRECISION = 12
+# Keep the exact set of values until there are more than this many,
+# so that fields with a small number of values are not estimated at all
+DEFAULT_EXACT_LIMIT = 4096
+# The size of the largest compactor of the KLL quantile sketch.
+# The rank error is about 1.65 / k
+DEFAULT_KLL_K = 200
+
+MASK_64 = (1 << 64) - 1
+
+def hash64(value):
+    """Return a well-mixed 64-bit hash of the given value (MurmurHash3's finalizer)"""
+    h = hash(value) & MASK_64
+    h ^= h >> 33
+    h = (h * 0xff51afd7ed558ccd) & MASK_64
+    h ^= h >> 33
+    h = (h * 0xc4ceb9fe1a85ec53) & MASK_64
+    h ^= h >> 33
+    return h
+## DEF
+
+## ==============================================
+## HyperLogLog
+## ==============================================
+class HyperLogLog(object):
+    """
+        Estimates the number of distinct values with a fixed amount of memory.
+        Values that are equal in Python are counted once, just like in a set().
+    """
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION, exact_limit=DEFAULT_EXACT_LIMIT):
+        self.precision = precision
+        self.exact_limit = exact_limit
+        # The exact values until we have seen more than exact_limit of them
+        self.values = set()
+        self.registers = None
+    ## DEF
+
+    def add(self, value):
+        if self.values is not None:
+            self.values.add(value)
+            if len(self.values) > self.exact_limit:
+                self.__toRegisters__()
+        else:
+            self.__addHash__(hash64(value))
+    ## DEF
+
+    def __addHash__(self, h):
+        p = self.precision
+        idx = h >> (64 - p)
+        w = (h << p) & MASK_64
+        rank = 65 - w.bit_length() if w else 65 - p
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+    ## DEF
+
+    def __toRegisters__(self):
+        self.registers = bytearray(1 << self.precision)
+        for value in self.values:
+            self.__addHash__(hash64(value))
+        self.values = None
+    ## DEF
+
+    def isExact(self):
+        return self.values is not None
+    ## DEF
+
+    def count(self):
+        """Return the (estimated) number of distinct values"""
+        if self.values is not None:
+            return len(self.values)
+        m = len(self.registers)
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        total = 0.0
+        zeros = 0
+        for r in self.registers:
+            total += 2.0 ** -r
+            if not r: zeros += 1
+        estimate = alpha * m * m / total
+        # Small range correction
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(float(m) / zeros)
+        return int(round(estimate))
+    ## DEF
+
+    def merge(self, other):
+        """Add all of the values of another HyperLogLog with the same precision to this one"""
+        assert self.precision == other.precision
+        if other.values is not None:
+            for value in other.values:
+                self.add(value)
+            return
+        if self.values is not None:
+            self.__toRegisters__()
+        for i in xrange(len(self.registers)):
+            if other.registers[i] > self.registers[i]:
+                self.registers[i] = other.registers[i]
+    ## DEF
+
+    def __len__(self):
+        return self.count()
+    ## DEF
+## CLASS
+
+## ==============================================
+## StreamingStats
+## ==============================================
+class StreamingStats(object):
+    """
+        Keeps the count, mean, variance, minimum and maximum of a stream of
+        numbers without storing them (Welford's algorithm)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        # The exact sum of the values, the mean*count product can be off by a little
+        self.total = 0
+        # Sum of the squared differences from the mean
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+    ## DEF
+
+    def put(self, value, delta=1):
+        """Add the value delta times. This has the same signature as Histogram.put()"""
+        self.total += value * delta
+        for i in xrange(delta):
+            self.count += 1
+            diff = value - self.mean
+            self.mean += diff / float(self.count)
+            self.m2 += diff * (value - self.mean)
+        ## FOR
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+    ## DEF
+
+    def getSampleCount(self):
+        return self.count
+    ## DEF
+
+    def getVariance(self):
+        """Return the population variance"""
+        return self.m2 / self.count if self.count else 0.0
+    ## DEF
+
+    def getStdev(self):
+        return math.sqrt(self.getVariance())
+    ## DEF
+
+    def merge(self, other):
+        """Add all of the values of another StreamingStats to this one (Chan et al.)"""
+        if not other.count: return
+        if not self.count:
+            self.count, self.mean, self.m2, self.total = other.count, other.mean, other.m2, other.total
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        diff = other.mean - self.mean
+        self.mean += diff * other.count / float(count)
+        self.m2 += other.m2 + diff * diff * self.count * other.count / float(count)
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    ## DEF
+
+    def __len__(self):
+        return self.count
+    ## DEF
+## CLASS
+
+## ==============================================
+## KLLSketch
+## ==============================================
+class KLLSketch(object):
+    """
+        Mergeable quantile sketch (Karnin, Lang and Liberty, 2016).
+        Every level holds items that each stand for 2^level of the values that
+        were added. When a level is full, we sort it and promote every other
+        item to the next level, so the memory stays at about 3k items.
+    """
+
+    def __init__(self, k=DEFAULT_KLL_K, seed=0):
+        self.k = k
+        self.rng = random.Random(seed)
+        self.compactors = [ [ ] ]
+        self.size = 0
+        self.count = 0
+    ## DEF
+
+    def getCapacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+    ## DEF
+
+    def getMaxSize(self):
+        return sum([ self.getCapacity(h) for h in xrange(len(self.compactors)) ])
+    ## DEF
+
+    def add(self, value):
+        self.compactors[0].append(value)
+        self.size += 1
+        self.count += 1
+        if self.size >= self.getMaxSize():
+            self.__compress__()
+    ## DEF
+
+    def __compress__(self):
+        for h in xrange(len(self.compactors)):
+            if len(self.compactors[h]) >= self.getCapacity(h):
+                if h + 1 == len(self.compactors):
+                    self.compactors.append([ ])
+                items = sorted(self.compactors[h])
+                # Keep an odd item at this level so that we do not lose it
+                leftover = [ items.pop() ] if len(items) % 2 else [ ]
+                promoted = items[self.rng.randint(0, 1)::2]
+                self.compactors[h + 1].extend(promoted)
+                self.compactors[h] = leftover
+                self.size = sum(map(len, self.compactors))
+                if self.size < self.getMaxSize(): break
+        ## FOR
+    ## DEF
+
+    def merge(self, other):
+        """Add all of the values of another KLLSketch to this one"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([ ])
+        for h in xrange(len(other.compactors)):
+            self.compactors[h].extend(other.compactors[h])
+        self.count += other.count
+        self.size = sum(map(len, self.compactors))
+        while self.size >= self.getMaxSize():
+            self.__compress__()
+    ## DEF
+
+    def getQuantiles(self, fractions):
+        """Return the (approximate) values at the given fractions (0.0 - 1.0) of the sorted values"""
+        items = [ ]
+        for h in xrange(len(self.compactors)):
+            items.extend([ (x, 1 << h) for x in self.compactors[h] ])
+        if not items: return [ ]
+        items.sort(key=lambda x: x[0])
+        total = float(sum([ w for x, w in items ]))
+        ret = [ ]
+        idx = 0
+        cumulative = items[0][1]
+        for fraction in sorted(fractions):
+            while idx + 1 < len(items) and cumulative <= fraction * total:
+                idx += 1
+                cumulative += items[idx][1]
+            ret.append(items[idx][0])
+        ## FOR
+        return ret
+    ## DEF
+## CLASS
+
+## ==============================================
+## ValueSketch
+## ==============================================
+class ValueSketch(object):
+    """
+        Replaces the set of distinct values of a field when we gather statistics
+        with bounded memory. It estimates the cardinality and the range boundaries.
+    """
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION, k=DEFAULT_KLL_K, exact_limit=DEFAULT_EXACT_LIMIT):
+        self.distinct = HyperLogLog(precision, exact_limit)
+        self.quantiles = KLLSketch(k)
+        self.min = None
+    ## DEF
+
+    def add(self, value):
+        self.distinct.add(value)
+        if value is None: return
+        self.quantiles.add(value)
+        if self.min is None or value < self.min: self.min = value
+    ## DEF
+
+    def merge(self, other):
+        self.distinct.merge(other.distinct)
+        self.quantiles.merge(other.quantiles)
+        if self.min is None or (other.min is not None and other.min < self.min):
+            self.min = other.min
+    ## DEF
+
+    def getRanges(self, num_ranges):
+        """
+            Return the lower boundaries of num_ranges ranges of the values. While we still
+            have all of the distinct values, they are split up into ranges with the same
+            number of distinct values. Otherwise the boundaries are quantiles of the values.
+        """
+        if self.min is None: return [ ]
+        if num_ranges <= 1: return [ self.min ]
+        if self.distinct.isExact():
+            values = sorted([ x for x in self.distinct.values if x is not None ])
+            range_len = max(1, len(values) / num_ranges)
+            return values[:range_len * num_ranges:range_len]
+        ranges = [ self.min ]
+        fractions = [ i / float(num_ranges) for i in xrange(1, num_ranges) ]
+        for value in self.quantiles.getQuantiles(fractions):
+            if value != ranges[-1]: ranges.append(value)
+        return ranges
+    ## DEF
+
+    def __len__(self):
+        return self.distinct.count()
+    ## DEF
+## CLASS
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import hashlib
+from zlib import crc32, adler32
 
 from util import constants
 
@@ -36,3 +38,52 @@ def escapeFieldNames(content):
     
     return copy
 ## DEF
+
+def __canonical__(value):
+    """Return a representation of the value that does not depend on dict or set ordering"""
+    if isinstance(value, dict):
+        return ("dict", sorted([ (__canonical__(k), __canonical__(v)) for k, v in value.iteritems() ]))
+    elif isinstance(value, (set, frozenset)):
+        return ("set", sorted([ __canonical__(v) for v in value ]))
+    elif isinstance(value, (list, tuple)):
+        return (type(value).__name__, [ __canonical__(v) for v in value ])
+    elif isinstance(value, unicode):
+        return value.encode("utf-8")
+    elif isinstance(value, (int, long)) and not isinstance(value, bool):
+        # BSON decodes int32 values as int and int64 values as long
+        return long(value)
+    return value
+## DEF
+
+def stableHash(value):
+    """
+        Return a non-negative 64-bit hash of the given value. Unlike hash(), the
+        result is the same in every process, on every platform and in every run,
+        so it can be used to seed random generators and to route values to nodes.
+        It is a lot slower than hash(), so do not use it for lookups that never
+        leave the process.
+    """
+    # Numbers and strings are by far the most common values, so we
+    # checksum them directly instead of going through md5
+    valueType = type(value)
+    if valueType is int or valueType is long:
+        value = "%d" % value
+        return (crc32(value, 1) & 0xffffffff) << 31 ^ (adler32(value, 1) & 0xffffffff)
+    elif valueType is str or valueType is unicode:
+        if valueType is unicode:
+            value = value.encode("utf-8")
+        return (crc32(value) & 0xffffffff) << 31 ^ (adler32(value) & 0xffffffff)
+    digest = hashlib.md5(repr(__canonical__(value))).hexdigest()
+    return int(digest[:16], 16)
+## DEF
+
+def deriveSeed(seed, *keys):
+    """
+        Derive a random seed for one part of the search (e.g. a single worker)
+        from the global seed. Returns None if the global seed is not set so that
+        the caller's random generator is seeded from the system instead.
+    """
+    if seed is None:
+        return None
+    return stableHash((seed, ) + keys)
+## DEF
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import os
+import re
+import gc
+import time
+import zlib
+import logging
+try:
+   import cPickle as pickle
+except:
+   import pickle
+
+# mongodb-d4
+import catalog
+
+LOG = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the store changes
+FILESTORE_VERSION = 1
+
+INDEX_FILE = "index.pickle"
+CATALOG_FILE = "catalog.seg"
+SEGMENT_FILE = "sessions-%05d.seg"
+SEGMENT_REGEX = re.compile("sessions-\d{5}\.seg$")
+
+# The number of sessions that we write into a single segment file
+DEFAULT_SEGMENT_SIZE = 10000
+# zlib compression level of the segment files. Low levels are much
+# faster to write and are only a little bit bigger.
+COMPRESSION_LEVEL = 1
+
+'''
+File-backed Metadata Store
+
+Stores the collection catalog and the workload sessions in a directory so
+that the designer can load them without a MongoDB server. The sessions are
+split into zlib-compressed segment files of plain dicts and the index file
+records which collections every segment references, so that we only have to
+read the segments that the search needs:
+
+    <dir>/index.pickle         Version, catalog and list of segments
+    <dir>/catalog.seg          Collection catalog
+    <dir>/sessions-NNNNN.seg   Workload sessions
+'''
+
+def __writeSegment__(path, docs):
+    """Write the given list of dicts to a compressed segment file and return its size in bytes"""
+    data = zlib.compress(pickle.dumps(docs, -1), COMPRESSION_LEVEL)
+    tmp_path = path + ".tmp"
+    f = open(tmp_path, 'wb')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+    os.rename(tmp_path, path)
+    return len(data)
+## DEF
+
+def __readSegment__(path, col_names=None):
+    """
+        Read the list of dicts from a segment file. If col_names is not None, then
+        we only return the sessions that have an operation on one of the collections.
+    """
+    f = open(path, 'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    # The garbage collector would otherwise scan all of the sessions that we
+    # already loaded over and over again while we create the new ones
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        docs = pickle.loads(zlib.decompress(data))
+        if col_names is not None:
+            docs = [ doc for doc in docs if not col_names.isdisjoint([ op['collection'] for op in doc['operations'] ]) ]
+        return docs
+    finally:
+        if enabled: gc.enable()
+## DEF
+
+## ==============================================
+## FileStoreWriter
+## ==============================================
+class FileStoreWriter:
+    """
+        Writes a new file-backed metadata store. Any store that is already in the
+        directory stays readable until close() replaces its index.
+    """
+
+    def __init__(self, path, segment_size=DEFAULT_SEGMENT_SIZE):
+        assert segment_size > 0
+        self.path = path
+        self.segment_size = segment_size
+        if not os.path.exists(path):
+            os.makedirs(path)
+        # Segments of the current store that we must not overwrite
+        self.old_files = set()
+        if os.path.exists(os.path.join(path, INDEX_FILE)):
+            self.old_files = set([ x["file"] for x in FileStore(path).segments ])
+
+        self.collections = [ ]
+        self.segments = [ ]
+        self.buffer = [ ]
+        self.next_segment = 0
+        self.num_sessions = 0
+        self.num_operations = 0
+    ## DEF
+
+    def writeCollections(self, collections):
+        """Store the catalog entries from the given list of collections"""
+        self.collections = [ dict(col_info) for col_info in collections ]
+    ## DEF
+
+    def addSession(self, sess):
+        self.buffer.append(dict(sess))
+        if len(self.buffer) >= self.segment_size:
+            self.__flush__()
+    ## DEF
+
+    def __flush__(self):
+        if not self.buffer: return
+        file_name = SEGMENT_FILE % self.next_segment
+        while file_name in self.old_files:
+            self.next_segment += 1
+            file_name = SEGMENT_FILE % self.next_segment
+        self.next_segment += 1
+
+        col_names = set()
+        num_operations = 0
+        for sess in self.buffer:
+            for op in sess['operations']:
+                col_names.add(op['collection'])
+            num_operations += len(sess['operations'])
+        ## FOR
+        size = __writeSegment__(os.path.join(self.path, file_name), self.buffer)
+        self.segments.append({
+            "file":        file_name,
+            "sessions":    len(self.buffer),
+            "operations":  num_operations,
+            "collections": sorted(col_names),
+            "size":        size,
+        })
+        self.num_sessions += len(self.buffer)
+        self.num_operations += num_operations
+        self.buffer = [ ]
+    ## DEF
+
+    def close(self):
+        """Write the remaining sessions and the index and remove the files of the previous store"""
+        self.__flush__()
+        __writeSegment__(os.path.join(self.path, CATALOG_FILE), self.collections)
+        index = {
+            "version":    FILESTORE_VERSION,
+            "created":    time.time(),
+            "sessions":   self.num_sessions,
+            "operations": self.num_operations,
+            "segments":   self.segments,
+        }
+        tmp_path = os.path.join(self.path, INDEX_FILE + ".tmp")
+        f = open(tmp_path, 'wb')
+        try:
+            pickle.dump(index, f, -1)
+        finally:
+            f.close()
+        os.rename(tmp_path, os.path.join(self.path, INDEX_FILE))
+
+        new_files = set([ x["file"] for x in self.segments ])
+        for file_name in os.listdir(self.path):
+            if SEGMENT_REGEX.match(file_name) and not file_name in new_files:
+                os.remove(os.path.join(self.path, file_name))
+        ## FOR
+        LOG.info("Wrote %d collections and %d sessions with %d operations to '%s' [segments=%d]", \
+                 len(self.collections), self.num_sessions, self.num_operations, self.path, len(self.segments))
+    ## DEF
+## CLASS
+
+## ==============================================
+## FileStore
+## ==============================================
+class FileStore:
+    """Reads the collection catalog and the workload sessions of a file-backed metadata store"""
+
+    def __init__(self, path):
+        index_path = os.path.join(path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise Exception("No metadata store was found in '%s'" % path)
+        self.path = path
+        f = open(index_path, 'rb')
+        try:
+            index = pickle.load(f)
+        finally:
+            f.close()
+        if index.get("version", None) != FILESTORE_VERSION:
+            raise Exception("Unsupported metadata store version in '%s'" % path)
+        self.segments = index["segments"]
+        self.num_sessions = index["sessions"]
+        self.num_operations = index["operations"]
+    ## DEF
+
+    def getSessionCount(self):
+        return self.num_sessions
+    ## DEF
+
+    def getOpCount(self):
+        return self.num_operations
+    ## DEF
+
+    def fetchCollections(self):
+        """Return the list of catalog.Collection in the store"""
+        return [ catalog.Collection(doc) for doc in __readSegment__(os.path.join(self.path, CATALOG_FILE)) ]
+    ## DEF
+
+    def fetchSessions(self, col_names=None):
+        """
+            Yield the sessions in the store. If col_names is not None, then we only
+            return the sessions that have an operation on one of the given collections.
+            The sessions are plain dicts and not workload.Session documents, because
+            mongokit walks the whole structure of every operation when it creates
+            a document, which takes longer than reading the segments.
+        """
+        if col_names is not None:
+            col_names = set(col_names)
+        for segment in self.segments:
+            if col_names is None:
+                filter_names = None
+            elif col_names.isdisjoint(segment["collections"]):
+                continue
+            elif col_names.issuperset(segment["collections"]):
+                # Every session in this segment only uses the given collections
+                filter_names = None
+            else:
+                filter_names = col_names
+            for doc in __readSegment__(os.path.join(self.path, segment["file"]), filter_names):
+                yield doc
+        ## FOR
+    ## DEF
+
+    def __str__(self):
+        return "FileStore[path=%s / sessions=%d / operations=%d / segments=%d]" % \
+               (self.path, self.num_sessions, self.num_operations, len(self.segments))
+    ## DEF
+## CLASS
+
+def exportMetadata(metadata_db, path, segment_size=DEFAULT_SEGMENT_SIZE):
+    """Copy the collection catalog and the workload sessions from the metadata database to a file-backed store"""
+    start = time.time()
+    writer = FileStoreWriter(path, segment_size)
+    writer.writeCollections(metadata_db.Collection.fetch())
+    for sess in metadata_db.Session.fetch():
+        writer.addSession(sess)
+    writer.close()
+    LOG.info("Exported the metadata database '%s' to '%s' in %.1f seconds", metadata_db.name, path, time.time() - start)
+## DEF
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import bisect
+import random
+import logging
+
+# mongodb-d4
+import catalog
+from session import Session
+from util import constants
+from util.utilmethods import stableHash
+
+LOG = logging.getLogger(__name__)
+
+# The size of every synthetic field value (bytes)
+FIELD_SIZE = 8
+# The share of the query templates of each operation type
+OP_TYPE_MIX = [
+    (constants.OP_TYPE_QUERY,  0.70),
+    (constants.OP_TYPE_UPDATE, 0.15),
+    (constants.OP_TYPE_INSERT, 0.10),
+    (constants.OP_TYPE_DELETE, 0.05),
+]
+# The probability that a predicate of a query template is a range predicate
+RANGE_PREDICATE_RATIO = 0.1
+# The probability that a query template has a projection
+PROJECTION_RATIO = 0.3
+
+## ==============================================
+## ZipfGenerator
+## ==============================================
+class ZipfGenerator:
+    """
+        Returns numbers in [0, n) where the probability of i is proportional
+        to 1 / (i+1)^skew. A skew of 0.0 is a uniform distribution.
+    """
+    def __init__(self, n, skew, rng):
+        assert n > 0
+        self.rng = rng
+        self.cdf = [ ]
+        total = 0.0
+        for i in xrange(n):
+            total += 1.0 / ((i+1) ** skew)
+            self.cdf.append(total)
+        ## FOR
+        self.total = total
+    ## DEF
+
+    def next(self):
+        return min(bisect.bisect_left(self.cdf, self.rng.random() * self.total), len(self.cdf)-1)
+    ## DEF
+## CLASS
+
+## ==============================================
+## SyntheticWorkloadGenerator
+## ==============================================
+class SyntheticWorkloadGenerator:
+    """
+        Generates a post-processed collection catalog and a workload of sessions
+        of any size without needing a trace or a MongoDB server. Every collection
+        has an id field 'f00' and collection #i references the id of collection #i-1
+        through its field 'f01', so the collections can be denormalized into each other.
+        The query templates and the values that the operations use are picked
+        with a Zipfian distribution.
+    """
+
+    def __init__(self, num_collections=4, num_fields=8, num_templates=20, num_sessions=1000, \
+                 ops_per_session=10, skew=1.0, doc_count=100000, num_nodes=8, seed=0):
+        assert num_fields >= 2
+        self.num_collections = num_collections
+        self.num_fields = num_fields
+        self.num_templates = num_templates
+        self.num_sessions = num_sessions
+        self.ops_per_session = ops_per_session
+        self.skew = skew
+        self.doc_count = doc_count
+        self.num_nodes = num_nodes
+        self.rng = random.Random(seed)
+
+        self.col_names = [ "col%02d" % i for i in xrange(num_collections) ]
+        self.field_names = [ "f%02d" % i for i in xrange(num_fields) ]
+        # ColName -> FieldName -> Cardinality
+        self.cardinality = { }
+        # Each template is a dict with the keys 'query_hash', 'collection', 'type', 'predicates' and 'projection'
+        self.templates = [ ]
+        self.next_query_id = 0
+    ## DEF
+
+    def getParameters(self):
+        return {
+            "num_collections": self.num_collections,
+            "num_fields":      self.num_fields,
+            "num_templates":   self.num_templates,
+            "num_sessions":    self.num_sessions,
+            "ops_per_session": self.ops_per_session,
+            "skew":            self.skew,
+            "doc_count":       self.doc_count,
+            "num_nodes":       self.num_nodes,
+        }
+    ## DEF
+
+    def generate(self):
+        """Return the collections (ColName -> catalog.Collection) and the list of workload.Session"""
+        self.__generateCardinalities__()
+        self.__generateTemplates__()
+        workload = [ self.__generateSession__(i) for i in xrange(self.num_sessions) ]
+        collections = self.__generateCollections__(workload)
+        LOG.info("Generated %d collections and %d sessions with %d operations", \
+                 len(collections), len(workload), self.num_sessions * self.ops_per_session)
+        return collections, workload
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## CATALOG
+    ## -----------------------------------------------------------------------
+
+    def __generateCardinalities__(self):
+        for col_name in self.col_names:
+            self.cardinality[col_name] = { }
+            for f_name in self.field_names:
+                if f_name == "f00":
+                    cardinality = self.doc_count
+                else:
+                    cardinality = self.rng.randint(min(10, self.doc_count), self.doc_count)
+                self.cardinality[col_name][f_name] = cardinality
+            ## FOR
+        ## FOR
+    ## DEF
+
+    def __generateCollections__(self, workload):
+        op_counts = dict([ (col_name, 0) for col_name in self.col_names ])
+        use_counts = dict([ (col_name, { }) for col_name in self.col_names ])
+        total_ops = 0
+        for sess in workload:
+            for op in sess['operations']:
+                op_counts[op['collection']] += 1
+                total_ops += 1
+                for f_name in op['predicates'].iterkeys():
+                    use_counts[op['collection']][f_name] = use_counts[op['collection']].get(f_name, 0) + 1
+            ## FOR
+        ## FOR
+
+        collections = { }
+        for i in xrange(self.num_collections):
+            col_name = self.col_names[i]
+            col_info = catalog.Collection()
+            col_info['name'] = col_name
+            col_info['doc_count'] = self.doc_count
+            col_info['avg_doc_size'] = self.num_fields * FIELD_SIZE
+            col_info['data_size'] = long(self.doc_count * col_info['avg_doc_size'])
+            col_info['max_pages'] = max(1, col_info['data_size'] / constants.DEFAULT_PAGE_SIZE)
+            col_info['workload_queries'] = op_counts[col_name]
+            col_info['workload_percent'] = op_counts[col_name] / float(total_ops) if total_ops else 0.0
+            col_info['interesting'] = sorted(use_counts[col_name].iterkeys())
+            col_info['embedding_ratio'] = { }
+            for f_name in self.field_names:
+                cardinality = self.cardinality[col_name][f_name]
+                field = catalog.Collection.fieldFactory(f_name, "int")
+                field['cardinality'] = cardinality
+                field['selectivity'] = cardinality / float(self.doc_count)
+                field['avg_size'] = FIELD_SIZE
+                field['query_use_count'] = use_counts[col_name].get(f_name, 0)
+                # Split the values evenly between the nodes
+                field['ranges'] = [ (cardinality * n) / self.num_nodes for n in xrange(self.num_nodes) ]
+                col_info['fields'][f_name] = field
+            ## FOR
+            if i > 0:
+                parent_col = self.col_names[i-1]
+                col_info['fields']['f01']['parent_col'] = parent_col
+                col_info['fields']['f01']['parent_key'] = 'f00'
+                col_info['fields']['f01']['parent_candidates'] = [ (parent_col, 'f00') ]
+            collections[col_name] = col_info
+        ## FOR
+        for i in xrange(1, self.num_collections):
+            # Every parent document has one child document on average
+            collections[self.col_names[i-1]]['embedding_ratio'][self.col_names[i]] = 1.0
+        ## FOR
+        return collections
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## WORKLOAD
+    ## -----------------------------------------------------------------------
+
+    def __generateTemplates__(self):
+        col_zipf = ZipfGenerator(self.num_collections, self.skew, self.rng)
+        for i in xrange(self.num_templates):
+            col_name = self.col_names[col_zipf.next()]
+            point = self.rng.random()
+            for op_type, ratio in OP_TYPE_MIX:
+                point -= ratio
+                if point < 0: break
+            ## FOR
+
+            predicates = { }
+            projection = None
+            if op_type != constants.OP_TYPE_INSERT:
+                num_predicates = self.rng.randint(1, min(3, self.num_fields))
+                for f_name in self.rng.sample(self.field_names, num_predicates):
+                    if self.rng.random() < RANGE_PREDICATE_RATIO:
+                        predicates[f_name] = constants.PRED_TYPE_RANGE
+                    else:
+                        predicates[f_name] = constants.PRED_TYPE_EQUALITY
+                ## FOR
+                if op_type == constants.OP_TYPE_QUERY and self.rng.random() < PROJECTION_RATIO:
+                    projection = dict([ (f_name, 1) for f_name in sorted(predicates.iterkeys()) ])
+            ## IF
+
+            self.templates.append({
+                "query_hash": long(stableHash((col_name, op_type, sorted(predicates.iteritems()), i)) >> 1),
+                "collection": col_name,
+                "type":       op_type,
+                "predicates": predicates,
+                "projection": projection,
+            })
+        ## FOR
+        self.template_zipf = ZipfGenerator(self.num_templates, self.skew, self.rng)
+        # ColName -> FieldName -> ZipfGenerator of the values
+        self.value_zipf = { }
+        for col_name in self.col_names:
+            self.value_zipf[col_name] = dict([ (f_name, ZipfGenerator(min(cardinality, 10000), self.skew, self.rng)) \
+                                               for f_name, cardinality in self.cardinality[col_name].iteritems() ])
+        ## FOR
+        # ColName -> Next id of an inserted document
+        self.next_ids = dict([ (col_name, self.doc_count) for col_name in self.col_names ])
+    ## DEF
+
+    def __getValue__(self, col_name, f_name):
+        # Spread the Zipfian ranks across the whole domain of the field
+        cardinality = self.cardinality[col_name][f_name]
+        rank = self.value_zipf[col_name][f_name].next()
+        return (rank * 7919) % cardinality
+    ## DEF
+
+    def __generateSession__(self, session_id):
+        sess = Session()
+        sess['session_id'] = session_id
+        sess['ip_client'] = "client:%d" % (10000 + session_id)
+        sess['ip_server'] = "server:27017"
+        sess['start_time'] = float(session_id)
+        timestamp = sess['start_time']
+        for i in xrange(self.ops_per_session):
+            template = self.templates[self.template_zipf.next()]
+            sess['operations'].append(self.__generateOperation__(template, timestamp))
+            timestamp += 0.001
+        ## FOR
+        sess['end_time'] = timestamp
+        return sess
+    ## DEF
+
+    def __generateOperation__(self, template, timestamp):
+        col_name = template['collection']
+        op = Session.operationFactory()
+        op['collection'] = col_name
+        op['type'] = template['type']
+        op['query_id'] = long(self.next_query_id)
+        op['resp_id'] = long(self.next_query_id)
+        self.next_query_id += 1
+        op['query_hash'] = template['query_hash']
+        op['query_time'] = timestamp
+        op['resp_time'] = timestamp + 0.0005
+        op['query_limit'] = -1
+        op['query_offset'] = 0
+        op['update_upsert'] = False
+        op['update_multi'] = False
+        op['query_aggregate'] = False
+        op['query_fields'] = template['projection']
+        op['predicates'] = dict(template['predicates'])
+
+        if op['type'] == constants.OP_TYPE_INSERT:
+            doc = dict([ (f_name, self.__getValue__(col_name, f_name)) for f_name in self.field_names ])
+            doc['f00'] = self.next_ids[col_name]
+            self.next_ids[col_name] += 1
+            op['query_content'] = [ doc ]
+            op['resp_content'] = [ ]
+        else:
+            values = dict([ (f_name, self.__getValue__(col_name, f_name)) for f_name in op['predicates'].iterkeys() ])
+            if op['type'] == constants.OP_TYPE_QUERY:
+                op['query_content'] = [ {constants.REPLACE_KEY_DOLLAR_PREFIX + "query": values} ]
+                op['resp_content'] = [ dict(values) ]
+            else:
+                op['query_content'] = [ values ]
+                op['resp_content'] = [ ]
+        ## IF
+        op['query_size'] = FIELD_SIZE * sum([ len(x) for x in op['query_content'] ])
+        op['resp_size'] = FIELD_SIZE * sum([ len(x) for x in op['resp_content'] ])
+        return op
+    ## DEF
+## CLASS
@@ -53,7 +53,9 @@ class WorkloadCombiner:
             self.col_sess_xref[col_name] = []
         ## FOR
 
-        workload = copy.deepcopy(self.workload)
+        # Copy the sessions as plain dicts. Deep copying a mongokit document
+        # fails if it is not bound to a collection (e.g., workload snapshots)
+        workload = [ copy.deepcopy(dict(sess)) for sess in self.workload ]
 
         for sess in workload:
             cols = set()
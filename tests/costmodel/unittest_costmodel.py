@@ -51,6 +51,51 @@ class TestCostModel(CostModelTestCase):
 
         self.assertEqual(cost0, cost1)
     ## def
+
+    def testQueryClassCache(self):
+        """
+            A new cost model that reuses the query class cache of another one
+            should compute the same cost for the same design
+        """
+        d = Design()
+        for col_name in CostModelTestCase.COLLECTION_NAMES:
+            d.addCollection(col_name)
+            col_info = self.collections[col_name]
+            d.addIndex(col_name, col_info['interesting'])
+        ## for
+        cost0 = self.cm.overallCost(d)
+        data = self.cm.getQueryClassCache()
+        self.assertEqual(set(CostModelTestCase.COLLECTION_NAMES), set(data.keys()))
+
+        cm = costmodel.CostModel(self.collections, self.workload, self.costModelConfig)
+        reused = cm.loadQueryClassCache(data, 0.0)
+        self.assertEqual(sum([len(x["op_counts"]) for x in data.itervalues()]), reused)
+        cost1 = cm.overallCost(d)
+        self.assertEqual(cost0, cost1)
+
+        # The cached entries are not used for a different design
+        col_name = CostModelTestCase.COLLECTION_NAMES[0]
+        signature = cm.warm_cache[col_name][0]
+        self.assertEqual(signature, cm.getDesignSignature(d, col_name))
+        d.addIndex(col_name, ["_id"])
+        self.assertNotEqual(signature, cm.getDesignSignature(d, col_name))
+    ## def
+    
+    def testQueryCostReport(self):
+        """The query classes in the cost report should account for the whole cost"""
+        d = Design()
+        for col_name in CostModelTestCase.COLLECTION_NAMES:
+            d.addCollection(col_name)
+            col_info = self.collections[col_name]
+            d.addIndex(col_name, col_info['interesting'])
+        ## for
+        cost = self.cm.overallCost(d)
+        report = self.cm.getQueryCostReport(d)
+        self.assertAlmostEqual(cost, sum([x["cost"] for x in report]))
+        self.assertEqual(sum([len(h) for h in self.cm.getQueryCounts().itervalues()]), len(report))
+        self.assertEqual(sorted([x["cost"] for x in report], reverse=True), [x["cost"] for x in report])
+        self.assertIsNone(self.cm.state.query_stats)
+    ## def
     
 ## CLASS
 
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from costmodel.querystats import QueryStatsCollector, formatReport
+
+class TestQueryStats(unittest.TestCase):
+
+    def setUp(self):
+        self.collector = QueryStatsCollector()
+        self.ops = [
+            {"query_hash": 1, "collection": "col0"},
+            {"query_hash": 2, "collection": "col0"},
+            {"query_hash": 3, "collection": "col1"},
+        ]
+        # query_hash -> (pageHits, maxHits, messages)
+        data = { 1: (10, 20, 1), 2: (30, 40, 3), 3: (0, 40, 2) }
+        for op in self.ops:
+            pageHits, maxHits, msgs = data[op["query_hash"]]
+            self.collector.addDisk(op, pageHits, maxHits, 0, 1, ["f0"], op["query_hash"] == 3, 0.01)
+            self.collector.addNetwork(op, msgs)
+        ## FOR
+        self.collector.disk_worst = 100
+        self.collector.network_worst = 10.0
+    ## DEF
+
+    def testGetReport(self):
+        weights = (1/3.0, 1/3.0, 1/3.0)
+        col_skew = { "col0": 0.4, "col1": 0.2 }
+        total = (40/100.0 + 6/10.0 + 0.6) / 3.0
+        report = self.collector.getReport(weights, col_skew, total)
+        self.assertEqual([ 2, 3, 1 ], [ x["query_hash"] for x in report ])
+
+        # The query classes account for all of the cost
+        self.assertAlmostEqual(total, sum([ x["cost"] for x in report ]))
+        self.assertAlmostEqual(1.0, sum([ x["share"] for x in report ]))
+
+        # The skew of col0 is split by the number of messages
+        self.assertAlmostEqual(0.4 * 3/4.0 / 3.0, report[0]["skew_cost"])
+        self.assertAlmostEqual(0.4 * 1/4.0 / 3.0, report[2]["skew_cost"])
+        self.assertTrue(report[1]["covering"])
+        self.assertFalse(report[2]["covering"])
+        self.assertEqual([ "f0" ], report[1]["index"])
+        self.assertEqual(3, report[0]["max_fanout"])
+
+        report = self.collector.getReport(weights, col_skew, total, 2)
+        self.assertEqual(2, len(report))
+    ## DEF
+
+    def testFormatReport(self):
+        report = self.collector.getReport((1.0, 0.0, 0.0), { }, 0.4)
+        lines = formatReport(report).split("\n")
+        self.assertEqual(2 + len(report), len(lines))
+        self.assertIn("(covering)", lines[-1])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
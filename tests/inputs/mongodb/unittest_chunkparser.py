@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import shutil
+import tempfile
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+
+# mongodb-d4
+from inputs.mongodb import parser
+from inputs.mongodb.tracegenerator import TraceGenerator, MongoSniffWriter, writeTrace
+
+NUM_SESSIONS = 40
+NUM_OPS_PER_SESSION = 10
+
+class InMemoryParser(parser.ChunkParser):
+    """Keeps the merged sessions in memory instead of saving them in the metadata database"""
+    def saveDirtySessions(self):
+        self.dirty_sessions = { }
+    ## DEF
+## CLASS
+
+class TestChunkParser(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "trace.out")
+        generator = TraceGenerator(num_collections=3, num_fields=6, nesting=2, fanout=3, doc_count=1000, \
+                                   num_sessions=NUM_SESSIONS, ops_per_session=NUM_OPS_PER_SESSION, \
+                                   duration=60.0, seed=1)
+        with open(self.path, "w") as fd:
+            writeTrace(generator, MongoSniffWriter(fd))
+    ## DEF
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    ## DEF
+
+    def parseSequential(self):
+        with open(self.path, "r") as fd:
+            p = parser.ChunkParser(fd)
+            p.processRange(0, os.path.getsize(self.path))
+        return p
+    ## DEF
+
+    def parseChunks(self, num_chunks):
+        with open(self.path, "r") as fd:
+            p = parser.ChunkParser(fd)
+        chunks = parser.findChunks(self.path, num_chunks, p.headerRegex)
+        for start, end in chunks:
+            p.mergeChunk(parser.parseChunk((self.path, start, end, True)))
+        return p, chunks
+    ## DEF
+
+    def testFindChunks(self):
+        """Check that the chunks cover the whole file and start with a header"""
+        with open(self.path, "r") as fd:
+            headerRegex = parser.ChunkParser(fd).headerRegex
+        chunks = parser.findChunks(self.path, 16, headerRegex)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(0, chunks[0][0])
+        self.assertEqual(os.path.getsize(self.path), chunks[-1][1])
+        with open(self.path, "r") as fd:
+            for i in xrange(1, len(chunks)):
+                self.assertEqual(chunks[i-1][1], chunks[i][0])
+                fd.seek(chunks[i][0])
+                self.assertTrue(headerRegex.match(fd.readline()))
+        ## WITH
+    ## DEF
+
+    def testMerge(self):
+        """Check that merging the chunks gives the same sessions as parsing the whole file"""
+        expected = self.parseSequential()
+        for num_chunks in [ 1, 3, 16 ]:
+            p, chunks = self.parseChunks(num_chunks)
+            self.assertEqual(expected.getResult()["sessions"], p.getResult()["sessions"])
+            self.assertEqual(expected.known_collections, p.known_collections)
+            for key in parser.CHUNK_COUNTERS:
+                self.assertEqual(getattr(expected, key), getattr(p, key), key)
+        ## FOR
+        self.assertEqual(NUM_SESSIONS * NUM_OPS_PER_SESSION, p.getOpCount())
+        # Every reply found its query, even if it was in another chunk
+        self.assertEqual(0, p.getOpSkipCount())
+        self.assertEqual(sorted(expected.query_response_map), sorted(p.query_response_map))
+    ## DEF
+
+    def testProcessParallel(self):
+        """Check that parsing with a pool of worker processes gives the same sessions as a serial parse"""
+        expected = self.parseSequential()
+        with open(self.path, "r") as fd:
+            p = InMemoryParser(fd)
+        # Skip the brute-force search for the salt of the hashed collection names
+        p.no_salt_search = True
+        p.processParallel(self.path, 2)
+        self.assertEqual(expected.getResult()["sessions"], p.getResult()["sessions"])
+        self.assertEqual(expected.known_collections, p.known_collections)
+        for key in parser.CHUNK_COUNTERS:
+            self.assertEqual(getattr(expected, key), getattr(p, key), key)
+        self.assertEqual(NUM_SESSIONS * NUM_OPS_PER_SESSION, p.getOpCount())
+        self.assertEqual(0, p.getOpSkipCount())
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
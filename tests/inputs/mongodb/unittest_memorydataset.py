@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+
+# mongodb-d4
+from inputs.mongodb.memorydataset import MemoryDataset, WRITE_SAVE, WRITE_REMOVE, WRITE_UPDATE
+
+COLLECTION_NAME = "squirrels"
+
+class TestMemoryDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = MemoryDataset()
+        self.dataset.apply(COLLECTION_NAME, [
+            (WRITE_SAVE, { "_id": 1, "name": "rocky", "tags": [ "red", "grey" ] }),
+            (WRITE_SAVE, { "_id": 2, "name": "sandy", "tags": [ "red" ] }),
+            (WRITE_SAVE, { "_id": 3, "name": "rocky", "flag": True }),
+        ])
+    ## DEF
+
+    def getIds(self):
+        return [ doc["_id"] for doc in self.dataset.getDocuments(COLLECTION_NAME) ]
+    ## DEF
+
+    def testFind(self):
+        """Check that queries match the way that equality predicates do in MongoDB"""
+        find = lambda query: [ doc["_id"] for doc in self.dataset.find(COLLECTION_NAME, query) ]
+        self.assertEqual([ 1, 3 ], find({ "name": "rocky" }))
+        self.assertEqual([ 2 ], find({ "_id": 2, "name": "sandy" }))
+        self.assertEqual([ ], find({ "_id": 2, "name": "rocky" }))
+        # Arrays match if one of their elements is equal to the value
+        self.assertEqual([ 1, 2 ], find({ "tags": "red" }))
+        self.assertEqual([ 2 ], find({ "tags": [ "red" ] }))
+        # Missing fields are equal to null, and true is not equal to 1
+        self.assertEqual([ 1, 2 ], find({ "flag": None }))
+        self.assertEqual([ ], find({ "flag": 1 }))
+        self.assertEqual([ ], self.dataset.find("missing", { }))
+    ## DEF
+
+    def testSave(self):
+        """Check that saving a document with an existing _id replaces it in place"""
+        self.dataset.apply(COLLECTION_NAME, [
+            (WRITE_SAVE, { "_id": 1, "name": "bullwinkle" }),
+            (WRITE_SAVE, { "name": "slappy" }),
+        ])
+        self.assertEqual(4, len(self.getIds()))
+        self.assertEqual([ 1, 2, 3 ], self.getIds()[:3])
+        self.assertEqual("bullwinkle", self.dataset.find(COLLECTION_NAME, { "_id": 1 })[0]["name"])
+        self.assertEqual(1, len(self.dataset.find(COLLECTION_NAME, { "name": "slappy" })))
+    ## DEF
+
+    def testRemove(self):
+        self.dataset.apply(COLLECTION_NAME, [ (WRITE_REMOVE, { "name": "rocky" }) ])
+        self.assertEqual([ 2 ], self.getIds())
+        self.dataset.apply(COLLECTION_NAME, [ (WRITE_REMOVE, { }) ])
+        self.assertEqual([ ], self.getIds())
+    ## DEF
+
+    def testUpdate(self):
+        """Check that updates replace the first match and that upserts take the _id from the query"""
+        self.dataset.apply(COLLECTION_NAME, [
+            (WRITE_UPDATE, { "name": "rocky" }, { "name": "skippy" }, False, True),
+            (WRITE_UPDATE, { "name": "nobody" }, { "name": "nobody" }, False, False),
+            (WRITE_UPDATE, { "_id": 9 }, { "name": "chip" }, True, False),
+        ])
+        self.assertEqual([ 1, 2, 3, 9 ], self.getIds())
+        self.assertEqual({ "_id": 1, "name": "skippy" }, self.dataset.find(COLLECTION_NAME, { "_id": 1 })[0])
+        self.assertEqual("rocky", self.dataset.find(COLLECTION_NAME, { "_id": 3 })[0]["name"])
+        self.assertEqual("chip", self.dataset.find(COLLECTION_NAME, { "_id": 9 })[0]["name"])
+        self.assertRaises(Exception, self.dataset.apply, COLLECTION_NAME, \
+                          [ (WRITE_UPDATE, { "_id": 1 }, { "$set": { "name": "x" } }, False, False) ])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import time
+import unittest
+from StringIO import StringIO
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+
+# mongodb-d4
+from inputs.mongodb import parser
+from inputs.mongodb.tracegenerator import TraceGenerator, MongoSniffWriter, writeTrace
+
+class TestParserCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        generator = TraceGenerator(num_collections=2, num_fields=4, doc_count=100, \
+                                   num_sessions=10, ops_per_session=5, duration=10.0, seed=1)
+        fd = StringIO()
+        writeTrace(generator, MongoSniffWriter(fd))
+        self.lines = fd.getvalue().splitlines(True)
+    ## DEF
+
+    def testCheckpointDue(self):
+        p = parser.Parser(True, StringIO(""))
+        p.checkpoint_lines = 100
+        p.line_ctr = 99
+        self.assertFalse(p.isCheckpointDue())
+        p.line_ctr = 100
+        self.assertTrue(p.isCheckpointDue())
+
+        p.checkpoint_lines = 0
+        p.checkpoint_seconds = 60
+        self.assertFalse(p.isCheckpointDue())
+        p.last_checkpoint_time = time.time() - 61
+        self.assertTrue(p.isCheckpointDue())
+
+        p.checkpoint_seconds = 0
+        self.assertFalse(p.isCheckpointDue())
+    ## DEF
+
+    def testDirtySessions(self):
+        """Check that only the sessions that got new operations are marked as changed"""
+        p = parser.ChunkParser(StringIO(""))
+        for line in self.lines:
+            p.processLine(line)
+        p.storeCurrentOpInSession()
+        p.currentOp = None
+        self.assertEqual(sorted(p.client_ops), sorted(p.dirty_sessions))
+
+        # Feed the parser one more query from a single client
+        p.dirty_sessions = { }
+        ip_client = p.client_order[0]
+        for i in xrange(len(self.lines)):
+            m = p.headerRegex.match(self.lines[i])
+            if m and m.group("ip1") == ip_client:
+                p.processLine(self.lines[i])
+                p.processLine(self.lines[i+1])
+                break
+        ## FOR
+        p.storeCurrentOpInSession()
+        self.assertEqual([ ip_client ], p.dirty_sessions.keys())
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
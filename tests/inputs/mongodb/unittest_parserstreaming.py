@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import re
+import unittest
+from StringIO import StringIO
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../"))
+
+# mongodb-d4
+from tests import MongoDBTestCase
+import workload
+from util import constants
+from inputs.mongodb import parser
+from inputs.mongodb.tracegenerator import TraceGenerator, MongoSniffWriter, writeTrace
+
+IDLE_TIMEOUT = 100.0
+LATE_CLIENT = "10.9.9.9:40000"
+LATE_QUERY_ID = 999999
+
+class TestParserStreaming(MongoDBTestCase):
+
+    def setUp(self):
+        MongoDBTestCase.setUp(self)
+        generator = TraceGenerator(num_collections=2, num_fields=4, doc_count=100, \
+                                   num_sessions=10, ops_per_session=5, duration=10.0, seed=1)
+        fd = StringIO()
+        writeTrace(generator, MongoSniffWriter(fd))
+        lines = fd.getvalue().splitlines(True)
+
+        # Split the trace up into its messages
+        headerRegex = re.compile(parser.HEADER_MASK, re.UNICODE)
+        preamble = [ ]
+        messages = [ ]
+        for line in lines:
+            m = headerRegex.match(line)
+            if m:
+                messages.append((m.groupdict(), [ line ]))
+            elif messages:
+                messages[-1][1].append(line)
+            else:
+                preamble.append(line)
+        ## FOR
+
+        # Hold back the reply to the first query so that it arrives after its
+        # session was flushed. The query from a new client long after the end of
+        # the trace makes the parser flush all of the other sessions
+        for i in xrange(len(messages)):
+            header, msg_lines = messages[i]
+            if header['arrow'] == '<<--' and header['reply_id']:
+                self.late_reply = messages.pop(i)
+                break
+        ## FOR
+        self.late_query_id = long(self.late_reply[0]['reply_id'])
+        query_header, query_lines = [ x for x in messages if x[0]['arrow'] == '-->>' ][0]
+        timestamp = float(messages[-1][0]['timestamp']) + 10 * IDLE_TIMEOUT
+        late_query = query_lines[0].replace(query_header['timestamp'], "%.6f" % timestamp, 1) \
+                                   .replace(query_header['ip1'], LATE_CLIENT, 1)
+        late_query = re.sub("id:\w+\t\d+", "id:%x\t%d" % (LATE_QUERY_ID, LATE_QUERY_ID), late_query)
+
+        self.head = preamble + sum([ x[1] for x in messages ], [ ]) + [ late_query ] + query_lines[1:]
+        self.tail = self.late_reply[1]
+        self.num_clients = len(set([ x[0]['ip1'] for x in messages if x[0]['arrow'] == '-->>' ]))
+    ## DEF
+
+    def getStoredSessions(self):
+        sessions = [ ]
+        for session in self.metadata_db.Session.fetch().sort('session_id', 1):
+            session = dict(session)
+            del session['_id']
+            sessions.append(session)
+        ## FOR
+        return sessions
+    ## DEF
+
+    def testIdleSessions(self):
+        """Check that idle sessions are flushed and still get their late replies"""
+        p = parser.Parser(self.metadata_db, StringIO(""), skipSaltSearch=True)
+        p.idle_timeout = IDLE_TIMEOUT
+        # The late reply's header finishes the late query, which flushes the other sessions
+        for line in self.head + self.tail[:1]:
+            p.processLine(line)
+
+        self.assertEqual([ LATE_CLIENT ], p.session_map.keys())
+        self.assertEqual(self.num_clients, p.flush_ctr)
+        self.assertEqual(self.num_clients + 1, p.getSessionCount())
+        self.assertIn(self.late_query_id, p.pending_replies)
+        _id, op_idx, flush_time = p.pending_replies[self.late_query_id]
+        stored = self.metadata_db.Session.collection.find_one({'_id': _id})
+        self.assertEqual(self.late_query_id, stored['operations'][op_idx]['query_id'])
+        self.assertIsNone(stored['operations'][op_idx]['resp_id'])
+        num_stored = self.metadata_db.Session.find().count()
+
+        # The reply is stored in the session that we flushed, not in a new one
+        p.fd = StringIO("".join(self.tail[1:]))
+        p.process()
+        self.assertNotIn(self.late_query_id, p.pending_replies)
+        stored = self.metadata_db.Session.collection.find_one({'_id': _id})
+        op = stored['operations'][op_idx]
+        self.assertEqual(long(self.late_reply[0]['query_id']), op['resp_id'])
+        self.assertAlmostEqual(float(self.late_reply[0]['timestamp']), op['resp_time'], 5)
+        self.assertNotEqual([ ], op['resp_content'])
+        self.assertEqual(num_stored + 1, self.metadata_db.Session.find().count())
+        streamed = self.getStoredSessions()
+
+        # Parsing the same trace while keeping every session in memory must give us the same sessions
+        self.metadata_db.Session.collection.remove()
+        p = parser.Parser(self.metadata_db, StringIO("".join(self.head + self.tail)), skipSaltSearch=True)
+        p.process()
+        self.assertEqual(self.num_clients + 1, len(p.session_map))
+        self.assertEqual(p.getSessionCount(), len(streamed))
+        self.assertEqual(self.getStoredSessions(), streamed)
+    ## DEF
+
+    def testPendingReplyTimeout(self):
+        """Check that we forget about the replies that do not show up within the idle timeout"""
+        p = parser.Parser(self.metadata_db, StringIO(""), skipSaltSearch=True)
+        p.idle_timeout = IDLE_TIMEOUT
+        for line in self.head + self.tail[:1]:
+            p.processLine(line)
+        self.assertIn(self.late_query_id, p.pending_replies)
+
+        p.flushIdleSessions(p.last_idle_check + IDLE_TIMEOUT)
+        self.assertNotIn(self.late_query_id, p.pending_replies)
+
+        # The reply is skipped instead of starting a new session for its client
+        num_skipped = p.skip_ctr
+        p.fd = StringIO("".join(self.tail[1:]))
+        p.process()
+        self.assertEqual(num_skipped + 1, p.skip_ctr)
+        _id = self.metadata_db.Session.collection.find_one({'operations.query_id': self.late_query_id})['_id']
+        stored = self.metadata_db.Session.collection.find_one({'_id': _id})
+        self.assertEqual(1, self.metadata_db.Session.find({'ip_client': stored['ip_client']}).count())
+    ## DEF
+
+    def testSplitSession(self):
+        """Check that we do not keep pending replies for a session that had to be split up to save it"""
+        p = parser.Parser(self.metadata_db, StringIO(""), skipSaltSearch=True)
+        p.idle_timeout = IDLE_TIMEOUT
+        session = p.getOrCreateSession(LATE_CLIENT, "10.0.0.1:27017")
+        # Together these operations are bigger than the maximum document size
+        for i in xrange(4):
+            op = workload.Session.operationFactory()
+            op['collection'] = "synthetic.col00"
+            op['type'] = constants.OP_TYPE_QUERY
+            op['query_id'] = LATE_QUERY_ID + i
+            op['query_content'] = [ {"data": "x" * (5 * 1024 * 1024)} ]
+            p.query_response_map[op['query_id']] = op
+            session['operations'].append(op)
+        ## FOR
+        p.flushSessions([ LATE_CLIENT ], 1.0)
+
+        # The first half was saved, the second half went into a new session
+        self.assertEqual(2, len(self.metadata_db.Session.collection.find_one({'_id': session['_id']})['operations']))
+        self.assertIn(LATE_CLIENT, p.session_map)
+        self.assertEqual(0, len(p.pending_replies))
+        for i in xrange(2):
+            self.assertNotIn(LATE_QUERY_ID + i, p.query_response_map)
+        for i in xrange(2, 4):
+            self.assertIn(LATE_QUERY_ID + i, p.query_response_map)
+    ## DEF
+
+    def testLegacyWrites(self):
+        """Check that we do not wait for the replies to legacy writes, which never get one"""
+        p = parser.Parser(self.metadata_db, StringIO(""), skipSaltSearch=True)
+        p.idle_timeout = IDLE_TIMEOUT
+        for query_id, expects_reply in [ (LATE_QUERY_ID, False), (LATE_QUERY_ID + 1, True) ]:
+            header = {
+                'timestamp':  1.0,
+                'ip1':        LATE_CLIENT,
+                'arrow':      "-->>",
+                'ip2':        "10.0.0.1:27017",
+                'collection': "synthetic.col00",
+                'size':       100,
+                'query_id':   query_id,
+                'reply_id':   None,
+                'type':       constants.OP_TYPE_INSERT,
+            }
+            # An insert that was sent as a command gets a reply
+            if expects_reply: header['expects_reply'] = True
+            p.storeMessage(header, [ {"_id": query_id} ])
+        ## FOR
+        self.assertEqual(2, len(p.session_map[LATE_CLIENT]['operations']))
+        self.assertNotIn(LATE_QUERY_ID, p.query_response_map)
+
+        p.flushSessions([ LATE_CLIENT ], 1.0)
+        self.assertEqual([ LATE_QUERY_ID + 1 ], p.pending_replies.keys())
+    ## DEF
+
+    def testMaxPendingReplies(self):
+        """Check that we only keep the newest MAX_PENDING_REPLIES pending replies"""
+        p = parser.Parser(self.metadata_db, StringIO(""), skipSaltSearch=True)
+        p.idle_timeout = IDLE_TIMEOUT
+        for i in xrange(parser.MAX_PENDING_REPLIES + 10):
+            p.pending_replies[i] = (None, 0, 0.0)
+        p.flushIdleSessions(1.0)
+        self.assertEqual(parser.MAX_PENDING_REPLIES, len(p.pending_replies))
+        self.assertEqual(10, next(p.pending_replies.iterkeys()))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
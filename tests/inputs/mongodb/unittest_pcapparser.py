@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import shutil
+import struct
+import tempfile
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+
+# mongodb-d4
+from util import constants
+from inputs.mongodb import parser, pcapparser, pcapreader
+from inputs.mongodb.tracegenerator import TraceGenerator, MongoSniffWriter, PcapWriter, writeTrace
+
+NUM_SESSIONS = 20
+NUM_OPS_PER_SESSION = 10
+
+class TestPcapParser(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.text_path = os.path.join(self.tmpdir, "trace.out")
+        self.pcap_path = os.path.join(self.tmpdir, "trace.pcap")
+        with open(self.text_path, "w") as fd:
+            writeTrace(self.createGenerator(), MongoSniffWriter(fd))
+        # Use a small segment size so that most of the messages are split up
+        with open(self.pcap_path, "wb") as fd:
+            writeTrace(self.createGenerator(), PcapWriter(fd, mss=100))
+    ## DEF
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    ## DEF
+
+    def createGenerator(self):
+        return TraceGenerator(num_collections=3, num_fields=6, nesting=2, fanout=3, doc_count=1000, \
+                              num_sessions=NUM_SESSIONS, ops_per_session=NUM_OPS_PER_SESSION, \
+                              duration=60.0, seed=1)
+    ## DEF
+
+    def parseText(self):
+        with open(self.text_path, "r") as fd:
+            p = parser.ChunkParser(fd)
+            p.processRange(0, os.path.getsize(self.text_path))
+        return p
+    ## DEF
+
+    def parsePcap(self, path):
+        with open(path, "rb") as fd:
+            p = parser.ChunkParser(fd)
+            decoder = pcapparser.WireProtocolDecoder(fd, 27017)
+            for event in decoder.events():
+                if event[0] == pcapparser.EVENT_MESSAGE:
+                    p.storeMessage(event[1], event[2])
+        ## WITH
+        return p, decoder
+    ## DEF
+
+    def getSessions(self, p):
+        """Return the sessions without the message sizes, which depend on the format"""
+        ret = [ ]
+        for ip_client, ip_server, start_time, ops in p.getResult()["sessions"]:
+            for op in ops:
+                for key in [ "query_size", "resp_size" ]:
+                    op.pop(key, None)
+                for key in [ "query_time", "resp_time" ]:
+                    if op.get(key) is not None: op[key] = round(op[key], 6)
+            ## FOR
+            ret.append((ip_client, ip_server, round(start_time, 6), ops))
+        ## FOR
+        return ret
+    ## DEF
+
+    def testDecode(self):
+        """Check that the capture gives the same sessions as the mongosniff trace"""
+        expected = self.parseText()
+        p, decoder = self.parsePcap(self.pcap_path)
+        self.assertEqual(NUM_SESSIONS * NUM_OPS_PER_SESSION, p.getOpCount())
+        self.assertEqual(0, p.getOpSkipCount())
+        self.assertEqual(self.getSessions(expected), self.getSessions(p))
+        self.assertEqual(expected.known_collections, p.known_collections)
+        self.assertEqual(0, decoder.resync_ctr)
+        self.assertEqual(0, decoder.unsupported_ctr)
+        self.assertEqual(0, decoder.tcp.gap_ctr)
+    ## DEF
+
+    def testReorderedSegments(self):
+        """Check that the segments of a message can arrive out of order"""
+        with open(self.pcap_path, "rb") as fd:
+            reader = pcapreader.PcapReader(fd)
+            packets = list(reader.packets())
+        swapped = 0
+        for i in xrange(1, len(packets)):
+            prev = pcapreader.decodeTCP(reader.linktype, packets[i-1][1])
+            cur = pcapreader.decodeTCP(reader.linktype, packets[i][1])
+            # Only swap the data segments of the same message
+            if packets[i-1][0] == packets[i][0] and prev[:4] == cur[:4] and prev[-1] and cur[-1]:
+                packets[i-1], packets[i] = packets[i], packets[i-1]
+                swapped += 1
+        ## FOR
+        self.assertGreater(swapped, 0)
+
+        path = os.path.join(self.tmpdir, "reordered.pcap")
+        with open(path, "wb") as fd:
+            with open(self.pcap_path, "rb") as src:
+                fd.write(src.read(24))
+            for timestamp, data in packets:
+                ts_sec = int(timestamp)
+                ts_usec = int(round((timestamp - ts_sec) * 1000000))
+                fd.write(struct.pack("<IIII", ts_sec, ts_usec, len(data), len(data)) + data)
+        ## WITH
+
+        expected, decoder = self.parsePcap(self.pcap_path)
+        p, decoder = self.parsePcap(path)
+        self.assertEqual(self.getSessions(expected), self.getSessions(p))
+        self.assertEqual(0, decoder.resync_ctr)
+    ## DEF
+
+    def testTranslateFind(self):
+        """Check that the filter of a find command always ends up under $query"""
+        body = { "find": "users", "filter": { "age": 21 }, "$db": "shop" }
+        ops = pcapparser.translateCommand({ }, "find", body)
+        self.assertEqual(1, len(ops))
+        header, content = ops[0]
+        self.assertEqual("shop.users", header['collection'])
+        self.assertEqual(constants.OP_TYPE_QUERY, header['type'])
+        self.assertEqual([ { "$query": { "age": 21 } } ], content)
+
+        body["sort"] = { "name": 1 }
+        header, content = pcapparser.translateCommand({ }, "find", body)[0]
+        self.assertEqual([ { "$query": { "age": 21 }, "$orderby": { "name": 1 } } ], content)
+
+        # Without a filter we still get an empty $query
+        header, content = pcapparser.translateCommand({ }, "find", { "find": "users", "$db": "shop" })[0]
+        self.assertEqual([ { "$query": { } } ], content)
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
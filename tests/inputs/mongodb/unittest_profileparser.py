@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+from collections import OrderedDict
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+
+# mongodb-d4
+from inputs.mongodb import profileparser
+from util import constants
+
+LOG_LINES = [
+    '{"t":{"$date":"2021-03-01T12:00:00.000+00:00"},"s":"I","c":"NETWORK","id":22943,"ctx":"listener","msg":"Connection accepted","attr":{"remote":"10.1.0.5:40000","connectionId":12}}',
+    '{"t":{"$date":"2021-03-01T12:00:01.250+00:00"},"s":"I","c":"COMMAND","id":51803,"ctx":"conn12","msg":"Slow query","attr":{"type":"command","ns":"shop.users","command":{"find":"users","filter":{"_id":{"$oid":"5f1e5e3a8b2e4a1d2c3b4a59"},"age":{"$gte":21}},"sort":{"name":1},"limit":5,"lsid":{"id":{"$uuid":"0a3e"}},"$db":"shop"},"nreturned":1,"reslen":230,"durationMillis":250}}',
+    '{"t":{"$date":"2021-03-01T13:00:02.000+01:00"},"s":"I","c":"WRITE","id":51803,"ctx":"conn12","msg":"Slow query","attr":{"type":"update","ns":"shop.users","command":{"q":{"name":"bob"},"u":{"$set":{"age":30}},"multi":true,"upsert":false},"durationMillis":0}}',
+    '{"t":{"$date":"2021-03-01T12:00:03.000Z"},"s":"I","c":"COMMAND","id":51803,"ctx":"conn13","msg":"Slow query","attr":{"type":"command","ns":"shop.$cmd","command":{"delete":"orders","deletes":[{"q":{"user":"bob"},"limit":0},{"q":{"user":"al"},"limit":1}],"$db":"shop"},"reslen":45,"durationMillis":1}}',
+    '{"t":{"$date":"2021-03-01T12:00:04.000Z"},"s":"I","c":"COMMAND","id":51803,"ctx":"conn13","msg":"Slow query","attr":{"type":"command","ns":"shop.orders","command":{"$truncated":"{ insert: \\"orders\\", documents: [ ...","comment":"large"},"durationMillis":1}}',
+    '{"t":{"$date":"2021-03-01T12:00:05.000Z"},"s":"I","c":"NETWORK","id":22944,"ctx":"conn12","msg":"Connection ended","attr":{"remote":"10.1.0.5:40000","connectionId":12}}',
+]
+
+PROFILE_LINES = [
+    '{"op":"insert","ns":"shop.orders","command":{"insert":"orders","documents":[{"_id":1,"user":"bob","at":{"$date":{"$numberLong":"1614600000000"}}}],"$db":"shop"},"ninserted":1,"millis":2,"ts":{"$date":"2021-03-01T12:00:00.002Z"},"client":"10.1.0.7","user":""}',
+    '{"op":"query","ns":"shop.orders","command":{"find":"orders","filter":{"user":"bob"},"projection":{"at":1},"$db":"shop"},"nreturned":1,"responseLength":120,"millis":1,"ts":{"$date":"2021-03-01T12:00:01.001Z"},"client":"10.1.0.7","user":""}',
+    '{"op":"getmore","ns":"shop.orders","command":{"getMore":{"$numberLong":"1234"},"collection":"orders"},"millis":0,"ts":{"$date":"2021-03-01T12:00:01.500Z"},"client":"10.1.0.7"}',
+    '{"op":"command","ns":"shop.orders","command":{"count":"orders","query":{"user":"bob"},"$db":"shop"},"millis":0,"ts":{"$date":"2021-03-01T12:00:02Z"},"client":"10.1.0.8"}',
+    '{"op":"remove","ns":"shop.orders","query":{"user":"al"},"millis":0,"ts":{"$date":"2021-03-01T12:00:03Z"},"client":"10.1.0.8"}',
+]
+
+class MemoryProfileParser(profileparser.ProfileParser):
+    """Keeps the sessions in memory instead of in the metadata database"""
+
+    def __init__(self, lines):
+        profileparser.ProfileParser.__init__(self, None, lines)
+        self.save_checkpoints = False
+        self.sessions = OrderedDict()
+    ## DEF
+
+    def getOrCreateSession(self, ip_client, ip_server):
+        if not ip_client in self.sessions:
+            self.sessions[ip_client] = { "session_id": ip_client, "ip_server": ip_server, "start_time": None, "operations": [ ] }
+        return self.sessions[ip_client]
+    ## DEF
+
+    def processLines(self):
+        for line in self.fd:
+            self.processEntry(line)
+        return self
+    ## DEF
+## CLASS
+
+class TestProfileParser(unittest.TestCase):
+
+    def testDecodeValue(self):
+        """Check that the extended JSON types look like they do in a mongosniff trace"""
+        decode = profileparser.decodeValue
+        self.assertEqual("ObjectId('5f1e5e3a8b2e4a1d2c3b4a59')", decode({ "$oid": "5f1e5e3a8b2e4a1d2c3b4a59" }))
+        self.assertEqual("new Date(1614600000000)", decode({ "$date": { "$numberLong": "1614600000000" } }))
+        self.assertEqual("new Date(1614600000123)", decode({ "$date": "2021-03-01T12:00:00.123Z" }))
+        self.assertEqual("new Date(1614600000000)", decode({ "$date": "2021-03-01T07:00:00.000-05:00" }))
+        self.assertEqual(12, decode({ "$numberLong": "12" }))
+        self.assertEqual(1.5, decode({ "$numberDouble": "1.5" }))
+        self.assertEqual("BinData(4, AAE=)", decode({ "$binary": { "base64": "AAE=", "subType": "04" } }))
+        self.assertEqual("/^ab/", decode({ "$regularExpression": { "pattern": "^ab", "options": "i" } }))
+        self.assertEqual({ "a": [ { "$gt": 1 } ] }, decode(OrderedDict([ ("a", [ { "$gt": { "$numberInt": "1" } } ]) ])))
+        self.assertEqual(dict, type(decode(OrderedDict([ ("b", OrderedDict()) ]))["b"]))
+    ## DEF
+
+    def testLog(self):
+        """Check the operations that we extract from a structured log"""
+        p = MemoryProfileParser(LOG_LINES).processLines()
+        self.assertEqual([ "conn12", "conn13" ], p.sessions.keys())
+        self.assertEqual(1, p.truncated_ctr)
+
+        find, update = p.sessions["conn12"]["operations"]
+        self.assertEqual(constants.OP_TYPE_QUERY, find["type"])
+        self.assertEqual("shop.users", find["collection"])
+        self.assertEqual(1614600001.0, find["query_time"])
+        self.assertEqual(1614600001.25, find["resp_time"])
+        self.assertEqual(230, find["resp_size"])
+        self.assertEqual(5, find["query_limit"])
+        query = find["query_content"][0][constants.REPLACE_KEY_DOLLAR_PREFIX + "query"]
+        self.assertEqual("ObjectId('5f1e5e3a8b2e4a1d2c3b4a59')", query["_id"])
+        self.assertEqual({ constants.REPLACE_KEY_DOLLAR_PREFIX + "gte": 21 }, query["age"])
+
+        self.assertEqual(constants.OP_TYPE_UPDATE, update["type"])
+        self.assertEqual(1614600002.0, update["query_time"])
+        self.assertTrue(update["update_multi"])
+        self.assertFalse(update["update_upsert"])
+        self.assertEqual({ "name": "bob" }, update["query_content"][0])
+
+        # Each statement of the bulk delete is a separate operation
+        deletes = p.sessions["conn13"]["operations"]
+        self.assertEqual([ constants.OP_TYPE_DELETE ] * 2, [ op["type"] for op in deletes ])
+        self.assertEqual([ [ { "user": "bob" } ], [ { "user": "al" } ] ], [ op["query_content"] for op in deletes ])
+        self.assertEqual("shop.orders", deletes[0]["collection"])
+    ## DEF
+
+    def testProfile(self):
+        """Check the operations that we extract from a system.profile export"""
+        p = MemoryProfileParser(PROFILE_LINES).processLines()
+        self.assertEqual([ "10.1.0.7", "10.1.0.8" ], p.sessions.keys())
+        self.assertEqual(1, p.getOpSkipCount())
+
+        insert, query = p.sessions["10.1.0.7"]["operations"]
+        self.assertEqual(constants.OP_TYPE_INSERT, insert["type"])
+        self.assertEqual([ { "_id": 1, "user": "bob", "at": "new Date(1614600000000)" } ], insert["query_content"])
+        self.assertEqual(1614600000.0, insert["query_time"])
+        self.assertEqual(constants.OP_TYPE_QUERY, query["type"])
+        self.assertEqual({ "at": 1 }, query["query_fields"])
+        self.assertEqual(120, query["resp_size"])
+        self.assertEqual(1614600001.001, query["resp_time"])
+
+        count, remove = p.sessions["10.1.0.8"]["operations"]
+        self.assertEqual("shop.$cmd", count["collection"])
+        # The Parser always renames the 'query' key
+        self.assertEqual({ "count": "orders", constants.REPLACE_KEY_DOLLAR_PREFIX + "query": { "user": "bob" } }, \
+                         count["query_content"][0])
+        self.assertEqual(constants.OP_TYPE_DELETE, remove["type"])
+        self.assertEqual([ { "user": "al" } ], remove["query_content"])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
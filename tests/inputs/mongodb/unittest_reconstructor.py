@@ -120,6 +120,24 @@ class TestReconstructor(MongoDBTestCase):
         # We should always have one per operation
         self.assertEquals(num_docs, NUM_SESSIONS * NUM_OPS_PER_SESSION)
     ## DEF
+
+    def testProcessBatches(self):
+        """Check that the batched and the in-memory reconstruction create the same documents"""
+        self.reconstructor.batch_size = 7
+        self.reconstructor.num_workers = 3
+        self.reconstructor.process()
+        expected = sorted(self.dataset_db[COLLECTION_NAME].find(), key=lambda doc: doc["_id"])
+        self.assertEquals(NUM_SESSIONS * NUM_OPS_PER_SESSION, len(expected))
+        self.assertGreater(self.reconstructor.bulk_ctr, 1)
+        self.dataset_db[COLLECTION_NAME].drop()
+
+        r = Reconstructor(self.metadata_db, self.dataset_db)
+        r.batch_size = 7
+        r.in_memory = True
+        r.process()
+        docs = sorted(self.dataset_db[COLLECTION_NAME].find(), key=lambda doc: doc["_id"])
+        self.assertEquals(expected, docs)
+    ## DEF
 ## CLASS
 
 if __name__ == '__main__':
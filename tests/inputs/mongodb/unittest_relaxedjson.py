@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import re
+import json
+import yaml
+import unittest
+from StringIO import StringIO
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+
+# mongodb-d4
+from inputs.mongodb import parser
+from inputs.mongodb import relaxedjson
+
+SAMPLE_FILES = [
+    os.path.join(basedir, "../../../src/inputs/mongodb/sample.txt"),
+    os.path.join(basedir, "../../sanitizer/trace-clean.out"),
+]
+
+def yamlParse(line):
+    """The old way of parsing a content line"""
+    return json.loads(json.dumps(yaml.load(line)))
+## DEF
+
+class TestRelaxedJSON(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = [ ]
+        for path in SAMPLE_FILES:
+            with open(path, "r") as fd:
+                for line in fd:
+                    self.lines += re.findall(r"\{.*?\}(?= \w+:|$)", line.strip())
+        ## FOR
+        self.assertGreater(len(self.lines), 0)
+    ## DEF
+
+    def testSampleLines(self):
+        """Check that the fast path gives the same result as YAML for the sample traces"""
+        accepted = 0
+        for line in self.lines:
+            try:
+                obj = relaxedjson.loads(line)
+            except ValueError:
+                continue
+            self.assertEqual(yamlParse(line), obj, line)
+            accepted += 1
+        ## FOR
+        self.assertGreater(accepted, len(self.lines) / 2)
+    ## DEF
+
+    def testScalars(self):
+        """Check that bare values are typed the same way that YAML types them"""
+        line = '{ _id: ObjectId(\'4f32e32277ed44154d000000\'), a: 1, b: -2, c: 0.5, d: 1.5e+10, ' + \
+               'e: true, f: No, g: null, h: e7a689b31342baa4c3d6422980fd0edc/8, i: $set, ' + \
+               'j: "x \\"y\\" z", k: \'it\'\'s\', l: [ 1, [ ], { } ], m.n: abc }'
+        self.assertEqual(yamlParse(line), relaxedjson.loads(line))
+    ## DEF
+
+    def testRejected(self):
+        """Check that notation that YAML would interpret differently is rejected"""
+        for line in [ "{ a: 012 }", "{ a: 1e5 }", "{ a: 2012-01-01 }", "{ a: 0x1F }",
+                      "{ a:1 }", "{ a: hello world }", "{ a: new Date(1) }", "{ a: 1, }",
+                      "{ 1: a }", "{ a: ~ }" ]:
+            self.assertRaises(ValueError, relaxedjson.loads, line)
+        ## FOR
+    ## DEF
+
+    def testParserCounters(self):
+        """Check that the Parser falls back to YAML and counts both paths"""
+        p = parser.Parser(True, StringIO(""))
+        self.assertEqual({ "a": 1 }, p.yaml2json("{ a: 1 }"))
+        self.assertEqual({ "a": "hello world" }, p.yaml2json("{ a: hello world }"))
+        self.assertIsNone(p.yaml2json("{ }"))
+        self.assertEqual(2, p.getJSONContentCount())
+        self.assertEqual(1, p.getYAMLContentCount())
+        self.assertEqual(1, p.error_ctr)
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
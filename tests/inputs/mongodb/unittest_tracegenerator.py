@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import re
+import json
+import yaml
+import unittest
+from StringIO import StringIO
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+
+# mongodb-d4
+from util import constants
+from inputs.mongodb import parser
+from inputs.mongodb.tracegenerator import TraceGenerator, MongoSniffWriter, SessionWriter, writeTrace, parseOpMix
+
+NUM_SESSIONS = 50
+NUM_OPS_PER_SESSION = 6
+
+class TestTraceGenerator(unittest.TestCase):
+
+    def createGenerator(self, seed=0):
+        return TraceGenerator(num_collections=3, num_fields=6, nesting=2, fanout=3, doc_count=1000, \
+                              num_sessions=NUM_SESSIONS, ops_per_session=NUM_OPS_PER_SESSION, \
+                              duration=60.0, seed=seed)
+    ## DEF
+
+    def getSessions(self, generator):
+        fd = StringIO()
+        writeTrace(generator, SessionWriter(fd))
+        return [ json.loads(line) for line in fd.getvalue().splitlines() ]
+    ## DEF
+
+    def testSessions(self):
+        sessions = self.getSessions(self.createGenerator())
+        self.assertEqual(NUM_SESSIONS, len(sessions))
+        self.assertEqual(NUM_SESSIONS, len(set([ sess['session_id'] for sess in sessions ])))
+        for sess in sessions:
+            self.assertEqual(NUM_OPS_PER_SESSION, len(sess['operations']))
+            last = sess['start_time']
+            for op in sess['operations']:
+                self.assertIn(op['type'], constants.OP_TYPE_ALL)
+                self.assertGreaterEqual(op['query_time'], last)
+                last = op['query_time']
+                if op['type'] != constants.OP_TYPE_QUERY: continue
+                # Every document in the response has to match the query
+                query = op['query_content'][0]
+                for doc in op['resp_content']:
+                    for key, value in query.iteritems():
+                        if isinstance(value, dict):
+                            self.assertTrue(value['#gte'] <= doc[key] < value['#lt'])
+                        elif not '__' in key:
+                            self.assertEqual(value, doc[key])
+                ## FOR
+            ## FOR
+        ## FOR
+    ## DEF
+
+    def testForeignKeys(self):
+        generator = self.createGenerator()
+        schema = generator.schema
+        for col_name in schema.col_names:
+            parent = schema.parents[col_name]
+            if parent is None: continue
+            fk = schema.getForeignKey(col_name)
+            for parent_id in xrange(10):
+                doc_ids = schema.findDocuments(col_name, fk, parent_id, 100)
+                self.assertEqual(schema.fanout, len(doc_ids))
+                for doc_id in doc_ids:
+                    self.assertEqual(parent_id, schema.getDocument(col_name, doc_id)[fk])
+            ## FOR
+        ## FOR
+    ## DEF
+
+    def testDeterministic(self):
+        sessions = [ self.getSessions(self.createGenerator(seed)) for seed in [ 1, 1, 2 ] ]
+        self.assertEqual(sessions[0], sessions[1])
+        self.assertNotEqual(sessions[0], sessions[2])
+    ## DEF
+
+    def testMongoSniff(self):
+        """Check that the mongosniff Parser can read every line of the trace"""
+        fd = StringIO()
+        num_ops = writeTrace(self.createGenerator(), MongoSniffWriter(fd))
+        self.assertEqual(NUM_SESSIONS * NUM_OPS_PER_SESSION, num_ops)
+
+        headerRegex = re.compile(parser.HEADER_MASK)
+        contentRegexes = [ re.compile(x) for x in [ parser.CONTENT_QUERY_MASK, parser.CONTENT_INSERT_MASK, \
+                                                    parser.CONTENT_UPDATE_MASK, parser.CONTENT_DELETE_MASK, \
+                                                    parser.CONTENT_REPLY_MASK ] ]
+        requests = 0
+        lastTime = 0
+        lines = fd.getvalue().splitlines()[1:]
+        for i in xrange(len(lines)):
+            header = headerRegex.match(lines[i])
+            if header:
+                header = header.groupdict()
+                self.assertGreaterEqual(float(header['timestamp']), lastTime)
+                lastTime = float(header['timestamp'])
+                if header['arrow'] == '-->>':
+                    requests += 1
+                    self.assertIsNone(header['reply_id'])
+                else:
+                    self.assertIsNotNone(header['reply_id'])
+                # The first content line tells the Parser what kind of message this is
+                self.assertTrue([ x for x in contentRegexes if x.match(lines[i+1]) ], lines[i+1])
+            else:
+                line = lines[i].strip()
+                if line.startswith("reply"): continue
+                for part in line[line.find('{'):line.rfind('}')+1].split(" o:"):
+                    self.assertIsInstance(yaml.load(part), dict, part)
+            ## IF
+        ## FOR
+        self.assertEqual(num_ops, requests)
+    ## DEF
+
+    def testParseOpMix(self):
+        op_mix = parseOpMix("query=80,insert=20")
+        self.assertEqual([ constants.OP_TYPE_QUERY, constants.OP_TYPE_INSERT ], op_mix.keys())
+        generator = TraceGenerator(num_templates=10, op_mix=op_mix)
+        for template in generator.templates:
+            self.assertIn(template['type'], op_mix)
+        self.assertRaises(Exception, parseOpMix, "select=100")
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
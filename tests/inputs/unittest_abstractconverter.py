@@ -6,6 +6,8 @@ import random
 import unittest
 from datetime import datetime
 from pprint import pprint
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
 
 basedir = os.path.realpath(os.path.dirname(__file__))
 sys.path.append(os.path.join(basedir, "../../"))
@@ -113,6 +115,169 @@ class TestAbstractConverter(MongoDBTestCase):
 
     ## DEF
 
+    def testExtractSchemaCatalogParallel(self):
+        """
+            Check that extracting the schema catalog with multiple worker
+            processes gives us the same statistics as a single process
+        """
+        Reconstructor(self.metadata_db, self.dataset_db).process()
+        self.converter.computeWorkloadStats()
+        # Make sure that the collection is split up between the workers
+        self.converter.schema_split_docs = 10
+        queries = self.converter.getIdRanges(COLLECTION_NAME, 3)
+        self.assertGreater(len(queries), 1)
+        self.assertLessEqual(len(queries), 3)
+        num_docs = sum([ self.dataset_db[COLLECTION_NAME].find(q).count() for q in queries ])
+        self.assertEqual(self.dataset_db[COLLECTION_NAME].count(), num_docs)
+
+        results = [ ]
+        for num_workers in [ 1, 3 ]:
+            self.converter.schema_workers = num_workers
+            self.converter.extractSchemaCatalog()
+            col_info = self.metadata_db.Collection.one({"name": COLLECTION_NAME})
+            results.append((col_info['doc_count'], col_info['data_size'], col_info['fields']))
+        ## FOR
+        self.assertEqual(results[0][0], results[1][0])
+        self.assertEqual(results[0][1], results[1][1])
+        self.assertEqual(results[0][2], results[1][2])
+
+        # A collection whose _id values have different types is not split up
+        col = self.dataset_db["mixed"]
+        for i in xrange(20):
+            col.insert({"_id": i if i % 2 else str(i)})
+        self.assertEqual([ None ], self.converter.getIdRanges("mixed", 3))
+        # Neither is a collection that is too small
+        self.converter.schema_split_docs = 100
+        self.assertEqual([ None ], self.converter.getIdRanges("mixed", 3))
+    ## DEF
+
+    def testExtractSchemaCatalogSampled(self):
+        """
+            Check that sampling half of the documents of a collection scales its
+            statistics up to all of them, with $sample and without it
+        """
+        col = self.dataset_db["sampled"]
+        for i in xrange(1000):
+            col.insert({"_id": i, "value": "x" * 10})
+        self.converter.extractSchemaCatalog(sample_rate=100)
+        expected = self.metadata_db.Collection.one({"name": "sampled"})
+
+        aggregate = Collection.aggregate
+        try:
+            for server_sample in [ True, False ]:
+                if not server_sample:
+                    def failAggregate(*args, **kwargs):
+                        raise OperationFailure("$sample is not supported")
+                    Collection.aggregate = failAggregate
+                ## IF
+                self.converter.extractSchemaCatalog(sample_rate=50)
+                col_info = self.metadata_db.Collection.one({"name": "sampled"})
+                self.assertEqual(1000, col_info['doc_count'])
+                # All of the documents have the same size
+                self.assertEqual(expected['data_size'], col_info['data_size'])
+                self.assertEqual(expected['avg_doc_size'], col_info['avg_doc_size'])
+                self.assertEqual(expected['fields']['value']['avg_size'], col_info['fields']['value']['avg_size'])
+            ## FOR
+        finally:
+            Collection.aggregate = aggregate
+    ## DEF
+
+    def testGetRangeSample(self):
+        """Check that we sample a range of _id values without $sample"""
+        col = self.dataset_db["sampled"]
+        for i in xrange(1000):
+            col.insert({"_id": i, "value": i * 2})
+        self.converter.rng.seed(0)
+        query = {"_id": {"$gte": 100, "$lt": 600}}
+        docs = list(self.converter.getSampleCursor("sampled", 50, query))
+        ids = [ doc["_id"] for doc in docs ]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertGreater(len(ids), 150)
+        self.assertLess(len(ids), 350)
+        for doc in docs:
+            self.assertTrue(100 <= doc["_id"] < 600)
+            self.assertEqual(doc["_id"] * 2, doc["value"])
+        ## FOR
+    ## DEF
+
+    def testGetCountOfValues(self):
+        """
+            Check that the counts of the values of a key are the same as counting
+            the documents with a query for each value, and that we do not drop
+            the indexes of the collection
+        """
+        col = self.dataset_db["embedded"]
+        for i in xrange(200):
+            col.insert({"key": i % 17, "tags": [ i % 3, i % 5 ], "nested": {"key": i % 4}})
+        col.create_index("key")
+        num_indexes = len(col.index_information())
+
+        for key in [ "key", "tags", "nested.key" ]:
+            values = col.distinct(key)
+            counts = self.converter.getCountOfValues("embedded", key, values + [ -1 ])
+            for value in values:
+                self.assertEqual(col.find({key: value}).count(), counts[value])
+            self.assertEqual(0, counts[-1])
+        ## FOR
+        self.assertEqual(num_indexes, len(col.index_information()))
+
+        # Large collections are counted by the server and give us the same counts
+        scanned = [ ]
+        for key in [ "key", "tags", "nested.key" ]:
+            values = col.distinct(key) + [ -1 ]
+            scanned.append((self.converter.getDistinctValues("embedded", key), \
+                            self.converter.getCountOfValues("embedded", key, values)))
+        ## FOR
+        self.converter.value_scan_docs = 0
+        self.converter.value_counts = { }
+        for key in [ "key", "tags", "nested.key" ]:
+            values = col.distinct(key) + [ -1 ]
+            self.assertEqual(scanned.pop(0), (self.converter.getDistinctValues("embedded", key), \
+                                              self.converter.getCountOfValues("embedded", key, values)))
+        ## FOR
+        self.assertEqual({ }, self.converter.value_counts)
+        self.converter.value_scan_docs = 1000
+
+        # The second time around the counts come from the cache
+        self.converter.getCountOfValues("embedded", "key", [ 0 ])
+        col.drop()
+        counts = self.converter.getCountOfValues("embedded", "key", [ 0 ])
+        self.assertEqual(12, counts[0])
+    ## DEF
+
+    def testMergeDataFields(self):
+        """Check that merging the fields of two sets of documents is the same as processing all of them"""
+        docs = [ ]
+        for i in xrange(100):
+            docs.append({
+                "int":    i % 7,
+                "str":    "abc%d" % (i % 13),
+                "list":   range(i % 5),
+                "nested": {"float": i / 10.0},
+            })
+        ## FOR
+
+        for field_sketches in [ False, True ]:
+            self.converter.field_sketches = field_sketches
+            fields = { }
+            col_info = catalog.Collection()
+            col_info['data_size'] = 0
+            for doc in docs:
+                self.converter.processDataFields(col_info, fields, doc)
+            self.converter.computeFieldStats(col_info, fields)
+
+            merged = { }
+            for part in [ docs[:30], docs[30:] ]:
+                part_fields = { }
+                for doc in part:
+                    self.converter.processDataFields(col_info, part_fields, doc)
+                self.converter.mergeDataFields(merged, part_fields)
+            ## FOR
+            self.converter.computeFieldStats(col_info, merged)
+            self.assertEqual(fields, merged)
+        ## FOR
+    ## DEF
+
     def testProcessDataFieldsSimple(self):
         doc = {
             'int':     123,
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import random
+import shutil
+import tempfile
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+from search.design import Design
+from checkpoint import Checkpoint, saveCheckpoint, loadCheckpoint
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "d4.checkpoint")
+    ## DEF
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    ## DEF
+
+    def testSaveAndLoad(self):
+        """Check that the best design and the worker states survive a round trip to disk"""
+        design = Design()
+        design.addCollection("col0")
+        design.addShardKey("col0", ("f0", "f1"))
+        design.addIndex("col0", ("f1",))
+        design.addCollection("col1")
+        design.setDenormalizationParent("col1", "col0")
+
+        rng = random.Random()
+        checkpoint = Checkpoint()
+        checkpoint.bestCost = 0.25
+        checkpoint.bestDesign = design
+        checkpoint.elapsed = 1234.5
+        checkpoint.workers[0] = {"relaxRatio": 0.35, "timeout": 600, "generator": {"rng": rng.getstate()}}
+        saveCheckpoint(self.path, checkpoint)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+        clone = loadCheckpoint(self.path)
+        self.assertEqual(checkpoint.bestCost, clone.bestCost)
+        self.assertEqual(checkpoint.elapsed, clone.elapsed)
+        self.assertEqual([ ], clone.bestDesign.getDelta(design))
+        self.assertIsNone(clone.getWorkerState(1))
+
+        # The restored rng must continue with the same sequence
+        state = clone.getWorkerState(0)
+        self.assertEqual(0.35, state["relaxRatio"])
+        restored = random.Random()
+        restored.setstate(state["generator"]["rng"])
+        self.assertEqual(rng.random(), restored.random())
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+import costcache
+from costcache import DesignCostCache
+from message import *
+
+class DummyChannel:
+    """Records the messages that the cache sends to the coordinator"""
+    def __init__(self):
+        self.messages = [ ]
+
+    def send(self, item):
+        self.messages.append(getMessage(item))
+## CLASS
+
+class TestDesignCostCache(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = DummyChannel()
+        self.cache = DesignCostCache(self.channel, 0)
+    ## DEF
+
+    def testFrontCache(self):
+        """Check that we never ask the coordinator for the costs that we computed ourselves"""
+        self.assertIsNone(self.cache.get("d0"))
+        self.assertEqual(1, self.cache.misses)
+        self.cache.put("d0", 1.0)
+        self.assertEqual(1.0, self.cache.get("d0"))
+        self.assertEqual(1, self.cache.local_hits)
+    ## DEF
+
+    def testPublishBatches(self):
+        """Check that computed costs are published in batches"""
+        for i in xrange(costcache.PUBLISH_BATCH_SIZE * 2):
+            self.cache.put("d%d" % i, float(i))
+        self.assertEqual(2, len(self.channel.messages))
+        for msg in self.channel.messages:
+            self.assertEqual(MSG_COST_CACHE_PUBLISH, msg.header)
+            self.assertEqual(costcache.PUBLISH_BATCH_SIZE, len(msg.data))
+        ## FOR
+    ## DEF
+
+    def testMissDoesNotWait(self):
+        """Check that a miss does not send anything to the coordinator"""
+        self.cache.put("d0", 1.0)
+        self.assertIsNone(self.cache.get("d1"))
+        self.assertEqual(1, self.cache.misses)
+        self.assertEqual(0, len(self.channel.messages))
+    ## DEF
+
+    def testRemoteEntries(self):
+        """Check that we use the costs that the other workers computed"""
+        self.cache.putRemote([ ("d1", 2.0), ("d2", 3.0) ])
+        self.assertEqual(2.0, self.cache.get("d1"))
+        self.assertEqual(3.0, self.cache.get("d2"))
+        self.assertEqual(2, self.cache.remote_hits)
+        # We do not publish them again
+        self.cache.publish()
+        self.assertEqual(0, len(self.channel.messages))
+    ## DEF
+
+    def testMaxEntries(self):
+        """Check that the front cache does not grow without bounds"""
+        entries = [ ("d%d" % i, float(i)) for i in xrange(costcache.MAX_FRONT_ENTRIES + 10) ]
+        self.cache.putRemote(entries)
+        self.assertLessEqual(len(self.cache.remote_entries), costcache.MAX_FRONT_ENTRIES)
+        self.assertEqual(float(len(entries) - 1), self.cache.get(entries[-1][0]))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+from neighborhoodqueue import NeighborhoodQueue
+
+class TestNeighborhoodQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.col_names = [ "col%d" % i for i in xrange(8) ]
+        self.queue = NeighborhoodQueue()
+    ## DEF
+
+    def testDisjointNeighborhoods(self):
+        """Check that workers with the same preferences relax different collections"""
+        picked = set()
+        for worker_id in xrange(4):
+            neighborhood = self.queue.getNeighborhood(worker_id, 2, self.col_names)
+            self.assertEqual(2, len(neighborhood))
+            self.assertEqual(set(), picked & set(neighborhood))
+            picked.update(neighborhood)
+        ## FOR
+
+        # Once a worker releases its neighborhood, its collections are free again
+        self.queue.release(0)
+        self.queue.resetExplored()
+        self.assertEqual(self.col_names[:2], self.queue.getNeighborhood(4, 2, self.col_names))
+    ## DEF
+
+    def testPreferences(self):
+        """Check that a worker gets the free collections that it prefers the most"""
+        self.queue.getNeighborhood(0, 2, self.col_names)
+        preferences = list(reversed(self.col_names))
+        self.assertEqual(preferences[:3], self.queue.getNeighborhood(1, 3, preferences))
+
+        # If there are not enough free collections, we share the least preferred ones
+        neighborhood = self.queue.getNeighborhood(2, 5, self.col_names)
+        self.assertEqual(self.col_names[2:5] + self.col_names[:2], neighborhood)
+    ## DEF
+
+    def testExploredNeighborhoods(self):
+        """Check that the same neighborhood is only handed out again after the best design changes"""
+        first = self.queue.getNeighborhood(0, 3, self.col_names)
+        second = self.queue.getNeighborhood(0, 3, self.col_names)
+        self.assertNotEqual(set(first), set(second))
+
+        self.queue.resetExplored()
+        self.assertEqual(first, self.queue.getNeighborhood(0, 3, self.col_names))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
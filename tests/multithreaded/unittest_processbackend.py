@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import time
+import Queue
+import unittest
+import multiprocessing
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../libs"))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+import processbackend
+from message import *
+from util import configutil
+
+class TestProcessBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.num_clients = 3
+        self.channels, self.queue, self.processes = \
+            processbackend.createProcessChannels(self.num_clients, ({ "col0": { } }, [ ]))
+    ## DEF
+
+    def tearDown(self):
+        processbackend.stopProcesses(self.channels, self.processes)
+        for p in self.processes:
+            self.assertFalse(p.is_alive())
+    ## DEF
+
+    def testInit(self):
+        """Check that the forked workers speak the same protocol as the execnet ones"""
+        config = configutil.makeDefaultConfig()
+        for worker_id in xrange(self.num_clients):
+            sendMessage(MSG_CMD_INIT, (config, { }, worker_id), self.channels[worker_id])
+        ## FOR
+        workers = set()
+        for i in xrange(self.num_clients):
+            chan, res = self.queue.get(timeout=60)
+            msg = getMessage(res)
+            self.assertEqual(MSG_INIT_COMPLETED, msg.header)
+            self.assertEqual(chan, self.channels[msg.data])
+            workers.add(msg.data)
+        ## FOR
+        self.assertEqual(set(range(self.num_clients)), workers)
+        self.assertRaises(Queue.Empty, self.queue.get, timeout=0.1)
+    ## DEF
+
+    def testStopStuckWorker(self):
+        """Check that we do not wait forever for a worker that does not stop"""
+        p = multiprocessing.Process(target=time.sleep, args=(600, ))
+        p.start()
+        start = time.time()
+        processbackend.stopProcesses([ ], [ p ], timeout=0.5)
+        self.assertFalse(p.is_alive())
+        self.assertLess(time.time() - start, 60)
+    ## DEF
+
+    def testInheritedWorkload(self):
+        self.assertEqual([ "col0" ], processbackend.INHERITED_WORKLOAD.getCollections().keys())
+        self.assertEqual([ ], processbackend.INHERITED_WORKLOAD.getWorkload())
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
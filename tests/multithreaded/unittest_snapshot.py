@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import shutil
+import tempfile
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../libs"))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+from catalog import Collection
+from workload import Session
+from snapshot import WorkloadSnapshot, saveSnapshot, loadSnapshot, dumpSnapshot, loadsSnapshot
+
+class TestWorkloadSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "d4.snapshot")
+
+        self.collections = { }
+        for i in xrange(3):
+            col_info = Collection()
+            col_info['name'] = "col%d" % i
+            col_info['doc_count'] = 100 * (i+1)
+            col_info['interesting'] = [ "f0" ]
+            col_info['fields']["f0"] = Collection.fieldFactory("f0", "int")
+            col_info['fields']["f0"]['cardinality'] = 10
+            self.collections[col_info['name']] = col_info
+        ## FOR
+
+        self.workload = [ ]
+        for i in xrange(10):
+            sess = Session()
+            sess['session_id'] = i
+            sess['operations'].append({
+                "collection": "col%d" % (i % 3),
+                "query_hash": i,
+                "query_content": [ {"f0": i} ],
+            })
+            self.workload.append(sess)
+        ## FOR
+        self.snapshot = WorkloadSnapshot(self.collections, self.workload)
+    ## DEF
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    ## DEF
+
+    def checkSnapshot(self, snapshot):
+        collections = snapshot.getCollections()
+        self.assertEqual(sorted(self.collections.keys()), sorted(collections.keys()))
+        for col_name, col_info in collections.iteritems():
+            self.assertIsInstance(col_info, Collection)
+            self.assertEqual(self.collections[col_name]['doc_count'], col_info['doc_count'])
+            self.assertEqual(10, col_info.getField("f0")['cardinality'])
+        ## FOR
+
+        workload = snapshot.getWorkload()
+        self.assertEqual(len(self.workload), len(workload))
+        for expected, sess in zip(self.workload, workload):
+            self.assertIsInstance(sess, Session)
+            self.assertEqual(expected['session_id'], sess['session_id'])
+            self.assertEqual(expected['operations'], sess['operations'])
+        ## FOR
+    ## DEF
+
+    def testSaveAndLoad(self):
+        """Check that local workers get the same collections and sessions from the snapshot file"""
+        saveSnapshot(self.path, self.snapshot)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+        self.checkSnapshot(loadSnapshot(self.path))
+    ## DEF
+
+    def testDumpAndLoads(self):
+        """Check that remote workers get the same collections and sessions from the serialized snapshot"""
+        self.checkSnapshot(loadsSnapshot(dumpSnapshot(self.snapshot)))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import shutil
+import tempfile
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+import telemetry
+from telemetry import SearchTelemetry, SearchProgress
+from message import *
+
+class DummyChannel:
+    """Records the messages that the workers send to the coordinator"""
+    def __init__(self):
+        self.messages = [ ]
+
+    def send(self, item):
+        self.messages.append(getMessage(item))
+## CLASS
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.channel = DummyChannel()
+    ## DEF
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    ## DEF
+
+    def testEvalTimeBuckets(self):
+        self.assertEqual(0, telemetry.getEvalTimeBucket(0.0))
+        self.assertEqual(1, telemetry.getEvalTimeBucket(0.005))
+        self.assertEqual(len(telemetry.EVAL_TIME_BUCKETS), telemetry.getEvalTimeBucket(1000.0))
+    ## DEF
+
+    def testBatchedFlush(self):
+        """Check that the counters are only sent once per interval"""
+        t = SearchTelemetry(self.channel, 3, 60)
+        for i in xrange(1000):
+            t.recordEvaluation(1000 - i, 0.05)
+            if i % 2: t.recordPruned()
+        self.assertEqual([ ], self.channel.messages)
+
+        t.flush(True)
+        self.assertEqual(1, len(self.channel.messages))
+        msg = self.channel.messages[0]
+        self.assertEqual(MSG_SEARCH_TELEMETRY, msg.header)
+        worker_id, counters = msg.data
+        self.assertEqual(3, worker_id)
+        self.assertEqual(1000, counters["evaluated"])
+        self.assertEqual(500, counters["pruned"])
+        self.assertEqual(1, counters["bestCost"])
+        self.assertEqual(1000, counters["eval_times"][telemetry.getEvalTimeBucket(0.05)])
+
+        # Without an interval, every evaluation is sent right away
+        t = SearchTelemetry(self.channel, 4, 0)
+        t.recordEvaluation(1.0, 0.05)
+        self.assertEqual(2, len(self.channel.messages))
+    ## DEF
+
+    def testProgress(self):
+        """Check that the coordinator adds up the counters of all workers and writes the best costs"""
+        path = os.path.join(self.tmpdir, "progress.csv")
+        progress = SearchProgress(path)
+        progress.recordBestCost(10.0)
+
+        for worker_id in xrange(3):
+            t = SearchTelemetry(self.channel, worker_id, 0)
+            for i in xrange(worker_id + 1):
+                t.recordEvaluation(5.0, 0.05)
+            progress.update(*self.channel.messages[-1].data)
+        ## FOR
+        # Counters are cumulative, so a repeated report does not count twice
+        progress.update(*self.channel.messages[-1].data)
+        self.assertEqual(6, progress.getTotal("evaluated"))
+        self.assertIn("evaluated=6", progress.getProgressLine(5.0, 3))
+
+        progress.recordBestCost(5.0)
+        progress.recordBestCost(5.0)
+        lines = open(path).read().strip().split("\n")
+        self.assertEqual("elapsed,best_cost,evaluated", lines[0])
+        self.assertEqual(3, len(lines))
+        self.assertEqual([ "5.0", "6" ], lines[-1].split(",")[1:])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
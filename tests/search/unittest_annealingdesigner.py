@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from search.annealingdesigner import AnnealingDesigner
+from search.designcandidates import DesignCandidates
+from search.design import Design
+from util import configutil
+
+class DummyCostModel:
+
+    def overallCost(self, design):
+        return self.function(design)
+
+    def __init__(self, function):
+        self.function = function
+## CLASS
+
+class TestAnnealingDesigner (unittest.TestCase) :
+
+    def setUp(self):
+        self.col_names = [ "col0", "col1", "col2" ]
+        self.collections = dict([ (col_name, { }) for col_name in self.col_names ])
+
+        self.dc = DesignCandidates()
+        self.dc.addCollection("col0", [ ("f0",), ("f1",) ], [ "f0", "f1" ], [ "col1" ])
+        self.dc.addCollection("col1", [ ("f0",) ], [ "f0" ], [ "col0", "col2" ])
+        self.dc.addCollection("col2", [ ("f0",), ("f0", "f1") ], [ "f1" ], [ "col1" ])
+
+        self.initialDesign = Design()
+        for col_name in self.col_names:
+            self.initialDesign.addCollection(col_name)
+
+        self.config = configutil.makeDefaultConfig()
+        self.costModel = DummyCostModel(lambda design: 1.0)
+        self.designer = AnnealingDesigner(self.collections, self.dc, [ ], self.config, self.costModel, self.initialDesign, 1.0)
+    ## DEF
+
+    def testNeighborIsFeasible(self):
+        """
+            Check that random moves never create circular embeddings
+            or leave a shard key on an embedded collection
+        """
+        design = self.initialDesign
+        for i in xrange(1000):
+            design = self.designer.neighbor(design)
+            self.assertIsNotNone(design)
+            for col_name in self.col_names:
+                self.assertFalse(col_name in design.getDenormalizationHierarchy(col_name))
+                if design.isDenormalized(col_name):
+                    self.assertEqual([ ], design.getShardKeys(col_name))
+                for shardKey in design.getShardKeys(col_name):
+                    self.assertIn(shardKey, self.dc.shardKeys[col_name])
+                for index in design.getIndexes(col_name):
+                    self.assertIn(index, self.dc.indexKeys[col_name])
+            ## FOR
+        ## FOR
+    ## DEF
+
+    def testNeighborChangesOneCollection(self):
+        """Check that a move only changes the design of a single collection"""
+        design = self.initialDesign
+        for i in xrange(100):
+            newDesign = self.designer.neighbor(design)
+            self.assertLessEqual(len(newDesign.getDelta(design)), 1)
+            design = newDesign
+        ## FOR
+    ## DEF
+
+    def testSeed(self):
+        """Check that the same seed and worker id always make the same moves"""
+        self.config.set(configutil.SECT_DESIGNER, 'seed', 1234)
+        designs = [ ]
+        for worker_id in [ 0, 0, 1 ]:
+            designer = AnnealingDesigner(self.collections, self.dc, [ ], self.config, self.costModel, self.initialDesign, 1.0, worker_id=worker_id)
+            design = self.initialDesign
+            for i in xrange(50):
+                design = designer.neighbor(design)
+            designs.append(design.getHash())
+        ## FOR
+        self.assertEqual(designs[0], designs[1])
+        self.assertNotEqual(designs[0], designs[2])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -54,6 +54,28 @@ class TestDesign (unittest.TestCase):
 
     ## DEF
 
+    def testGetHash(self):
+        d0 = TestDesign.designFactory()
+        d1 = TestDesign.designFactory()
+        self.assertEqual(d0.getHash(), d1.getHash())
+        self.assertEqual(d0.getHash(), d0.copy().getHash())
+
+        # Unicode collection names come back from the catalog
+        d2 = design.Design()
+        for col_name in d0.getCollections():
+            d2.addCollection(unicode(col_name))
+            d2.addShardKey(unicode(col_name), tuple(d0.getShardKeys(col_name)))
+            for indexKeys in d0.getIndexes(col_name):
+                d2.addIndex(unicode(col_name), indexKeys)
+        self.assertEqual(d0.getHash(), d2.getHash())
+
+        col_name = d0.getCollections()[0]
+        d1.reset(col_name)
+        self.assertNotEqual(d0.getHash(), d1.getHash())
+        d1.recover(col_name)
+        self.assertNotEqual(d0.getHash(), d1.getHash())
+    ## DEF
+
     def testAddCollection(self) :
         d = design.Design()
         collection = 'Test'
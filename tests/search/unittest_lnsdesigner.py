@@ -34,6 +34,46 @@ class TestSearchSpace (unittest.TestCase) :
         self.assertNotEqual(sorted(value_list[0]), sorted(value_list[2]))
         self.assertNotEqual(sorted(value_list[1]), sorted(value_list[2]))
     ## DEF
+    
+    def testAdaptiveCollectionGenerator(self):
+        """
+            Check whether AdaptiveCollectionGenerator prefers expensive collections
+            and stops preferring the ones that do not lead to better designs
+        """
+        acg = LNSDesigner.AdaptiveCollectionGenerator(self.collections)
+        col_costs = dict([(col_name, 0.0) for col_name in self.collections])
+        col_costs["key0"] = 100.0
+        acg.updateCosts(col_costs)
+        
+        picked = [ ]
+        for j in xrange(100):
+            r = acg.getRandomCollections(3)
+            self.assertEqual(3, len(set(r)))
+            picked.extend(r)
+        ## FOR
+        self.assertGreater(picked.count("key0"), 60)
+        
+        # Keep on failing to improve the design by relaxing key0
+        for j in xrange(10):
+            acg.update(["key0"], 1.0, 1.0)
+        ## FOR
+        self.assertEqual(0.0, acg.getImprovementRate("key0"))
+        self.assertLess(acg.getWeight("key0"), acg.getWeight("key1") * 100)
+        
+        acg.update(["key1"], 1.0, 0.5)
+        self.assertEqual(1.0, acg.getImprovementRate("key1"))
+    ## DEF
+    
+    def testSeededCollectionGenerator(self):
+        """Check that generators with the same seed pick the same collections"""
+        picks = [ ]
+        for seed in [ 42, 42, 43 ]:
+            rcg = LNSDesigner.RandomCollectionGenerator(self.collections, seed)
+            picks.append([ rcg.getRandomCollections(5) for j in xrange(10) ])
+        ## FOR
+        self.assertEqual(picks[0], picks[1])
+        self.assertNotEqual(picks[0], picks[2])
+    ## DEF
 ## CLASS
 
 if __name__ == '__main__':
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import unittest
+import shutil
+import pstats
+import tempfile
+
+from util import profiler
+from inputs.abstractconverter import AbstractConverter
+
+class TestProfiler(unittest.TestCase):
+    
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+    ## DEF
+    
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+    ## DEF
+    
+    def busy(self):
+        return sum([ x*x for x in xrange(100000) ])
+    ## DEF
+    
+    def testDisabled(self):
+        p = profiler.Profiler()
+        p.start("load")
+        p.stop("load")
+        self.assertEqual([ ], p.getPhases())
+        self.assertIsNone(p.finish())
+    ## DEF
+    
+    def testPhases(self):
+        p = profiler.Profiler(enabled=True)
+        for i in xrange(3):
+            p.start("cost")
+            self.busy()
+            p.stop("cost")
+        ## FOR
+        p.start("load")
+        p.stop("load")
+        
+        phases = p.getPhases()
+        self.assertEqual([ "cost", "load" ], [ x[0] for x in phases ])
+        name, count, wall, cpu, rss = phases[0]
+        self.assertEqual(3, count)
+        self.assertGreater(wall, 0.0)
+        self.assertGreaterEqual(cpu, 0.0)
+        self.assertGreaterEqual(rss, 0)
+        
+        summary = profiler.formatSummary(phases, {"disk": (3, 1.5)})
+        self.assertIn("cost", summary)
+        self.assertIn("500.00", summary)
+    ## DEF
+    
+    def testProfilePhase(self):
+        p = profiler.setupProfiler({"profile_phase": "cost", "profile_dir": self.output_dir}, "test")
+        self.assertTrue(p.enabled)
+        self.assertIs(p, profiler.getProfiler())
+        p.start("load")
+        p.stop("load")
+        p.start("cost")
+        self.busy()
+        p.stop("cost")
+        
+        path = p.finish()
+        self.assertEqual(os.path.join(self.output_dir, "test-cost.pstats"), path)
+        stats = pstats.Stats(path)
+        functions = [ func[2] for func in stats.stats.iterkeys() ]
+        self.assertIn("busy", functions)
+        profiler.setupProfiler({ }, "d4")
+    ## DEF
+    
+    def testPhaseError(self):
+        """Check that a phase is stopped when it raises an exception"""
+        p = profiler.setupProfiler({"profile": True}, "test")
+        try:
+            converter = AbstractConverter(None, None)
+            self.assertRaises(NotImplementedError, converter.process)
+            self.assertEqual({ }, p.active)
+            self.assertEqual([ "load" ], [ x[0] for x in p.getPhases() ])
+            # Starting the phase again does not trip over the one that failed
+            p.start("load")
+            p.stop("load")
+            self.assertEqual(2, p.getPhases()[0][1])
+        finally:
+            profiler.setupProfiler({ }, "d4")
+    ## DEF
+    
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
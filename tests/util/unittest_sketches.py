@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import math
+import random
+import pickle
+import unittest
+import numpy
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+from util.sketches import HyperLogLog, StreamingStats, KLLSketch, ValueSketch
+
+class TestSketches(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(1234)
+    ## DEF
+
+    def testHyperLogLogExact(self):
+        h = HyperLogLog(exact_limit=100)
+        for i in xrange(1000):
+            h.add(i % 50)
+        self.assertTrue(h.isExact())
+        self.assertEqual(50, h.count())
+    ## DEF
+
+    def testHyperLogLogEstimate(self):
+        h = HyperLogLog()
+        num_values = 50000
+        for i in xrange(num_values):
+            h.add("key%d" % i)
+            h.add("key%d" % i)
+        self.assertFalse(h.isExact())
+        self.assertLess(abs(h.count() - num_values), num_values * 0.05)
+    ## DEF
+
+    def testHyperLogLogMerge(self):
+        h0 = HyperLogLog()
+        h1 = HyperLogLog()
+        for i in xrange(30000):
+            h0.add(i)
+            h1.add(i + 10000)
+        h0.merge(h1)
+        self.assertLess(abs(h0.count() - 40000), 40000 * 0.05)
+
+        # A sketch that still has its exact values
+        h2 = HyperLogLog()
+        h2.add(-1)
+        h0.merge(h2)
+        self.assertLess(abs(h0.count() - 40001), 40001 * 0.05)
+    ## DEF
+
+    def testStreamingStats(self):
+        values = [ self.rng.randint(0, 1000) for i in xrange(1000) ]
+        stats = StreamingStats()
+        other = StreamingStats()
+        for v in values[:400]:
+            stats.put(v)
+        for v in values[400:]:
+            other.put(v)
+        stats.merge(other)
+
+        self.assertEqual(len(values), stats.getSampleCount())
+        self.assertAlmostEqual(numpy.average(values), stats.mean)
+        self.assertAlmostEqual(numpy.std(values), stats.getStdev())
+        self.assertEqual(min(values), stats.min)
+        self.assertEqual(max(values), stats.max)
+        self.assertEqual(sum(values), stats.total)
+    ## DEF
+
+    def testStreamingStatsTotal(self):
+        # The running mean times the count of these values is a little more than their sum
+        values = [ 40, 18, 51, 99, 78, 54, 87 ]
+        stats = StreamingStats()
+        for v in values:
+            stats.put(v)
+        self.assertGreater(stats.mean * len(values), sum(values))
+        self.assertEqual(sum(values), stats.total)
+        self.assertEqual(sum(values) / len(values), int(math.ceil(stats.total / float(stats.count))))
+    ## DEF
+
+    def testKLLQuantiles(self):
+        values = range(100000)
+        self.rng.shuffle(values)
+        kll = KLLSketch()
+        for v in values:
+            kll.add(v)
+        # The sketch must not keep all of the values
+        self.assertLess(kll.size, 1000)
+
+        fractions = [ 0.1, 0.25, 0.5, 0.75, 0.9 ]
+        for fraction, value in zip(fractions, kll.getQuantiles(fractions)):
+            self.assertLess(abs(value - fraction * len(values)), len(values) * 0.02)
+    ## DEF
+
+    def testValueSketchRanges(self):
+        # While the values are exact, the ranges must be the same
+        # as the ones that we compute from the set of distinct values
+        sketch = ValueSketch()
+        for v in [ 5, 1, None, 3, 2, 4, 3, 0 ]:
+            sketch.add(v)
+        self.assertEqual(7, len(sketch))
+        self.assertEqual([ 0 ], sketch.getRanges(1))
+        self.assertEqual([ 0, 2, 4 ], sketch.getRanges(3))
+        self.assertEqual([ 0, 1, 2, 3, 4, 5 ], sketch.getRanges(10))
+
+        sketch = ValueSketch(exact_limit=100)
+        for i in xrange(10000):
+            sketch.add(i)
+        ranges = sketch.getRanges(4)
+        self.assertEqual(0, ranges[0])
+        for expected, value in zip([ 2500, 5000, 7500 ], ranges[1:]):
+            self.assertLess(abs(value - expected), 200)
+    ## DEF
+
+    def testPickle(self):
+        sketch = ValueSketch(exact_limit=10)
+        for i in xrange(100):
+            sketch.add(i)
+        clone = pickle.loads(pickle.dumps(sketch, -1))
+        self.assertEqual(len(sketch), len(clone))
+        self.assertEqual(sketch.getRanges(4), clone.getRanges(4))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -5,7 +5,9 @@ import os, sys
 basedir = os.path.realpath(os.path.dirname(__file__))
 sys.path.append(os.path.join(basedir, "../../src"))
 
+import time
 import unittest
+import subprocess
 from pprint import pprint, pformat
 
 import util 
@@ -46,6 +48,54 @@ class TestUtilMethods (unittest.TestCase):
         ## FOR
     ## DEF
     
+    def testStableHash(self):
+        values = [ "col0", u"col0", 1234, 12.5, ("f0", 1), [ "f0", [ 1, 2 ] ], {"a": 1, "b": {"c": None}} ]
+        for value in values:
+            h = util.stableHash(value)
+            self.assertGreaterEqual(h, 0)
+            self.assertLess(h, 2**64)
+            self.assertEqual(h, util.stableHash(value))
+        ## FOR
+        self.assertEqual(util.stableHash("col0"), util.stableHash(u"col0"))
+        self.assertEqual(util.stableHash(1), util.stableHash(1L))
+        self.assertEqual(util.stableHash(("f0", 1)), util.stableHash(("f0", 1L)))
+        self.assertNotEqual(util.stableHash(1), util.stableHash(True))
+        self.assertEqual(util.stableHash({"a": 1, "b": 2}), util.stableHash(dict([("b", 2), ("a", 1)])))
+        self.assertNotEqual(util.stableHash(("f0", 1)), util.stableHash(["f0", 1]))
+        
+        # The hash must not change in a process with randomized hash() values
+        script = "import sys; sys.path.append(%r); import util; print util.stableHash(%r)" % \
+                 (os.path.join(basedir, "../../src"), values)
+        output = subprocess.check_output([ sys.executable, "-R", "-c", script ])
+        self.assertEqual(util.stableHash(values), int(output.strip()))
+        script = "import sys; sys.path.append(%r); import util; print [ util.stableHash(x) for x in %r ]" % \
+                 (os.path.join(basedir, "../../src"), values)
+        output = subprocess.check_output([ sys.executable, "-R", "-c", script ])
+        self.assertEqual(map(util.stableHash, values), eval(output))
+    ## DEF
+    
+    def testStableHashSpeed(self):
+        """Numbers and strings must not go through the slow md5 path"""
+        values = range(50000) + [ "col%d" % i for i in xrange(50000) ]
+        tuples = [ (x, ) for x in values ]
+        start = time.time()
+        for value in values:
+            util.stableHash(value)
+        fast = time.time() - start
+        start = time.time()
+        for value in tuples:
+            util.stableHash(value)
+        slow = time.time() - start
+        self.assertLess(fast, slow / 2)
+    ## DEF
+    
+    def testDeriveSeed(self):
+        self.assertIsNone(util.deriveSeed(None, "lns", 0))
+        self.assertEqual(util.deriveSeed(42, "lns", 0), util.deriveSeed(42, "lns", 0))
+        self.assertNotEqual(util.deriveSeed(42, "lns", 0), util.deriveSeed(42, "lns", 1))
+        self.assertNotEqual(util.deriveSeed(42, "lns", 0), util.deriveSeed(43, "lns", 0))
+    ## DEF
+    
 ## CLASS
 
 if __name__ == '__main__':
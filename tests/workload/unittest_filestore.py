@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import shutil
+import tempfile
+import unittest
+
+from workload.filestore import FileStore, FileStoreWriter, SEGMENT_REGEX
+from workload.synthetic import SyntheticWorkloadGenerator
+from search.designer import Designer
+from util import configutil
+
+NUM_SESSIONS = 100
+
+class TestFileStore(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="d4-filestore-")
+        generator = SyntheticWorkloadGenerator(num_collections=3, num_fields=4, num_templates=6, \
+                                               num_sessions=NUM_SESSIONS, ops_per_session=3, seed=1)
+        self.collections, self.workload = generator.generate()
+    ## DEF
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+    ## DEF
+
+    def writeStore(self, workload, segment_size=10):
+        writer = FileStoreWriter(self.path, segment_size)
+        writer.writeCollections(self.collections.itervalues())
+        for sess in workload:
+            writer.addSession(sess)
+        writer.close()
+    ## DEF
+
+    def testReadWrite(self):
+        self.writeStore(self.workload)
+        store = FileStore(self.path)
+        self.assertEqual(NUM_SESSIONS, store.getSessionCount())
+        self.assertEqual(NUM_SESSIONS * 3, store.getOpCount())
+        self.assertEqual(NUM_SESSIONS / 10, len(store.segments))
+
+        collections = dict([ (col_info['name'], col_info) for col_info in store.fetchCollections() ])
+        self.assertEqual(sorted(self.collections.keys()), sorted(collections.keys()))
+        for col_name, col_info in collections.iteritems():
+            self.assertEqual(dict(self.collections[col_name]), dict(col_info))
+
+        sessions = list(store.fetchSessions())
+        self.assertEqual(len(self.workload), len(sessions))
+        for expected, sess in zip(self.workload, sessions):
+            self.assertEqual(dict(expected), dict(sess))
+    ## DEF
+
+    def testFetchCollection(self):
+        """Check that we only return the sessions that touch the given collections"""
+        self.writeStore(self.workload)
+        store = FileStore(self.path)
+        col_name = sorted(self.collections.keys())[0]
+        expected = [ sess['session_id'] for sess in self.workload \
+                     if [ op for op in sess['operations'] if op['collection'] == col_name ] ]
+        sessions = [ sess['session_id'] for sess in store.fetchSessions([ col_name ]) ]
+        self.assertEqual(expected, sessions)
+        self.assertEqual([ ], list(store.fetchSessions([ "doesNotExist" ])))
+    ## DEF
+
+    def testReplace(self):
+        """Check that writing a smaller store removes the segments of the previous one"""
+        self.writeStore(self.workload)
+        self.writeStore(self.workload[:25])
+        store = FileStore(self.path)
+        self.assertEqual(25, store.getSessionCount())
+        self.assertEqual(25, len(list(store.fetchSessions())))
+        segments = [ x for x in os.listdir(self.path) if SEGMENT_REGEX.match(x) ]
+        self.assertEqual(sorted([ x["file"] for x in store.segments ]), sorted(segments))
+    ## DEF
+
+    def testMissing(self):
+        self.assertRaises(Exception, FileStore, os.path.join(self.path, "missing"))
+    ## DEF
+
+    def testDesigner(self):
+        """Check that the Designer can load the workload without a metadata database"""
+        self.writeStore(self.workload)
+        config = configutil.makeDefaultConfig()
+        config.set(configutil.SECT_MONGODB, 'metadata_store', 'file')
+        config.set(configutil.SECT_MONGODB, 'metadata_dir', self.path)
+        designer = Designer(config, None, None)
+        collections = designer.loadCollections()
+        expected = [ col_name for col_name, col_info in self.collections.iteritems() \
+                     if col_info['workload_queries'] and col_info['interesting'] ]
+        self.assertEqual(sorted(expected), sorted(collections.keys()))
+        sessions = [ sess for sess in self.workload \
+                     if [ op for op in sess['operations'] if op['collection'] in collections ] ]
+        self.assertEqual(len(sessions), len(designer.loadWorkload(collections)))
+
+        designer.sess_limit = 10
+        self.assertEqual(10, len(designer.loadWorkload(collections)))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import random
+import unittest
+from workload.synthetic import SyntheticWorkloadGenerator, ZipfGenerator
+from costmodel import CostModel
+from costmodel_benchmark import generateDesigns, compareResults
+from util import constants
+
+class TestSyntheticWorkload(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = SyntheticWorkloadGenerator(num_collections=3, num_fields=5, num_templates=6, \
+                                                    num_sessions=50, ops_per_session=4, seed=1)
+    ## DEF
+
+    def testGenerate(self):
+        collections, workload = self.generator.generate()
+        self.assertEqual(3, len(collections))
+        self.assertEqual(50, len(workload))
+        for col_name, col_info in collections.iteritems():
+            self.assertEqual(5, len(col_info['fields']))
+        for sess in workload:
+            self.assertEqual(4, len(sess['operations']))
+            for op in sess['operations']:
+                self.assertIn(op['collection'], collections)
+        ## FOR
+    ## DEF
+
+    def testDeterministic(self):
+        """Check that the same seed always generates the same workload"""
+        workloads = [ ]
+        for seed in [ 1, 1, 2 ]:
+            generator = SyntheticWorkloadGenerator(num_collections=3, num_fields=5, num_templates=6, \
+                                                   num_sessions=50, ops_per_session=4, seed=seed)
+            collections, workload = generator.generate()
+            workloads.append([ (op['collection'], op['query_hash'], repr(op['query_content'])) \
+                               for sess in workload for op in sess['operations'] ])
+        ## FOR
+        self.assertEqual(workloads[0], workloads[1])
+        self.assertNotEqual(workloads[0], workloads[2])
+    ## DEF
+
+    def testZipf(self):
+        rng = random.Random(0)
+        uniform = ZipfGenerator(10, 0.0, rng)
+        skewed = ZipfGenerator(10, 2.0, rng)
+        counts = [ [ 0 ] * 10, [ 0 ] * 10 ]
+        for i in xrange(10000):
+            counts[0][uniform.next()] += 1
+            counts[1][skewed.next()] += 1
+        ## FOR
+        self.assertLess(max(counts[0]) - min(counts[0]), 500)
+        self.assertEqual(0, counts[1].index(max(counts[1])))
+        self.assertGreater(counts[1][0], counts[1][9] * 10)
+    ## DEF
+
+    def testCostModel(self):
+        """Check that the cost model can evaluate designs for the synthetic workload without MongoDB"""
+        collections, workload = self.generator.generate()
+        config = {
+            'weight_network': 1.0,
+            'weight_disk':    1.0,
+            'weight_skew':    1.0,
+            'nodes':          8,
+            'max_memory':     1024,
+            'skew_intervals': constants.DEFAULT_TIME_INTERVALS,
+            'address_size':   constants.DEFAULT_ADDRESS_SIZE,
+            'window_size':    constants.WINDOW_SIZE,
+        }
+        cm = CostModel(collections, workload, config)
+        rng = random.Random(0)
+        for denormalize in [ False, True ]:
+            for design in generateDesigns(collections, 2, denormalize, rng):
+                cost = cm.overallCost(design)
+                self.assertGreaterEqual(cost, 0.0)
+                self.assertLessEqual(cost, 1.0)
+        ## FOR
+    ## DEF
+
+    def testCompareResults(self):
+        baseline = { "results": { "disk":    { "per_second": 100.0 },
+                                  "network": { "per_second": 100.0 } } }
+        results = { "results": { "disk":    { "per_second": 70.0 },
+                                 "network": { "per_second": 95.0 },
+                                 "skew":    { "per_second": 10.0 } } }
+        comparison = compareResults(results, baseline, 0.2)
+        self.assertEqual([ "disk", "network" ], [ x[0] for x in comparison ])
+        self.assertTrue(comparison[0][-1])
+        self.assertFalse(comparison[1][-1])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN